@@ -1,21 +1,36 @@
 import os
 import json
+import sqlite3
 import logging
 import functools
-from datetime import datetime, time, timedelta
-import pytz
-from flask import Flask, request, jsonify, send_file
+from datetime import datetime
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from models import get_db, init_db
-from voice import place_call, get_voice_response, process_lead_response, update_industry_patterns, elevenlabs_tts
-from config import get_config
-from scraper import scrape_business_leads
-from twilio.twiml.voice_response import VoiceResponse
+from async_turns import (submit_turn, get_turn, forget_turn, abandon_turn, turn_abandoned, wait_for_turn,
+                         holding_twiml, retry_twiml, DEFAULT_GRACE_SECONDS, DEFAULT_POLL_WAIT_SECONDS, MAX_POLL_ATTEMPTS)
+from history_window import load_conversation
+from llm_router import get_llm_router
+from prompt_compiler import get_prompt_version
+from response_cache import get_response_cache
+from lead_cache import lead_cache, get_lead, invalidate_lead
+from call_log_writer import write_call_log
+from artifact_store import get_artifact_store
+from call_calendar import get_call_calendar, invalidate_call_calendar
+from archive import DEFAULT_ARCHIVE_DAYS, archive_stats, delete_archived_logs
+from lead_timeline import DEFAULT_PAGE_SIZE, parse_types, load_timeline, load_call_turns
+from job_queue import JOB_STATUSES, DEFAULT_LIST_LIMIT, enqueue_job, get_handler, get_job, list_jobs, cancel_job, start_job_workers
+from search import (DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search_available, build_match_query, search_leads,
+                    search_transcripts)
+from speculation import stats as speculation_stats, speculation_enabled
+from turn_metrics import start_turn, checkpoint, annotate_turn, slow_turns, render_metrics
+from lead_identity import insert_lead, find_lead_id_by_phone, refresh_lead_identity
+from voice import place_call, get_voice_response, process_lead_response, elevenlabs_tts, TTS_CACHE_STATS, speculate_next_turn, twilio_client
+from config import get_config, public_base_url
 import csv
 import io
+import tempfile
 import urllib.parse
-from twilio.rest import Client
-import requests
 
 # Set up logging
 logging.basicConfig(
@@ -31,15 +46,15 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize database
-init_db()
+# Schema setup and migrations run once per deployment (`python models.py` or
+# `flask --app app init-db`), not on every import or worker boot
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and apply migrations"""
+    init_db()
+    print("Database initialized")
 
 # --- Authentication and Setup ---
-@app.before_request
-def setup():
-    if not hasattr(app, 'db_initialized'):
-        init_db()
-        app.db_initialized = True
 
 # API authentication decorator
 def require_api_key(f):
@@ -87,48 +102,9 @@ def check_auth():
             return {'error': 'Unauthorized. Invalid or missing API key.'}, 401
 
 # Time restrictions for calls
-def is_within_call_hours():
-    """Check if current time is within acceptable calling hours based on configuration"""
-    config = get_config()
-    business_hours = config.get('BUSINESS_HOURS', {})
-    
-    # Get timezone from config
-    tz_name = business_hours.get('timezone', 'US/Mountain')
-    try:
-        timezone = pytz.timezone(tz_name)
-    except:
-        # Fallback to Mountain time if invalid timezone
-        timezone = pytz.timezone('US/Mountain')
-    
-    now = datetime.now(timezone)
-    current_time = now.time()
-    is_weekend = now.weekday() >= 5  # 5 = Saturday, 6 = Sunday
-    
-    # Parse business hours from config
-    if is_weekend:
-        # Check if weekend calling is enabled
-        if not business_hours.get('weekend_enabled', False):
-            return False
-            
-        # Parse weekend hours
-        try:
-            start_time = time(*map(int, business_hours.get('weekend_start', '10:00').split(':')))
-            end_time = time(*map(int, business_hours.get('weekend_end', '14:00').split(':')))
-        except:
-            # Fallback to default weekend hours
-            start_time = time(10, 0)
-            end_time = time(14, 0)
-    else:
-        # Parse weekday hours
-        try:
-            start_time = time(*map(int, business_hours.get('weekday_start', '09:30').split(':')))
-            end_time = time(*map(int, business_hours.get('weekday_end', '16:00').split(':')))
-        except:
-            # Fallback to default weekday hours
-            start_time = time(9, 30)
-            end_time = time(16, 0)
-    
-    return start_time <= current_time <= end_time
+def is_within_call_hours(lead=None):
+    """Check if current time is within calling hours (in the lead's time zone when a lead is given)"""
+    return get_call_calendar().can_call(lead)
 
 def is_call_in_progress(lead_id):
     """Check if a call is already in progress for this lead"""
@@ -167,15 +143,28 @@ def should_allow_call(lead_id=None):
     if config.get('TEST_MODE', False):
         return True
         
-    # If it's within call hours, always allow
-    if is_within_call_hours():
+    # If it's within the lead's call hours, always allow
+    lead = None
+    if lead_id:
+        with get_db() as conn:
+            lead = get_lead(conn, lead_id)
+    if is_within_call_hours(lead):
         return True
         
     # If outside call hours, check if call is already in progress
     return is_call_in_progress(lead_id)
 
+def next_call_window(lead_id=None):
+    """When the lead can next be called, in words (None if no window is coming up)"""
+    lead = None
+    if lead_id:
+        with get_db() as conn:
+            lead = get_lead(conn, lead_id)
+    return get_call_calendar().describe_next_window(lead)
+
 def log_outside_hours_attempt(lead_id=None, call_type="outbound"):
     """Log an attempt to make/receive calls outside of business hours"""
+    import pytz
     mountain_tz = pytz.timezone('US/Mountain')
     now = datetime.now(mountain_tz)
     
@@ -184,12 +173,7 @@ def log_outside_hours_attempt(lead_id=None, call_type="outbound"):
     
     if lead_id:
         try:
-            with get_db() as conn:
-                conn.execute('''INSERT INTO call_logs 
-                              (lead_id, call_status, transcript) 
-                              VALUES (?, ?, ?)''',
-                           (lead_id, 'Failed', f"System: {message} - Call blocked by time restrictions"))
-                conn.commit()
+            write_call_log(lead_id, 'Failed', f"System: {message} - Call blocked by time restrictions")
         except Exception as e:
             logger.error(f"Failed to log outside hours attempt: {str(e)}")
     
@@ -210,6 +194,26 @@ def health_check():
         'ngrok_url': app.config.get('CALLBACK_URL', 'Not configured')
     }
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until the database is reachable and its schema is set up"""
+    checks = {}
+    try:
+        with get_db() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [table for table in ('leads', 'call_logs', 'appointments') if table not in tables]
+        checks['database'] = 'ok' if not missing else f"missing tables: {', '.join(missing)} (run python models.py)"
+    except Exception as e:
+        checks['database'] = str(e)
+    try:
+        get_config()
+        checks['config'] = 'ok'
+    except Exception as e:
+        checks['config'] = str(e)
+
+    ready = all(value == 'ok' for value in checks.values())
+    return {'status': 'ready' if ready else 'not ready', 'checks': checks, 'pid': os.getpid()}, 200 if ready else 503
+
 # --- Twilio Webhook Routes ---
 @app.route('/webhook', methods=['GET'])
 def webhook_root():
@@ -242,8 +246,11 @@ def webhook_voice():
     # Check time restrictions
     if not should_allow_call(lead_id):
         log_outside_hours_attempt(lead_id, "inbound webhook")
+        from twilio.twiml.voice_response import VoiceResponse
         response = VoiceResponse()
-        response.say("We are currently outside of business hours. Our calling hours are Monday through Friday, 9:30 AM to 4:00 PM Mountain Time. Goodbye.")
+        next_window = next_call_window(lead_id)
+        callback = f" We can call you back {next_window}." if next_window else ""
+        response.say(f"We are currently outside of business hours.{callback} Goodbye.")
         response.hangup()
         return str(response)
     
@@ -254,21 +261,21 @@ def webhook_voice():
     lead_data = None
     if lead_id:
         with get_db() as conn:
-            lead_data = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-            if lead_data:
-                lead_data = dict(lead_data)
+            lead_data = get_lead(conn, lead_id)
     
     # Generate TwiML response for the call
     response = get_voice_response(script, lead_data)
     
     # Store initial conversation in call_logs if lead_id is provided
     if lead_id:
-        with get_db() as conn:
-            conn.execute('''INSERT INTO call_logs 
-                          (lead_id, call_status, transcript) 
-                          VALUES (?, ?, ?)''',
-                       (lead_id, 'Started', f"Bot: {script}"))
-            conn.commit()
+        # The first turn reads this row back, so wait for it to be committed
+        write_call_log(lead_id, 'Started', f"Bot: {script}").wait()
+        
+        # Start on the likely replies to the opening question while the lead answers
+        if speculation_enabled(get_config()):
+            with get_db() as conn:
+                conversation_history, history_digest = load_conversation(conn, lead_id)
+            speculate_next_turn(lead_id, lead_data, conversation_history, history_digest)
     
     return str(response)
 
@@ -296,12 +303,7 @@ def webhook_amd_status():
     
     # Store AMD result in database if lead_id is provided
     if lead_id:
-        with get_db() as conn:
-            conn.execute('''INSERT INTO call_logs 
-                          (lead_id, call_status, transcript, call_sid) 
-                          VALUES (?, ?, ?, ?)''',
-                       (lead_id, 'AMD Detection', f"Call was answered by: {answered_by} (detection took {machine_detection_duration}ms)", call_sid))
-            conn.commit()
+        write_call_log(lead_id, 'AMD Detection', f"Call was answered by: {answered_by} (detection took {machine_detection_duration}ms)", call_sid=call_sid)
     
     # Check if this is a voicemail/answering machine
     is_voicemail = answered_by in ['machine_end_beep', 'machine_end_silence', 'machine_end_other']
@@ -314,11 +316,9 @@ def webhook_amd_status():
         lead_data = None
         if lead_id:
             with get_db() as conn:
-                lead_result = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-                if lead_result:
-                    lead_data = dict(lead_result)
-                    # TODO: In the future, we might want to get a personalized voicemail script
-                    # For now we'll use a default
+                lead_data = get_lead(conn, lead_id)
+                # TODO: In the future, we might want to get a personalized voicemail script
+                # For now we'll use a default
         
         if not script:
             script = "I'm calling about helping your company save money on mobile device management. Our clients typically save 20% on their mobile costs."
@@ -327,30 +327,16 @@ def webhook_amd_status():
         from voice import get_voice_response
         voicemail_twiml = get_voice_response(script, lead_data=lead_data, is_voicemail=True)
         
-        # Store the voicemail TwiML in the call_logs table with the call_sid
-        with get_db() as conn:
-            # First check if we already have a voicemail TwiML entry for this call_sid
-            existing = conn.execute('SELECT id FROM call_logs WHERE call_sid = ? AND call_status = ?', 
-                                   (call_sid, 'VoicemailTwiML')).fetchone()
-            
-            if existing:
-                # Update the existing entry
-                conn.execute('UPDATE call_logs SET transcript = ? WHERE id = ?', 
-                           (voicemail_twiml, existing['id']))
-            else:
-                # Create a new entry
-                conn.execute('INSERT INTO call_logs (lead_id, call_status, transcript, call_sid) VALUES (?, ?, ?, ?)',
-                           (lead_id, 'VoicemailTwiML', voicemail_twiml, call_sid))
-            
-            conn.commit()
+        # Keep the voicemail TwiML until Twilio fetches it (a later AMD callback replaces it)
+        config = get_config()
+        get_artifact_store(config).put('voicemail_twiml', call_sid, voicemail_twiml)
         
         # Update the call with new TwiML for voicemail
         try:
-            config = get_config()
-            client = Client(config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'])
+            client = twilio_client(config)
             
             # Get webhook URL 
-            webhook_url = config.get('CALLBACK_URL', 'http://localhost:5001').rstrip('/webhook')
+            webhook_url = public_base_url(config, 'http://localhost:5001')
             
             # Create URL for voicemail TwiML
             voicemail_twiml_url = f"{webhook_url}/webhook/voicemail_twiml?call_sid={call_sid}"
@@ -376,16 +362,14 @@ def voicemail_twiml():
     
     # Retrieve the stored TwiML for this call_sid
     if call_sid:
-        with get_db() as conn:
-            result = conn.execute('SELECT transcript FROM call_logs WHERE call_sid = ? AND call_status = ?',
-                               (call_sid, 'VoicemailTwiML')).fetchone()
-            
-            if result and result['transcript']:
-                logger.info(f"Retrieved voicemail TwiML for call {call_sid}")
-                return result['transcript']
+        twiml = get_artifact_store(get_config()).get('voicemail_twiml', call_sid)
+        if twiml:
+            logger.info(f"Retrieved voicemail TwiML for call {call_sid}")
+            return twiml
     
     # If no TwiML found or no call_sid provided, generate a default response
     logger.warning(f"No voicemail TwiML found for call {call_sid}, using default")
+    from twilio.twiml.voice_response import VoiceResponse
     response = VoiceResponse()
     response.say("Hello, this is Steve from Seamless Mobile Services with a message about mobile device management. Please call us back at your convenience. Thank you.")
     response.hangup()
@@ -409,41 +393,81 @@ def webhook_response():
     # Check time restrictions
     if not should_allow_call(lead_id):
         log_outside_hours_attempt(lead_id, "inbound response")
+        from twilio.twiml.voice_response import VoiceResponse
         response = VoiceResponse()
-        response.say("I apologize, but we are now outside of business hours. I'll have to call you back during our business hours, which are Monday through Friday, 9:30 AM to 4:00 PM Mountain Time. Thank you and goodbye.")
+        next_window = next_call_window(lead_id)
+        callback = f" I'll have to call you back {next_window}." if next_window else " I'll have to call you back during our business hours."
+        response.say(f"I apologize, but we are now outside of business hours.{callback} Thank you and goodbye.")
         response.hangup()
         return str(response)
     
     # Get speech recognition result from Twilio
     speech_result = request.values.get('SpeechResult')
     
+    config = get_config()
+    if str(config.get('ASYNC_TURNS', False)).lower() not in ('false', '0', ''):
+        # Compute the turn in a worker; if it isn't ready almost immediately,
+        # play a filler clip and let Twilio poll for the finished TwiML
+        turn_id, future = submit_turn(handle_turn, lead_id, speech_result, request.values.get('CallSid'))
+        twiml = wait_for_turn(future, float(config.get('ASYNC_TURN_GRACE', DEFAULT_GRACE_SECONDS)), lead_id)
+        if twiml is not None:
+            forget_turn(turn_id)
+            return twiml
+        logger.info(f"Turn {turn_id} for lead {lead_id} still computing, playing filler")
+        return holding_twiml(turn_id, lead_id, config)
+    
+    return handle_turn(lead_id, speech_result, request.values.get('CallSid'))
+
+@app.route('/webhook/turn/<turn_id>', methods=['GET', 'POST'])
+def webhook_turn(turn_id):
+    """Serve the TwiML of an asynchronous turn, holding with <Redirect> until it is ready"""
+    lead_id = request.args.get('lead_id') or None
+    attempt = int(request.args.get('attempt', 1))
+    
+    future = get_turn(turn_id)
+    if future is None:
+        logger.warning(f"Unknown or expired turn {turn_id}")
+        return retry_twiml(lead_id)
+    
+    config = get_config()
+    twiml = wait_for_turn(future, float(config.get('ASYNC_POLL_WAIT', DEFAULT_POLL_WAIT_SECONDS)), lead_id)
+    if twiml is not None:
+        forget_turn(turn_id)
+        return twiml
+    
+    if attempt >= MAX_POLL_ATTEMPTS:
+        logger.error(f"Turn {turn_id} for lead {lead_id} did not finish after {attempt} polls")
+        abandon_turn(turn_id)
+        return retry_twiml(lead_id)
+    return holding_twiml(turn_id, lead_id, config, attempt)
+
+def handle_turn(lead_id, speech_result, call_sid=None):
+    """Run one conversation turn (LLM, TTS, call log writes) and return its TwiML"""
+    # Each stage's latency goes to /metrics; slow turns are kept for /api/debug/slow_turns
+    with start_turn(lead_id, call_sid):
+        return _handle_turn(lead_id, speech_result)
+
+def _handle_turn(lead_id, speech_result):
     # Get lead data
     lead_data = None
     conversation_history = []
+    history_digest = None
     
     if lead_id:
         with get_db() as conn:
-            lead_data = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-            if lead_data:
-                lead_data = dict(lead_data)
+            lead_data = get_lead(conn, lead_id)
                 
-            # Retrieve conversation history from call logs
-            logs = conn.execute('SELECT transcript FROM call_logs WHERE lead_id = ? ORDER BY created_at ASC', 
-                             (lead_id,)).fetchall()
-            
-            # Parse conversation history into format for LLM
-            for log in logs:
-                transcript = log['transcript']
-                if transcript.startswith('Bot: '):
-                    conversation_history.append({"role": "assistant", "content": transcript[5:]})
-                elif transcript.startswith('Lead: '):
-                    conversation_history.append({"role": "user", "content": transcript[6:]})
+            # Current call verbatim, earlier calls as a cached digest
+            conversation_history, history_digest = load_conversation(conn, lead_id)
+    annotate_turn(turn_index=sum(1 for msg in conversation_history if msg.get('role') == 'user') + 1)
+    checkpoint('history_load')
     
     # Process the lead's response
     result = process_lead_response(
         speech_result, 
         lead_data, 
-        conversation_history
+        conversation_history,
+        history_digest
     )
     
     # Handle different return formats (compatibility with older and newer versions)
@@ -454,25 +478,29 @@ def webhook_response():
         # Old version without follow-up recommendation
         ai_response, updated_history, conversation_result = result
         follow_up = None
+    checkpoint('process')
     
     # Generate voice response for the next interaction
     response = get_voice_response(ai_response, lead_data, updated_history)
+    checkpoint('tts')
     
-    # Save the transcript to call logs
+    # Start on the likely replies to what we just asked while the lead answers
+    speculate_next_turn(lead_id, lead_data, updated_history, history_digest)
+    checkpoint('speculation')
+    
+    # A turn that took too long was given up on and the lead asked to repeat
+    # themselves, so this reply was never heard: keep it out of the history
+    if turn_abandoned():
+        logger.warning(f"Dropping the abandoned turn for lead {lead_id}")
+        return response
+    
+    # Save the transcript to call logs (group-committed with other calls' turns)
     if lead_id:
+        write_call_log(lead_id, 'In Progress', f"Lead: {speech_result}")
+        # The bot's response is saved with the hash of the prompt that produced it
+        transcript_logged = write_call_log(lead_id, 'In Progress', f"Bot: {ai_response}", conversation_result.get("prompt_hash"))
+        
         with get_db() as conn:
-            # Save the lead's response
-            conn.execute('''INSERT INTO call_logs 
-                          (lead_id, call_status, transcript) 
-                          VALUES (?, ?, ?)''',
-                       (lead_id, 'In Progress', f"Lead: {speech_result}"))
-            
-            # Save the bot's response
-            conn.execute('''INSERT INTO call_logs 
-                          (lead_id, call_status, transcript) 
-                          VALUES (?, ?, ?)''',
-                       (lead_id, 'In Progress', f"Bot: {ai_response}"))
-            
             # If the conversation is complete, update the lead status
             if conversation_result["status"] == "complete":
                 if conversation_result["appointment_set"]:
@@ -548,6 +576,12 @@ def webhook_response():
                         logger.error(f"Error scheduling follow-up: {str(e)}")
             
             conn.commit()
+            if conversation_result["status"] == "complete":
+                invalidate_lead(lead_id)
+        
+        # The next turn reads this transcript back, so it must be durable before Twilio gets the TwiML
+        transcript_logged.wait()
+        checkpoint('db_write')
     
     return str(response)
 
@@ -577,14 +611,11 @@ def webhook_status():
             if current and current['status'] == 'Calling':
                 conn.execute('UPDATE leads SET status = ? WHERE id = ?', 
                            ('Call Attempted', lead_id))
-                
-                # Log the call outcome
-                conn.execute('''INSERT INTO call_logs 
-                              (lead_id, call_status, transcript) 
-                              VALUES (?, ?, ?)''',
-                           (lead_id, call_status, f"Call ended with status: {call_status}"))
-                
                 conn.commit()
+                invalidate_lead(lead_id)
+                
+                # Log the call outcome (no TwiML depends on it, so don't wait for the commit)
+                write_call_log(lead_id, call_status, f"Call ended with status: {call_status}")
     
     return '', 204  # No content needed for status callbacks
 
@@ -616,14 +647,11 @@ def webhook_recording():
                           ORDER BY created_at DESC LIMIT 1''',
                        (recording_url, lead_id))
                 
-            # Also save a separate log entry for the recording
-            conn.execute('''INSERT INTO call_logs 
-                          (lead_id, call_status, transcript) 
-                          VALUES (?, ?, ?)''',
-                       (lead_id, 'Recording', f"Call recording available at: {recording_url}"))
-            
             conn.commit()
             
+            # Also save a separate log entry for the recording
+            write_call_log(lead_id, 'Recording', f"Call recording available at: {recording_url}")
+            
             # Log the recording URL
             logger.info(f"Call recording for lead {lead_id}: {recording_url}")
     
@@ -649,16 +677,23 @@ def get_leads():
 def add_lead():
     data = request.json
     with get_db() as conn:
-        c = conn.cursor()
-        c.execute('''INSERT INTO leads (name, phone, category, address, website, status, 
-                 employee_count, uses_mobile_devices, industry, city, state) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (data['name'], data['phone'], data['category'], data['address'], 
-                   data.get('website', ''), data.get('status', 'Not Called'), 
-                   data.get('employee_count', 0), data.get('uses_mobile_devices', 'Unknown'),
-                   data.get('industry', ''), data.get('city', ''), data.get('state', '')))
+        lead_id, created = insert_lead(conn, {
+            'name': data['name'],
+            'phone': data['phone'],
+            'category': data['category'],
+            'address': data['address'],
+            'website': data.get('website', ''),
+            'status': data.get('status', 'Not Called'),
+            'employee_count': data.get('employee_count', 0),
+            'uses_mobile_devices': data.get('uses_mobile_devices', 'Unknown'),
+            'industry': data.get('industry', ''),
+            'city': data.get('city', ''),
+            'state': data.get('state', '')
+        })
         conn.commit()
-        return {'id': c.lastrowid}, 201
+        if not created:
+            return {'id': lead_id, 'duplicate': True}, 200
+        return {'id': lead_id}, 201
 
 @app.route('/api/leads/<int:lead_id>', methods=['PATCH'])
 def update_lead(lead_id):
@@ -667,24 +702,35 @@ def update_lead(lead_id):
         with get_db() as conn:
             conn.execute('UPDATE leads SET name = COALESCE(?, name), phone = COALESCE(?, phone), email = COALESCE(?, email), company = COALESCE(?, company), position = COALESCE(?, position), industry = COALESCE(?, industry), location = COALESCE(?, location), status = COALESCE(?, status), employee_count = COALESCE(?, employee_count), qualification_status = COALESCE(?, qualification_status), uses_mobile_devices = COALESCE(?, uses_mobile_devices), address = COALESCE(?, address), notes = COALESCE(?, notes), website = COALESCE(?, website), updated_at = CURRENT_TIMESTAMP WHERE id = ?',
                        (data.get('name'), data.get('phone'), data.get('email'), data.get('company'), data.get('position'), data.get('industry'), data.get('location'), data.get('status'), data.get('employee_count'), data.get('qualification_status'), data.get('uses_mobile_devices'), data.get('address'), data.get('notes'), data.get('website'), lead_id))
+            if any(key in data for key in ('name', 'phone', 'address')):
+                try:
+                    refresh_lead_identity(conn, lead_id)
+                except sqlite3.IntegrityError:
+                    # The new phone number already belongs to another lead
+                    conn.rollback()
+                    phone = data.get('phone') or conn.execute('SELECT phone FROM leads WHERE id = ?', (lead_id,)).fetchone()[0]
+                    existing_id = find_lead_id_by_phone(conn, phone)
+                    return {'error': 'Another lead already has this phone number', 'existing_id': existing_id}, 409
             conn.commit()
+        invalidate_lead(lead_id)
         
         return {'message': 'Lead updated successfully'}
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Error updating lead {lead_id}: {str(e)}")
         return {'error': str(e)}, 500
 
 @app.route('/api/leads/<int:lead_id>', methods=['DELETE'])
 def delete_lead(lead_id):
     try:
-        with get_db() as conn:
+        with get_db(with_archive=True) as conn:
             # Check if lead exists
             lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
             if not lead:
                 return {'error': 'Lead not found'}, 404
                 
-            # Delete call logs associated with this lead
+            # Delete call logs associated with this lead, including archived ones
             conn.execute('DELETE FROM call_logs WHERE lead_id = ?', (lead_id,))
+            delete_archived_logs(conn, [lead_id])
             
             # Delete follow-ups associated with this lead
             conn.execute('DELETE FROM follow_ups WHERE lead_id = ?', (lead_id,))
@@ -695,6 +741,7 @@ def delete_lead(lead_id):
             # Finally delete the lead
             conn.execute('DELETE FROM leads WHERE id = ?', (lead_id,))
             conn.commit()
+        invalidate_lead(lead_id)
         
         return {'message': 'Lead deleted successfully'}
     except Exception as e:
@@ -710,12 +757,13 @@ def batch_delete_leads():
         if not lead_ids:
             return {'error': 'No lead IDs provided'}, 400
             
-        with get_db() as conn:
+        with get_db(with_archive=True) as conn:
             # Prepare placeholder string for SQL IN clause
             placeholders = ','.join(['?' for _ in lead_ids])
             
             # Delete associated records first
             conn.execute(f'DELETE FROM call_logs WHERE lead_id IN ({placeholders})', lead_ids)
+            delete_archived_logs(conn, lead_ids)
             conn.execute(f'DELETE FROM follow_ups WHERE lead_id IN ({placeholders})', lead_ids)
             conn.execute(f'DELETE FROM appointments WHERE lead_id IN ({placeholders})', lead_ids)
             
@@ -724,44 +772,27 @@ def batch_delete_leads():
             conn.commit()
             
             deleted_count = result.rowcount
+        invalidate_lead(lead_ids)
         
         return {'message': f'{deleted_count} leads deleted successfully'}
     except Exception as e:
         print(f"Error batch deleting leads: {str(e)}")
         return {'error': str(e)}, 500
 
+@app.route('/api/leads/merge_duplicates', methods=['POST'])
+def merge_duplicates():
+    """Fold leads with the same phone or name/address into one record (run nightly; queued as a job)"""
+    return queue_job('merge_duplicates')
+
 @app.route('/api/scrape', methods=['POST'])
 def scrape_new_leads():
-    config = get_config()
-    # Get location and industry from request or use default
-    location = request.json.get('location', 'Denver, CO')
-    industry = request.json.get('industry', 'Plumbing')
-    limit = request.json.get('limit', 30)
-    
-    # Call the scraper for business leads
-    scraped = scrape_business_leads(location=location, industry=industry, limit=limit)
-    
-    with get_db() as conn:
-        c = conn.cursor()
-        new_ids = []
-        for lead in scraped:
-            c.execute('''INSERT INTO leads (
-                    name, phone, category, address, website, status, 
-                    employee_count, industry, city, state, uses_mobile_devices
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                      (lead['name'], lead['phone'], lead['category'], lead['address'], 
-                       lead.get('website', ''), 'Not Called', lead.get('employee_count', 0),
-                       lead.get('industry', ''), lead.get('city', ''), lead.get('state', ''),
-                       'Unknown'))
-            new_ids.append(c.lastrowid)
-        conn.commit()
-    
-    # Optionally sync with Zoho CRM if credentials are present
-    if config.get('ZOHO_REFRESH_TOKEN') and config.get('ZOHO_CLIENT_ID') and config.get('ZOHO_CLIENT_SECRET'):
-        sync_leads_to_zoho(new_ids)
-    
-    is_dummy = not config['BRIGHTDATA_API_TOKEN']
-    return {'inserted_ids': new_ids, 'count': len(new_ids), 'dummy': is_dummy}
+    """Scrape new business leads in the background; poll the returned job for the inserted ids"""
+    data = request.get_json(silent=True) or {}
+    return queue_job('scrape', {
+        'location': data.get('location', 'Denver, CO'),
+        'industry': data.get('industry', 'Plumbing'),
+        'limit': data.get('limit', 30)
+    })
 
 @app.route('/api/config', methods=['GET', 'POST'])
 def api_config():
@@ -770,6 +801,7 @@ def api_config():
     else:
         data = request.json or {}
         save_config(data)
+        invalidate_call_calendar()
         return {'status': 'updated'}
 
 # --- Call Logs ---
@@ -785,10 +817,25 @@ def add_call_log():
 
 @app.route('/api/call_logs/<int:lead_id>', methods=['GET'])
 def get_call_logs(lead_id):
-    with get_db() as conn:
-        logs = conn.execute('SELECT * FROM call_logs WHERE lead_id = ? ORDER BY created_at DESC', (lead_id,)).fetchall()
+    with get_db(with_archive=True) as conn:
+        logs = conn.execute('SELECT * FROM call_logs_all WHERE lead_id = ? ORDER BY created_at DESC', (lead_id,)).fetchall()
         return jsonify([dict(row) for row in logs])
 
+@app.route('/api/call_logs/archive', methods=['POST'])
+def archive_old_call_logs():
+    """Move calls older than CALL_LOG_ARCHIVE_DAYS (or ?days=) to the archive database (run nightly; queued as a job)"""
+    try:
+        days = int(request.args.get('days') or get_config().get('CALL_LOG_ARCHIVE_DAYS', DEFAULT_ARCHIVE_DAYS))
+    except ValueError:
+        return {'error': 'days must be a whole number'}, 400
+    return queue_job('archive_call_logs', {'days': days})
+
+@app.route('/api/call_logs/archive/stats', methods=['GET'])
+def get_archive_stats():
+    """Hot table size and archived rows per month"""
+    with get_db() as conn:
+        return jsonify(archive_stats(conn))
+
 @app.route('/api/call', methods=['POST'])
 def call_lead():
     data = request.json
@@ -805,21 +852,21 @@ def call_lead():
     # Check time restrictions - only if not a manual call
     if not is_manual and not should_allow_call(lead_id):
         message = log_outside_hours_attempt(lead_id, "outbound")
+        next_window = next_call_window(lead_id)
         return {
             'error': 'Outside of calling hours', 
-            'message': 'Calls can only be made Monday through Friday, 9:30 AM to 4:00 PM Mountain Time.'
+            'message': f"This lead can next be called {next_window}." if next_window
+                       else 'Calls can only be made during business hours in the lead\'s local time.'
         }, 400
     
     # Get lead info to generate script if not provided
     with get_db() as conn:
-        lead_row = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-        if not lead_row:
+        lead = get_lead(conn, lead_id)
+        if not lead:
             logger.error(f"Lead {lead_id} not found")
             return {'error': 'Lead not found'}, 404
         
-        # Convert SQLite Row to dictionary
-        lead = dict(lead_row)
-        logger.info(f"Lead data: {json.dumps(lead, indent=2)}")
+        logger.info(f"Lead data: {json.dumps(lead.to_dict(), indent=2)}")
         
         # Generate script based on lead data if not provided
         if not script:
@@ -859,16 +906,18 @@ def call_lead():
         with get_db() as conn:
             conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
             conn.commit()
+        invalidate_lead(lead_id)
         return {'call_sid': 'dummy-call', 'dummy': True}
     
     # Real mode
     try:
         logger.info("Attempting to place real call")
-        call_sid = place_call(lead['phone'], script)
+        call_sid = place_call(lead['phone'], script, lead_id=lead_id)
         logger.info(f"Call placed successfully with SID: {call_sid}")
         with get_db() as conn:
             conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
             conn.commit()
+        invalidate_lead(lead_id)
         return {'call_sid': call_sid}
     except Exception as e:
         logger.error(f"Error placing call: {str(e)}")
@@ -911,10 +960,12 @@ def add_appointment():
                       WHERE id = ?''',
                     ('Appointment Set', 'Qualified', date, time, lead_id))
         conn.commit()
+        invalidate_lead(lead_id)
         
         # Sync with Zoho if configured
         config = get_config()
         if config.get('ZOHO_REFRESH_TOKEN') and lead_id:
+            from zoho import create_zoho_appointment
             create_zoho_appointment(lead_id, date, time, medium)
         
         return {'id': appointment_id}, 201
@@ -968,6 +1019,7 @@ def update_appointment(appointment_id):
         if config.get('ZOHO_REFRESH_TOKEN') and 'date' in data or 'time' in data:
             # Get the updated appointment info
             updated = conn.execute('SELECT * FROM appointments WHERE id = ?', (appointment_id,)).fetchone()
+            from zoho import update_zoho_appointment
             update_zoho_appointment(appointment['lead_id'], updated['date'], updated['time'], updated['medium'])
         
         return {'status': 'updated'}
@@ -991,10 +1043,12 @@ def qualify_lead(lead_id):
                       WHERE id = ?''',
                     (qualification_status, uses_mobile, employee_count, notes, lead_id))
         conn.commit()
+        invalidate_lead(lead_id)
         
         # Sync with Zoho if configured
         config = get_config()
         if config.get('ZOHO_REFRESH_TOKEN'):
+            from zoho import update_zoho_lead_qualification
             update_zoho_lead_qualification(lead_id, qualification_status, uses_mobile, employee_count, notes)
         
         return {'status': 'updated', 'qualification_status': qualification_status}
@@ -1031,6 +1085,7 @@ def get_availability():
     # Alternatively, check Zoho Calendar if configured
     config = get_config()
     if date and config.get('ZOHO_REFRESH_TOKEN') and config.get('ZOHO_CLIENT_ID'):
+        from zoho import get_zoho_availability
         zoho_slots = get_zoho_availability(date)
         if zoho_slots:
             # Use Zoho's availability instead
@@ -1040,21 +1095,24 @@ def get_availability():
 
 @app.route('/api/check_business_hours', methods=['GET'])
 def check_business_hours():
-    """Check if current time is within business hours"""
+    """Check if current time is within business hours (for a lead's time zone with ?lead_id=)"""
     config = get_config()
     business_hours = config.get('BUSINESS_HOURS', {})
     
-    # Get timezone from config
-    tz_name = business_hours.get('timezone', 'US/Mountain')
-    try:
-        timezone = pytz.timezone(tz_name)
-    except:
-        # Fallback to Mountain time if invalid timezone
-        timezone = pytz.timezone('US/Mountain')
+    lead = None
+    lead_id = request.args.get('lead_id')
+    if lead_id:
+        with get_db() as conn:
+            lead = get_lead(conn, lead_id)
+    
+    calendar = get_call_calendar()
+    timezone = calendar.timezone_for(lead)
+    tz_name = str(timezone)
     
     now = datetime.now(timezone)
     is_weekend = now.weekday() >= 5  # 5 = Saturday, 6 = Sunday
-    within_hours = is_within_call_hours()
+    within_hours = calendar.can_call(lead)
+    next_window = calendar.next_window(lead)
     
     # Format times for display
     weekday_start = business_hours.get('weekday_start', '09:30')
@@ -1079,6 +1137,8 @@ def check_business_hours():
         'within_business_hours': within_hours,
         'current_time': now.strftime('%Y-%m-%d %H:%M:%S %Z'),
         'is_weekend': is_weekend,
+        'is_holiday': now.date() in calendar.holidays,
+        'next_window': next_window.isoformat() if next_window else None,
         'business_hours': {
             'timezone': tz_name,
             'days': 'Monday-Friday' if not weekend_enabled else 'Monday-Sunday',
@@ -1090,384 +1150,6 @@ def check_business_hours():
         }
     }
 
-# --- Zoho Integration Functions ---
-
-def get_zoho_access_token():
-    """Get an access token for Zoho CRM API"""
-    config = get_config()
-    refresh_token = config.get('ZOHO_REFRESH_TOKEN')
-    client_id = config.get('ZOHO_CLIENT_ID')
-    client_secret = config.get('ZOHO_CLIENT_SECRET')
-    
-    if not refresh_token or not client_id or not client_secret:
-        return None
-    
-    url = "https://accounts.zoho.com/oauth/v2/token"
-    data = {
-        "refresh_token": refresh_token,
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "grant_type": "refresh_token"
-    }
-    
-    try:
-        response = requests.post(url, data=data)
-        if response.status_code == 200:
-            return response.json().get('access_token')
-    except Exception as e:
-        logger.error(f"Error getting Zoho access token: {str(e)}")
-    
-    return None
-
-def sync_leads_to_zoho(lead_ids):
-    """Sync leads to Zoho CRM"""
-    access_token = get_zoho_access_token()
-    if not access_token:
-        return False
-    
-    config = get_config()
-    org_id = config.get('ZOHO_ORG_ID')
-    department_id = config.get('ZOHO_DEPARTMENT_ID')
-    
-    with get_db() as conn:
-        for lead_id in lead_ids:
-            lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-            if not lead:
-                continue
-            
-            # Format lead data for Zoho
-            lead_data = {
-                "data": [{
-                    "Company": lead['name'],
-                    "Phone": lead['phone'],
-                    "Industry": lead['industry'] or lead['category'],
-                    "Address": lead['address'],
-                    "Website": lead['website'],
-                    "City": lead['city'],
-                    "State": lead['state'],
-                    "Description": f"Employee Count: {lead['employee_count']}\nUses Mobile Devices: {lead['uses_mobile_devices']}",
-                    "Lead_Source": "AI Assistant",
-                    "Department": department_id
-                }]
-            }
-            
-            # Create lead in Zoho
-            url = "https://www.zohoapis.com/crm/v2/Leads"
-            headers = {
-                "Authorization": f"Zoho-oauthtoken {access_token}",
-                "Content-Type": "application/json"
-            }
-            
-            if org_id:
-                headers["X-ORGID"] = org_id
-                
-            try:
-                response = requests.post(url, headers=headers, json=lead_data)
-                if response.status_code == 201:
-                    zoho_id = response.json()['data'][0]['details']['id']
-                    # Store Zoho ID in local DB for future reference
-                    conn.execute('UPDATE leads SET notes = ? WHERE id = ?', 
-                               (f"Zoho Lead ID: {zoho_id}", lead_id))
-                    conn.commit()
-            except Exception as e:
-                logger.error(f"Error creating lead in Zoho: {str(e)}")
-    
-    return True
-
-def create_zoho_appointment(lead_id, date, time, medium):
-    """Create an appointment in Zoho Calendar"""
-    access_token = get_zoho_access_token()
-    if not access_token:
-        return False
-    
-    config = get_config()
-    org_id = config.get('ZOHO_ORG_ID')
-    department_id = config.get('ZOHO_DEPARTMENT_ID')
-    
-    with get_db() as conn:
-        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-        if not lead:
-            return False
-        
-        # Extract Zoho Lead ID if available
-        zoho_lead_id = None
-        if lead['notes'] and "Zoho Lead ID:" in lead['notes']:
-            try:
-                zoho_lead_id = lead['notes'].split("Zoho Lead ID:")[1].strip().split()[0]
-            except:
-                pass
-        
-        # Format appointment data
-        start_datetime = f"{date}T{time}:00"
-        end_datetime = increment_time(start_datetime, minutes=30)
-        
-        # Create event in Zoho Calendar
-        url = "https://www.zohoapis.com/crm/v2/Events"
-        headers = {
-            "Authorization": f"Zoho-oauthtoken {access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        if org_id:
-            headers["X-ORGID"] = org_id
-        
-        event_data = {
-            "data": [{
-                "Subject": f"Meeting with {lead['name']}",
-                "Start_DateTime": start_datetime,
-                "End_DateTime": end_datetime,
-                "Event_Title": f"Mobile Solutions Consultation with {lead['name']}",
-                "Location": "Phone Call" if medium == "Phone" else "Zoom Meeting",
-                "Department": department_id
-            }]
-        }
-        
-        # Link to lead if we have the Zoho Lead ID
-        if zoho_lead_id:
-            event_data["data"][0]["What_Id"] = zoho_lead_id
-            event_data["data"][0]["$se_module"] = "Leads"
-        
-        try:
-            response = requests.post(url, headers=headers, json=event_data)
-            if response.status_code == 201:
-                event_id = response.json()['data'][0]['details']['id']
-                # Store Event ID in appointment notes for future reference
-                with get_db() as conn:
-                    appointment = conn.execute(
-                        'SELECT id FROM appointments WHERE lead_id = ? AND date = ? AND time = ?',
-                        (lead_id, date, time)
-                    ).fetchone()
-                    if appointment:
-                        conn.execute('UPDATE appointments SET notes = ? WHERE id = ?',
-                                   (f"Zoho Event ID: {event_id}", appointment['id']))
-                        conn.commit()
-                return True
-        except Exception as e:
-            logger.error(f"Error creating event in Zoho: {str(e)}")
-    
-    return False
-
-def update_zoho_appointment(lead_id, date, time, medium):
-    """Update an existing appointment in Zoho"""
-    access_token = get_zoho_access_token()
-    if not access_token:
-        return False
-    
-    config = get_config()
-    org_id = config.get('ZOHO_ORG_ID')
-    
-    with get_db() as conn:
-        # Get the appointment details from our database
-        appointment = conn.execute('''
-            SELECT a.*, l.notes 
-            FROM appointments a 
-            JOIN leads l ON a.lead_id = l.id 
-            WHERE a.lead_id = ? AND a.date = ? AND a.time = ?
-        ''', (lead_id, date, time)).fetchone()
-        
-        if not appointment:
-            return False
-        
-        # Extract Zoho Event ID if available in notes
-        zoho_event_id = None
-        if appointment['notes'] and "Zoho Event ID:" in appointment['notes']:
-            try:
-                zoho_event_id = appointment['notes'].split("Zoho Event ID:")[1].strip().split()[0]
-            except:
-                pass
-        
-        if not zoho_event_id:
-            # If no event ID, create a new appointment instead
-            return create_zoho_appointment(lead_id, date, time, medium)
-        
-        # Format appointment data
-        start_datetime = f"{date}T{time}:00"
-        end_datetime = increment_time(start_datetime, minutes=30)
-        
-        # Update event in Zoho Calendar
-        url = f"https://www.zohoapis.com/crm/v2/Events/{zoho_event_id}"
-        headers = {
-            "Authorization": f"Zoho-oauthtoken {access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        if org_id:
-            headers["X-ORGID"] = org_id
-        
-        # Get lead information
-        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-        if not lead:
-            return False
-        
-        event_data = {
-            "data": [{
-                "Start_DateTime": start_datetime,
-                "End_DateTime": end_datetime,
-                "Location": "Phone Call" if medium == "Phone" else "Zoom Meeting"
-            }]
-        }
-        
-        try:
-            response = requests.put(url, headers=headers, json=event_data)
-            return response.status_code in (200, 201, 204)
-        except Exception as e:
-            logger.error(f"Error updating event in Zoho: {str(e)}")
-            return False
-
-def update_zoho_lead_qualification(lead_id, qualification_status, uses_mobile, employee_count, notes):
-    """Update lead qualification status in Zoho CRM"""
-    access_token = get_zoho_access_token()
-    if not access_token:
-        return False
-    
-    config = get_config()
-    org_id = config.get('ZOHO_ORG_ID')
-    
-    with get_db() as conn:
-        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-        if not lead:
-            return False
-        
-        # Extract Zoho Lead ID if available
-        zoho_lead_id = None
-        if lead['notes'] and "Zoho Lead ID:" in lead['notes']:
-            try:
-                zoho_lead_id = lead['notes'].split("Zoho Lead ID:")[1].strip().split()[0]
-            except:
-                pass
-        
-        if not zoho_lead_id:
-            # If no Zoho ID, we can't update the lead
-            return False
-        
-        # Format lead data for update
-        lead_data = {
-            "data": [{
-                "Description": f"Employee Count: {employee_count}\nUses Mobile Devices: {uses_mobile}\n\n{notes or ''}",
-                # Custom fields - these would need to match your actual Zoho CRM setup
-                "$se_module": "Leads"
-            }]
-        }
-        
-        # Add a custom field for qualification status if your Zoho has one
-        if qualification_status == 'Qualified':
-            lead_data["data"][0]["Lead_Status"] = "Qualified"
-        else:
-            lead_data["data"][0]["Lead_Status"] = "Not Qualified"
-        
-        # Update lead in Zoho
-        url = f"https://www.zohoapis.com/crm/v2/Leads/{zoho_lead_id}"
-        headers = {
-            "Authorization": f"Zoho-oauthtoken {access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        if org_id:
-            headers["X-ORGID"] = org_id
-        
-        try:
-            response = requests.put(url, headers=headers, json=lead_data)
-            return response.status_code in (200, 201, 204)
-        except Exception as e:
-            logger.error(f"Error updating lead in Zoho: {str(e)}")
-            return False
-
-def get_zoho_availability(date):
-    """Get available time slots from Zoho Calendar"""
-    access_token = get_zoho_access_token()
-    if not access_token:
-        return []
-    
-    config = get_config()
-    org_id = config.get('ZOHO_ORG_ID')
-    
-    # Format date for Zoho API
-    try:
-        dt = datetime.fromisoformat(f"{date}T00:00:00")
-        
-        # Get start of day and end of day
-        start_time = dt.isoformat() + 'Z'
-        end_time = dt.replace(hour=23, minute=59, second=59).isoformat() + 'Z'
-    except:
-        # If date parsing fails, return empty list
-        return []
-    
-    try:
-        # Get user ID - needed for free/busy lookup
-        user_url = "https://www.zohoapis.com/crm/v2/users?type=CurrentUser"
-        headers = {
-            "Authorization": f"Zoho-oauthtoken {access_token}"
-        }
-        
-        if org_id:
-            headers["X-ORGID"] = org_id
-        
-        user_response = requests.get(user_url, headers=headers)
-        if user_response.status_code != 200:
-            return []
-        
-        user_id = user_response.json()['users'][0]['id']
-        
-        # Get free/busy information from Zoho Calendar
-        calendar_url = "https://www.zohoapis.com/calendar/v1/freebusy"
-        params = {
-            "users": user_id,
-            "starttime": start_time,
-            "endtime": end_time
-        }
-        
-        response = requests.get(calendar_url, headers=headers, params=params)
-        if response.status_code != 200:
-            return []
-        
-        # Extract busy times
-        busy_times = []
-        try:
-            freebusy_data = response.json()
-            if 'users' in freebusy_data and len(freebusy_data['users']) > 0:
-                busy_periods = freebusy_data['users'][0]['busy']
-                for period in busy_periods:
-                    start = datetime.fromisoformat(period['startTime'].replace('Z', ''))
-                    end = datetime.fromisoformat(period['endTime'].replace('Z', ''))
-                    busy_times.append((start, end))
-        except Exception as e:
-            logger.error(f"Error parsing Zoho freebusy response: {str(e)}")
-            return []
-        
-        # Generate all available slots during business hours (9am-5pm)
-        all_slots = []
-        business_start = dt.replace(hour=9, minute=0, second=0)
-        business_end = dt.replace(hour=17, minute=0, second=0)
-        
-        # Create 30-minute slots
-        current_slot = business_start
-        while current_slot < business_end:
-            slot_end = current_slot + timedelta(minutes=30)
-            
-            # Check if slot overlaps with any busy time
-            is_available = True
-            for busy_start, busy_end in busy_times:
-                # Slot is unavailable if it overlaps with a busy period
-                if not (slot_end <= busy_start or current_slot >= busy_end):
-                    is_available = False
-                    break
-            
-            if is_available:
-                all_slots.append(current_slot.strftime('%H:%M'))
-            
-            current_slot = slot_end
-        
-        return all_slots
-    except Exception as e:
-        logger.error(f"Error getting Zoho availability: {str(e)}")
-        return []
-
-def increment_time(datetime_str, minutes=30):
-    """Add minutes to a datetime string in ISO format"""
-    dt = datetime.fromisoformat(datetime_str)
-    dt = dt + timedelta(minutes=minutes)
-    return dt.isoformat()
-
 def extract_city_state(address):
     """Extract city and state from an address string"""
     if not address:
@@ -1484,166 +1166,77 @@ def extract_city_state(address):
 
 @app.route('/api/auto_dial', methods=['POST'])
 def auto_dial_leads():
-    """Auto-dial leads - strictly enforces business hours"""
+    """Auto-dial leads in the background - strictly enforces business hours in each lead's time zone"""
     data = request.json
     lead_ids = data.get('lead_ids', [])
     
-    # Strictly check business hours - no exceptions
-    if not is_within_call_hours():
-        mountain_tz = pytz.timezone('US/Mountain')
-        now = datetime.now(mountain_tz)
-        message = f"Auto-dialer attempt outside business hours at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-        logger.warning(message)
-        
-        return {
-            'error': 'Outside of calling hours', 
-            'message': 'Auto-dialer can only be used Monday through Friday, 9:30 AM to 4:00 PM Mountain Time.'
-        }, 400
-    
     # If we have no leads to call, return error
     if not lead_ids:
         return {'error': 'No leads provided'}, 400
     
-    results = []
-    
-    # Process each lead
-    for lead_id in lead_ids:
-        try:
-            with get_db() as conn:
-                lead_row = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-                if not lead_row:
-                    results.append({'lead_id': lead_id, 'status': 'error', 'message': 'Lead not found'})
-                    continue
-                
-                # Convert SQLite Row to dictionary
-                lead = dict(lead_row)
-                
-                # Generate script based on lead data
-                contact_name = lead['name'].split()[0] if lead['name'] else "there"
-                company_name = lead['name']
-                industry = lead.get('industry', lead.get('category', 'business'))
-                city = lead.get('city', 'your area')
-                
-                script = f"Hello, is this {contact_name}? This is Steve with Seamless Mobile Services. I'll be brief. I understand your company provides {industry} services in {city}. Quick question: do your field crews use mobile phones or tablets for work?"
-                
-                # Make the call
-                config = get_config()
-                if config.get('TEST_MODE', False) or not config['TWILIO_ACCOUNT_SID'] or not config['TWILIO_AUTH_TOKEN'] or not config['ELEVENLABS_API_KEY'] or not config['ELEVENLABS_VOICE_ID'] or not config['TWILIO_PHONE_NUMBER']:
-                    # Dummy mode
-                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
-                    results.append({'lead_id': lead_id, 'status': 'success', 'call_sid': 'dummy-call', 'dummy': True})
-                else:
-                    # Real mode
-                    call_sid = place_call(lead['phone'], script)
-                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
-                    results.append({'lead_id': lead_id, 'status': 'success', 'call_sid': call_sid})
-                
-                conn.commit()
-                
-        except Exception as e:
-            results.append({'lead_id': lead_id, 'status': 'error', 'message': str(e)})
-    
-    return {'results': results}
+    return queue_job('auto_dial', {'lead_ids': lead_ids})
 
 @app.route('/api/lead_history/<int:lead_id>', methods=['GET'])
 def get_lead_history(lead_id):
-    """Get complete history for a lead including all interactions"""
-    with get_db() as conn:
-        # Get the lead info
-        lead_row = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
-        if not lead_row:
-            return {'error': 'Lead not found'}, 404
-        
-        lead = dict(lead_row)
-        
-        # Get all call logs
-        call_logs = conn.execute('''
-            SELECT * FROM call_logs 
-            WHERE lead_id = ? 
-            ORDER BY created_at ASC
-        ''', (lead_id,)).fetchall()
-        
-        # Get all appointments
-        appointments = conn.execute('''
-            SELECT * FROM appointments 
-            WHERE lead_id = ? 
-            ORDER BY date ASC, time ASC
-        ''', (lead_id,)).fetchall()
-        
-        # Get all follow-ups
-        follow_ups = conn.execute('''
-            SELECT * FROM follow_ups
-            WHERE lead_id = ?
-            ORDER BY scheduled_time ASC
-        ''', (lead_id,)).fetchall()
-        
-        # Convert to dictionaries
-        call_logs = [dict(log) for log in call_logs]
-        appointments = [dict(appt) for appt in appointments]
-        follow_ups = [dict(fu) for fu in follow_ups]
-        
-        # Create a timeline of all interactions
-        timeline = []
-        
-        # Add call logs to timeline
-        for log in call_logs:
-            timeline.append({
-                'type': 'call_log',
-                'timestamp': log['created_at'],
-                'status': log['call_status'],
-                'transcript': log['transcript'],
-                'data': log
-            })
-        
-        # Add appointments to timeline
-        for appt in appointments:
-            # Create a timestamp from date and time
-            try:
-                timestamp = f"{appt['date']} {appt['time']}"
-            except:
-                timestamp = appt['created_at']
-                
-            timeline.append({
-                'type': 'appointment',
-                'timestamp': timestamp,
-                'status': appt['status'],
-                'medium': appt['medium'],
-                'data': appt
-            })
-        
-        # Add follow-ups to timeline
-        for follow_up in follow_ups:
-            timeline.append({
-                'type': 'follow_up',
-                'timestamp': follow_up['scheduled_time'],
-                'status': follow_up['status'],
-                'priority': follow_up['priority'],
-                'reason': follow_up['reason'],
-                'data': follow_up
-            })
-        
-        # Add lead status changes if we can derive them
-        if lead.get('qualification_status'):
-            timeline.append({
-                'type': 'qualification',
-                'timestamp': lead.get('notes', ''),
-                'status': lead['qualification_status'],
-                'data': {
-                    'employee_count': lead.get('employee_count'),
-                    'uses_mobile_devices': lead.get('uses_mobile_devices')
-                }
-            })
-        
-        # Sort timeline by timestamp (most recent first for display)
-        timeline.sort(key=lambda x: x['timestamp'] if x['timestamp'] else '', reverse=True)
-        
-        return {
-            'lead': lead,
-            'call_logs': call_logs,
-            'appointments': appointments,
-            'follow_ups': follow_ups,
-            'timeline': timeline
-        }
+    """Get a page of a lead's timeline (calls, appointments, follow-ups, qualification), newest first"""
+    try:
+        types = parse_types(request.args.get('types'))
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        with get_db(with_archive=True) as conn:
+            lead_row = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
+            if not lead_row:
+                return {'error': 'Lead not found'}, 404
+            timeline, next_cursor = load_timeline(conn, lead_id, types, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    
+    return {
+        'lead': dict(lead_row),
+        'timeline': timeline,
+        'next_cursor': next_cursor
+    }
+
+@app.route('/api/lead_history/<int:lead_id>/calls/<int:call_id>', methods=['GET'])
+def get_lead_call_turns(lead_id, call_id):
+    """Get the call log rows of one call from a lead's timeline"""
+    with get_db(with_archive=True) as conn:
+        turns = load_call_turns(conn, lead_id, call_id)
+    if not turns:
+        return {'error': 'Call not found'}, 404
+    return {'lead_id': lead_id, 'call_id': call_id, 'turns': turns}
+
+# --- Search ---
+@app.route('/api/search', methods=['GET'])
+def full_text_search():
+    """Full-text search over leads and call transcripts, ranked by bm25 with highlighted snippets"""
+    match = build_match_query(request.args.get('q', ''))
+    if not match:
+        return {'error': 'Query parameter q is required'}, 400
+    scope = request.args.get('type', 'all')
+    if scope not in ('all', 'leads', 'transcripts'):
+        return {'error': "type must be 'all', 'leads' or 'transcripts'"}, 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    lead_id = request.args.get('lead_id', type=int)
+    sort = request.args.get('sort', 'rank')
+    if sort not in ('rank', 'recent'):
+        return {'error': "sort must be 'rank' or 'recent'"}, 400
+    
+    try:
+        with get_db(with_archive=True) as conn:
+            if not search_available(conn):
+                return {'error': 'Full-text search is not available (SQLite was built without FTS5)'}, 503
+            response = {'query': request.args.get('q'), 'match': match}
+            if scope in ('all', 'leads') and lead_id is None:
+                results, next_offset = search_leads(conn, match, limit, offset)
+                response['leads'] = {'results': results, 'next_offset': next_offset}
+            if scope in ('all', 'transcripts'):
+                results, next_offset = search_transcripts(conn, match, limit, offset, lead_id, sort)
+                response['transcripts'] = {'results': results, 'next_offset': next_offset}
+        return response
+    except Exception as e:
+        logger.error(f"Search failed for {match!r}: {str(e)}")
+        return {'error': str(e)}, 500
 
 # --- Leads Import/Export ---
 @app.route('/api/leads/export', methods=['GET'])
@@ -1682,7 +1275,7 @@ def export_leads():
 
 @app.route('/api/leads/import', methods=['POST'])
 def import_leads():
-    """Import leads from CSV file"""
+    """Import leads from a CSV file; the rows are inserted by a background job"""
     if 'file' not in request.files:
         return {'error': 'No file part'}, 400
         
@@ -1693,77 +1286,16 @@ def import_leads():
     if not file.filename.endswith('.csv'):
         return {'error': 'File must be a CSV'}, 400
     
-    # Read CSV file
-    stream = io.StringIO(file.stream.read().decode("utf-8"), newline=None)
-    csv_reader = csv.DictReader(stream)
-    
-    # Get column names from the CSV
     try:
-        # Check header row
-        column_names = csv_reader.fieldnames
-        required_columns = ['name', 'phone']
+        text = file.stream.read().decode("utf-8")
         
-        # Check if required columns exist
-        for col in required_columns:
+        # Check the header row before queueing
+        column_names = csv.DictReader(io.StringIO(text, newline=None)).fieldnames or []
+        for col in ['name', 'phone']:
             if col not in column_names:
                 return {'error': f'Missing required column: {col}'}, 400
         
-        # Process rows
-        imported_count = 0
-        errors = []
-        
-        with get_db() as conn:
-            for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 for row number (header is 1)
-                # Basic validation
-                if not row['name'] or not row['phone']:
-                    errors.append(f"Row {row_num}: Missing name or phone")
-                    continue
-                
-                # Check for duplicate phone number
-                existing = conn.execute('SELECT id FROM leads WHERE phone = ?', (row['phone'],)).fetchone()
-                if existing:
-                    errors.append(f"Row {row_num}: Duplicate phone number {row['phone']}")
-                    continue
-                
-                try:
-                    # Prepare SQL parameters (handle both required and optional fields)
-                    params = {
-                        'name': row['name'],
-                        'phone': row['phone'],
-                        'category': row.get('category', ''),
-                        'address': row.get('address', ''),
-                        'website': row.get('website', ''),
-                        'status': row.get('status', 'Not Called'),
-                        'employee_count': int(row.get('employee_count', 0)) if row.get('employee_count', '').isdigit() else 0,
-                        'uses_mobile_devices': row.get('uses_mobile_devices', 'Unknown'),
-                        'industry': row.get('industry', ''),
-                        'city': row.get('city', ''),
-                        'state': row.get('state', '')
-                    }
-                    
-                    # Insert the lead
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO leads (name, phone, category, address, website, status, 
-                                          employee_count, uses_mobile_devices, industry, city, state) 
-                        VALUES (:name, :phone, :category, :address, :website, :status, 
-                               :employee_count, :uses_mobile_devices, :industry, :city, :state)
-                    ''', params)
-                    imported_count += 1
-                except Exception as e:
-                    errors.append(f"Row {row_num}: Error - {str(e)}")
-            
-            conn.commit()
-        
-        # Generate response
-        result = {
-            'success': True,
-            'imported_count': imported_count,
-            'errors': errors,
-            'error_count': len(errors)
-        }
-        
-        return jsonify(result)
+        return queue_job('lead_import', {'csv': text})
         
     except Exception as e:
         return {'error': str(e)}, 500
@@ -1945,197 +1477,9 @@ def add_follow_up():
 
 @app.route('/api/auto_follow_up', methods=['POST'])
 def auto_follow_up():
-    """Automatically process and dial follow-ups that are due"""
-    # Check business hours
-    if not is_within_call_hours():
-        return {
-            'error': 'Outside of calling hours', 
-            'message': 'Auto-follow-up can only be run during business hours.'
-        }, 400
-    
-    # Get the max number of calls to make
-    max_calls = request.json.get('max_calls', 10)
-    
-    # Get current time
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    with get_db() as conn:
-        # Find follow-ups that are due (scheduled time before now)
-        query = """
-            SELECT f.*, l.id as lead_id, l.name as lead_name, l.phone as lead_phone, 
-                   l.status as lead_status, l.industry, l.city 
-            FROM follow_ups f
-            JOIN leads l ON f.lead_id = l.id
-            WHERE f.status = 'Pending' AND f.scheduled_time <= ?
-            ORDER BY f.priority DESC, f.scheduled_time ASC
-            LIMIT ?
-        """
-        
-        due_follow_ups = conn.execute(query, (now, max_calls)).fetchall()
-        
-        if not due_follow_ups:
-            return {'message': 'No follow-ups due at this time'}, 200
-        
-        # Process each follow-up
-        results = []
-        for follow_up in due_follow_ups:
-            try:
-                # Convert to dictionary
-                follow_up = dict(follow_up)
-                lead_id = follow_up['lead_id']
-                
-                # Generate personalized follow-up script
-                script = generate_follow_up_script(follow_up)
-                
-                # Make the call
-                config = get_config()
-                if config.get('TEST_MODE', False) or not config['TWILIO_ACCOUNT_SID'] or not config['TWILIO_AUTH_TOKEN'] or not config['ELEVENLABS_API_KEY'] or not config['ELEVENLABS_VOICE_ID'] or not config['TWILIO_PHONE_NUMBER']:
-                    # Dummy mode
-                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
-                    results.append({
-                        'follow_up_id': follow_up['id'],
-                        'lead_id': lead_id,
-                        'status': 'success', 
-                        'call_sid': 'dummy-call',
-                        'dummy': True
-                    })
-                else:
-                    # Real mode - place the call
-                    call_sid = place_call(follow_up['lead_phone'], script)
-                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
-                    results.append({
-                        'follow_up_id': follow_up['id'],
-                        'lead_id': lead_id,
-                        'status': 'success',
-                        'call_sid': call_sid
-                    })
-                
-                # Update follow-up status to 'In Progress'
-                conn.execute('UPDATE follow_ups SET status = ? WHERE id = ?', 
-                           ('In Progress', follow_up['id']))
-                
-                conn.commit()
-                
-            except Exception as e:
-                results.append({
-                    'follow_up_id': follow_up['id'],
-                    'lead_id': follow_up['lead_id'],
-                    'status': 'error',
-                    'message': str(e)
-                })
-        
-        return {'results': results, 'count': len(results)}
-
-def generate_follow_up_script(follow_up):
-    """Generate a personalized script for follow-up calls"""
-    lead_name = follow_up.get('lead_name', '')
-    contact_name = lead_name.split()[0] if lead_name else "there"
-    reason = follow_up.get('reason', '')
-    
-    # Generate script based on reason and context
-    script = f"Hello, is this {contact_name}? This is Steve with Seamless Mobile Services following up on our previous conversation."
-    
-    if "not a good time" in reason.lower() or "busy" in reason.lower():
-        script += f" You mentioned earlier that it wasn't a good time to talk. I hope this is a better time to discuss how our telecom expense management and mobile device management services can help your business."
-    
-    elif "qualified" in reason.lower():
-        script += f" In our previous conversation, I learned that your company uses mobile devices. I'd like to discuss how we can help optimize your mobile operations, reduce costs through our telecom expense management, and improve your mobile device management."
-    
-    elif "callback" in reason.lower():
-        script += f" I'm calling back as requested during our previous conversation. I wanted to discuss how we can help with your telecom expenses and mobile device management."
-    
-    else:
-        # Generic follow-up
-        script += f" I'm following up to see if you've had a chance to consider our telecom expense management and mobile device management solutions for your business. Do you have a few minutes to talk?"
-    
-    return script
-
-@app.route('/api/analytics/learn', methods=['POST'])
-def learn_from_successful_calls():
-    """Analyze successful calls to improve future conversations"""
-    from voice import update_industry_patterns
-    
-    with get_db() as conn:
-        # Get all successful appointments from the last 30 days
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        appointments = conn.execute('''
-            SELECT a.*, l.industry, l.employee_count, l.uses_mobile_devices
-            FROM appointments a
-            JOIN leads l ON a.lead_id = l.id
-            WHERE a.created_at > ?
-            AND a.status = 'Scheduled'
-        ''', (thirty_days_ago,)).fetchall()
-        
-        # For each successful appointment, analyze the conversation that led to it
-        for appt in appointments:
-            lead_id = appt['lead_id']
-            industry = appt['industry'] or 'generic'
-            
-            # Get the call logs for this lead
-            logs = conn.execute('''
-                SELECT transcript, created_at
-                FROM call_logs
-                WHERE lead_id = ?
-                ORDER BY created_at ASC
-            ''', (lead_id,)).fetchall()
-            
-            # Only analyze if we have enough conversation data
-            if len(logs) < 4:
-                continue
-                
-            # Extract the full conversation
-            conversation = []
-            for log in logs:
-                transcript = log['transcript']
-                if transcript.startswith('Bot: '):
-                    conversation.append({"role": "assistant", "content": transcript[5:]})
-                elif transcript.startswith('Lead: '):
-                    conversation.append({"role": "user", "content": transcript[6:]})
-            
-            # Analyze the conversation for patterns
-            for i in range(len(conversation) - 1):
-                if conversation[i]["role"] == "assistant" and conversation[i+1]["role"] == "user":
-                    bot_message = conversation[i]["content"]
-                    lead_response = conversation[i+1]["content"].lower()
-                    
-                    # Check if this was a value proposition that led to interest
-                    if "save" in bot_message.lower() or "help" in bot_message.lower():
-                        if "yes" in lead_response or "interested" in lead_response:
-                            # This was a successful value proposition
-                            update_industry_patterns(
-                                industry,
-                                "successful_phrases",
-                                "value_proposition",
-                                bot_message,
-                                True
-                            )
-                    
-                    # Check for successful objection handling
-                    objection_indicators = {
-                        "not interested": "objection:not interested",
-                        "too busy": "objection:too busy",
-                        "already have": "objection:already have",
-                        "using another": "objection:using another",
-                        "too expensive": "objection:too expensive"
-                    }
-                    
-                    for indicator, objection_type in objection_indicators.items():
-                        if indicator in lead_response:
-                            # If the next bot message led to a positive response
-                            if i + 2 < len(conversation):
-                                next_bot_message = conversation[i+2]["content"]
-                                next_lead_response = conversation[i+2]["content"].lower()
-                                if "yes" in next_lead_response or "interested" in next_lead_response:
-                                    # This was a successful objection handling
-                                    update_industry_patterns(
-                                        industry,
-                                        "objection_responses",
-                                        objection_type,
-                                        next_bot_message,
-                                        True
-                                    )
-    
-    return jsonify({"status": "success", "message": "Successfully analyzed conversations"})
+    """Dial the follow-ups that are due, in the background"""
+    data = request.get_json(silent=True) or {}
+    return queue_job('auto_follow_up', {'max_calls': data.get('max_calls', 10)})
 
 @app.route('/audio/<filename>')
 def serve_audio(filename):
@@ -2143,6 +1487,42 @@ def serve_audio(filename):
     audio_dir = os.path.join(os.path.dirname(__file__), 'audio_files')
     return send_file(os.path.join(audio_dir, filename), mimetype='audio/mpeg')
 
+@app.route('/api/prompts/<prompt_hash>', methods=['GET'])
+def get_prompt(prompt_hash):
+    """Return the exact system prompt recorded for a bot turn"""
+    with get_db() as conn:
+        version = get_prompt_version(conn, prompt_hash)
+    if not version:
+        return {'error': 'Prompt not found'}, 404
+    return jsonify(version)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Per-stage response cache hit rates, TTS audio and lead cache hits"""
+    response_cache = get_response_cache(get_config())
+    return jsonify({
+        'responses': response_cache.stats() if response_cache else {'enabled': False},
+        'audio': dict(TTS_CACHE_STATS),
+        'speculation': dict(speculation_stats),
+        'leads': lead_cache.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Per-stage conversation turn latency histograms for Prometheus"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/debug/slow_turns', methods=['GET'])
+def debug_slow_turns():
+    """Recent slow conversation turns with their per-stage timings, slowest first"""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'turns': slow_turns(limit)})
+
+@app.route('/api/llm/health', methods=['GET'])
+def llm_health():
+    """Report LLM circuit breaker state and latency percentiles per model"""
+    return jsonify(get_llm_router(get_config()).stats())
+
 @app.route('/api/voice_check', methods=['GET'])
 def check_voice_settings():
     """Check if ElevenLabs voice is properly configured and test it"""
@@ -2162,13 +1542,14 @@ def check_voice_settings():
         return jsonify(result)
     
     try:
+        import requests
         # Check if the voice ID exists by querying the ElevenLabs API
         headers = {
             "xi-api-key": elevenlabs_api_key,
             "Content-Type": "application/json"
         }
         response = requests.get(
-            f"https://api.elevenlabs.io/v1/voices/{elevenlabs_voice_id}",
+            f"{config.get('ELEVENLABS_API_URL') or 'https://api.elevenlabs.io'}/v1/voices/{elevenlabs_voice_id}",
             headers=headers
         )
         
@@ -2216,21 +1597,21 @@ def check_voice_settings():
 def get_call_logs_summary():
     """Get summary statistics for call logs"""
     try:
-        with get_db() as conn:
+        with get_db(with_archive=True) as conn:
             # Get total number of calls
-            total_calls = conn.execute('SELECT COUNT(DISTINCT lead_id) FROM call_logs WHERE call_status IN ("Started", "In Progress", "completed")').fetchone()[0]
+            total_calls = conn.execute('SELECT COUNT(DISTINCT lead_id) FROM call_logs_all WHERE call_status IN ("Started", "In Progress", "completed")').fetchone()[0]
             
             # Get average call duration
             avg_duration_result = conn.execute('''
-                SELECT AVG(
-                    CASE 
-                        WHEN json_extract(transcript, '$.duration') IS NOT NULL 
-                        THEN CAST(json_extract(transcript, '$.duration') AS INTEGER)
-                        ELSE NULL 
-                    END
-                ) as avg_duration
-                FROM call_logs 
-                WHERE call_status = 'completed' AND json_extract(transcript, '$.duration') IS NOT NULL
+                SELECT AVG(CAST(duration AS INTEGER)) as avg_duration FROM (
+                    -- Most transcripts are plain text; only JSON ones can carry a duration
+                    SELECT CASE WHEN json_valid(transcript)
+                                THEN json_extract(transcript, '$.duration')
+                           END as duration
+                    FROM call_logs_all
+                    WHERE call_status = 'completed'
+                )
+                WHERE duration IS NOT NULL
             ''').fetchone()
             
             # Fallback calculation for average duration
@@ -2241,7 +1622,7 @@ def get_call_logs_summary():
                         SELECT 
                             lead_id, 
                             (julianday(MAX(created_at)) - julianday(MIN(created_at))) * 86400 as duration
-                        FROM call_logs 
+                        FROM call_logs_all 
                         WHERE call_status IN ('Started', 'In Progress', 'completed')
                         GROUP BY lead_id
                     )
@@ -2254,7 +1635,7 @@ def get_call_logs_summary():
                 SELECT 
                     date(created_at) as call_date,
                     COUNT(DISTINCT lead_id) as count
-                FROM call_logs
+                FROM call_logs_all
                 WHERE created_at >= date('now', '-7 day')
                 GROUP BY date(created_at)
                 ORDER BY call_date
@@ -2306,7 +1687,7 @@ def get_ai_patterns():
     """Get successful patterns learned by the AI from successful calls"""
     try:
         with get_db() as conn:
-            patterns = conn.execute('SELECT * FROM ai_patterns ORDER BY created_at DESC LIMIT 1').fetchone()
+            patterns = conn.execute('SELECT * FROM ai_patterns ORDER BY id DESC LIMIT 1').fetchone()
             
             if patterns:
                 pattern_data = json.loads(patterns['patterns'])
@@ -2327,175 +1708,72 @@ def get_ai_patterns():
 
 @app.route('/api/analytics/learn', methods=['POST'])
 def run_ai_learning():
-    """Run AI learning process on successful conversations"""
-    feedback = request.json.get('feedback', '')
-    
-    try:
-        # Get all successful conversations (calls that led to appointments)
-        with get_db() as conn:
-            # Get all qualified leads
-            qualified_leads = conn.execute('''
-                SELECT id FROM leads 
-                WHERE qualification_status = 'Qualified' 
-                OR status = 'Appointment Set'
-            ''').fetchall()
-            
-            qualified_lead_ids = [lead['id'] for lead in qualified_leads]
-            
-            if not qualified_lead_ids:
-                return jsonify({
-                    'message': 'No qualified leads found for learning',
-                    'callsAnalyzed': 0,
-                    'patternsIdentified': 0
-                }), 200
-            
-            # Get transcripts for successful calls
-            successful_transcripts = []
-            for lead_id in qualified_lead_ids:
-                call_logs = conn.execute('SELECT * FROM call_logs WHERE lead_id = ?', (lead_id,)).fetchall()
-                
-                if call_logs:
-                    # Organize call log transcripts
-                    transcript = []
-                    for log in call_logs:
-                        if log['transcript']:
-                            transcript.append(log['transcript'])
-                    
-                    if transcript:
-                        successful_transcripts.append({
-                            'lead_id': lead_id,
-                            'transcript': transcript
-                        })
-            
-            # Identify patterns using a basic analysis
-            # This is a simplified version - in a real app, this would use more advanced NLP
-            patterns = {
-                'objectionHandling': [],
-                'valuePropositions': [],
-                'qualificationQuestions': [],
-                'closingTechniques': []
-            }
-            
-            # Simple pattern detection logic
-            objection_keywords = ['but', 'however', 'concerned', 'worry', 'expensive', 'cost', 'price', 'time', 'not sure']
-            value_keywords = ['save', 'benefit', 'improve', 'increase', 'reduce', 'solution', 'better']
-            qualification_keywords = ['how many', 'employees', 'budget', 'currently', 'decision', 'timeline', 'process']
-            closing_keywords = ['schedule', 'appointment', 'available', 'meet', 'next steps', 'follow up', 'calendar']
-            
-            for convo in successful_transcripts:
-                for line in convo['transcript']:
-                    line_lower = line.lower()
-                    
-                    if line.startswith('Bot:'):
-                        text = line[4:].strip().lower()
-                        
-                        # Check for objection handling
-                        if any(keyword in text for keyword in objection_keywords) and len(text) > 20:
-                            # Extract the sentence containing the objection handling
-                            if not any(existing.lower() == text.lower() for existing in patterns['objectionHandling']):
-                                patterns['objectionHandling'].append(line[4:].strip())
-                        
-                        # Check for value propositions
-                        if any(keyword in text for keyword in value_keywords) and len(text) > 15:
-                            # Extract the sentence containing the value proposition
-                            if not any(existing.lower() == text.lower() for existing in patterns['valuePropositions']):
-                                patterns['valuePropositions'].append(line[4:].strip())
-                        
-                        # Check for qualification questions
-                        if any(keyword in text for keyword in qualification_keywords) and '?' in text:
-                            # Extract the question
-                            if not any(existing.lower() == text.lower() for existing in patterns['qualificationQuestions']):
-                                patterns['qualificationQuestions'].append(line[4:].strip())
-                        
-                        # Check for closing techniques
-                        if any(keyword in text for keyword in closing_keywords) and len(text) > 15:
-                            # Extract the closing statement
-                            if not any(existing.lower() == text.lower() for existing in patterns['closingTechniques']):
-                                patterns['closingTechniques'].append(line[4:].strip())
-            
-            # Incorporate user feedback if provided
-            if feedback:
-                # Store feedback for future use
-                conn.execute(
-                    'INSERT INTO ai_feedback (feedback, created_at) VALUES (?, datetime("now"))',
-                    (feedback,)
-                )
-            
-            # Limit the number of patterns
-            for category in patterns:
-                patterns[category] = patterns[category][:5]  # Keep only the top 5
-            
-            # Store the patterns in the database
-            conn.execute(
-                'INSERT INTO ai_patterns (patterns, created_at) VALUES (?, datetime("now"))',
-                (json.dumps(patterns),)
-            )
-            
-            return jsonify({
-                'message': 'Learning process completed successfully',
-                'callsAnalyzed': len(successful_transcripts),
-                'patternsIdentified': sum(len(patterns[category]) for category in patterns)
-            })
-    
-    except Exception as e:
-        logger.error(f"Error in AI learning process: {str(e)}")
-        return jsonify({'error': 'Learning process failed'}), 500
+    """Learn from successful conversations recorded since the last run (see learning.py), as a job"""
+    feedback = (request.get_json(silent=True) or {}).get('feedback', '')
+    return queue_job('learn', {'feedback': feedback})
 
 
 @app.route('/api/zoho/sync', methods=['POST'])
 def sync_to_zoho():
-    """Sync appointments to Zoho CRM"""
+    """Sync appointments to Zoho CRM, as a job"""
+    return queue_job('zoho_sync')
+
+
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs():
+    """Recent background jobs, newest first (?status=, ?kind=, ?limit=)"""
+    status = request.args.get('status')
+    if status and status not in JOB_STATUSES:
+        return {'error': f"status must be one of: {', '.join(JOB_STATUSES)}"}, 400
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_LIST_LIMIT)), 500)
+    except ValueError:
+        return {'error': 'limit must be a whole number'}, 400
+    with get_db() as conn:
+        return jsonify({'jobs': list_jobs(conn, status, request.args.get('kind'), limit)})
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a job by kind, e.g. {"kind": "mine_patterns", "payload": {}, "priority": 0}"""
+    data = request.get_json(silent=True) or {}
+    if not get_handler(data.get('kind')):
+        return {'error': f"Unknown job kind: {data.get('kind')}"}, 400
+    return queue_job(data['kind'], data.get('payload'), data.get('priority'))
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Status, progress and (once finished) result or error of a job"""
+    with get_db() as conn:
+        job = get_job(conn, job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return jsonify(job)
+
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_queued_job(job_id):
+    """Cancel a job that hasn't started yet"""
+    with get_db() as conn:
+        if cancel_job(conn, job_id):
+            return jsonify(get_job(conn, job_id))
+        job = get_job(conn, job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return {'error': f"Job is {job['status']} and can no longer be cancelled"}, 409
+
+
+def queue_job(kind, payload=None, priority=None):
+    """Queue a background job and answer 202 with where to poll for it"""
     try:
         with get_db() as conn:
-            # Get appointments that haven't been synced
-            appointments = conn.execute('''
-                SELECT a.*, l.name, l.phone, l.email, l.address, l.city, l.state, l.zipcode, l.industry
-                FROM appointments a
-                JOIN leads l ON a.lead_id = l.id
-                WHERE a.zoho_synced = 0 OR a.zoho_synced IS NULL
-            ''').fetchall()
-            
-            if not appointments:
-                return jsonify({
-                    'message': 'No appointments to sync',
-                    'syncedCount': 0
-                })
-            
-            # Set up Zoho connection (simplified - in a real app, this would handle auth)
-            zoho_enabled = os.environ.get('ZOHO_ENABLED', 'false').lower() == 'true'
-            zoho_api_key = os.environ.get('ZOHO_API_KEY', '')
-            
-            if not zoho_enabled or not zoho_api_key:
-                return jsonify({
-                    'message': 'Zoho integration not configured',
-                    'syncedCount': 0
-                }), 400
-            
-            # Mock successful sync for testing
-            # In a real app, this would make actual API calls to Zoho
-            synced_count = 0
-            for appointment in appointments:
-                # Update appointment as synced in database
-                conn.execute(
-                    'UPDATE appointments SET zoho_synced = 1, zoho_id = ? WHERE id = ?',
-                    (f"zoho_{appointment['id']}", appointment['id'])
-                )
-                synced_count += 1
-                
-                # Log the sync
-                conn.execute(
-                    'INSERT INTO sync_logs (entity_type, entity_id, destination, status, created_at) VALUES (?, ?, ?, ?, datetime("now"))',
-                    ('appointment', appointment['id'], 'zoho', 'success')
-                )
-            
-            return jsonify({
-                'message': f'Successfully synced {synced_count} appointments to Zoho CRM',
-                'syncedCount': synced_count
-            })
-    
+            job_id = enqueue_job(conn, kind, payload, priority)
+            job = get_job(conn, job_id)
+        return jsonify(dict(job, job_id=job_id, status_url=f'/api/jobs/{job_id}')), 202
     except Exception as e:
-        logger.error(f"Error syncing to Zoho: {str(e)}")
-        return jsonify({'error': 'Failed to sync with Zoho CRM'}), 500
+        logger.error(f"Error queueing {kind} job: {str(e)}")
+        return {'error': str(e)}, 500
 
 
 @app.route('/api/voices', methods=['GET'])
@@ -2534,4 +1812,8 @@ if __name__ == '__main__':
             port = 5001
     else:
         port = int(os.environ.get('PORT', 5001))
+    init_db()
+    # With the reloader, only the child process that serves requests runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_workers()
     app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,153 @@
+import os
+import zlib
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DAYS = 90
+
+# Rows moved per transaction, so the hot table's write lock is never held for long
+ARCHIVE_BATCH_SIZE = 2000
+
+# Columns shared by both tiers, in call_logs_all order
+CALL_LOG_COLUMNS = ['id', 'lead_id', 'call_status', 'transcript', 'created_at', 'prompt_hash', 'call_sid']
+
+
+def archive_db_path():
+    """Archive database path: ARCHIVE_DATABASE_URL, or <main db>_archive.db beside the main database"""
+    import models
+    path = os.environ.get('ARCHIVE_DATABASE_URL', '').replace('sqlite:///', '')
+    return path or f"{os.path.splitext(models.DB_PATH)[0]}_archive.db"
+
+
+def compress_text(text):
+    return zlib.compress(text.encode('utf-8'), 6) if text is not None else None
+
+
+def decompress_text(blob):
+    return zlib.decompress(blob).decode('utf-8') if blob is not None else None
+
+
+def attach_archive(conn):
+    """Attach the archive database and define the call_logs_all view over both tiers.
+
+    Archived rows keep their original ids, so ordering by id still follows
+    the conversation. Transcripts are stored zlib-compressed and inflated by
+    the archive_text() SQL function in the view.
+    """
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    if 'archive' not in attached:
+        conn.execute('ATTACH DATABASE ? AS archive', (archive_db_path(),))
+        # Registered once: the search index keeps statements using it prepared,
+        # and SQLite won't redefine a function while they exist
+        conn.create_function('archive_text', 1, decompress_text, deterministic=True)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.archived_call_logs (
+            id INTEGER PRIMARY KEY,
+            lead_id INTEGER,
+            call_status TEXT,
+            transcript_z BLOB,
+            created_at TIMESTAMP,
+            prompt_hash TEXT,
+            call_sid TEXT,
+            partition_month TEXT,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archived_call_logs_lead_id ON archived_call_logs(lead_id, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archived_call_logs_partition ON archived_call_logs(partition_month)')
+    conn.execute(f'''
+        CREATE TEMP VIEW IF NOT EXISTS call_logs_all AS
+        SELECT {', '.join(CALL_LOG_COLUMNS)} FROM main.call_logs
+        UNION ALL
+        SELECT id, lead_id, call_status, archive_text(transcript_z), created_at, prompt_hash, call_sid
+        FROM archive.archived_call_logs
+    ''')
+    # Archived turns stay searchable
+    from search import ensure_archive_search_index
+    ensure_archive_search_index(conn)
+    return conn
+
+
+def archive_call_logs(conn, older_than_days=DEFAULT_ARCHIVE_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move calls older than the cut-off from call_logs to the archive tier.
+
+    A lead's latest call always stays hot (the conversation flow reads it),
+    and every earlier row older than the cut-off is moved. Each batch is
+    copied and deleted in one transaction across both databases, so a crash
+    never loses or duplicates rows. Returns the number of rows archived.
+    """
+    attach_archive(conn)
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+    # Row ids grow with time, so the latest 'Started' row starts a lead's latest call
+    conn.execute('DROP TABLE IF EXISTS temp.current_calls')
+    conn.execute('''
+        CREATE TEMP TABLE current_calls AS
+        SELECT lead_id, max(id) AS start_id FROM main.call_logs
+        WHERE call_status = 'Started' GROUP BY lead_id
+    ''')
+
+    archived = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT {', '.join('c.' + col for col in CALL_LOG_COLUMNS)} FROM main.call_logs c
+            LEFT JOIN temp.current_calls cur ON cur.lead_id = c.lead_id
+            WHERE c.created_at < ? AND (cur.start_id IS NULL OR c.id < cur.start_id)
+            ORDER BY c.id LIMIT ?
+        ''', (cutoff, batch_size)).fetchall()
+        if not rows:
+            break
+
+        conn.executemany('''
+            INSERT OR IGNORE INTO archive.archived_call_logs
+            (id, lead_id, call_status, transcript_z, created_at, prompt_hash, call_sid, partition_month)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(row['id'], row['lead_id'], row['call_status'], compress_text(row['transcript']),
+               row['created_at'], row['prompt_hash'], row['call_sid'], (row['created_at'] or '')[:7])
+              for row in rows])
+        ids = [row['id'] for row in rows]
+        conn.execute(f"DELETE FROM main.call_logs WHERE id IN ({','.join('?' for _ in ids)})", ids)
+        conn.commit()
+        archived += len(rows)
+
+    conn.execute('DROP TABLE IF EXISTS temp.current_calls')
+    logger.info(f"Archived {archived} call log rows older than {older_than_days} days")
+    return archived
+
+
+def delete_archived_logs(conn, lead_ids):
+    """Remove a deleted lead's archived call logs"""
+    attach_archive(conn)
+    placeholders = ','.join('?' for _ in lead_ids)
+    conn.execute(f'DELETE FROM archive.archived_call_logs WHERE lead_id IN ({placeholders})', list(lead_ids))
+
+
+def archive_stats(conn):
+    """Row counts for the hot table and each archive partition"""
+    attach_archive(conn)
+    hot_rows = conn.execute('SELECT COUNT(*) FROM main.call_logs').fetchone()[0]
+    partitions = conn.execute('''
+        SELECT partition_month, COUNT(*) AS rows, SUM(length(transcript_z)) AS compressed_bytes
+        FROM archive.archived_call_logs GROUP BY partition_month ORDER BY partition_month
+    ''').fetchall()
+    return {
+        'hot_rows': hot_rows,
+        'archived_rows': sum(row['rows'] for row in partitions),
+        'partitions': [dict(row) for row in partitions]
+    }
+
+
+if __name__ == '__main__':
+    # Nightly maintenance entry point, e.g. from cron:
+    #   30 2 * * * cd /path/to/backend && python archive.py 90
+    import sys
+    from config import get_config
+    from models import get_db, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else int(get_config().get('CALL_LOG_ARCHIVE_DAYS', DEFAULT_ARCHIVE_DAYS))
+    init_db()
+    with get_db() as conn:
+        count = archive_call_logs(conn, days)
+    print(f"Archived {count} call log rows older than {days} days")
@@ -0,0 +1,104 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Artifacts only need to outlive the Twilio round trip that fetches them
+DEFAULT_TTL = 600
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class ArtifactStore:
+    """Short-lived per-call artifacts (e.g. voicemail TwiML by CallSid) with a TTL.
+
+    Entries live in memory. With spill enabled they are also written to the
+    call_artifacts table, so a follow-up request that lands on another worker
+    process can still find them; memory is always checked first.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, spill=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.spill = spill
+        self._entries = {}  # (kind, key) -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def put(self, kind, key, value, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        with self._lock:
+            self._entries[(kind, key)] = (expires_at, value)
+            if len(self._entries) > self.max_entries:
+                self._purge(time.time())
+        if self.spill:
+            self._spill(kind, key, value, expires_at)
+
+    def get(self, kind, key):
+        """The stored value, or None if it is unknown or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry:
+                if entry[0] > now:
+                    return entry[1]
+                del self._entries[(kind, key)]
+        if self.spill:
+            return self._load(kind, key, now)
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _purge(self, now):
+        for entry_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[entry_key]
+        # Still full of live entries: drop the ones closest to expiry
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            for entry_key in sorted(self._entries, key=lambda k: self._entries[k][0])[:overflow]:
+                del self._entries[entry_key]
+
+    def _spill(self, kind, key, value, expires_at):
+        from models import get_db
+        try:
+            with get_db() as conn:
+                conn.execute('INSERT OR REPLACE INTO call_artifacts (kind, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                             (kind, key, value, expires_at))
+                conn.execute('DELETE FROM call_artifacts WHERE expires_at <= ?', (time.time(),))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error spilling {kind} artifact for {key}: {str(e)}")
+
+    def _load(self, kind, key, now):
+        from models import get_db
+        try:
+            with get_db() as conn:
+                row = conn.execute('SELECT value, expires_at FROM call_artifacts WHERE kind = ? AND key = ?',
+                                   (kind, key)).fetchone()
+        except Exception as e:
+            logger.error(f"Error loading {kind} artifact for {key}: {str(e)}")
+            return None
+        if not row or row['expires_at'] <= now:
+            return None
+        with self._lock:
+            self._entries[(kind, key)] = (row['expires_at'], row['value'])
+        return row['value']
+
+
+_store = None
+_store_key = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store(config):
+    """Return the shared store, rebuilt when ARTIFACT_TTL or ARTIFACT_SPILL change"""
+    global _store, _store_key
+    key = (
+        float(config.get('ARTIFACT_TTL') or DEFAULT_TTL),
+        str(config.get('ARTIFACT_SPILL', False)).lower() not in ('false', '0', '')
+    )
+    with _store_lock:
+        if _store is None or _store_key != key:
+            _store = ArtifactStore(ttl=key[0], spill=key[1])
+            _store_key = key
+        return _store
@@ -0,0 +1,197 @@
+import os
+import time
+import uuid
+import random
+import threading
+import logging
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from config import get_config, public_base_url
+
+logger = logging.getLogger(__name__)
+
+# Short clips played while the real reply is computed
+FILLER_PHRASES = [
+    "Mm, sure.",
+    "Okay, got it.",
+    "Right, one second.",
+    "Sure, let me see."
+]
+
+# How long the webhook waits before falling back to filler + <Redirect>
+DEFAULT_GRACE_SECONDS = 0.5
+
+# How long each poll request holds the connection waiting for the turn
+DEFAULT_POLL_WAIT_SECONDS = 5
+
+# Polls before giving up on a turn (about 30 seconds in total)
+MAX_POLL_ATTEMPTS = 6
+
+# Finished or abandoned turns are forgotten after this long
+TURN_TTL_SECONDS = 600
+
+# Turn worker threads when neither ASYNC_TURN_WORKERS nor GUNICORN_THREADS is set
+DEFAULT_TURN_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+_turns = {}  # turn_id -> (created, future, abandoned event)
+_turns_lock = threading.Lock()
+_filler_urls = {}
+_filler_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor():
+    """The turn worker pool, sized so every request thread can have a turn computing"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(get_config().get('ASYNC_TURN_WORKERS') or os.environ.get('GUNICORN_THREADS')
+                          or DEFAULT_TURN_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='turn-worker')
+        return _executor
+
+
+def _reset_after_fork():
+    """Give a forked worker its own pool; turns in flight belong to the parent"""
+    global _executor, _executor_lock, _turns_lock, _filler_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+    _turns.clear()
+    _turns_lock = threading.Lock()
+    _filler_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def submit_turn(fn, *args):
+    """Run fn(*args) on the turn worker pool and return (turn_id, future)"""
+    _expire_turns()
+    turn_id = uuid.uuid4().hex
+    abandoned = threading.Event()
+    future = _get_executor().submit(_run_turn, abandoned, fn, *args)
+    with _turns_lock:
+        _turns[turn_id] = (time.time(), future, abandoned)
+    return turn_id, future
+
+
+def _run_turn(abandoned, fn, *args):
+    _local.abandoned = abandoned
+    try:
+        return fn(*args)
+    finally:
+        _local.abandoned = None
+
+
+def turn_abandoned():
+    """Whether the turn running on this thread was given up on (the caller was asked to repeat)"""
+    abandoned = getattr(_local, 'abandoned', None)
+    return bool(abandoned and abandoned.is_set())
+
+
+def get_turn(turn_id):
+    """Future for a submitted turn, or None if it is unknown or expired"""
+    with _turns_lock:
+        entry = _turns.get(turn_id)
+    return entry[1] if entry else None
+
+
+def forget_turn(turn_id):
+    with _turns_lock:
+        _turns.pop(turn_id, None)
+
+
+def abandon_turn(turn_id):
+    """Forget a turn whose reply will never be played; it finishes without logging it"""
+    with _turns_lock:
+        entry = _turns.pop(turn_id, None)
+    if entry:
+        entry[2].set()
+
+
+def _expire_turns():
+    cutoff = time.time() - TURN_TTL_SECONDS
+    with _turns_lock:
+        for turn_id in [tid for tid, (created, _, _) in _turns.items() if created < cutoff]:
+            _turns.pop(turn_id)[2].set()
+
+
+def wait_for_turn(future, timeout, lead_id=None):
+    """TwiML from a finished turn, or None if it is still running after timeout"""
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        return None
+    except Exception as e:
+        logger.error(f"Turn for lead {lead_id} failed: {str(e)}")
+        return retry_twiml(lead_id)
+
+
+# --- Filler audio ---
+
+def _filler_audio_url(phrase, config):
+    """Cached ElevenLabs clip URL for a filler phrase; generated in the background on first use"""
+    if not (config.get('ELEVENLABS_API_KEY') and config.get('ELEVENLABS_VOICE_ID')):
+        return None
+
+    with _filler_lock:
+        if phrase in _filler_urls:
+            return _filler_urls[phrase]
+        # Reserve the slot so only one worker generates the clip
+        _filler_urls[phrase] = None
+
+    webhook_url = public_base_url(config)
+
+    def generate():
+        # elevenlabs_tts reuses the stored clip when one already exists
+        from voice import elevenlabs_tts
+        audio_file = elevenlabs_tts(phrase)
+        with _filler_lock:
+            if audio_file and os.path.exists(audio_file):
+                url = f"{webhook_url}/audio/{os.path.basename(audio_file)}"
+                _filler_urls[phrase] = url
+                logger.info(f"Cached filler clip for '{phrase}': {url}")
+            else:
+                # Try again on a later turn
+                _filler_urls.pop(phrase, None)
+
+    _get_executor().submit(generate)
+    return None
+
+
+def holding_twiml(turn_id, lead_id, config, attempt=0):
+    """Filler clip plus a <Redirect> to the poll endpoint"""
+    from twilio.twiml.voice_response import VoiceResponse
+    response = VoiceResponse()
+    if attempt == 0:
+        phrase = random.choice(FILLER_PHRASES)
+        audio_url = _filler_audio_url(phrase, config)
+        if audio_url:
+            response.play(audio_url)
+        else:
+            response.say(phrase)
+    else:
+        response.pause(length=1)
+
+    params = urllib.parse.urlencode({'lead_id': lead_id or '', 'attempt': attempt + 1})
+    response.redirect(f"/webhook/turn/{turn_id}?{params}", method='POST')
+    return str(response)
+
+
+def retry_twiml(lead_id):
+    """Ask the lead to repeat themselves when a turn was lost or took too long"""
+    from twilio.twiml.voice_response import VoiceResponse, Gather
+    response = VoiceResponse()
+    response.say("Sorry about that, I didn't quite catch that. Could you say that again?")
+    gather = Gather(
+        input='speech',
+        action=f"/webhook/response?lead_id={lead_id or ''}",
+        method='POST',
+        speechTimeout='auto',
+        enhanced='true'
+    )
+    response.append(gather)
+    return str(response)
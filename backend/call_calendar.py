@@ -0,0 +1,233 @@
+import bisect
+import threading
+import logging
+from datetime import datetime, date, time, timedelta
+from functools import lru_cache
+import pytz
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = 'US/Mountain'
+
+# Primary time zone per state (the zone most of the state's population is in)
+STATE_TIMEZONES = {
+    'AL': 'US/Central', 'AK': 'US/Alaska', 'AZ': 'US/Arizona', 'AR': 'US/Central',
+    'CA': 'US/Pacific', 'CO': 'US/Mountain', 'CT': 'US/Eastern', 'DC': 'US/Eastern',
+    'DE': 'US/Eastern', 'FL': 'US/Eastern', 'GA': 'US/Eastern', 'HI': 'US/Hawaii',
+    'ID': 'US/Mountain', 'IL': 'US/Central', 'IN': 'US/Eastern', 'IA': 'US/Central',
+    'KS': 'US/Central', 'KY': 'US/Eastern', 'LA': 'US/Central', 'ME': 'US/Eastern',
+    'MD': 'US/Eastern', 'MA': 'US/Eastern', 'MI': 'US/Eastern', 'MN': 'US/Central',
+    'MS': 'US/Central', 'MO': 'US/Central', 'MT': 'US/Mountain', 'NE': 'US/Central',
+    'NV': 'US/Pacific', 'NH': 'US/Eastern', 'NJ': 'US/Eastern', 'NM': 'US/Mountain',
+    'NY': 'US/Eastern', 'NC': 'US/Eastern', 'ND': 'US/Central', 'OH': 'US/Eastern',
+    'OK': 'US/Central', 'OR': 'US/Pacific', 'PA': 'US/Eastern', 'RI': 'US/Eastern',
+    'SC': 'US/Eastern', 'SD': 'US/Central', 'TN': 'US/Central', 'TX': 'US/Central',
+    'UT': 'US/Mountain', 'VT': 'US/Eastern', 'VA': 'US/Eastern', 'WA': 'US/Pacific',
+    'WV': 'US/Eastern', 'WI': 'US/Central', 'WY': 'US/Mountain', 'PR': 'America/Puerto_Rico'
+}
+
+# (first ZIP3 prefix, time zone) ranges for leads without a usable state
+ZIP_PREFIX_TIMEZONES = [
+    (5, 'US/Eastern'), (6, 'America/Puerto_Rico'), (10, 'US/Eastern'),
+    (350, 'US/Central'), (398, 'US/Eastern'), (500, 'US/Central'),
+    (590, 'US/Mountain'), (600, 'US/Central'), (798, 'US/Mountain'),
+    (850, 'US/Arizona'), (870, 'US/Mountain'), (889, 'US/Pacific'),
+    (967, 'US/Hawaii'), (970, 'US/Pacific'), (995, 'US/Alaska')
+]
+_ZIP_PREFIX_STARTS = [start for start, _ in ZIP_PREFIX_TIMEZONES]
+
+# The calendar is rebuilt at least this often so config saved by another worker is picked up
+CALENDAR_TTL = 300
+
+# No calling window can be further away than this (a week plus a long holiday run)
+MAX_LOOKAHEAD_DAYS = 14
+
+
+@lru_cache(maxsize=1024)
+def lead_timezone(state=None, zipcode=None):
+    """Time zone for a lead's state (or ZIP code when the state is unknown), or None"""
+    tz_name = STATE_TIMEZONES.get((state or '').strip().upper())
+    if not tz_name:
+        digits = ''.join(ch for ch in str(zipcode or '') if ch.isdigit())
+        if len(digits) >= 3:
+            index = bisect.bisect_right(_ZIP_PREFIX_STARTS, int(digits[:3])) - 1
+            if index >= 0:
+                tz_name = ZIP_PREFIX_TIMEZONES[index][1]
+    return pytz.timezone(tz_name) if tz_name else None
+
+
+def us_federal_holidays(year):
+    """Dates of the US federal holidays most businesses close for"""
+    def nth_weekday(month, weekday, n):
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    def last_weekday(month, weekday):
+        last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+        return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+    return {
+        date(year, 1, 1),                 # New Year's Day
+        last_weekday(5, 0),               # Memorial Day
+        date(year, 7, 4),                 # Independence Day
+        nth_weekday(9, 0, 1),             # Labor Day
+        nth_weekday(11, 3, 4),            # Thanksgiving
+        date(year, 12, 25)                # Christmas Day
+    }
+
+
+def _parse_time(value, default):
+    try:
+        return time(*map(int, str(value).split(':')))
+    except (TypeError, ValueError):
+        return default
+
+
+def _enabled(value):
+    return str(value).lower() not in ('false', '0', '', 'none')
+
+
+class CallCalendar:
+    """Calling windows compiled once from BUSINESS_HOURS.
+
+    Windows are looked up by weekday and holiday date and applied in the
+    lead's own time zone (from state or ZIP code), falling back to the
+    configured zone. can_call() and next_window() do a constant amount of
+    work per lead, so dialers can order whole queues with them.
+    """
+
+    def __init__(self, business_hours=None, holidays=(), lead_local_time=True):
+        hours = business_hours or {}
+        try:
+            self.default_tz = pytz.timezone(hours.get('timezone', DEFAULT_TIMEZONE))
+        except pytz.UnknownTimeZoneError:
+            self.default_tz = pytz.timezone(DEFAULT_TIMEZONE)
+
+        weekday = (_parse_time(hours.get('weekday_start', '09:30'), time(9, 30)),
+                   _parse_time(hours.get('weekday_end', '16:00'), time(16, 0)))
+        weekend = None
+        if _enabled(hours.get('weekend_enabled', False)):
+            weekend = (_parse_time(hours.get('weekend_start', '10:00'), time(10, 0)),
+                       _parse_time(hours.get('weekend_end', '14:00'), time(14, 0)))
+        # Window (start, end) per weekday, Monday first; None means no calling
+        self.windows = [weekday] * 5 + [weekend] * 2
+        self.holidays = set(holidays)
+        self.lead_local_time = lead_local_time
+
+    def timezone_for(self, lead=None):
+        if lead and self.lead_local_time:
+            return lead_timezone(lead.get('state'), lead.get('zipcode')) or self.default_tz
+        return self.default_tz
+
+    def window_on(self, day):
+        """(start, end) local calling window for a date, or None"""
+        if day in self.holidays:
+            return None
+        return self.windows[day.weekday()]
+
+    def can_call(self, lead=None, now=None):
+        """Whether it is inside the calling window where the lead is"""
+        local = (now or datetime.now(pytz.utc)).astimezone(self.timezone_for(lead))
+        window = self.window_on(local.date())
+        return bool(window) and window[0] <= local.time() <= window[1]
+
+    def current_window_end(self, lead=None, now=None):
+        """End of the window the lead is in right now, or None"""
+        tz = self.timezone_for(lead)
+        local = (now or datetime.now(pytz.utc)).astimezone(tz)
+        window = self.window_on(local.date())
+        if not window or not window[0] <= local.time() <= window[1]:
+            return None
+        return tz.localize(datetime.combine(local.date(), window[1]))
+
+    def next_window(self, lead=None, now=None):
+        """When the lead can next be called (now if a window is open), or None"""
+        tz = self.timezone_for(lead)
+        local = (now or datetime.now(pytz.utc)).astimezone(tz)
+        for offset in range(MAX_LOOKAHEAD_DAYS):
+            day = local.date() + timedelta(days=offset)
+            window = self.window_on(day)
+            if not window:
+                continue
+            start = tz.localize(datetime.combine(day, window[0]))
+            end = tz.localize(datetime.combine(day, window[1]))
+            if local <= end:
+                return max(start, local)
+        return None
+
+    def describe_next_window(self, lead=None, now=None):
+        """next_window() as words for callers and the UI, e.g. 'tomorrow at 9:30 AM Mountain Time'"""
+        start = self.next_window(lead, now)
+        if start is None:
+            return None
+        today = (now or datetime.now(pytz.utc)).astimezone(start.tzinfo).date()
+        if start.date() == today:
+            day = 'today'
+        elif start.date() == today + timedelta(days=1):
+            day = 'tomorrow'
+        else:
+            day = f"{start:%A, %B} {start.day}"
+        zone = self.timezone_for(lead).zone.split('/')[-1].replace('_', ' ')
+        return f"{day} at {start.strftime('%I:%M %p').lstrip('0')} {zone} Time"
+
+    def order_for_dialing(self, leads, now=None):
+        """Split leads into (ready, waiting).
+
+        ready holds leads that can be called now, those whose window closes
+        soonest first; waiting holds (lead, next_window) pairs, soonest first.
+        """
+        now = now or datetime.now(pytz.utc)
+        ready, waiting = [], []
+        for lead in leads:
+            window_end = self.current_window_end(lead, now)
+            if window_end:
+                ready.append((window_end, lead))
+            else:
+                waiting.append((self.next_window(lead, now), lead))
+        far_future = now + timedelta(days=MAX_LOOKAHEAD_DAYS)
+        ready.sort(key=lambda item: item[0])
+        waiting.sort(key=lambda item: item[0] or far_future)
+        return [lead for _, lead in ready], [(lead, start) for start, lead in waiting]
+
+
+def build_call_calendar(config):
+    """Compile BUSINESS_HOURS, CALL_HOLIDAYS and US holidays into a CallCalendar"""
+    holidays = set()
+    for value in config.get('CALL_HOLIDAYS') or []:
+        try:
+            holidays.add(datetime.strptime(value, '%Y-%m-%d').date())
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid holiday date: {value}")
+    if _enabled(config.get('US_HOLIDAYS_ENABLED', True)):
+        this_year = date.today().year
+        for year in (this_year - 1, this_year, this_year + 1):
+            holidays |= us_federal_holidays(year)
+    return CallCalendar(
+        config.get('BUSINESS_HOURS', {}),
+        holidays,
+        _enabled(config.get('CALL_IN_LEAD_TIMEZONE', True))
+    )
+
+
+_calendar = None
+_built_at = 0
+_calendar_lock = threading.Lock()
+
+
+def get_call_calendar():
+    """Return the compiled calendar, rebuilding it after invalidation or CALENDAR_TTL"""
+    global _calendar, _built_at
+    now = datetime.now().timestamp()
+    with _calendar_lock:
+        if _calendar is None or now - _built_at > CALENDAR_TTL:
+            _calendar = build_call_calendar(get_config())
+            _built_at = now
+        return _calendar
+
+
+def invalidate_call_calendar():
+    """Call after BUSINESS_HOURS or holidays change"""
+    global _calendar
+    with _calendar_lock:
+        _calendar = None
@@ -0,0 +1,179 @@
+import os
+import time
+import queue
+import sqlite3
+import atexit
+import threading
+import logging
+from models import get_db
+
+logger = logging.getLogger(__name__)
+
+# Rows are collected for at most this long (or until the batch is full) before one commit
+DEFAULT_BATCH_INTERVAL = 0.005
+DEFAULT_MAX_BATCH = 200
+
+# How long a webhook waits for its rows to be committed before giving up
+DEFAULT_DURABILITY_TIMEOUT = 5
+
+# A batch that hits a locked database is retried this many times in all,
+# backing off from RETRY_BACKOFF seconds and doubling each time
+COMMIT_ATTEMPTS = 3
+RETRY_BACKOFF = 0.1
+
+INSERT_SQL = '''INSERT INTO call_logs
+                (lead_id, call_status, transcript, prompt_hash, call_sid)
+                VALUES (?, ?, ?, ?, ?)'''
+
+_STOP = object()
+
+
+class LogTicket:
+    """Handle for a queued write; wait() returns once the row is committed"""
+
+    __slots__ = ('event', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=DEFAULT_DURABILITY_TIMEOUT):
+        if not self.event.wait(timeout):
+            raise TimeoutError(f"call_logs write not committed within {timeout}s")
+        if self.error:
+            raise self.error
+
+
+class CallLogWriter:
+    """Write-behind queue for call_logs inserts.
+
+    Webhooks enqueue rows and get a LogTicket back; a single writer thread
+    group-commits everything queued within batch_interval (or max_batch rows)
+    in one transaction, so concurrent calls share one SQLite write instead of
+    contending for the lock. Callers whose TwiML depends on the rows (the next
+    turn reads them back) wait on the last ticket before responding.
+    """
+
+    def __init__(self, batch_interval=DEFAULT_BATCH_INTERVAL, max_batch=DEFAULT_MAX_BATCH):
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.stats = {'rows': 0, 'batches': 0, 'errors': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, lead_id, call_status, transcript, prompt_hash=None, call_sid=None):
+        """Queue one call_logs row and return its LogTicket"""
+        return self._put((lead_id, call_status, transcript, prompt_hash, call_sid))
+
+    def flush(self, timeout=DEFAULT_DURABILITY_TIMEOUT):
+        """Block until everything queued so far is committed"""
+        with self._lock:
+            if self._thread is None:
+                return
+        self._put(None).wait(timeout)
+
+    def close(self):
+        """Commit whatever is queued and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            self._queue.put(_STOP)
+            thread.join(timeout=DEFAULT_DURABILITY_TIMEOUT)
+
+    def reset_after_fork(self):
+        """Forget the parent's queue and writer thread in a forked worker"""
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _put(self, row):
+        ticket = LogTicket()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='call-log-writer', daemon=True)
+                self._thread.start()
+            self._queue.put((row, ticket))
+        return ticket
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        rows = [row for row, _ in batch if row is not None]
+        errors = {}
+        if rows:
+            try:
+                self._insert(rows)
+                self.stats['batches'] += 1
+            except Exception as e:
+                if _is_transient(e):
+                    # Still locked after the retries: nothing in this batch could be written
+                    errors = {index: e for index, (row, _) in enumerate(batch) if row is not None}
+                else:
+                    # One bad row shouldn't fail other calls' rows, so write them one by one
+                    logger.warning(f"Writing {len(rows)} call log rows one by one after: {str(e)}")
+                    for index, (row, _) in enumerate(batch):
+                        if row is not None:
+                            try:
+                                self._insert([row])
+                            except Exception as row_error:
+                                errors[index] = row_error
+            for index, error in errors.items():
+                lead_id, call_status = batch[index][0][:2]
+                logger.error(f"Error writing call log row ({call_status}) for lead {lead_id}: {str(error)}")
+            self.stats['rows'] += len(rows) - len(errors)
+            self.stats['errors'] += len(errors)
+
+        # A flush marker reports the batch's first failure, if any
+        first_error = next(iter(errors.values()), None)
+        for index, (row, ticket) in enumerate(batch):
+            ticket.error = errors.get(index) if row is not None else first_error
+            ticket.event.set()
+
+    def _insert(self, rows):
+        """Insert rows in one transaction, retrying with backoff while the database is locked"""
+        for attempt in range(COMMIT_ATTEMPTS):
+            try:
+                with get_db() as conn:
+                    conn.executemany(INSERT_SQL, rows)
+                    conn.commit()
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == COMMIT_ATTEMPTS - 1 or not _is_transient(e):
+                    raise
+                logger.warning(f"Call log commit failed ({str(e)}), retrying")
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+def _is_transient(error):
+    """Lock contention (another writer, a job thread) rather than a bad row or schema"""
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+
+call_log_writer = CallLogWriter()
+atexit.register(call_log_writer.close)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=call_log_writer.reset_after_fork)
+
+
+def write_call_log(lead_id, call_status, transcript, prompt_hash=None, call_sid=None):
+    """Queue a call_logs row on the shared writer; returns a LogTicket"""
+    return call_log_writer.write(lead_id, call_status, transcript, prompt_hash, call_sid)
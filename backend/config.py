@@ -1,7 +1,11 @@
 import os
+import copy
 import json
+import logging
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # Default config
 DEFAULT_CONFIG = {
     'TWILIO_ACCOUNT_SID': '',
@@ -18,6 +22,12 @@ DEFAULT_CONFIG = {
     'ZOHO_CLIENT_SECRET': '',
     'ZOHO_REFRESH_TOKEN': '',
     'ZOHO_DEPARTMENT_ID': '',
+    # Service endpoints; point these at local stand-ins for load tests (see tests/bench)
+    'OPENAI_BASE_URL': '',
+    'ELEVENLABS_API_URL': 'https://api.elevenlabs.io',
+    'TWILIO_API_URL': '',
+    'ZOHO_ACCOUNTS_URL': 'https://accounts.zoho.com',
+    'ZOHO_API_URL': 'https://www.zohoapis.com',
     # Add business hours configuration
     'BUSINESS_HOURS': {
         'timezone': 'US/Mountain',
@@ -27,72 +37,114 @@ DEFAULT_CONFIG = {
         'weekend_start': '10:00',
         'weekend_end': '14:00'
     },
+    # Apply business hours in each lead's local time zone (from state/ZIP code)
+    'CALL_IN_LEAD_TIMEZONE': True,
+    # Extra no-call dates (YYYY-MM-DD) on top of the US federal holidays
+    'CALL_HOLIDAYS': [],
+    'US_HOLIDAYS_ENABLED': True,
     # API authentication
     'API_KEY': '',
     # Call recording settings
     'RECORDING_ENABLED': False,
     # Test mode toggle
     'TEST_MODE': False,
+    # Answer trivial lead replies from templates without calling the LLM
+    'FAST_PATH_ENABLED': True,
+    # Minimum intent classifier confidence for the template fast path
+    'FAST_PATH_CONFIDENCE': 0.85,
+    # LLM models in order of preference, per-turn deadline and hedge delay (seconds)
+    'LLM_MODELS': ['gpt-4', 'gpt-3.5-turbo'],
+    'LLM_TURN_DEADLINE': 6.0,
+    'LLM_HEDGE_AFTER': 2.5,
+    # Compute slow turns in a worker, holding the caller with a filler clip
+    # and <Redirect> polling; grace and poll wait are in seconds. Turn worker
+    # threads default to GUNICORN_THREADS, one per request a worker can hold
+    'ASYNC_TURNS': False,
+    'ASYNC_TURN_GRACE': 0.5,
+    'ASYNC_POLL_WAIT': 5,
+    'ASYNC_TURN_WORKERS': 0,
+    # Reuse LLM replies for near-duplicate utterances at the same stage
+    'RESPONSE_CACHE_ENABLED': True,
+    'RESPONSE_CACHE_TTL': 3600,
+    'RESPONSE_CACHE_SIZE': 2000,
+    'RESPONSE_CACHE_SIMILARITY': 0.8,
+    # Pre-generate replies to likely answers (yes/no, employee count) while the lead talks
+    'SPECULATION_ENABLED': False,
+    # Calls older than this many days move to the compressed archive database
+    'CALL_LOG_ARCHIVE_DAYS': 90,
+    # Per-call artifacts (voicemail TwiML); spill to SQLite when running several worker processes
+    'ARTIFACT_TTL': 600,
+    'ARTIFACT_SPILL': False,
+    # Background job threads per process (see job_queue.py); a job whose worker stops
+    # renewing its lease for this many seconds is handed to another worker
+    'JOB_WORKERS': 2,
+    'JOB_LEASE_SECONDS': 300,
     # Confirmation dialog settings
     'CONFIRM_DELETIONS': 'true'
 }
 
 CONFIG_FILE = 'config.json'
 
-def get_config():
-    """Get configuration from environment variables or config file"""
-    # First, load from config file if it exists
-    config = DEFAULT_CONFIG.copy()
-    
-    print("\nLoading configuration...")
-    
-    # Try to load from .env file first
+_dotenv_loaded = False
+_file_cache = {}  # config file path -> (mtime, parsed contents)
+
+def _load_dotenv():
+    """Load .env into the environment once per process"""
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
     try:
         from dotenv import load_dotenv
         load_dotenv()
-        print("✓ Loaded .env file")
+        logger.debug("Loaded .env file")
     except ImportError:
-        print("× python-dotenv not installed, skipping .env file")
+        logger.debug("python-dotenv not installed, skipping .env file")
+
+def _load_config_file():
+    """Contents of config.json, re-read only when the file changes"""
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _file_cache.get(CONFIG_FILE)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            file_config = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading config file: {e}")
+        return {}
+    _file_cache[CONFIG_FILE] = (mtime, file_config)
+    logger.debug(f"Loaded {CONFIG_FILE}")
+    return file_config
+
+def get_config():
+    """Get configuration from environment variables or config file"""
+    # Defaults, overridden by environment variables (including .env), then config.json
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    _load_dotenv()
     
-    # Then load from environment variables (which now include any .env values)
-    env_loaded = []
     for key in config.keys():
         if key in os.environ:
             # Handle complex objects like BUSINESS_HOURS
             if key == 'BUSINESS_HOURS' and isinstance(config[key], dict):
                 try:
                     config[key].update(json.loads(os.environ[key]))
-                except:
+                except ValueError:
                     pass
             else:
                 config[key] = os.environ[key]
-            env_loaded.append(key)
     
-    if env_loaded:
-        print(f"✓ Loaded from environment: {', '.join(env_loaded)}")
-    
-    # Finally, load from config.json if it exists
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                file_config = json.load(f)
-                print("✓ Loaded from config.json")
-                config.update(file_config)
-        except Exception as e:
-            print(f"× Error loading config file: {e}")
-    else:
-        print(f"× Config file {CONFIG_FILE} not found")
-    
-    print("\nFinal configuration values:")
-    for key in sorted(config.keys()):
-        if key in ['TWILIO_AUTH_TOKEN', 'ELEVENLABS_API_KEY', 'LLM_API_KEY', 'ZOHO_CLIENT_SECRET', 'ZOHO_REFRESH_TOKEN']:
-            print(f"{key}: [HIDDEN]")
-        else:
-            print(f"{key}: {config[key]}")
-    
-    print("\nConfiguration loaded successfully.")
+    config.update(copy.deepcopy(_load_config_file()))
     return config
 
+def public_base_url(config, default=''):
+    """CALLBACK_URL without its /webhook suffix, for building audio and TwiML URLs"""
+    url = config.get('CALLBACK_URL', default) or default
+    return url[:-len('/webhook')] if url.endswith('/webhook') else url
+
 def save_config(new_config):
     """Save configuration to config file"""
     config = get_config()
@@ -0,0 +1,110 @@
+"""
+Gunicorn settings for serving the backend in production.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Webhooks spend most of their time waiting on OpenAI, ElevenLabs and SQLite, so
+each worker runs a pool of threads (gthread) rather than one request at a time.
+Every setting can be overridden with a GUNICORN_* environment variable.
+
+Reloading: `kill -HUP <master pid>` starts fresh workers and retires the old ones
+once their in-flight requests finish (graceful_timeout). With preload_app the code
+is loaded by the master, so deploy new code with a full restart, or
+`kill -USR2 <master pid>` followed by `kill -QUIT <old master pid>`.
+"""
+import os
+import sys
+import glob
+import tempfile
+import multiprocessing
+
+# Make the backend modules importable wherever gunicorn is started from
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from config import get_config
+
+
+def _truthy(value):
+    return str(value).lower() not in ('false', '0', '')
+
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5001)}")
+
+# Async turns, speculation and the response cache live in the worker process, and a
+# polled /webhook/turn must reach the worker that started the turn, so run a single
+# worker when ASYNC_TURNS is on (scale with threads instead)
+_async_turns = _truthy(get_config().get('ASYNC_TURNS', False))
+_default_workers = 1 if _async_turns else min(multiprocessing.cpu_count() * 2, 4)
+workers = int(os.environ.get('GUNICORN_WORKERS', _default_workers))
+
+if workers > 1:
+    # Voicemail TwiML stored by one worker is fetched by whichever worker Twilio reaches,
+    # so spill artifacts to SQLite unless ARTIFACT_SPILL was set explicitly
+    os.environ.setdefault('ARTIFACT_SPILL', 'true')
+    # Each worker keeps its own turn histograms; they meet in METRICS_DIR so /metrics
+    # (served by any one worker) reports all of them
+    os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='steve-metrics-'))
+
+# Threads per worker; each in-flight webhook holds one while it waits on the LLM/TTS
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Import the app (and warm its caches) once in the master so workers share the pages.
+# Thread pools, the call log writer and the MCP worker reset themselves in each
+# forked worker via os.register_at_fork, so no post_fork hook is needed
+preload_app = _truthy(os.environ.get('GUNICORN_PRELOAD', 'true'))
+
+# Twilio gives up on a webhook after 15 seconds; the worker timeout only needs to
+# catch a wedged worker, not a slow request
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Create or migrate the schema once, before any worker takes traffic"""
+    from models import init_db, DB_PATH
+    init_db()
+    server.log.info(f"Database ready at {DB_PATH}")
+    if _async_turns and workers > 1:
+        server.log.warning("ASYNC_TURNS is on with several workers; polls that reach another worker "
+                           "will ask the lead to repeat. Use GUNICORN_WORKERS=1 and more threads.")
+    if workers > 1 and not _truthy(get_config().get('ARTIFACT_SPILL', False)):
+        server.log.warning("Several workers with ARTIFACT_SPILL turned off; voicemail TwiML is only visible to the worker that stored it")
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        # Drop snapshots left by the workers of a previous run
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Warm the shared caches in the master, after startup and before the first fork"""
+    if preload_app:
+        from wsgi import warm_caches
+        warm_caches()
+
+
+def post_worker_init(worker):
+    """Start this worker's background job threads (they share the jobs table with every other worker)
+    and the thread that shares its turn metrics with the other workers"""
+    from job_queue import start_job_workers
+    from turn_metrics import start_metrics_flusher
+    start_job_workers()
+    start_metrics_flusher()
+
+
+def worker_exit(server, worker):
+    """Stop taking jobs and commit queued call log rows before the worker goes away"""
+    from job_queue import stop_job_workers
+    from call_log_writer import call_log_writer
+    stop_job_workers()
+    call_log_writer.close()
@@ -0,0 +1,192 @@
+import threading
+import logging
+from collections import OrderedDict
+from phrase_matcher import CONVERSATION_MATCHER
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget (in estimated tokens) for conversation history at each stage.
+# Later stages get more room since the lead's earlier answers matter more there.
+STAGE_TOKEN_BUDGETS = {
+    "introduction": 400,
+    "qualification": 600,
+    "value_proposition": 800,
+    "appointment_setting": 1000,
+    "objection_handling": 1200,
+    "closing": 600
+}
+DEFAULT_TOKEN_BUDGET = 800
+
+# Share of the budget the digest of earlier calls may use
+DIGEST_BUDGET_SHARE = 0.25
+
+# Lead lines quoted per earlier call, and how long each quote may be
+DIGEST_QUOTES_PER_CALL = 3
+DIGEST_QUOTE_CHARS = 120
+
+# Per-lead digests kept in memory
+MAX_CACHED_DIGESTS = 1024
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English)"""
+    return len(text or "") // 4 + 1
+
+
+def parse_transcript(rows):
+    """Turn Bot:/Lead: call log rows into chat messages"""
+    history = []
+    for row in rows:
+        transcript = row['transcript'] or ''
+        if transcript.startswith('Bot: '):
+            history.append({"role": "assistant", "content": transcript[5:]})
+        elif transcript.startswith('Lead: '):
+            history.append({"role": "user", "content": transcript[6:]})
+    return history
+
+
+def split_calls(rows):
+    """Group call log rows into calls; each call starts at a 'Started' row"""
+    calls = []
+    for row in rows:
+        if row['call_status'] == 'Started' or not calls:
+            calls.append([])
+        calls[-1].append(row)
+    return calls
+
+
+def summarize_call(rows):
+    """One-paragraph extractive summary of an earlier call"""
+    history = parse_transcript(rows)
+    lead_lines = [msg["content"].strip() for msg in history if msg["role"] == "user"]
+    if not lead_lines:
+        return None
+
+    # Prefer what the lead said about objections, callbacks, interest or numbers
+    def weight(line):
+        tags = CONVERSATION_MATCHER.scan(line)
+        return (bool(tags.keys() & {"objection", "callback", "positive"})
+                or any(char.isdigit() for char in line))
+    quotes = [line for line in lead_lines if weight(line)] or lead_lines
+    quotes = [line[:DIGEST_QUOTE_CHARS] for line in quotes[-DIGEST_QUOTES_PER_CALL:] if line.lower() != 'none']
+
+    outcome = None
+    for row in reversed(rows):
+        transcript = row['transcript'] or ''
+        if transcript.startswith('Call ended with status:'):
+            outcome = transcript.split(':', 1)[1].strip()
+            break
+
+    date = str(rows[0]['created_at'] or '')[:10]
+    summary = f"Call on {date or 'an earlier date'} ({len(history)} messages)"
+    if quotes:
+        summary += ". Lead said: " + "; ".join(f'"{quote}"' for quote in quotes)
+    if outcome:
+        summary += f". Ended: {outcome}"
+    return summary + "."
+
+
+def build_digest(earlier_calls):
+    """Digest of earlier calls, most recent first"""
+    summaries = [summarize_call(rows) for rows in reversed(earlier_calls)]
+    return "\n".join(summary for summary in summaries if summary)
+
+
+_digest_cache = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def _cached_digest(lead_id, start_id, load_earlier_rows):
+    """Digest for a lead's calls before start_id, computed once per new call"""
+    key = (str(lead_id), start_id)
+    with _digest_lock:
+        if key in _digest_cache:
+            _digest_cache.move_to_end(key)
+            return _digest_cache[key]
+
+    digest = build_digest(split_calls(load_earlier_rows()))
+
+    with _digest_lock:
+        _digest_cache[key] = digest
+        _digest_cache.move_to_end(key)
+        while len(_digest_cache) > MAX_CACHED_DIGESTS:
+            _digest_cache.popitem(last=False)
+    return digest
+
+
+def load_conversation(conn, lead_id):
+    """Return (current call history, digest of earlier calls) for a lead.
+
+    The current call is everything since the lead's latest 'Started' row and
+    is returned verbatim. Earlier calls are summarized once and cached until
+    the next call starts, so later turns only read the current call's rows.
+    """
+    start = conn.execute(
+        "SELECT max(id) FROM call_logs WHERE lead_id = ? AND call_status = 'Started'", (lead_id,)
+    ).fetchone()[0]
+    if start is None:
+        # No call start recorded; treat everything as one call
+        rows = conn.execute(
+            'SELECT id, call_status, transcript, created_at FROM call_logs WHERE lead_id = ? ORDER BY id',
+            (lead_id,)
+        ).fetchall()
+        return parse_transcript(rows), ""
+
+    rows = conn.execute(
+        'SELECT id, call_status, transcript, created_at FROM call_logs WHERE lead_id = ? AND id >= ? ORDER BY id',
+        (lead_id, start)
+    ).fetchall()
+
+    def load_earlier_rows():
+        return conn.execute(
+            'SELECT id, call_status, transcript, created_at FROM call_logs WHERE lead_id = ? AND id < ? ORDER BY id',
+            (lead_id, start)
+        ).fetchall()
+
+    return parse_transcript(rows), _cached_digest(lead_id, start, load_earlier_rows)
+
+
+def _truncate(text, max_tokens):
+    """Cut text to roughly max_tokens, on a line boundary where possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * 4
+    cut = text[:max_chars]
+    if "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    return cut.rstrip() + " ..."
+
+
+def window_history(conversation_history, stage, history_digest=None):
+    """Fit the history into the stage's token budget.
+
+    Returns the chat messages to send between the system prompt and the
+    lead's latest reply: the digest of earlier calls (trimmed to its share of
+    the budget) followed by as many of the current call's most recent
+    messages as fit in the rest.
+    """
+    budget = STAGE_TOKEN_BUDGETS.get(stage, DEFAULT_TOKEN_BUDGET)
+    messages = []
+
+    if history_digest:
+        digest = _truncate(history_digest, int(budget * DIGEST_BUDGET_SHARE))
+        messages.append({"role": "system", "content": f"Summary of earlier calls with this lead:\n{digest}"})
+        budget -= estimate_tokens(messages[0]["content"])
+
+    kept = []
+    for message in reversed(conversation_history or []):
+        cost = estimate_tokens(message["content"])
+        if cost > budget:
+            if not kept:
+                # Always keep the latest message, even if it has to be cut
+                kept.append({"role": message["role"], "content": _truncate(message["content"], max(budget, 1))})
+            break
+        kept.append(message)
+        budget -= cost
+    kept.reverse()
+
+    omitted = len(conversation_history or []) - len(kept)
+    if omitted:
+        logger.info(f"History window dropped {omitted} older messages for stage {stage}")
+        messages.append({"role": "system", "content": f"({omitted} earlier messages from this call omitted.)"})
+    return messages + kept
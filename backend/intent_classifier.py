@@ -0,0 +1,283 @@
+import os
+import math
+import re
+import threading
+import time
+import logging
+from collections import Counter, defaultdict
+from phrase_matcher import CONVERSATION_MATCHER
+
+logger = logging.getLogger(__name__)
+
+# Catch-all label for anything that needs the LLM
+OTHER = "other"
+
+# Hand-written examples the model always starts from
+SEED_EXAMPLES = {
+    "yes": [
+        "yes", "yeah", "yep", "yes we do", "yeah we do", "sure", "sure thing", "of course",
+        "absolutely", "definitely", "that's right", "correct", "yes that's correct", "uh huh",
+        "yes I am", "yeah go ahead", "okay sure", "yes please", "sounds good", "that works"
+    ],
+    "no": [
+        "no", "nope", "no we don't", "no we do not", "not really", "no thanks", "no thank you",
+        "we don't", "nah", "no not at all", "no we don't use them", "not at this time"
+    ],
+    "not_interested": [
+        "not interested", "i'm not interested", "we're not interested", "no I'm not interested",
+        "not interested thank you", "we are not interested", "please take me off your list",
+        "don't call me again", "stop calling", "remove me from your list", "we're all set",
+        "no thanks we're good", "we're happy with what we have"
+    ],
+    "callback": [
+        "call me back", "call me back tomorrow", "can you call back later", "call back next week",
+        "I'm busy right now", "not a good time", "now is not a good time", "try me again tomorrow",
+        "call me later", "can you call me another time", "call back monday", "I'm in a meeting",
+        "try again later", "call me back in the afternoon", "call me tomorrow morning"
+    ],
+    "wrong_number": [
+        "wrong number", "you have the wrong number", "you've got the wrong number",
+        "there's nobody here by that name", "this isn't a business", "this is a personal phone",
+        "I think you have the wrong number", "no one here by that name", "this is my cell phone"
+    ],
+    OTHER: [
+        "we have about twenty employees", "maybe fifteen people", "around fifty employees",
+        "what is this about", "who is this", "how much does it cost", "what company are you with",
+        "how did you get my number", "can you send me an email", "yes but we're under contract",
+        "yeah but we already have a provider", "we use verizon", "we have company phones",
+        "what kind of savings", "tell me more", "how long would the meeting take",
+        "I'm not the right person", "you'd have to talk to the owner", "what time works",
+        "tuesday at two would be fine", "what do you mean", "can you repeat that",
+        "we might be interested but", "it depends on the price", "who did you say you were"
+    ]
+}
+
+# Intents whose stored-transcript examples can be labelled reliably by rule
+WEAK_LABEL_RULES = [
+    ("wrong_number", re.compile(r"\bwrong number\b|\bnobody (here )?by that name\b")),
+    ("not_interested", re.compile(r"\bnot interested\b|\bstop calling\b|\boff your list\b")),
+    ("yes", re.compile(r"^(yes|yeah|yep|sure|absolutely|definitely|of course|correct)[.!]?$")),
+    ("no", re.compile(r"^(no|nope|nah|not really)[.!]?$")),
+]
+
+# Replies for each (intent, stage). A missing entry means the stage needs the
+# LLM even for that intent. Replies that end the call keep the phrasing
+# check_conversation_result looks for ("thank you for your time" + "goodbye",
+# "doesn't seem like").
+RESPONSE_TEMPLATES = {
+    "yes": {
+        # The opener already asked about mobile devices, so a yes moves on to how many
+        "introduction": "Great! And roughly how many of your employees use a mobile phone or tablet for work?",
+        "qualification": "Great! And how many employees do you have?",
+        "value_proposition": "Well, I've helped similar {companies} save up to 20% on their mobile costs through telecom expense management. Would you be interested in a quick 15-minute meeting to see how we could help your business?",
+        "appointment_setting": "Perfect! Would tomorrow at 10 AM work for you?"
+    },
+    "no": {
+        "qualification": "I see. It doesn't seem like we'd be a good fit right now then. Thank you for your time, and goodbye.",
+        "appointment_setting": "I understand. Many of our clients felt the same way initially, but they were surprised by the savings we found. Would you be open to a quick 15-minute meeting to explore the possibilities?",
+        "objection_handling": "No problem, I appreciate you hearing me out. Thank you for your time, and goodbye."
+    },
+    "not_interested": {
+        "introduction": "I understand. We've helped a lot of {companies} cut their mobile costs by up to 20%, so even a quick 15-minute meeting could be worth it. Would you be open to that?",
+        "qualification": "I understand. We've helped a lot of {companies} cut their mobile costs by up to 20%, so even a quick 15-minute meeting could be worth it. Would you be open to that?",
+        "value_proposition": "I understand. Many of our clients felt the same way initially, but they were surprised by the savings we found. Would you be open to a quick 15-minute meeting to explore the possibilities?",
+        "appointment_setting": "I understand. Many of our clients felt the same way initially, but they were surprised by the savings we found. Would you be open to a quick 15-minute meeting to explore the possibilities?",
+        "objection_handling": "I completely understand. Thank you for your time, and goodbye."
+    },
+    "callback": {
+        stage: "No problem at all, I'll give you a call back {when}. Thank you for your time, and goodbye."
+        for stage in ["introduction", "qualification", "value_proposition", "appointment_setting", "objection_handling"]
+    },
+    "wrong_number": {
+        stage: "Oh, I'm sorry about that, I must have the wrong number. Thank you for your time, and goodbye."
+        for stage in ["introduction", "qualification", "value_proposition", "appointment_setting", "objection_handling"]
+    }
+}
+
+# Longer utterances carry nuance the templates can't answer
+MAX_FAST_PATH_WORDS = 12
+
+# Stored transcripts read when (re)training, newest first
+MAX_TRAINING_TRANSCRIPTS = 5000
+
+# Retrain on fresh transcripts after this many seconds
+RETRAIN_INTERVAL = 3600
+
+
+def tokenize(text):
+    """Lower-case word unigrams plus bigrams (with start/end markers)"""
+    words = re.findall(r"[a-z0-9']+", (text or "").lower())
+    if not words:
+        return []
+    padded = ["<s>"] + words + ["</s>"]
+    return words + [f"{a} {b}" for a, b in zip(padded, padded[1:])]
+
+
+class IntentClassifier:
+    """Multinomial naive Bayes over unigrams and bigrams, with Laplace smoothing"""
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.token_counts = defaultdict(Counter)
+        self.token_totals = Counter()
+        self.vocabulary = set()
+
+    def fit(self, examples):
+        """Train on (text, intent) pairs"""
+        for text, intent in examples:
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            self.class_counts[intent] += 1
+            self.token_counts[intent].update(tokens)
+            self.token_totals[intent] += len(tokens)
+            self.vocabulary.update(tokens)
+        return self
+
+    def predict(self, text):
+        """Return (intent, confidence) where confidence is the posterior of the top intent"""
+        tokens = [token for token in tokenize(text) if token in self.vocabulary]
+        if not tokens or not self.class_counts:
+            return OTHER, 0.0
+
+        total_examples = sum(self.class_counts.values())
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for intent, count in self.class_counts.items():
+            denominator = self.token_totals[intent] + self.alpha * vocabulary_size
+            score = math.log(count / total_examples)
+            for token in tokens:
+                score += math.log((self.token_counts[intent][token] + self.alpha) / denominator)
+            scores[intent] = score
+
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+def weak_label(text):
+    """Label a stored lead utterance by high-precision rules, defaulting to OTHER"""
+    text = text.strip().lower()
+    for intent, pattern in WEAK_LABEL_RULES:
+        if pattern.search(text):
+            return intent
+    if "callback" in CONVERSATION_MATCHER.scan(text) and len(text.split()) <= MAX_FAST_PATH_WORDS:
+        return "callback"
+    return OTHER
+
+
+def load_transcript_examples(conn, limit=MAX_TRAINING_TRANSCRIPTS):
+    """Weakly labelled (text, intent) pairs from the lead side of stored calls"""
+    rows = conn.execute('''
+        SELECT transcript FROM call_logs
+        WHERE transcript LIKE 'Lead: %'
+        ORDER BY id DESC LIMIT ?
+    ''', (limit,)).fetchall()
+    examples = []
+    for (transcript,) in rows:
+        text = transcript[6:].strip()
+        if text and text.lower() != 'none':
+            examples.append((text, weak_label(text)))
+    return examples
+
+
+def train_intent_classifier(conn=None):
+    """Train a classifier on the seed examples plus stored lead transcripts"""
+    examples = [(text, intent) for intent, texts in SEED_EXAMPLES.items() for text in texts]
+    try:
+        if conn is None:
+            from models import get_db
+            with get_db() as db:
+                examples.extend(load_transcript_examples(db))
+        else:
+            examples.extend(load_transcript_examples(conn))
+    except Exception as e:
+        logger.warning(f"Training intent classifier on seed examples only: {str(e)}")
+    logger.info(f"Trained intent classifier on {len(examples)} examples")
+    return IntentClassifier().fit(examples)
+
+
+_classifier = None
+_trained_at = 0
+_retraining = False
+_classifier_lock = threading.Lock()
+
+
+def _retrain():
+    """Train a fresh classifier off the request path and swap it in"""
+    global _classifier, _trained_at, _retraining
+    try:
+        classifier = train_intent_classifier()
+        with _classifier_lock:
+            _classifier = classifier
+            _trained_at = time.time()
+    except Exception as e:
+        logger.error(f"Error retraining intent classifier: {str(e)}")
+    finally:
+        with _classifier_lock:
+            _retraining = False
+
+
+def get_intent_classifier():
+    """Return the shared classifier.
+
+    Only the first call trains inline. Once the model is older than
+    RETRAIN_INTERVAL a background thread retrains it, and turns keep using
+    the old model until the new one is swapped in.
+    """
+    global _classifier, _trained_at, _retraining
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = train_intent_classifier()
+            _trained_at = time.time()
+        elif time.time() - _trained_at > RETRAIN_INTERVAL and not _retraining:
+            _retraining = True
+            threading.Thread(target=_retrain, name='intent-retrain', daemon=True).start()
+        return _classifier
+
+
+def _reset_after_fork():
+    """A retrain running in the parent doesn't exist in a forked worker"""
+    global _retraining, _classifier_lock
+    _retraining = False
+    _classifier_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def callback_when(text):
+    """Spoken description of when the lead asked to be called back"""
+    hits = CONVERSATION_MATCHER.scan(text)
+    if "weekday" in hits:
+        day = hits["weekday"][0]
+        return f"on {day.capitalize()}"
+    if "tomorrow" in hits:
+        return "tomorrow"
+    if "next_week" in hits:
+        return "next week"
+    return "at a better time"
+
+
+def fast_path_response(speech_result, stage, industry=None, config=None):
+    """Answer a trivial turn from a template, or return None to fall through to the LLM"""
+    if config is None:
+        from config import get_config
+        config = get_config()
+    if str(config.get('FAST_PATH_ENABLED', True)).lower() in ('false', '0', ''):
+        return None
+    if not speech_result or len(speech_result.split()) > MAX_FAST_PATH_WORDS:
+        return None
+
+    intent, confidence = get_intent_classifier().predict(speech_result)
+    threshold = float(config.get('FAST_PATH_CONFIDENCE', 0.85))
+    template = RESPONSE_TEMPLATES.get(intent, {}).get(stage)
+    if intent == OTHER or confidence < threshold or not template:
+        logger.info(f"Intent fast path skipped: {intent} ({confidence:.2f}) at stage {stage}")
+        return None
+
+    logger.info(f"Intent fast path: {intent} ({confidence:.2f}) at stage {stage}")
+    companies = f"{industry} companies" if industry else "companies"
+    return template.format(companies=companies, when=callback_when(speech_result))
@@ -0,0 +1,423 @@
+import os
+import json
+import time
+import random
+import socket
+import threading
+import logging
+import models
+
+logger = logging.getLogger(__name__)
+
+# queued -> running -> succeeded | failed; a failed attempt with attempts left goes back to queued
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+DEFAULT_PRIORITY = 0
+DEFAULT_MAX_ATTEMPTS = 3
+
+# A running job's lease is renewed while its handler runs; once it lapses (the
+# worker process died) the job is queued again, or failed if out of attempts
+DEFAULT_LEASE_SECONDS = 300
+
+# Retry delay after a failed attempt doubles from the base, up to the cap (seconds)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+# Idle workers look for new jobs this often (seconds)
+POLL_INTERVAL = 1.0
+
+# Progress is written at most this often per job (seconds), apart from the final update
+PROGRESS_INTERVAL = 0.5
+
+DEFAULT_LIST_LIMIT = 50
+
+_handlers = {}  # kind -> (function, priority, max_attempts)
+
+
+class JobFailed(Exception):
+    """Raised by a handler for a failure a retry won't fix; result is kept on the job"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def job_handler(kind, priority=DEFAULT_PRIORITY, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register a function(job) as the handler for a kind of job, with its default priority and attempts"""
+    def register(function):
+        _handlers[kind] = (function, priority, max_attempts)
+        return function
+    return register
+
+
+def _load_handlers():
+    """The handler registry, after importing jobs.py (whose decorators fill it)"""
+    # Imported for its @job_handler registrations only
+    import jobs  # noqa: F401
+    return _handlers
+
+
+def get_handler(kind):
+    """(function, priority, max_attempts) for a job kind, or None"""
+    return _load_handlers().get(kind)
+
+
+def ensure_job_tables(conn):
+    """Create the jobs table"""
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            priority INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires REAL,
+            progress INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+        -- Claims take the highest priority, oldest ready job; lease checks scan running jobs
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, priority DESC, id);
+    ''')
+    conn.commit()
+
+
+def enqueue_job(conn, kind, payload=None, priority=None, max_attempts=None, delay=0):
+    """Queue a job and return its id (ValueError for a kind with no handler)"""
+    handler = get_handler(kind)
+    if not handler:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = conn.execute('''
+        INSERT INTO jobs (kind, payload, priority, max_attempts, run_after)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (kind, json.dumps(payload or {}),
+          handler[1] if priority is None else priority,
+          handler[2] if max_attempts is None else max_attempts,
+          time.time() + delay)).lastrowid
+    conn.commit()
+    logger.info(f"Queued {kind} job {job_id}")
+    return job_id
+
+
+def job_to_dict(row):
+    """API view of a jobs row (the payload is left out; a CSV import's can be large)"""
+    job = {key: row[key] for key in row.keys() if key not in ('payload', 'result', 'lease_owner', 'lease_expires')}
+    job['result'] = json.loads(row['result']) if row['result'] else None
+    job['run_after'] = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(row['run_after']))
+    return job
+
+
+def get_job(conn, job_id):
+    """One job as a dict, or None"""
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return job_to_dict(row) if row else None
+
+
+def list_jobs(conn, status=None, kind=None, limit=DEFAULT_LIST_LIMIT):
+    """Most recent jobs first, optionally filtered by status and kind"""
+    filters, params = [], []
+    if status:
+        filters.append('status = ?')
+        params.append(status)
+    if kind:
+        filters.append('kind = ?')
+        params.append(kind)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ''
+    rows = conn.execute(f'SELECT * FROM jobs {where} ORDER BY id DESC LIMIT ?', params + [limit]).fetchall()
+    return [job_to_dict(row) for row in rows]
+
+
+def cancel_job(conn, job_id):
+    """Cancel a job that hasn't started; returns False if it is already running or finished"""
+    cursor = conn.execute('''
+        UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND status = 'queued'
+    ''', (job_id,))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def purge_jobs(conn, older_than_days):
+    """Delete finished jobs older than this many days; returns how many"""
+    cursor = conn.execute(f'''
+        DELETE FROM jobs
+        WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))})
+          AND finished_at < datetime('now', ?)
+    ''', FINISHED_STATUSES + (f'-{int(older_than_days)} days',))
+    conn.commit()
+    return cursor.rowcount
+
+
+def retry_delay(attempt):
+    """Seconds to wait before retrying after the given failed attempt (with jitter)"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempt - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def requeue_expired(conn, now=None):
+    """Queue again (or fail, if out of attempts) running jobs whose worker stopped renewing the lease"""
+    now = time.time() if now is None else now
+    cursor = conn.execute('''
+        UPDATE jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            finished_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP END,
+            error = 'Worker stopped before the job finished',
+            lease_owner = NULL,
+            lease_expires = NULL,
+            run_after = ?
+        WHERE status = 'running' AND lease_expires < ?
+    ''', (now, now))
+    if cursor.rowcount:
+        logger.warning(f"Recovered {cursor.rowcount} jobs with expired leases")
+    return cursor.rowcount
+
+
+def claim_job(conn, owner, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Take the highest-priority ready job and lease it to owner; returns the row or None.
+
+    The claim is a compare-and-set on status, so any number of worker threads
+    and processes can share the queue; a worker that loses the race tries the next job.
+    """
+    now = time.time()
+    requeue_expired(conn, now)
+    conn.commit()
+    kinds = list(_load_handlers())
+    while True:
+        row = conn.execute(f'''
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_after <= ? AND kind IN ({', '.join('?' * len(kinds))})
+            ORDER BY priority DESC, id
+            LIMIT 1
+        ''', [now] + kinds).fetchone()
+        if not row:
+            return None
+        cursor = conn.execute('''
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, lease_owner = ?, lease_expires = ?,
+                started_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'queued'
+        ''', (owner, now + lease_seconds, row['id']))
+        conn.commit()
+        if cursor.rowcount:
+            return conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+
+
+def finish_job(conn, job_id, owner, status, result=None, error=None, run_after=None):
+    """Record a job's outcome, if owner still holds its lease; returns whether it did"""
+    cursor = conn.execute('''
+        UPDATE jobs
+        SET status = ?, result = COALESCE(?, result), error = ?, run_after = COALESCE(?, run_after),
+            lease_owner = NULL, lease_expires = NULL,
+            finished_at = CASE WHEN ? = 'queued' THEN NULL ELSE CURRENT_TIMESTAMP END
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+    ''', (status, json.dumps(result) if result is not None else None, error, run_after, status, job_id, owner))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+class JobContext:
+    """What a handler gets: the job's payload and attempt number, and progress reporting"""
+
+    def __init__(self, row, owner, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.id = row['id']
+        self.kind = row['kind']
+        self.payload = json.loads(row['payload'] or '{}')
+        self.attempt = row['attempts']
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._last_report = 0
+
+    def progress(self, done, total=None, message=None):
+        """Record progress (e.g. 40 of 120 leads dialed); also renews the lease"""
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL and (total is None or done < total):
+            return
+        self._last_report = now
+        try:
+            with models.get_db() as conn:
+                conn.execute('''
+                    UPDATE jobs SET progress = ?, total = COALESCE(?, total), message = COALESCE(?, message),
+                                    lease_expires = ?
+                    WHERE id = ? AND lease_owner = ?
+                ''', (done, total, message, time.time() + self.lease_seconds, self.id, self.owner))
+                conn.commit()
+        except Exception as e:
+            # Progress is best effort; the heartbeat keeps the lease alive regardless
+            logger.warning(f"Could not record progress for job {self.id}: {str(e)}")
+
+
+def run_job(row, owner, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Run a claimed job's handler and record the outcome, retrying with backoff on errors"""
+    job = JobContext(row, owner, lease_seconds)
+    handler = get_handler(job.kind)
+    started = time.time()
+    status, result, error, run_after = 'succeeded', None, None, None
+    try:
+        result = handler[0](job)
+    except JobFailed as e:
+        status, result, error = 'failed', e.result, str(e)
+    except Exception as e:
+        logger.error(f"{job.kind} job {job.id} attempt {job.attempt} failed: {str(e)}")
+        error = str(e)
+        if job.attempt < row['max_attempts']:
+            status, run_after = 'queued', time.time() + retry_delay(job.attempt)
+        else:
+            status = 'failed'
+
+    with models.get_db() as conn:
+        if not finish_job(conn, job.id, owner, status, result, error, run_after):
+            logger.warning(f"{job.kind} job {job.id} lost its lease before finishing; outcome not recorded")
+    logger.info(f"{job.kind} job {job.id} {status} in {time.time() - started:.1f}s")
+    return status
+
+
+class JobWorker:
+    """Threads that claim and run queued jobs, plus a heartbeat that renews their leases.
+
+    Workers run inside each app process (JOB_WORKERS threads) and/or as a
+    dedicated process (python job_queue.py); they all share the jobs table.
+    """
+
+    def __init__(self, threads=1, lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=POLL_INTERVAL):
+        self.threads = threads
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def run_once(self):
+        """Claim and run one job; returns its id, or None if nothing was ready"""
+        with models.get_db() as conn:
+            row = claim_job(conn, self.owner, self.lease_seconds)
+        if row is None:
+            return None
+        with self._lock:
+            self._active.add(row['id'])
+        try:
+            run_job(row, self.owner, self.lease_seconds)
+        finally:
+            with self._lock:
+                self._active.discard(row['id'])
+        return row['id']
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+                         for i in range(self.threads)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Started {self.threads} job worker threads ({self.owner})")
+
+    def stop(self, timeout=5):
+        """Stop claiming jobs and wait briefly for running ones; unfinished jobs are recovered by their lease"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once() is None:
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            try:
+                with models.get_db() as conn:
+                    conn.execute(f'''
+                        UPDATE jobs SET lease_expires = ?
+                        WHERE lease_owner = ? AND id IN ({', '.join('?' * len(active))})
+                    ''', [time.time() + self.lease_seconds, self.owner] + active)
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Error renewing job leases: {str(e)}")
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_job_workers(threads=None):
+    """Start this process's job worker threads (JOB_WORKERS in config; 0 leaves jobs to a dedicated worker)"""
+    global _worker
+    from config import get_config
+    config = get_config()
+    threads = int(config.get('JOB_WORKERS', 2)) if threads is None else threads
+    with _worker_lock:
+        if _worker is not None or threads <= 0:
+            return _worker
+        _worker = JobWorker(threads, lease_seconds=int(config.get('JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)))
+        _worker.start()
+        return _worker
+
+
+def stop_job_workers():
+    """Stop this process's job worker threads, letting running jobs finish first"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker:
+        worker.stop()
+
+
+def _forget_worker():
+    """A forked child has none of the parent's worker threads"""
+    global _worker, _worker_lock
+    _worker = None
+    _worker_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_worker)
+
+
+if __name__ == '__main__':
+    # Dedicated worker process, e.g. under systemd or supervisord (set JOB_WORKERS=0 for the app):
+    #   cd /path/to/backend && python job_queue.py
+    # or drain the queue from cron and exit, and purge old finished jobs:
+    #   * * * * * cd /path/to/backend && python job_queue.py --once
+    #   0 4 * * * cd /path/to/backend && python job_queue.py --purge 30
+    import sys
+    # The handlers register with the importable module, not this __main__ copy
+    import job_queue
+
+    logging.basicConfig(level=logging.INFO)
+    models.init_db()
+    if '--purge' in sys.argv:
+        with models.get_db() as conn:
+            days = int(sys.argv[sys.argv.index('--purge') + 1])
+            print(f"{job_queue.purge_jobs(conn, days)} finished jobs purged")
+    elif '--once' in sys.argv:
+        worker = job_queue.JobWorker()
+        while worker.run_once() is not None:
+            pass
+    else:
+        worker = job_queue.JobWorker(threads=int(os.environ.get('JOB_WORKERS', 2)))
+        worker.start()
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            worker.stop()
@@ -0,0 +1,432 @@
+"""Background job handlers for the long-running API operations (see job_queue.py).
+
+Dialing jobs run once: a retry could call a lead twice. They also claim each
+lead or follow-up before dialing it, so two dialing jobs running side by side
+never call the same one. The rest are safe to retry (inserts dedupe, learning
+and syncs only pick up what is left to do).
+"""
+import os
+import csv
+import io
+import logging
+from datetime import datetime
+from models import get_db
+from config import get_config
+from job_queue import job_handler, JobFailed
+from lead_identity import insert_lead, merge_duplicate_leads, normalize_phone
+from lead_cache import get_lead, invalidate_lead
+from call_calendar import get_call_calendar
+
+logger = logging.getLogger(__name__)
+
+# Dialing is time-sensitive (calling windows close), user-started imports come
+# next, and maintenance and analytics run when nothing else is waiting
+DIALING_PRIORITY = 10
+INTERACTIVE_PRIORITY = 5
+MAINTENANCE_PRIORITY = -5
+
+# CSV rows inserted per transaction during an import
+IMPORT_BATCH_SIZE = 500
+
+# Due follow-ups read per query while looking for ones inside their calling window
+DUE_PAGE_SIZE = 100
+
+
+def calls_simulated(config):
+    """Test mode, or Twilio/ElevenLabs not configured: mark leads as called without dialing"""
+    return (config.get('TEST_MODE', False) or not config['TWILIO_ACCOUNT_SID'] or not config['TWILIO_AUTH_TOKEN']
+            or not config['ELEVENLABS_API_KEY'] or not config['ELEVENLABS_VOICE_ID'] or not config['TWILIO_PHONE_NUMBER'])
+
+
+@job_handler('scrape', priority=INTERACTIVE_PRIORITY)
+def scrape_leads(job):
+    """Scrape business leads and insert the new ones (POST /api/scrape)"""
+    config = get_config()
+    location = job.payload.get('location', 'Denver, CO')
+    industry = job.payload.get('industry', 'Plumbing')
+    limit = job.payload.get('limit', 30)
+
+    # Call the scraper for business leads
+    from scraper import scrape_business_leads
+    job.progress(0, message=f"Searching for {industry} businesses in {location}")
+    scraped = scrape_business_leads(location=location, industry=industry, limit=limit)
+
+    with get_db() as conn:
+        new_ids = []
+        duplicate_count = 0
+        for lead in scraped:
+            lead_id, created = insert_lead(conn, {
+                'name': lead['name'],
+                'phone': lead['phone'],
+                'category': lead['category'],
+                'address': lead['address'],
+                'website': lead.get('website', ''),
+                'status': 'Not Called',
+                'employee_count': lead.get('employee_count', 0),
+                'industry': lead.get('industry', ''),
+                'city': lead.get('city', ''),
+                'state': lead.get('state', ''),
+                'uses_mobile_devices': 'Unknown'
+            })
+            if created:
+                new_ids.append(lead_id)
+            else:
+                duplicate_count += 1
+        conn.commit()
+    job.progress(len(scraped), len(scraped), f"{len(new_ids)} new leads saved")
+
+    # Optionally sync with Zoho CRM if credentials are present
+    if config.get('ZOHO_REFRESH_TOKEN') and config.get('ZOHO_CLIENT_ID') and config.get('ZOHO_CLIENT_SECRET'):
+        from zoho import sync_leads_to_zoho
+        sync_leads_to_zoho(new_ids)
+
+    is_dummy = not config['BRIGHTDATA_API_TOKEN']
+    return {'inserted_ids': new_ids, 'count': len(new_ids), 'duplicates': duplicate_count, 'dummy': is_dummy}
+
+
+@job_handler('auto_dial', priority=DIALING_PRIORITY, max_attempts=1)
+def auto_dial_leads(job):
+    """Dial a batch of leads - strictly enforces business hours in each lead's time zone (POST /api/auto_dial)"""
+    from voice import place_call
+
+    results = []
+    leads = []
+    with get_db() as conn:
+        for lead_id in dict.fromkeys(job.payload['lead_ids']):
+            lead = get_lead(conn, lead_id)
+            if lead:
+                leads.append(lead)
+            else:
+                results.append({'lead_id': lead_id, 'status': 'error', 'message': 'Lead not found'})
+
+    # Strictly check business hours - no exceptions. Leads whose window closes
+    # soonest are dialed first; the rest are reported with their next window
+    ready, waiting = get_call_calendar().order_for_dialing(leads)
+    for lead, next_window in waiting:
+        results.append({
+            'lead_id': lead['id'],
+            'status': 'skipped',
+            'message': 'Outside calling hours for this lead',
+            'next_window': next_window.isoformat() if next_window else None
+        })
+
+    if not ready:
+        logger.warning(f"Auto-dialer attempt with no leads inside their calling hours ({len(waiting)} waiting)")
+        raise JobFailed('Outside of calling hours', {
+            'message': 'None of these leads can be called right now. Calls are made during business hours in each lead\'s local time.',
+            'results': results
+        })
+
+    dialed_phones = set()
+
+    # Process each lead
+    for index, lead in enumerate(ready, 1):
+        lead_id = lead['id']
+        try:
+            with get_db() as conn:
+                # Never dial the same number twice in one batch, however it was formatted
+                phone_e164 = lead.get('phone_e164') or normalize_phone(lead['phone']) or lead['phone']
+                if phone_e164 in dialed_phones:
+                    results.append({'lead_id': lead_id, 'status': 'skipped', 'message': 'Duplicate phone number in batch'})
+                    continue
+                dialed_phones.add(phone_e164)
+
+                # Claim the lead first, so another dialing job can't call it at the same time
+                claimed = conn.execute("UPDATE leads SET status = 'Calling' WHERE id = ? AND status IS NOT 'Calling'",
+                                       (lead_id,)).rowcount
+                conn.commit()
+                invalidate_lead(lead_id)
+                if not claimed:
+                    results.append({'lead_id': lead_id, 'status': 'skipped', 'message': 'Lead is already being called'})
+                    continue
+
+                # Generate script based on lead data
+                contact_name = lead['name'].split()[0] if lead['name'] else "there"
+                industry = lead.get('industry', lead.get('category', 'business'))
+                city = lead.get('city', 'your area')
+
+                script = f"Hello, is this {contact_name}? This is Steve with Seamless Mobile Services. I'll be brief. I understand your company provides {industry} services in {city}. Quick question: do your field crews use mobile phones or tablets for work?"
+
+                # Make the call
+                try:
+                    if calls_simulated(get_config()):
+                        # Dummy mode
+                        results.append({'lead_id': lead_id, 'status': 'success', 'call_sid': 'dummy-call', 'dummy': True})
+                    else:
+                        # Real mode
+                        call_sid = place_call(lead['phone'], script, lead_id=lead_id)
+                        results.append({'lead_id': lead_id, 'status': 'success', 'call_sid': call_sid})
+                except Exception:
+                    # The call never started: give the lead its status back
+                    conn.execute("UPDATE leads SET status = ? WHERE id = ? AND status = 'Calling'", (lead['status'], lead_id))
+                    conn.commit()
+                    invalidate_lead(lead_id)
+                    raise
+
+        except Exception as e:
+            results.append({'lead_id': lead_id, 'status': 'error', 'message': str(e)})
+        finally:
+            job.progress(index, len(ready), f"Dialed {index} of {len(ready)} leads")
+
+    return {'results': results}
+
+
+def generate_follow_up_script(follow_up):
+    """Generate a personalized script for follow-up calls"""
+    lead_name = follow_up.get('lead_name', '')
+    contact_name = lead_name.split()[0] if lead_name else "there"
+    reason = follow_up.get('reason', '')
+
+    # Generate script based on reason and context
+    script = f"Hello, is this {contact_name}? This is Steve with Seamless Mobile Services following up on our previous conversation."
+
+    if "not a good time" in reason.lower() or "busy" in reason.lower():
+        script += f" You mentioned earlier that it wasn't a good time to talk. I hope this is a better time to discuss how our telecom expense management and mobile device management services can help your business."
+
+    elif "qualified" in reason.lower():
+        script += f" In our previous conversation, I learned that your company uses mobile devices. I'd like to discuss how we can help optimize your mobile operations, reduce costs through our telecom expense management, and improve your mobile device management."
+
+    elif "callback" in reason.lower():
+        script += f" I'm calling back as requested during our previous conversation. I wanted to discuss how we can help with your telecom expenses and mobile device management."
+
+    else:
+        # Generic follow-up
+        script += f" I'm following up to see if you've had a chance to consider our telecom expense management and mobile device management solutions for your business. Do you have a few minutes to talk?"
+
+    return script
+
+
+@job_handler('auto_follow_up', priority=DIALING_PRIORITY, max_attempts=1)
+def auto_follow_up(job):
+    """Dial the follow-ups that are due (POST /api/auto_follow_up)"""
+    from voice import place_call
+
+    max_calls = job.payload.get('max_calls', 10)
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    with get_db() as conn:
+        # Page through the follow-ups that are due (scheduled time before now) until
+        # max_calls of them are inside the calling window in their lead's time zone;
+        # the rest stay pending
+        calendar = get_call_calendar()
+        due_follow_ups = []
+        due_count = 0
+        while len(due_follow_ups) < max_calls:
+            page = conn.execute("""
+                SELECT f.*, l.id as lead_id, l.name as lead_name, l.phone as lead_phone,
+                       l.status as lead_status, l.industry, l.city, l.state, l.zipcode
+                FROM follow_ups f
+                JOIN leads l ON f.lead_id = l.id
+                WHERE f.status = 'Pending' AND f.scheduled_time <= ?
+                ORDER BY f.priority DESC, f.scheduled_time ASC, f.id ASC
+                LIMIT ? OFFSET ?
+            """, (now, DUE_PAGE_SIZE, due_count)).fetchall()
+            due_count += len(page)
+            due_follow_ups.extend(dict(row) for row in page if calendar.can_call(dict(row)))
+            if len(page) < DUE_PAGE_SIZE:
+                break
+        due_follow_ups = due_follow_ups[:max_calls]
+
+        if not due_count:
+            return {'message': 'No follow-ups due at this time', 'results': [], 'count': 0}
+        if not due_follow_ups:
+            raise JobFailed('Outside of calling hours', {
+                'message': 'Auto-follow-up can only be run during business hours.'
+            })
+
+        # Process each follow-up
+        results = []
+        for index, follow_up in enumerate(due_follow_ups, 1):
+            lead_id = follow_up['lead_id']
+            try:
+                # Claim the follow-up first, so another dialing job can't call it at the same time
+                claimed = conn.execute("UPDATE follow_ups SET status = 'In Progress' WHERE id = ? AND status = 'Pending'",
+                                       (follow_up['id'],)).rowcount
+                conn.commit()
+                if not claimed:
+                    results.append({
+                        'follow_up_id': follow_up['id'],
+                        'lead_id': lead_id,
+                        'status': 'skipped',
+                        'message': 'Follow-up is already being dialed'
+                    })
+                    continue
+
+                # Generate personalized follow-up script
+                script = generate_follow_up_script(follow_up)
+
+                # Make the call
+                if calls_simulated(get_config()):
+                    # Dummy mode
+                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
+                    results.append({
+                        'follow_up_id': follow_up['id'],
+                        'lead_id': lead_id,
+                        'status': 'success',
+                        'call_sid': 'dummy-call',
+                        'dummy': True
+                    })
+                else:
+                    # Real mode - place the call
+                    call_sid = place_call(follow_up['lead_phone'], script, lead_id=lead_id)
+                    conn.execute('UPDATE leads SET status = ? WHERE id = ?', ("Calling", lead_id))
+                    results.append({
+                        'follow_up_id': follow_up['id'],
+                        'lead_id': lead_id,
+                        'status': 'success',
+                        'call_sid': call_sid
+                    })
+
+                conn.commit()
+                invalidate_lead(lead_id)
+
+            except Exception as e:
+                # The call never started: the follow-up stays due
+                conn.rollback()
+                conn.execute("UPDATE follow_ups SET status = 'Pending' WHERE id = ? AND status = 'In Progress'",
+                             (follow_up['id'],))
+                conn.commit()
+                results.append({
+                    'follow_up_id': follow_up['id'],
+                    'lead_id': lead_id,
+                    'status': 'error',
+                    'message': str(e)
+                })
+            finally:
+                job.progress(index, len(due_follow_ups), f"Dialed {index} of {len(due_follow_ups)} follow-ups")
+
+        return {'results': results, 'count': len(results)}
+
+
+@job_handler('lead_import', priority=INTERACTIVE_PRIORITY)
+def import_leads(job):
+    """Insert the rows of an uploaded CSV as leads (POST /api/leads/import)"""
+    rows = list(csv.DictReader(io.StringIO(job.payload['csv'], newline=None)))
+    imported_count = 0
+    errors = []
+
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        with get_db() as conn:
+            for row_num, row in enumerate(rows[start:start + IMPORT_BATCH_SIZE], start=start + 2):  # Header is row 1
+                # Basic validation
+                if not row['name'] or not row['phone']:
+                    errors.append(f"Row {row_num}: Missing name or phone")
+                    continue
+
+                try:
+                    # Prepare the lead fields (handle both required and optional fields)
+                    lead_id, created = insert_lead(conn, {
+                        'name': row['name'],
+                        'phone': row['phone'],
+                        'category': row.get('category', ''),
+                        'address': row.get('address', ''),
+                        'website': row.get('website', ''),
+                        'status': row.get('status', 'Not Called'),
+                        'employee_count': int(row.get('employee_count', 0)) if (row.get('employee_count') or '').isdigit() else 0,
+                        'uses_mobile_devices': row.get('uses_mobile_devices', 'Unknown'),
+                        'industry': row.get('industry', ''),
+                        'city': row.get('city', ''),
+                        'state': row.get('state', '')
+                    })
+                    if not created:
+                        errors.append(f"Row {row_num}: Duplicate of existing lead {lead_id} ({row['phone']})")
+                        continue
+                    imported_count += 1
+                except Exception as e:
+                    errors.append(f"Row {row_num}: Error - {str(e)}")
+
+            conn.commit()
+        done = min(start + IMPORT_BATCH_SIZE, len(rows))
+        job.progress(done, len(rows), f"Imported {done} of {len(rows)} rows")
+
+    return {
+        'success': True,
+        'imported_count': imported_count,
+        'errors': errors,
+        'error_count': len(errors)
+    }
+
+
+@job_handler('learn')
+def learn_from_calls(job):
+    """Incremental learning run over new successful conversations (POST /api/analytics/learn)"""
+    from learning import run_learning
+    with get_db(with_archive=True) as conn:
+        stats = run_learning(conn, feedback=job.payload.get('feedback'))
+    message = ('Learning process completed successfully' if stats['callsAnalyzed']
+               else 'No new successful conversations to learn from')
+    return dict(stats, message=message)
+
+
+@job_handler('zoho_sync')
+def sync_appointments_to_zoho(job):
+    """Mark unsynced appointments as synced to Zoho CRM (POST /api/zoho/sync)"""
+    with get_db() as conn:
+        # Get appointments that haven't been synced
+        appointments = conn.execute('''
+            SELECT a.*, l.name, l.phone, l.email, l.address, l.city, l.state, l.zipcode, l.industry
+            FROM appointments a
+            JOIN leads l ON a.lead_id = l.id
+            WHERE a.zoho_synced = 0 OR a.zoho_synced IS NULL
+        ''').fetchall()
+
+        if not appointments:
+            return {'message': 'No appointments to sync', 'syncedCount': 0}
+
+        # Set up Zoho connection (simplified - in a real app, this would handle auth)
+        zoho_enabled = os.environ.get('ZOHO_ENABLED', 'false').lower() == 'true'
+        zoho_api_key = os.environ.get('ZOHO_API_KEY', '')
+
+        if not zoho_enabled or not zoho_api_key:
+            raise JobFailed('Zoho integration not configured', {'syncedCount': 0})
+
+        # Mock successful sync for testing
+        # In a real app, this would make actual API calls to Zoho
+        synced_count = 0
+        for appointment in appointments:
+            # Update appointment as synced in database
+            conn.execute(
+                'UPDATE appointments SET zoho_synced = 1, zoho_id = ? WHERE id = ?',
+                (f"zoho_{appointment['id']}", appointment['id'])
+            )
+            synced_count += 1
+
+            # Log the sync
+            conn.execute(
+                'INSERT INTO sync_logs (entity_type, entity_id, destination, status, created_at) VALUES (?, ?, ?, ?, datetime("now"))',
+                ('appointment', appointment['id'], 'zoho', 'success')
+            )
+        conn.commit()
+
+    return {
+        'message': f'Successfully synced {synced_count} appointments to Zoho CRM',
+        'syncedCount': synced_count
+    }
+
+
+@job_handler('archive_call_logs', priority=MAINTENANCE_PRIORITY)
+def archive_old_call_logs(job):
+    """Move old calls to the archive database (POST /api/call_logs/archive)"""
+    from archive import archive_call_logs
+    days = job.payload['days']
+    with get_db() as conn:
+        archived_count = archive_call_logs(conn, days)
+    return {'message': f'{archived_count} call log rows archived', 'archived_count': archived_count}
+
+
+@job_handler('merge_duplicates', priority=MAINTENANCE_PRIORITY)
+def merge_duplicates(job):
+    """Fold duplicate leads into one record (POST /api/leads/merge_duplicates)"""
+    with get_db() as conn:
+        merged_count = merge_duplicate_leads(conn)
+        conn.commit()
+    invalidate_lead()
+    return {'message': f'{merged_count} duplicate leads merged', 'merged_count': merged_count}
+
+
+@job_handler('mine_patterns', priority=MAINTENANCE_PRIORITY)
+def mine_phrase_patterns(job):
+    """Rank bot phrases by lift over the booking rate (see pattern_mining.py)"""
+    from pattern_mining import MIN_SUPPORT, mine_patterns
+    with get_db(with_archive=True) as conn:
+        return mine_patterns(conn, min_support=job.payload.get('min_support', MIN_SUPPORT))
@@ -0,0 +1,121 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# The lead fields the call flow (webhooks, dialers, scripts, prompts) reads
+LEAD_FIELDS = (
+    'id', 'name', 'phone', 'phone_e164', 'industry', 'category', 'city', 'state',
+    'zipcode', 'address', 'website', 'employee_count', 'uses_mobile_devices',
+    'qualification_status', 'status'
+)
+
+DEFAULT_MAX_ENTRIES = 5000
+
+# Safety net for writes made by other worker processes, which can't invalidate this one
+DEFAULT_TTL = 30
+
+
+class LeadRecord:
+    """Compact lead with the call-flow fields; reads like the row dict it replaces"""
+
+    __slots__ = LEAD_FIELDS
+
+    def __init__(self, row):
+        for field in LEAD_FIELDS:
+            setattr(self, field, row[field])
+
+    def __getitem__(self, key):
+        if key not in LEAD_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in LEAD_FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in LEAD_FIELDS else default
+
+    def keys(self):
+        return LEAD_FIELDS
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in LEAD_FIELDS}
+
+
+class LeadCache:
+    """Bounded LRU of LeadRecords keyed by lead id, read through from SQLite"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records = OrderedDict()  # lead id -> (loaded_at, record)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conn, lead_id):
+        """LeadRecord for a lead id, or None if the lead doesn't exist"""
+        try:
+            lead_id = int(lead_id)
+        except (TypeError, ValueError):
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._records.get(lead_id)
+            if entry and now - entry[0] < self.ttl:
+                self._records.move_to_end(lead_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        row = conn.execute(f"SELECT {', '.join(LEAD_FIELDS)} FROM leads WHERE id = ?", (lead_id,)).fetchone()
+        if not row:
+            return None
+        record = LeadRecord(row)
+        with self._lock:
+            self._records[lead_id] = (now, record)
+            self._records.move_to_end(lead_id)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        return record
+
+    def invalidate(self, lead_ids=None):
+        """Forget one lead, a list of leads, or (with no argument) everything"""
+        with self._lock:
+            if lead_ids is None:
+                self._records.clear()
+                return
+            if not isinstance(lead_ids, (list, tuple, set)):
+                lead_ids = [lead_ids]
+            for lead_id in lead_ids:
+                try:
+                    self._records.pop(int(lead_id), None)
+                except (TypeError, ValueError):
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._records),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+lead_cache = LeadCache()
+
+
+def get_lead(conn, lead_id):
+    """Cached call-flow view of a lead (see LEAD_FIELDS), or None"""
+    return lead_cache.get(conn, lead_id)
+
+
+def invalidate_lead(lead_ids=None):
+    """Call after any write to the leads table"""
+    lead_cache.invalidate(lead_ids)
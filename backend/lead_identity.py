@@ -0,0 +1,320 @@
+import re
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Words that vary between listings of the same business and carry no identity
+NAME_STOPWORDS = {
+    'the', 'and', 'llc', 'inc', 'incorporated', 'co', 'corp', 'corporation',
+    'company', 'ltd', 'limited', 'pllc', 'lp', 'llp'
+}
+
+# Lead columns considered when folding a duplicate into the lead we keep
+MERGE_COLUMNS = [
+    'name', 'phone', 'email', 'company', 'industry', 'category', 'address', 'website',
+    'city', 'state', 'zipcode', 'employee_count', 'uses_mobile_devices',
+    'qualification_status', 'appointment_date', 'appointment_time', 'status'
+]
+
+# Values that mean "nothing known yet" and may be overwritten by a duplicate
+PLACEHOLDER_VALUES = (None, '', 0, 'Unknown', 'Not Called', 'Not Qualified', 'N/A')
+
+# Tables whose rows follow a lead when it is merged into another
+LEAD_CHILD_TABLES = ['call_logs', 'appointments', 'follow_ups']
+
+# Digits in a dialable E.164 number (+country code and subscriber number)
+MIN_E164_DIGITS = 10
+MAX_E164_DIGITS = 15
+
+
+def normalize_phone(phone, default_country_code='1'):
+    """Normalize a phone number to E.164 (+15551234567), or None if it isn't dialable"""
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    has_plus = phone.startswith('+')
+    digits = re.sub(r'\D', '', phone)
+
+    if has_plus:
+        if digits.startswith('1'):
+            # North American numbers are +1 and ten digits
+            return f"+{digits}" if len(digits) == 11 else None
+        return f"+{digits}" if MIN_E164_DIGITS <= len(digits) <= MAX_E164_DIGITS else None
+    if len(digits) == 10:
+        return f"+{default_country_code}{digits}"
+    if len(digits) == 11 and digits.startswith(default_country_code):
+        return f"+{digits}"
+    return None
+
+
+def normalize_name(name):
+    """Lower-case business name with punctuation and legal suffixes removed"""
+    if not name:
+        return ''
+    name = name.lower().replace('&', ' and ')
+    tokens = re.findall(r'[a-z0-9]+', name)
+    return ' '.join(token for token in tokens if token not in NAME_STOPWORDS)
+
+
+def identity_key(name, address=None, city=None):
+    """Fuzzy name/address key shared by listings of the same business.
+
+    Uses the normalized name plus the street number and ZIP code (or city when
+    there is no ZIP), so "ABC Plumbing, LLC - 123 Main Street, Denver, CO 80202"
+    and "ABC Plumbing 123 Main St Denver CO 80202-1234" produce the same key.
+    A name alone doesn't identify a business, so without a street number or
+    locality there is no key.
+    """
+    name_key = normalize_name(name)
+    if not name_key:
+        return None
+
+    street_number = ''
+    locality = ''
+    if address:
+        address = address.lower()
+        number_match = re.match(r'\s*(\d+)', address)
+        if number_match:
+            street_number = number_match.group(1)
+        zip_match = re.search(r'\b(\d{5})(?:-\d{4})?\s*$', address)
+        if zip_match:
+            locality = zip_match.group(1)
+    if not locality and city:
+        locality = ' '.join(re.findall(r'[a-z0-9]+', city.lower()))
+
+    if not street_number and not locality:
+        return None
+    return f"{name_key}|{street_number}|{locality}"
+
+
+def lead_identity(lead):
+    """Return (phone_e164, identity_key) for a lead-like dict"""
+    return (
+        normalize_phone(lead.get('phone')),
+        identity_key(lead.get('name'), lead.get('address'), lead.get('city'))
+    )
+
+
+def dedupe_businesses(businesses):
+    """Drop repeated listings from a scrape, keyed on phone first and name/address second.
+
+    Listings with the same name/address key but different known phones are
+    different businesses (or branches), so both are kept.
+    """
+    unique = []
+    seen_phones = set()
+    phones_by_key = {}  # identity key -> phones seen with it (None for a listing without one)
+    for business in businesses:
+        phone_e164, key = lead_identity(business)
+        if phone_e164 and phone_e164 in seen_phones:
+            continue
+        if key in phones_by_key and (phone_e164 is None or None in phones_by_key[key]):
+            continue
+        if phone_e164:
+            seen_phones.add(phone_e164)
+        if key:
+            phones_by_key.setdefault(key, set()).add(phone_e164)
+        unique.append(business)
+    return unique
+
+
+def find_duplicate_lead(conn, phone_e164=None, key=None):
+    """Return the id of an existing lead with the same phone or identity key.
+
+    The identity key only matches when one side has no known phone: two
+    leads whose phones differ are different businesses, whatever their names.
+    """
+    if phone_e164:
+        row = conn.execute('SELECT id FROM leads WHERE phone_e164 = ?', (phone_e164,)).fetchone()
+        if row:
+            return row[0]
+    if key:
+        row = conn.execute('''
+            SELECT id FROM leads WHERE identity_key = ? AND (phone_e164 IS NULL OR ? IS NULL)
+            ORDER BY id LIMIT 1
+        ''', (key, phone_e164)).fetchone()
+        if row:
+            return row[0]
+    return None
+
+
+def find_lead_id_by_phone(conn, phone):
+    """Look a lead up by any formatting of its phone number"""
+    phone_e164 = normalize_phone(phone)
+    if phone_e164:
+        row = conn.execute('SELECT id FROM leads WHERE phone_e164 = ?', (phone_e164,)).fetchone()
+        if row:
+            return row[0]
+    row = conn.execute('SELECT id FROM leads WHERE phone = ?', (phone,)).fetchone()
+    return row[0] if row else None
+
+
+def insert_lead(conn, fields):
+    """Insert a lead unless it already exists.
+
+    This is the single insert path for manual adds, scrapes and CSV imports.
+    Returns (lead_id, created); when the lead already exists nothing is written
+    and the existing id is returned. The caller commits.
+    """
+    phone_e164, key = lead_identity(fields)
+    existing_id = find_duplicate_lead(conn, phone_e164, key)
+    if existing_id:
+        return existing_id, False
+
+    row = dict(fields)
+    row['phone_e164'] = phone_e164
+    row['identity_key'] = key
+    columns = list(row.keys())
+    placeholders = ', '.join(f':{col}' for col in columns)
+    try:
+        cursor = conn.execute(f"INSERT INTO leads ({', '.join(columns)}) VALUES ({placeholders})", row)
+    except sqlite3.IntegrityError:
+        # Another request inserted the same phone between our check and insert
+        existing_id = find_duplicate_lead(conn, phone_e164, key)
+        if existing_id:
+            return existing_id, False
+        raise
+    return cursor.lastrowid, True
+
+
+def refresh_lead_identity(conn, lead_id):
+    """Recompute the identity columns after a lead's phone, name or address changed"""
+    row = conn.execute('SELECT name, phone, address, city FROM leads WHERE id = ?', (lead_id,)).fetchone()
+    if not row:
+        return
+    phone_e164, key = lead_identity(dict(zip(['name', 'phone', 'address', 'city'], row)))
+    conn.execute('UPDATE leads SET phone_e164 = ?, identity_key = ? WHERE id = ?', (phone_e164, key, lead_id))
+
+
+def backfill_lead_identity(conn):
+    """Fill phone_e164/identity_key for leads written before the columns existed.
+
+    A row whose phone already belongs to another lead keeps a NULL phone_e164
+    (the unique index forbids the copy) and is returned as an
+    (existing_id, row_id) pair for merge_duplicate_leads to fold.
+    """
+    rows = conn.execute('''
+        SELECT id, name, phone, address, city FROM leads
+        WHERE identity_key IS NULL OR (phone_e164 IS NULL AND phone IS NOT NULL AND phone != '')
+    ''').fetchall()
+    conflicts = []
+    for row in rows:
+        lead = dict(zip(['id', 'name', 'phone', 'address', 'city'], row))
+        phone_e164, key = lead_identity(lead)
+        try:
+            conn.execute('UPDATE leads SET phone_e164 = ?, identity_key = ? WHERE id = ?',
+                         (phone_e164, key, lead['id']))
+        except sqlite3.IntegrityError:
+            conn.execute('UPDATE leads SET identity_key = ? WHERE id = ?', (key, lead['id']))
+            existing_id = find_duplicate_lead(conn, phone_e164)
+            if existing_id:
+                conflicts.append((existing_id, lead['id']))
+    return conflicts
+
+
+def _duplicate_groups(conn):
+    """Yield lists of lead ids that refer to the same business, oldest first"""
+    seen = set()
+    # A name/address group with two known phones is several businesses, not one
+    for column, condition in (('phone_e164', ''), ('identity_key', 'AND COUNT(phone_e164) <= 1')):
+        groups = conn.execute(f'''
+            SELECT group_concat(id) FROM (
+                SELECT id, phone_e164, {column} FROM leads WHERE {column} IS NOT NULL ORDER BY id
+            )
+            GROUP BY {column} HAVING COUNT(*) > 1 {condition}
+        ''').fetchall()
+        for (ids,) in groups:
+            group = [int(lead_id) for lead_id in ids.split(',') if int(lead_id) not in seen]
+            if len(group) > 1:
+                seen.update(group)
+                yield group
+
+
+def merge_duplicate_leads(conn):
+    """Fold duplicate leads into the oldest record of each group.
+
+    Call logs, appointments and follow-ups are re-pointed at the surviving
+    lead, and any field the survivor is missing is taken from the duplicate.
+    Meant to run nightly (POST /api/leads/merge_duplicates or
+    `python lead_identity.py`); returns the number of leads removed.
+    """
+    lead_columns = {row[1] for row in conn.execute('PRAGMA table_info(leads)')}
+    merge_columns = [col for col in MERGE_COLUMNS if col in lead_columns]
+    child_tables = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }.intersection(LEAD_CHILD_TABLES)
+
+    removed = 0
+    for existing_id, row_id in backfill_lead_identity(conn):
+        removed += _merge_group(conn, sorted([existing_id, row_id]), merge_columns, child_tables)
+
+    # A lead can share a phone with one record and a name/address with another,
+    # so keep merging until a pass finds nothing left to fold
+    for _ in range(5):
+        groups = list(_duplicate_groups(conn))
+        if not groups:
+            break
+        for group in groups:
+            removed += _merge_group(conn, group, merge_columns, child_tables)
+    return removed
+
+
+def _merge_group(conn, group, merge_columns, child_tables):
+    """Merge one group of duplicate lead ids into its first (oldest) member"""
+    survivor_id = group[0]
+    placeholders = ','.join('?' for _ in group)
+    rows = conn.execute(
+        f"SELECT id, {', '.join(merge_columns)} FROM leads WHERE id IN ({placeholders}) ORDER BY id",
+        group
+    ).fetchall()
+    if len(rows) < 2:
+        return 0
+    duplicate_ids = [row[0] for row in rows[1:]]
+
+    merged = dict(zip(['id'] + merge_columns, rows[0]))
+    for row in rows[1:]:
+        duplicate = dict(zip(['id'] + merge_columns, row))
+        for col in merge_columns:
+            if merged[col] in PLACEHOLDER_VALUES and duplicate[col] not in PLACEHOLDER_VALUES:
+                merged[col] = duplicate[col]
+
+    dup_placeholders = ','.join('?' for _ in duplicate_ids)
+    for table in child_tables:
+        conn.execute(f'UPDATE {table} SET lead_id = ? WHERE lead_id IN ({dup_placeholders})',
+                     [survivor_id] + duplicate_ids)
+    conn.execute(f'DELETE FROM leads WHERE id IN ({dup_placeholders})', duplicate_ids)
+
+    phone_e164, key = lead_identity(merged)
+    assignments = ', '.join(f'{col} = ?' for col in merge_columns)
+    conn.execute(f'UPDATE leads SET {assignments}, phone_e164 = ?, identity_key = ? WHERE id = ?',
+                 [merged[col] for col in merge_columns] + [phone_e164, key, survivor_id])
+
+    logger.info(f"Merged leads {duplicate_ids} into lead {survivor_id}")
+    return len(duplicate_ids)
+
+
+def ensure_lead_identity_index(conn):
+    """Backfill identity columns and create the unique phone index, merging duplicates first if needed"""
+    backfill_lead_identity(conn)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_leads_identity_key ON leads(identity_key)')
+    try:
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_phone_e164 ON leads(phone_e164)')
+    except sqlite3.IntegrityError:
+        removed = merge_duplicate_leads(conn)
+        logger.info(f"Merged {removed} duplicate leads before creating the phone index")
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_phone_e164 ON leads(phone_e164)')
+    conn.commit()
+
+
+if __name__ == '__main__':
+    # Nightly maintenance entry point, e.g. from cron:
+    #   0 2 * * * cd /path/to/backend && python lead_identity.py
+    from models import get_db, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with get_db() as conn:
+        count = merge_duplicate_leads(conn)
+        conn.commit()
+    print(f"Merged {count} duplicate leads")
@@ -0,0 +1,143 @@
+import json
+import base64
+
+# Timeline items per page, and the most a client may ask for
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+TIMELINE_TYPES = ('call', 'appointment', 'follow_up', 'qualification')
+
+# One row per call: call_logs rows are grouped like history_window.split_calls
+# (a call starts at its 'Started' row, or at the lead's first row). The last
+# row's status and transcript are read as bare columns next to max(id).
+CALL_SQL = '''
+    SELECT 'call' AS type, call_id AS item_id, started_at AS timestamp, call_status AS status,
+           json_object('call_id', call_id, 'started_at', started_at, 'ended_at', created_at,
+                       'messages', messages, 'outcome', transcript) AS data
+    FROM (
+        SELECT call_id, MAX(id), call_status, transcript, created_at, started_at,
+               SUM(transcript LIKE 'Lead: %' OR transcript LIKE 'Bot: %') AS messages
+        FROM (
+            SELECT id, call_status, transcript, created_at, call_id,
+                   FIRST_VALUE(created_at) OVER (PARTITION BY call_id ORDER BY id) AS started_at
+            FROM (
+                SELECT id, call_status, transcript, created_at,
+                       COALESCE(MAX(CASE WHEN call_status = 'Started' THEN id END) OVER (ORDER BY id),
+                                MIN(id) OVER ()) AS call_id
+                FROM call_logs_all
+                WHERE lead_id = :lead_id
+            )
+        )
+        GROUP BY call_id
+    )
+'''
+
+APPOINTMENT_SQL = '''
+    SELECT 'appointment' AS type, id AS item_id, COALESCE(date || ' ' || time, created_at) AS timestamp, status,
+           json_object('date', date, 'time', time, 'medium', medium, 'notes', notes, 'created_at', created_at) AS data
+    FROM appointments
+    WHERE lead_id = :lead_id
+'''
+
+FOLLOW_UP_SQL = '''
+    SELECT 'follow_up' AS type, id AS item_id, scheduled_time AS timestamp, status,
+           json_object('priority', priority, 'reason', reason, 'created_at', created_at) AS data
+    FROM follow_ups
+    WHERE lead_id = :lead_id
+'''
+
+QUALIFICATION_SQL = '''
+    SELECT 'qualification' AS type, id AS item_id, COALESCE(updated_at, created_at) AS timestamp,
+           qualification_status AS status,
+           json_object('employee_count', employee_count, 'uses_mobile_devices', uses_mobile_devices) AS data
+    FROM leads
+    WHERE id = :lead_id AND qualification_status IS NOT NULL
+'''
+
+TYPE_SQL = {
+    'call': CALL_SQL,
+    'appointment': APPOINTMENT_SQL,
+    'follow_up': FOLLOW_UP_SQL,
+    'qualification': QUALIFICATION_SQL
+}
+
+
+def encode_cursor(timestamp, item_type, item_id):
+    """Opaque cursor for the item a page ended on"""
+    raw = json.dumps([timestamp, item_type, item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, type, id) from encode_cursor; raises ValueError for anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, item_type, item_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or item_type not in TIMELINE_TYPES or not isinstance(item_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, item_type, item_id
+
+
+def parse_types(value):
+    """Timeline types from a comma-separated filter (all types when empty)"""
+    if not value:
+        return list(TIMELINE_TYPES)
+    types = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [item for item in types if item not in TIMELINE_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown timeline type(s): {', '.join(unknown)}")
+    return types
+
+
+def load_timeline(conn, lead_id, types=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of a lead's timeline, newest first, from a single UNION ALL query.
+
+    conn needs the call_logs_all view (get_db(with_archive=True)). Returns
+    (items, next_cursor); next_cursor is None on the last page.
+    """
+    types = types or list(TIMELINE_TYPES)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    params = {'lead_id': lead_id, 'limit': limit + 1}
+
+    where = ''
+    if cursor:
+        params['cursor_ts'], params['cursor_type'], params['cursor_id'] = decode_cursor(cursor)
+        where = 'WHERE (ts, type, item_id) < (:cursor_ts, :cursor_type, :cursor_id)'
+
+    union = '\n    UNION ALL\n'.join(TYPE_SQL[item_type] for item_type in TIMELINE_TYPES if item_type in types)
+    rows = conn.execute(f'''
+        SELECT type, item_id, ts, status, data
+        FROM (SELECT type, item_id, COALESCE(timestamp, '') AS ts, status, data FROM ({union}))
+        {where}
+        ORDER BY ts DESC, type DESC, item_id DESC
+        LIMIT :limit
+    ''', params).fetchall()
+
+    items = [{
+        'type': row['type'],
+        'id': row['item_id'],
+        'timestamp': row['ts'],
+        'status': row['status'],
+        'data': json.loads(row['data'])
+    } for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last['timestamp'], last['type'], last['id'])
+    return items, next_cursor
+
+
+def load_call_turns(conn, lead_id, call_id):
+    """call_logs rows of one call (call_id is the id of its first row), in order"""
+    rows = conn.execute('''
+        SELECT id, call_status, transcript, created_at
+        FROM call_logs_all
+        WHERE lead_id = :lead_id AND id >= :call_id
+          AND id < COALESCE((SELECT MIN(id) FROM call_logs_all
+                             WHERE lead_id = :lead_id AND id > :call_id AND call_status = 'Started'), 9223372036854775807)
+        ORDER BY id
+    ''', {'lead_id': lead_id, 'call_id': call_id}).fetchall()
+    return [dict(row) for row in rows]
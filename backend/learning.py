@@ -0,0 +1,312 @@
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from phrase_matcher import CONVERSATION_MATCHER, OBJECTION_INDICATORS
+from history_window import parse_transcript, split_calls
+
+logger = logging.getLogger(__name__)
+
+# ai_patterns categories, the learn:* phrase family each is drawn from, and
+# the shortest bot line worth keeping (qualification lines must be questions)
+PHRASE_CATEGORIES = {
+    'objectionHandling': ('learn:objection', 20),
+    'valuePropositions': ('learn:value', 15),
+    'qualificationQuestions': ('learn:qualification', 0),
+    'closingTechniques': ('learn:closing', 15)
+}
+
+# Phrases per category in each ai_patterns snapshot
+TOP_PHRASES = 5
+
+# A call with no "Call ended" row is treated as finished once it is this old
+STALE_CALL_SECONDS = 3600
+
+# Leads per call_logs_all query (kept under SQLite's bound-parameter limit)
+FETCH_CHUNK = 500
+
+SUCCESSFUL_LEADS_SQL = '''
+    WITH booked_ids AS (
+        SELECT lead_id FROM appointments WHERE status = 'Scheduled'
+    ), successful AS (
+        SELECT l.id AS lead_id, COALESCE(l.industry, 'generic') AS industry,
+               (l.status = 'Appointment Set' OR l.id IN booked_ids) AS booked
+        FROM leads l
+        WHERE l.status = 'Appointment Set' OR l.qualification_status = 'Qualified' OR l.id IN booked_ids
+    )
+    SELECT s.lead_id, s.industry, s.booked, p.last_log_id, p.booked AS was_booked
+    FROM successful s
+    LEFT JOIN learning_progress p ON p.lead_id = s.lead_id
+    WHERE p.lead_id IS NULL
+       OR p.pending
+       OR (s.booked AND NOT p.booked)
+       OR s.lead_id IN (SELECT lead_id FROM call_logs_all WHERE id > ? AND id <= ?)
+'''
+
+
+def ensure_learning_tables(conn):
+    """Create the learned-pattern tables and the learning engine's bookkeeping"""
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS ai_patterns (
+            id INTEGER PRIMARY KEY,
+            patterns TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS ai_feedback (
+            id INTEGER PRIMARY KEY,
+            feedback TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Last call_logs id learned from per lead; pending while a call is still open
+        CREATE TABLE IF NOT EXISTS learning_progress (
+            lead_id INTEGER PRIMARY KEY,
+            last_log_id INTEGER NOT NULL DEFAULT 0,
+            booked INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Bot lines seen in successful calls, deduplicated by hash and counted
+        CREATE TABLE IF NOT EXISTS learned_phrases (
+            category TEXT,
+            text_hash TEXT,
+            text TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (category, text_hash)
+        );
+
+        -- One row per learning run; high_water_mark is the newest call_logs id it saw
+        CREATE TABLE IF NOT EXISTS learning_runs (
+            id INTEGER PRIMARY KEY,
+            high_water_mark INTEGER NOT NULL,
+            leads_processed INTEGER,
+            calls_analyzed INTEGER,
+            patterns_identified INTEGER,
+            seconds REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+    conn.commit()
+
+
+def phrase_hash(text):
+    """Case-insensitive dedupe key for a learned phrase"""
+    return hashlib.sha1(text.lower().encode('utf-8')).hexdigest()
+
+
+def save_patterns_snapshot(conn, updates):
+    """Add an ai_patterns row: the latest snapshot with the given keys replaced"""
+    latest = conn.execute('SELECT patterns FROM ai_patterns ORDER BY id DESC LIMIT 1').fetchone()
+    snapshot = json.loads(latest['patterns']) if latest else {}
+    snapshot.update(updates)
+    conn.execute('INSERT INTO ai_patterns (patterns) VALUES (?)', (json.dumps(snapshot),))
+
+
+def call_finished(call, is_last, now):
+    """Whether a call is over and safe to learn from"""
+    if not is_last:
+        return True
+    if any((row['transcript'] or '').startswith('Call ended with status:') for row in call):
+        return True
+    try:
+        last_at = datetime.fromisoformat(str(call[-1]['created_at'])[:19])
+    except (TypeError, ValueError):
+        return True
+    return now - last_at > timedelta(seconds=STALE_CALL_SECONDS)
+
+
+def collect_phrases(rows, phrases):
+    """Count the learn:* bot lines in rows into phrases[(category, hash)] = [text, count]"""
+    for row in rows:
+        transcript = row['transcript'] or ''
+        if not transcript.startswith('Bot:'):
+            continue
+        line = transcript[4:].strip()
+        hits = CONVERSATION_MATCHER.scan(line.lower())
+        for category, (tag, min_length) in PHRASE_CATEGORIES.items():
+            if tag not in hits or len(line) <= min_length:
+                continue
+            if category == 'qualificationQuestions' and '?' not in line:
+                continue
+            entry = phrases.setdefault((category, phrase_hash(line)), [line, 0])
+            entry[1] += 1
+
+
+def collect_industry_patterns(industry, rows, updates):
+    """Count successful value propositions and objection responses in one call.
+
+    updates[(industry, pattern_type, pattern_key)] = [latest bot line, successes]
+    """
+    conversation = parse_transcript(rows)
+    tags = [CONVERSATION_MATCHER.scan(message["content"]) for message in conversation]
+    for i in range(len(conversation) - 1):
+        if conversation[i]["role"] != "assistant" or conversation[i + 1]["role"] != "user":
+            continue
+        bot_message = conversation[i]["content"]
+
+        # A value proposition the lead answered positively
+        if "value_offer" in tags[i] and "positive" in tags[i + 1]:
+            entry = updates.setdefault((industry, "successful_phrases", "value_proposition"), [bot_message, 0])
+            entry[0] = bot_message
+            entry[1] += 1
+
+        # An objection, the bot's answer to it, and a positive reply from the lead
+        if (i + 3 < len(conversation) and conversation[i + 2]["role"] == "assistant"
+                and conversation[i + 3]["role"] == "user" and "positive" in tags[i + 3]):
+            response = conversation[i + 2]["content"]
+            for objection_type in OBJECTION_INDICATORS.values():
+                if objection_type in tags[i + 1]:
+                    entry = updates.setdefault((industry, "objection_responses", objection_type), [response, 0])
+                    entry[0] = response
+                    entry[1] += 1
+
+
+def fetch_new_rows(conn, starts, cutoff):
+    """New call log rows per lead, {lead_id: [rows]}, for leads in starts {lead_id: after_id}.
+
+    Leads are queried in chunks with a literal IN list, which SQLite pushes into
+    both tiers of call_logs_all (a join against a temp table would not be).
+    """
+    rows_by_lead = {}
+    ordered = sorted(starts, key=lambda lead_id: starts[lead_id])
+    for offset in range(0, len(ordered), FETCH_CHUNK):
+        chunk = ordered[offset:offset + FETCH_CHUNK]
+        placeholders = ', '.join('?' * len(chunk))
+        rows = conn.execute(f'''
+            SELECT id, lead_id, call_status, transcript, created_at
+            FROM call_logs_all
+            WHERE lead_id IN ({placeholders}) AND id > ? AND id <= ?
+            ORDER BY lead_id, id
+        ''', chunk + [starts[chunk[0]], cutoff]).fetchall()
+        for row in rows:
+            if row['id'] > starts[row['lead_id']]:
+                rows_by_lead.setdefault(row['lead_id'], []).append(row)
+    return rows_by_lead
+
+
+def run_learning(conn, feedback=None):
+    """Learn from conversations with successful leads added since the last run.
+
+    Successful leads are qualified or booked ones; only booked leads (an
+    'Appointment Set' status or a Scheduled appointment) feed industry_patterns.
+    Each lead's progress is a call_logs id high-water mark, so a run reads only
+    new, finished calls. A lead that becomes booked is re-read from its first
+    call for industry patterns. All writes happen in one transaction.
+    conn needs the call_logs_all view (get_db(with_archive=True)).
+    """
+    started = time.time()
+    now = datetime.utcnow()
+    cutoff = conn.execute('SELECT COALESCE(MAX(id), 0) FROM call_logs_all').fetchone()[0]
+    last_mark = conn.execute('SELECT COALESCE(MAX(high_water_mark), 0) FROM learning_runs').fetchone()[0]
+
+    candidates = conn.execute(SUCCESSFUL_LEADS_SQL, (last_mark, cutoff)).fetchall()
+    starts, phrase_after = {}, {}
+    for lead in candidates:
+        progress = lead['last_log_id'] or 0
+        upgraded = lead['booked'] and not lead['was_booked']
+        starts[lead['lead_id']] = 0 if upgraded else progress
+        # Phrases from rows already read are counted; only industry patterns are re-read
+        phrase_after[lead['lead_id']] = progress
+    rows_by_lead = fetch_new_rows(conn, starts, cutoff)
+
+    phrases, updates, progress_rows = {}, {}, []
+    calls_analyzed = 0
+    for lead in candidates:
+        lead_id = lead['lead_id']
+        calls = split_calls(rows_by_lead.get(lead_id, []))
+        finished = []
+        for index, call in enumerate(calls):
+            if not call_finished(call, index == len(calls) - 1, now):
+                break
+            finished.append(call)
+
+        for call in finished:
+            if call[-1]['id'] > phrase_after[lead_id]:
+                calls_analyzed += 1
+                collect_phrases([row for row in call if row['id'] > phrase_after[lead_id]], phrases)
+            if lead['booked']:
+                collect_industry_patterns(lead['industry'], call, updates)
+
+        last_log_id = finished[-1][-1]['id'] if finished else starts[lead_id]
+        last_log_id = max(last_log_id, phrase_after[lead_id])
+        pending = 1 if len(finished) < len(calls) else 0
+        progress_rows.append((lead_id, last_log_id, 1 if lead['booked'] else 0, pending))
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO learning_progress (lead_id, last_log_id, booked, pending, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(lead_id) DO UPDATE SET
+                last_log_id = excluded.last_log_id,
+                booked = excluded.booked,
+                pending = excluded.pending,
+                updated_at = CURRENT_TIMESTAMP
+        ''', progress_rows)
+
+        conn.executemany('''
+            INSERT INTO learned_phrases (category, text_hash, text, count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(category, text_hash) DO UPDATE SET
+                count = count + excluded.count,
+                last_seen = CURRENT_TIMESTAMP
+        ''', [(category, digest, text, count) for (category, digest), (text, count) in phrases.items()])
+
+        conn.executemany('''
+            INSERT INTO industry_patterns (industry, pattern_type, pattern_key, pattern_value, success_count, last_used)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(industry, pattern_type, pattern_key) DO UPDATE SET
+                pattern_value = excluded.pattern_value,
+                success_count = success_count + excluded.success_count,
+                last_used = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [key + tuple(value) for key, value in updates.items()])
+
+        if phrases:
+            snapshot = {}
+            for category in PHRASE_CATEGORIES:
+                rows = conn.execute('''
+                    SELECT text FROM learned_phrases WHERE category = ?
+                    ORDER BY count DESC, first_seen LIMIT ?
+                ''', (category, TOP_PHRASES)).fetchall()
+                snapshot[category] = [row['text'] for row in rows]
+            save_patterns_snapshot(conn, snapshot)
+
+        if feedback:
+            conn.execute('INSERT INTO ai_feedback (feedback) VALUES (?)', (feedback,))
+
+        stats = {
+            'callsAnalyzed': calls_analyzed,
+            'leadsProcessed': len(rows_by_lead),
+            'patternsIdentified': len(phrases),
+            'industryPatternsUpdated': len(updates),
+            'highWaterMark': cutoff,
+            'seconds': round(time.time() - started, 3)
+        }
+        conn.execute('''
+            INSERT INTO learning_runs (high_water_mark, leads_processed, calls_analyzed, patterns_identified, seconds)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (cutoff, stats['leadsProcessed'], calls_analyzed, stats['patternsIdentified'], stats['seconds']))
+
+    if updates:
+        from prompt_compiler import invalidate_learned_patterns
+        for industry in {key[0] for key in updates}:
+            invalidate_learned_patterns(industry)
+
+    logger.info(f"Learning run: {calls_analyzed} calls from {stats['leadsProcessed']} leads, "
+                f"{len(phrases)} phrases, {len(updates)} industry patterns in {stats['seconds']}s")
+    return stats
+
+
+if __name__ == '__main__':
+    # Incremental learning pass, e.g. hourly from cron:
+    #   15 * * * * cd /path/to/backend && python learning.py
+    from models import get_db, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with get_db(with_archive=True) as conn:
+        print(json.dumps(run_learning(conn)))
@@ -0,0 +1,315 @@
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures that open a model's breaker, and how long it stays open
+FAILURE_THRESHOLD = 3
+RESET_TIMEOUT = 30
+
+# Latency samples kept per model for p50/p95
+LATENCY_WINDOW = 100
+
+# Samples needed before p95 is trusted for routing/hedging decisions
+MIN_LATENCY_SAMPLES = 10
+
+DEFAULT_MODELS = ['gpt-4', 'gpt-3.5-turbo']
+DEFAULT_TURN_DEADLINE = 6.0
+DEFAULT_HEDGE_AFTER = 2.5
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cool-down"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent; in half-open state only one trial at a time"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def release(self):
+        """Give back a half-open trial slot that allow() granted but wasn't used"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class LLMRouter:
+    """Routes a chat completion across models within a per-turn deadline.
+
+    Models are tried in configured order, skipping any whose breaker is open
+    and moving models whose recent p95 would blow the deadline to the back.
+    If the first model hasn't answered after the hedge delay (its p95, capped
+    at hedge_after) the next model is started in parallel and the first
+    answer wins. A failure starts the next model immediately. When every
+    model has failed or the deadline passes, the caller's fallback is
+    returned.
+
+    Each call runs on its own thread rather than a shared pool, so a burst of
+    concurrent turns never queues behind itself: a model's timeout is
+    whatever is left of the turn when its call actually starts.
+    """
+
+    def __init__(self, models=None, deadline=DEFAULT_TURN_DEADLINE, hedge_after=DEFAULT_HEDGE_AFTER):
+        self.models = list(models or DEFAULT_MODELS)
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.breakers = {model: CircuitBreaker() for model in self.models}
+        self.latency = {model: LatencyTracker() for model in self.models}
+        self.counts = {model: {'calls': 0, 'failures': 0, 'timeouts': 0} for model in self.models}
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def complete(self, call, fallback=None, deadline=None):
+        """Return call(model, timeout) from the first model to answer, or fallback"""
+        deadline = deadline or self.deadline
+        end = time.monotonic() + deadline
+        candidates = self._candidates(deadline)
+        if not candidates:
+            logger.error("All LLM circuit breakers are open, using fallback response")
+            self._count(fallback=True)
+            return fallback
+
+        launched = []
+        try:
+            return self._race(call, candidates, launched, end, deadline, fallback)
+        finally:
+            for model in candidates:
+                if model not in launched:
+                    self.breakers[model].release()
+
+    def _race(self, call, candidates, launched, end, deadline, fallback):
+        pending = {}
+
+        def launch():
+            model = candidates[len(launched)]
+            launched.append(model)
+            attempt = {'model': model, 'settled': False, 'started': False}
+            future = Future()
+            threading.Thread(target=self._run, args=(future, call, attempt, end),
+                             name=f'llm-router-{model}', daemon=True).start()
+            pending[future] = attempt
+            return time.monotonic() + self._hedge_delay(model)
+
+        hedge_at = launch()
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+            can_hedge = len(launched) < len(candidates)
+            timeout = min(end, hedge_at) - now if can_hedge else end - now
+            done, _ = wait(list(pending), timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge and time.monotonic() >= hedge_at:
+                    logger.info(f"Hedging LLM request with {candidates[len(launched)]}")
+                    hedge_at = launch()
+                continue
+
+            for future in done:
+                model = pending.pop(future)['model']
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.warning(f"LLM model {model} failed: {str(e)}")
+            if not pending and len(launched) < len(candidates):
+                hedge_at = launch()
+
+        for attempt in pending.values():
+            # The abandoned call counts as one timeout; when it finishes later
+            # _timed_call sees it settled and leaves the breaker alone
+            if self._settle(attempt):
+                model = attempt['model']
+                if not attempt['started']:
+                    # Never reached the model, so it says nothing about its health
+                    self.breakers[model].release()
+                    continue
+                logger.warning(f"LLM model {model} missed the {deadline}s turn deadline")
+                self._count(model, 'timeouts')
+                self.breakers[model].record_failure()
+        if pending:
+            logger.error("No LLM response within the turn deadline, using fallback response")
+        else:
+            logger.error("All LLM models failed, using fallback response")
+        self._count(fallback=True)
+        return fallback
+
+    def _candidates(self, deadline):
+        """Models whose breakers allow a request, slow ones last"""
+        allowed = [model for model in self.models if self.breakers[model].allow()]
+        fast = [model for model in allowed if not self._too_slow(model, deadline)]
+        return fast + [model for model in allowed if model not in fast]
+
+    def _too_slow(self, model, deadline):
+        tracker = self.latency[model]
+        return len(tracker) >= MIN_LATENCY_SAMPLES and tracker.percentile(95) > deadline
+
+    def _hedge_delay(self, model):
+        tracker = self.latency[model]
+        if len(tracker) >= MIN_LATENCY_SAMPLES:
+            return min(self.hedge_after, tracker.percentile(95))
+        return self.hedge_after
+
+    def _settle(self, attempt):
+        """Claim the right to record an attempt's outcome; only the first caller gets it"""
+        with self._lock:
+            if attempt['settled']:
+                return False
+            attempt['settled'] = True
+            return True
+
+    def _count(self, model=None, key=None, fallback=False):
+        with self._lock:
+            if model:
+                self.counts[model][key] += 1
+            if fallback:
+                self.fallbacks += 1
+
+    def _run(self, future, call, attempt, end):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._timed_call(call, attempt, end))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _timed_call(self, call, attempt, end):
+        model = attempt['model']
+        with self._lock:
+            # The turn may already have given up on this attempt before it started
+            attempt['started'] = not attempt['settled']
+        if not attempt['started']:
+            raise TimeoutError(f"turn deadline passed before the {model} call started")
+        self._count(model, 'calls')
+        start = time.monotonic()
+        try:
+            # The model gets whatever is left of the turn when the call starts
+            result = call(model, max(end - start, 0.1))
+        except Exception:
+            if self._settle(attempt):
+                self._count(model, 'failures')
+                self.breakers[model].record_failure()
+            raise
+        # A late answer still tells us how slow the model is
+        self.latency[model].record(time.monotonic() - start)
+        if self._settle(attempt):
+            self.breakers[model].record_success()
+        return result
+
+    def stats(self):
+        """Per-model breaker state, latency percentiles and counters"""
+        models = {}
+        for model in self.models:
+            p50 = self.latency[model].percentile(50)
+            p95 = self.latency[model].percentile(95)
+            models[model] = {
+                'state': self.breakers[model].state,
+                'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000) if p95 is not None else None,
+                **self.counts[model]
+            }
+        return {
+            'models': models,
+            'deadline_seconds': self.deadline,
+            'hedge_after_seconds': self.hedge_after,
+            'fallbacks': self.fallbacks
+        }
+
+    def shutdown(self):
+        """Nothing to stop: calls run on daemon threads that end with their call"""
+
+
+_router = None
+_router_key = None
+_router_lock = threading.Lock()
+
+
+def get_llm_router(config):
+    """Return the shared router, rebuilt when the model list or timings change"""
+    global _router, _router_key
+
+    models = config.get('LLM_MODELS') or DEFAULT_MODELS
+    if isinstance(models, str):
+        models = [model.strip() for model in models.split(',') if model.strip()]
+    deadline = float(config.get('LLM_TURN_DEADLINE') or DEFAULT_TURN_DEADLINE)
+    hedge_after = float(config.get('LLM_HEDGE_AFTER') or DEFAULT_HEDGE_AFTER)
+
+    key = (tuple(models), deadline, hedge_after)
+    with _router_lock:
+        if _router is None or _router_key != key:
+            if _router:
+                _router.shutdown()
+            _router = LLMRouter(models, deadline, hedge_after)
+            _router_key = key
+        return _router
+
+
+def _reset_router():
+    """A forked worker builds its own router; the parent's call threads don't exist here"""
+    global _router, _router_key, _router_lock
+    _router = None
+    _router_key = None
+    _router_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_router)
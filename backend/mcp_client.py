@@ -0,0 +1,372 @@
+import asyncio
+import atexit
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# How long a single scrape may take, queueing included, before we give up on it
+DEFAULT_REQUEST_TIMEOUT = 180
+
+# How long a freshly started server gets to answer the initialize handshake
+INITIALIZE_TIMEOUT = 30
+
+# Pending scrapes allowed to wait for the worker before submit() blocks
+MAX_QUEUED_REQUESTS = 100
+
+# MCP revision we speak; the server answers with the one it picked
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "steve-appointment-booker", "version": "1.0"}
+
+# JSON-RPC error code for requests we don't serve (the server may ask us for roots, sampling, ...)
+METHOD_NOT_FOUND = -32601
+
+
+class MCPClientWorker:
+    """Long-lived Bright Data MCP server process shared by all scrapes.
+
+    Speaks MCP over stdio: newline-delimited JSON-RPC 2.0 messages. A new
+    process is sent `initialize`, and `notifications/initialized` once it
+    answers; after that each scrape is one `tools/call` request. Requests are
+    sent one at a time from a queue and a reader task matches responses to
+    them by id. A caller that gives up (submit() timed out) has its request
+    dropped from the queue, or, once sent, cancelled with
+    `notifications/cancelled`. Stdout lines that aren't JSON are server log
+    output.
+    """
+
+    def __init__(self, command, env=None, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+        self.command = list(command)
+        self.env = env
+        self.request_timeout = request_timeout
+        self.server_info = None
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._process = None
+        self._reader = None
+        self._responses = {}  # request id -> future for its response
+        self._dispatcher = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # --- Public, thread-safe API ---
+
+    def start(self):
+        """Start the event loop thread that owns the server process"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._closed = False
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="mcp-client-worker", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def submit(self, tool, arguments, timeout=None):
+        """Call an MCP tool and block until its businesses are available ([] on error or timeout)"""
+        if self._closed:
+            raise RuntimeError("MCP client worker is closed")
+        self.start()
+        timeout = timeout or self.request_timeout
+        future = asyncio.run_coroutine_threadsafe(self._enqueue(tool, arguments), self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            # Unqueues the request, or has the dispatcher cancel it on the server
+            future.cancel()
+            logger.error(f"MCP {tool} call timed out after {timeout}s")
+            return []
+
+    def close(self):
+        """Stop the server process and the event loop thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop = self._loop
+        if loop and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=10)
+            loop.call_soon_threadsafe(loop.stop)
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    @property
+    def pid(self):
+        return self._process.pid if self._process else None
+
+    # --- Event loop side ---
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=MAX_QUEUED_REQUESTS)
+        self._dispatcher = self._loop.create_task(self._dispatch())
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _enqueue(self, tool, arguments):
+        future = self._loop.create_future()
+        await self._queue.put((tool, arguments, future))
+        # Cancelling this coroutine (submit() timed out) cancels future as well
+        return await future
+
+    async def _ensure_process(self):
+        if self._process and self._process.returncode is None:
+            return self._process
+        if self._process:
+            logger.warning(f"MCP server exited with code {self._process.returncode}, restarting")
+            await self._kill_process()
+        env = dict(os.environ)
+        if self.env:
+            env.update(self.env)
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=env
+        )
+        self._reader = self._loop.create_task(self._read(self._process))
+        try:
+            response = await asyncio.wait_for(self._request("initialize", {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": CLIENT_INFO
+            }), INITIALIZE_TIMEOUT)
+            if "error" in response:
+                raise RuntimeError(f"initialize failed: {response['error']}")
+            self.server_info = response["result"].get("serverInfo")
+            await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        except BaseException:
+            await self._kill_process()
+            raise
+        logger.info(f"Started MCP server {self.server_info} (pid {self._process.pid})")
+        return self._process
+
+    async def _dispatch(self):
+        """Serve queued tool calls one at a time against the warm process"""
+        while True:
+            tool, arguments, caller = await self._queue.get()
+            if caller.done():
+                # The caller gave up while the request was queued
+                continue
+            try:
+                await self._ensure_process()
+                if caller.done():
+                    continue
+                request_id = next(self._ids)
+                response = asyncio.ensure_future(self._request("tools/call", {"name": tool, "arguments": arguments}, request_id))
+                await asyncio.wait({response, caller}, return_when=asyncio.FIRST_COMPLETED)
+                if not response.done():
+                    response.cancel()
+                    self._responses.pop(request_id, None)
+                    await self._send({"jsonrpc": "2.0", "method": "notifications/cancelled",
+                                      "params": {"requestId": request_id, "reason": "Request timed out"}})
+                    logger.info(f"Cancelled MCP request {request_id}")
+                    continue
+                message = response.result()
+                if "error" in message:
+                    logger.error(f"MCP {tool} call failed: {message['error']}")
+                    businesses = []
+                else:
+                    businesses = businesses_from_result(message.get("result") or {})
+                if not caller.done():
+                    caller.set_result(businesses)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"MCP {tool} call failed: {str(e)}")
+                # The process may be wedged mid-message; start fresh for the next request
+                await self._kill_process()
+                if not caller.done():
+                    caller.set_result([])
+
+    async def _request(self, method, params, request_id=None):
+        """Send a JSON-RPC request and return the response message"""
+        request_id = request_id if request_id is not None else next(self._ids)
+        future = self._loop.create_future()
+        self._responses[request_id] = future
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            return await future
+        finally:
+            self._responses.pop(request_id, None)
+
+    async def _send(self, message):
+        self._process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        await self._process.stdin.drain()
+
+    async def _read(self, process):
+        """Route the server's stdout: responses to their requests, requests answered, the rest logged"""
+        while True:
+            raw = await process.stdout.readline()
+            if not raw:
+                break
+            message = parse_json_line(raw)
+            if message is None:
+                logger.debug(f"MCP server: {raw.decode('utf-8', errors='replace').rstrip()}")
+                continue
+
+            if "method" in message and "id" in message:
+                # Server-to-client request; we only answer pings
+                if message["method"] == "ping":
+                    reply = {"jsonrpc": "2.0", "id": message["id"], "result": {}}
+                else:
+                    reply = {"jsonrpc": "2.0", "id": message["id"],
+                             "error": {"code": METHOD_NOT_FOUND, "message": f"Method not found: {message['method']}"}}
+                try:
+                    await self._send(reply)
+                except (BrokenPipeError, ConnectionResetError):
+                    break
+            elif "method" in message:
+                logger.debug(f"MCP notification: {message['method']}")
+            else:
+                # Responses to requests we cancelled have no future left and are dropped
+                future = self._responses.get(message.get("id"))
+                if future and not future.done():
+                    future.set_result(message)
+
+        # EOF: nothing more will answer the requests in flight
+        for future in self._responses.values():
+            if not future.done():
+                future.set_exception(ConnectionError("MCP server closed stdout"))
+
+    async def _kill_process(self):
+        process, self._process = self._process, None
+        reader, self._reader = self._reader, None
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if reader:
+            reader.cancel()
+
+    async def _shutdown(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        process, self._process = self._process, None
+        if not process or process.returncode is not None:
+            return
+        try:
+            # Closing stdin is how an MCP stdio client asks the server to exit
+            process.stdin.close()
+            await asyncio.wait_for(process.wait(), 5)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            process.kill()
+            await process.wait()
+        if self._reader:
+            self._reader.cancel()
+
+
+def parse_json_line(raw):
+    """Return the JSON object on a stdout line, or None for log output"""
+    line = raw.decode("utf-8", errors="replace").strip() if isinstance(raw, bytes) else raw.strip()
+    if not (line.startswith("{") and line.endswith("}")):
+        return None
+    try:
+        value = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def businesses_from_result(result):
+    """Businesses in a tools/call result.
+
+    structuredContent is used when the tool returns it; otherwise each text
+    content item that holds JSON is read. An object with a "businesses" list,
+    a list of objects or a single object are all accepted; plain text is not
+    business data.
+    """
+    if result.get("isError"):
+        text = " ".join(item.get("text", "") for item in result.get("content") or [] if isinstance(item, dict))
+        logger.error(f"MCP tool error: {text}")
+        return []
+
+    if "structuredContent" in result:
+        values = [result["structuredContent"]]
+    else:
+        values = []
+        for item in result.get("content") or []:
+            if not isinstance(item, dict) or item.get("type") != "text":
+                continue
+            try:
+                values.append(json.loads(item.get("text", "")))
+            except json.JSONDecodeError:
+                logger.debug("MCP tool returned text that isn't JSON")
+
+    businesses = []
+    for value in values:
+        if isinstance(value, dict) and isinstance(value.get("businesses"), list):
+            value = value["businesses"]
+        if isinstance(value, list):
+            businesses.extend(record for record in value if isinstance(record, dict))
+        elif isinstance(value, dict):
+            businesses.append(value)
+    return businesses
+
+
+# --- Shared worker ---
+
+_worker = None
+_worker_key = None
+_worker_lock = threading.Lock()
+
+
+def get_mcp_worker(api_token, web_unlocker_zone=None, browser_auth=None, command=None):
+    """Return the process-wide MCP worker, restarting it if the credentials changed"""
+    global _worker, _worker_key
+
+    key = (api_token, web_unlocker_zone, browser_auth, tuple(command or ()))
+    with _worker_lock:
+        if _worker and _worker_key == key:
+            return _worker
+        if _worker:
+            _worker.close()
+
+        from scraper import mcp_server_config
+        server = mcp_server_config(api_token, web_unlocker_zone, browser_auth)
+        if command is None:
+            command = [server["command"]] + server["args"]
+
+        _worker = MCPClientWorker(command, env=server["env"])
+        _worker_key = key
+        return _worker
+
+
+def shutdown_mcp_worker():
+    """Stop the shared worker (registered to run at interpreter exit)"""
+    global _worker, _worker_key
+    with _worker_lock:
+        if _worker:
+            _worker.close()
+        _worker = None
+        _worker_key = None
+
+
+atexit.register(shutdown_mcp_worker)
+
+
+def _forget_mcp_worker():
+    """In a forked worker the parent's MCP process isn't ours to use or stop"""
+    global _worker, _worker_key, _worker_lock
+    _worker = None
+    _worker_key = None
+    _worker_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_mcp_worker)
@@ -1,13 +1,21 @@
 import sqlite3
 from contextlib import contextmanager
 import os
+from lead_identity import ensure_lead_identity_index
+from search import ensure_search_index
+from learning import ensure_learning_tables
+from job_queue import ensure_job_tables
 
 DB_PATH = os.environ.get('DATABASE_URL', 'leads.db').replace('sqlite:///', '')
 
 @contextmanager
-def get_db():
+def get_db(with_archive=False):
+    """Connection to the main database; with_archive adds the call_logs_all view over archived logs"""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    if with_archive:
+        from archive import attach_archive
+        attach_archive(conn)
     try:
         yield conn
     finally:
@@ -95,6 +103,28 @@ def init_db():
             )
         ''')
         
+        # Create prompt_versions table (compiled system prompts, keyed by hash)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prompt_versions (
+                prompt_hash TEXT PRIMARY KEY,
+                stage TEXT,
+                industry TEXT,
+                prompt TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Create call_artifacts table (short-lived per-call data spilled from artifact_store.py)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS call_artifacts (
+                kind TEXT,
+                key TEXT,
+                value TEXT,
+                expires_at REAL,
+                PRIMARY KEY (kind, key)
+            )
+        ''')
+        
         conn.commit()
         
         # Check if new columns exist and add them if not
@@ -104,10 +134,18 @@ def init_db():
             ('industry', 'TEXT'),
             ('city', 'TEXT'),
             ('state', 'TEXT'),
+            ('zipcode', 'TEXT'),
             ('appointment_date', 'TEXT'),
             ('appointment_time', 'TEXT'),
             ('qualification_status', 'TEXT DEFAULT "Not Qualified"'),
-            ('notes', 'TEXT')
+            ('notes', 'TEXT'),
+            ('address', 'TEXT'),
+            ('website', 'TEXT'),
+            ('company', 'TEXT'),
+            ('position', 'TEXT'),
+            ('location', 'TEXT'),
+            ('phone_e164', 'TEXT'),
+            ('identity_key', 'TEXT')
         ]
         
         for col_name, col_type in columns_to_add:
@@ -117,3 +155,43 @@ def init_db():
                 # Column doesn't exist, add it
                 conn.execute(f'ALTER TABLE leads ADD COLUMN {col_name} {col_type}')
                 conn.commit()
+        
+        # Prompt used for each bot turn (see prompt_compiler.py)
+        try:
+            conn.execute('SELECT prompt_hash FROM call_logs LIMIT 1')
+        except sqlite3.OperationalError:
+            conn.execute('ALTER TABLE call_logs ADD COLUMN prompt_hash TEXT')
+            conn.commit()
+        
+        # Twilio CallSid for AMD results and voicemail TwiML
+        try:
+            conn.execute('SELECT call_sid FROM call_logs LIMIT 1')
+        except sqlite3.OperationalError:
+            conn.execute('ALTER TABLE call_logs ADD COLUMN call_sid TEXT')
+            conn.commit()
+        
+        # Per-lead transcript lookups (conversation history windowing)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_call_logs_lead_id ON call_logs(lead_id, id)')
+        
+        # Per-lead timeline lookups (see lead_timeline.py)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_appointments_lead_id ON appointments(lead_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_follow_ups_lead_id ON follow_ups(lead_id)')
+        
+        # Normalized phone / fuzzy name+address keys used to dedupe leads
+        ensure_lead_identity_index(conn)
+        
+        # FTS5 indexes over leads and conversation turns, kept in sync by triggers
+        ensure_search_index(conn)
+        
+        # Learned patterns and the incremental learning engine's progress (see learning.py)
+        ensure_learning_tables(conn)
+        
+        # Durable queue for scraping, dialing, imports and other long operations (see job_queue.py)
+        ensure_job_tables(conn)
+
+
+if __name__ == '__main__':
+    # One-time schema setup / migration step, run before starting the app:
+    #   cd backend && python models.py
+    init_db()
+    print(f"Database initialized at {DB_PATH}")
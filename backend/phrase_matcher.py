@@ -0,0 +1,179 @@
+import re
+from collections import deque
+
+
+class PhraseMatcher:
+    """Multi-phrase matcher that tags text with every intent it mentions in one pass.
+
+    Built on an Aho-Corasick automaton, so the cost of scanning a message is
+    linear in its length no matter how many phrases are registered. Matching
+    is case-insensitive substring matching, the same semantics as the
+    `phrase in text.lower()` checks it replaces.
+    """
+
+    def __init__(self, phrase_tags=None):
+        # Trie nodes: goto transitions, failure link, tags/phrases ending at the
+        # node itself, and (after compile) everything reachable via failure links
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [[]]
+        self._output = [[]]
+        self._compiled = False
+        for phrase, tags in (phrase_tags or {}).items():
+            self.add(phrase, tags)
+
+    def add(self, phrase, tags):
+        """Register a phrase under one tag or a list of tags"""
+        if isinstance(tags, str):
+            tags = [tags]
+        node = 0
+        for char in phrase.lower():
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append([])
+            node = next_node
+        self._terminal[node].extend((tag, phrase.lower()) for tag in tags)
+        self._compiled = False
+        return self
+
+    def compile(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        output = [list(tags) for tags in self._terminal]
+        queue = deque()
+        for next_node in self._goto[0].values():
+            self._fail[next_node] = 0
+            queue.append(next_node)
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                output[next_node] = output[next_node] + output[self._fail[next_node]]
+        self._output = output
+        self._compiled = True
+        return self
+
+    def scan(self, text):
+        """Return {tag: [matched phrases]} for every registered phrase found in text"""
+        if not self._compiled:
+            self.compile()
+        hits = {}
+        if not text:
+            return hits
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for tag, phrase in output[node]:
+                matched = hits.setdefault(tag, [])
+                if phrase not in matched:
+                    matched.append(phrase)
+        return hits
+
+    def tags(self, text):
+        """Return the set of tags whose phrases occur in text"""
+        return set(self.scan(text))
+
+
+# --- Shared conversation vocabulary ---
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Objection phrases and the industry_patterns key their handling is stored under
+OBJECTION_INDICATORS = {
+    "not interested": "objection:not interested",
+    "too busy": "objection:too busy",
+    "already have": "objection:already have",
+    "using another": "objection:using another",
+    "too expensive": "objection:too expensive"
+}
+
+CONVERSATION_PHRASES = {
+    # Callback requests and timing (analyze_callback_indicators)
+    "callback": ["call me back", "call back", "call later", "try again", "try me again",
+                 "call again", "another time", "busy right now", "not a good time"],
+    "tomorrow": ["tomorrow", "next day"],
+    "next_week": ["next week"],
+    "morning": ["morning"],
+    "afternoon": ["afternoon"],
+
+    # Lead reactions (learning jobs)
+    "positive": ["yes", "interested"],
+
+    # Bot phrasing (learning jobs)
+    "value_offer": ["save", "help"],
+
+    # Conversation outcome (check_conversation_result)
+    "confirmation": ["confirmed", "scheduled"],
+    "meeting": ["appointment", "meeting"],
+    "disqualified": ["not a good fit", "doesn't seem like"],
+    "thanks_for_time": ["thank you for your time"],
+    "goodbye": ["goodbye"],
+
+    # Keyword families used to sort bot lines into pattern categories (learning.py)
+    "learn:objection": ['but', 'however', 'concerned', 'worry', 'expensive', 'cost', 'price', 'time', 'not sure'],
+    "learn:value": ['save', 'benefit', 'improve', 'increase', 'reduce', 'solution', 'better'],
+    "learn:qualification": ['how many', 'employees', 'budget', 'currently', 'decision', 'timeline', 'process'],
+    "learn:closing": ['schedule', 'appointment', 'available', 'meet', 'next steps', 'follow up', 'calendar'],
+}
+
+# Spoken callback times ("3pm", "3:30", "3 o'clock"), tried in this order
+TIME_PATTERNS = [
+    re.compile(r"(\d{1,2})\s*(am|pm)"),
+    re.compile(r"(\d{1,2}):(\d{2})\s*(am|pm)?"),
+    re.compile(r"(\d{1,2})\s*o'clock")
+]
+
+
+def build_conversation_matcher():
+    matcher = PhraseMatcher()
+    for tag, phrases in CONVERSATION_PHRASES.items():
+        for phrase in phrases:
+            matcher.add(phrase, tag)
+    for phrase, objection_key in OBJECTION_INDICATORS.items():
+        matcher.add(phrase, ["objection", objection_key])
+    for day in WEEKDAYS:
+        matcher.add(day, ["weekday", f"day:{day}"])
+    return matcher.compile()
+
+
+# Shared by voice.py and the learning endpoints
+CONVERSATION_MATCHER = build_conversation_matcher()
+
+
+def find_spoken_time(text):
+    """Return the first spoken time match (as re.findall would) or None"""
+    for pattern in TIME_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            groups = match.groups(default='')
+            return groups if len(groups) > 1 else groups[0]
+    return None
+
+
+def first_weekday(hits):
+    """Index (0 = Monday) of the earliest weekday mentioned, given scan() output"""
+    days = hits.get("weekday", [])
+    indexes = [WEEKDAYS.index(day) for day in days]
+    return min(indexes) if indexes else None
+
+
+def first_objection(hits, available=None):
+    """The industry_patterns key of the first objection (in OBJECTION_INDICATORS order) mentioned.
+
+    With available (e.g. the learned prompt fragments), objection types not in
+    it are skipped, so a later mentioned objection with learned responses wins.
+    """
+    for key in OBJECTION_INDICATORS.values():
+        if key in hits and (available is None or key in available):
+            return key
+    return None
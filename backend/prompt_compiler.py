@@ -0,0 +1,142 @@
+import time
+import hashlib
+import threading
+import logging
+from functools import lru_cache
+from phrase_matcher import CONVERSATION_MATCHER, first_objection
+
+logger = logging.getLogger(__name__)
+
+# Steve Schiffman-style instructions; {stage} and {industry} are filled per compiled prompt
+SYSTEM_PROMPT_TEMPLATE = """
+        You are an AI sales assistant named Steve following the Steve Schiffman method of appointment setting.
+        Your goal is to set an appointment, not to sell on this call.
+
+        Current conversation stage: {stage}
+
+        Follow these principles:
+        1. Be direct, polite, and straight to the point
+        2. Focus on qualifying the prospect (do they use mobile devices, do they have 10+ employees)
+        3. Present brief value (example: "We've helped similar {industry} companies save 20% on mobile costs through telecom expense management and mobile device management")
+        4. Ask directly for a short appointment (15 minutes)
+        5. Handle objections with the Ledge technique (acknowledge, pivot back to appointment)
+        6. Maintain a professional, confident tone
+
+        To sound more natural and human-like:
+        1. Use contractions (I'm, we've, can't, don't)
+        2. Include occasional filler words like "um" or "you know" (but sparingly)
+        3. Start some sentences with connectors like "So," "Well," or "And"
+        4. Occasionally correct yourself mid-sentence or rephrase
+        5. Vary your sentence length and structure
+        6. Use more casual language and informal phrases
+        7. Sound engaged and empathetic by responding to what the person just said
+
+        For objection handling:
+        - If "not interested": Respond with a benefit example and restate meeting request
+        - If "too busy": Suggest a short meeting later, "even 10 minutes can find savings"
+        - If "using another provider": Acknowledge and mention "we often find savings even with current providers"
+
+        Keep your responses brief, natural and conversational.
+        """
+
+# Learned patterns are re-read at most this often per industry (other workers may update them)
+PATTERN_CACHE_TTL = 60
+
+_pattern_cache = {}
+_pattern_lock = threading.Lock()
+_recorded_hashes = set()
+
+
+@lru_cache(maxsize=256)
+def compile_base_prompt(stage, industry):
+    """Static part of the system prompt for a (stage, industry) pair"""
+    return SYSTEM_PROMPT_TEMPLATE.format(stage=stage, industry=industry)
+
+
+def build_pattern_fragments(industry, learned_patterns):
+    """Prompt sections for an industry's learned patterns, keyed by stage or objection type"""
+    fragments = {}
+    if not learned_patterns:
+        return fragments
+
+    top_phrases = sorted(learned_patterns.get("successful_phrases", {}).items(),
+                         key=lambda x: x[1], reverse=True)[:3]
+    if top_phrases:
+        phrases_text = "\n".join([f"- {phrase}" for phrase, _ in top_phrases])
+        fragments["value_proposition"] = f"\n\nThese value statements have been particularly effective for {industry} companies:\n{phrases_text}"
+
+    for objection_type, responses in learned_patterns.get("objection_responses", {}).items():
+        if responses[:2]:
+            responses_text = "\n".join([f"- {resp}" for resp in responses[:2]])
+            fragments[objection_type] = f"\n\nThese responses have worked well for this type of objection:\n{responses_text}"
+    return fragments
+
+
+def get_pattern_fragments(industry, load_patterns):
+    """Cached (version, fragments) for an industry; the version changes whenever the fragments do"""
+    now = time.time()
+    with _pattern_lock:
+        entry = _pattern_cache.get(industry)
+        if entry and now - entry[0] < PATTERN_CACHE_TTL:
+            return entry[1], entry[2]
+
+    fragments = build_pattern_fragments(industry, load_patterns(industry))
+    digest = hashlib.sha256(repr(sorted(fragments.items())).encode('utf-8')).hexdigest()[:12]
+    with _pattern_lock:
+        _pattern_cache[industry] = (now, digest, fragments)
+    return digest, fragments
+
+
+def invalidate_learned_patterns(industry=None):
+    """Drop cached fragments after industry_patterns changes"""
+    with _pattern_lock:
+        if industry is None:
+            _pattern_cache.clear()
+        else:
+            _pattern_cache.pop(industry, None)
+
+
+def compile_prompt(stage, industry, lead_text=None, load_patterns=None):
+    """Return (system_prompt, prompt_hash) for a turn.
+
+    The static prompt comes from compile_base_prompt and learned-pattern
+    fragments from the versioned per-industry cache; only the objection type
+    is detected per turn. The prompt text is stored in prompt_versions under
+    its hash the first time it is seen, so any turn can be replayed exactly.
+    """
+    system_prompt = compile_base_prompt(stage, industry)
+
+    if industry and load_patterns:
+        _, fragments = get_pattern_fragments(industry, load_patterns)
+        if stage == "value_proposition":
+            system_prompt += fragments.get("value_proposition", "")
+        elif stage == "objection_handling" and lead_text:
+            objection_type = first_objection(CONVERSATION_MATCHER.scan(lead_text), fragments)
+            if objection_type:
+                system_prompt += fragments.get(objection_type, "")
+
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+    if prompt_hash not in _recorded_hashes:
+        record_prompt_version(prompt_hash, stage, industry, system_prompt)
+    return system_prompt, prompt_hash
+
+
+def record_prompt_version(prompt_hash, stage, industry, system_prompt):
+    """Store a compiled prompt under its hash (once per process per hash)"""
+    from models import get_db
+    try:
+        with get_db() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO prompt_versions (prompt_hash, stage, industry, prompt)
+                VALUES (?, ?, ?, ?)
+            ''', (prompt_hash, stage, industry, system_prompt))
+            conn.commit()
+        _recorded_hashes.add(prompt_hash)
+    except Exception as e:
+        logger.error(f"Error recording prompt version {prompt_hash}: {str(e)}")
+
+
+def get_prompt_version(conn, prompt_hash):
+    """The stored prompt for a hash, or None"""
+    row = conn.execute('SELECT * FROM prompt_versions WHERE prompt_hash = ?', (prompt_hash,)).fetchone()
+    return dict(row) if row else None
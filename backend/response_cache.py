@@ -0,0 +1,230 @@
+import re
+import time
+import zlib
+import random
+import threading
+import logging
+from collections import OrderedDict, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length and LSH banding (16 bands of 4 rows finds pairs
+# with Jaccard similarity around 0.5 and above; candidates are then checked exactly)
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_SIMILARITY = 0.8
+
+# Words that don't change what the lead meant
+FILLER_WORDS = {'um', 'uh', 'er', 'erm', 'hmm', 'mm', 'oh', 'well', 'like', 'so'}
+
+# Stands in for the lead's name, company or city in cache contexts
+LEAD_SLOT = '{lead}'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+
+def normalize_utterance(text):
+    """Lower-case words without punctuation or filler words"""
+    words = re.findall(r"[a-z0-9]+", (text or "").lower().replace("'", ""))
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def shingles(normalized):
+    """Word unigrams and bigrams; short utterances need both to compare well"""
+    words = normalized.split()
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(shingle_set):
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def lead_slots(lead_data):
+    """The lead-specific words the bot says: the lead's name, the first word of it (the opener's contact name) and city"""
+    if not lead_data:
+        return ()
+    name = (lead_data.get('name') or '').strip()
+    values = {name, name.split()[0] if name else '', (lead_data.get('city') or '').strip()}
+    return tuple(sorted((value for value in values if value), key=len, reverse=True))
+
+
+def strip_slots(text, slots):
+    """Replace each slot value in text with LEAD_SLOT, longest first"""
+    for value in slots:
+        text = re.sub(r"(?<!\w)" + re.escape(value) + r"(?!\w)", LEAD_SLOT, text, flags=re.IGNORECASE)
+    return text
+
+
+def question_context(history, slots=()):
+    """The bot's last question with the lead's name, company and city blanked out.
+
+    The stage is already part of the cache scope, so this is all the context
+    a reply depends on: two leads asked the same question at the same stage
+    share entries. Replies that mention a slot are never stored (see voice.py).
+    """
+    last_bot = next((msg["content"] for msg in reversed(history or []) if msg["role"] == "assistant"), "")
+    sentences = re.split(r"(?<=[.!?])\s+", last_bot.strip())
+    question = next((sentence for sentence in reversed(sentences) if sentence.endswith('?')), sentences[-1])
+    return normalize_utterance(strip_slots(question, slots))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class ResponseCache:
+    """Near-duplicate cache of LLM replies per (stage, industry, prompt).
+
+    Exact matches on the normalized utterance are a dict lookup; otherwise
+    MinHash LSH buckets supply candidates whose exact Jaccard similarity must
+    reach the threshold. Entries expire after ttl seconds and the least
+    recently used entry is evicted beyond max_entries. Hits and misses are
+    counted per stage, except for lookups made with record=False.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, similarity=DEFAULT_SIMILARITY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._entries = OrderedDict()   # (scope, normalized) -> entry dict
+        self._buckets = defaultdict(set)  # (scope, band, band hash) -> entry keys
+        self._lock = threading.Lock()
+        self.metrics = defaultdict(lambda: {'hits': 0, 'near_hits': 0, 'misses': 0, 'stores': 0})
+
+    def get(self, stage, industry, utterance, prompt_hash=None, context=None, record=True):
+        """Cached reply for an utterance at this stage and question context (question_context), or None
+
+        Speculative lookups pass record=False so answers nobody gave yet
+        don't move the hit rate.
+        """
+        scope = (stage, industry, prompt_hash, context)
+        normalized = normalize_utterance(utterance)
+        if not normalized:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._live_entry((scope, normalized), now)
+            if entry:
+                if record:
+                    self.metrics[stage]['hits'] += 1
+                return entry['response']
+
+            shingle_set = shingles(normalized)
+            best, best_score = None, self.similarity
+            for key in self._candidates(scope, minhash(shingle_set)):
+                candidate = self._live_entry(key, now)
+                if candidate:
+                    score = jaccard(shingle_set, candidate['shingles'])
+                    if score >= best_score:
+                        best, best_score = candidate, score
+            if best:
+                self._entries.move_to_end(best['key'])
+                if record:
+                    self.metrics[stage]['hits'] += 1
+                    self.metrics[stage]['near_hits'] += 1
+                return best['response']
+
+            if record:
+                self.metrics[stage]['misses'] += 1
+            return None
+
+    def put(self, stage, industry, utterance, response, prompt_hash=None, context=None):
+        scope = (stage, industry, prompt_hash, context)
+        normalized = normalize_utterance(utterance)
+        if not normalized or not response:
+            return
+        shingle_set = shingles(normalized)
+        signature = minhash(shingle_set)
+        key = (scope, normalized)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'key': key,
+                'response': response,
+                'shingles': shingle_set,
+                'signature': signature,
+                'created_at': time.time()
+            }
+            for bucket in self._bucket_keys(scope, signature):
+                self._buckets[bucket].add(key)
+            self.metrics[stage]['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        """Per-stage hit rates plus cache size"""
+        with self._lock:
+            stages = {}
+            for stage, counts in self.metrics.items():
+                lookups = counts['hits'] + counts['misses']
+                stages[stage] = dict(counts, hit_rate=round(counts['hits'] / lookups, 3) if lookups else 0.0)
+            return {'entries': len(self._entries), 'ttl_seconds': self.ttl, 'stages': stages}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    # --- Internal helpers (caller holds the lock) ---
+
+    def _live_entry(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry['created_at'] > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _bucket_keys(self, scope, signature):
+        for band in range(LSH_BANDS):
+            yield (scope, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+
+    def _candidates(self, scope, signature):
+        keys = set()
+        for bucket in self._bucket_keys(scope, signature):
+            keys.update(self._buckets.get(bucket, ()))
+        return keys
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket in self._bucket_keys(key[0], entry['signature']):
+            members = self._buckets.get(bucket)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._buckets[bucket]
+
+
+_cache = None
+_cache_key = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache(config):
+    """Return the shared cache, or None when RESPONSE_CACHE_ENABLED is off"""
+    global _cache, _cache_key
+    if str(config.get('RESPONSE_CACHE_ENABLED', True)).lower() in ('false', '0', ''):
+        return None
+    key = (
+        float(config.get('RESPONSE_CACHE_TTL') or DEFAULT_TTL),
+        int(config.get('RESPONSE_CACHE_SIZE') or DEFAULT_MAX_ENTRIES),
+        float(config.get('RESPONSE_CACHE_SIMILARITY') or DEFAULT_SIMILARITY)
+    )
+    with _cache_lock:
+        if _cache is None or _cache_key != key:
+            _cache = ResponseCache(*key)
+            _cache_key = key
+        return _cache
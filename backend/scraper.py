@@ -1,9 +1,7 @@
-import asyncio
-import subprocess
 import json
-import os
-import tempfile
 from config import get_config
+from mcp_client import get_mcp_worker
+from lead_identity import dedupe_businesses
 import logging
 import random
 import requests
@@ -29,77 +27,38 @@ def is_internet_connected():
         except (socket.timeout, socket.error):
             return False
 
-def create_mcp_config(api_token, web_unlocker_zone=None, browser_auth=None):
-    """Create a temporary MCP configuration file with Bright Data settings"""
+# Bright Data MCP tool each scrape calls
+SCRAPE_TOOL = "search_engine"
+
+def mcp_server_config(api_token, web_unlocker_zone=None, browser_auth=None):
+    """The Bright Data MCP server's command, arguments and environment"""
     config = {
-        "mcpServers": {
-            "Bright Data": {
-                "command": "npx",
-                "args": ["@brightdata/mcp"],
-                "env": {
-                    "API_TOKEN": api_token
-                }
-            }
+        "command": "npx",
+        "args": ["@brightdata/mcp"],
+        "env": {
+            "API_TOKEN": api_token
         }
     }
     
     if web_unlocker_zone:
-        config["mcpServers"]["Bright Data"]["env"]["WEB_UNLOCKER_ZONE"] = web_unlocker_zone
+        config["env"]["WEB_UNLOCKER_ZONE"] = web_unlocker_zone
     
     if browser_auth:
-        config["mcpServers"]["Bright Data"]["env"]["BROWSER_AUTH"] = browser_auth
+        config["env"]["BROWSER_AUTH"] = browser_auth
     
-    temp_config = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False)
-    json.dump(config, temp_config)
-    temp_config.close()
-    
-    return temp_config.name
+    return config
 
-def run_mcp_scraper(prompt, config_path):
-    """Run a Bright Data MCP scraping task using the MCP client"""
+def run_mcp_scraper(query, api_token, web_unlocker_zone=None, browser_auth=None):
+    """Run a Bright Data MCP search on the shared, long-lived MCP server"""
     try:
-        cmd = ["npx", "@brightdata/mcp-client", "--config", config_path, "--prompt", prompt]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            logger.error(f"MCP client error: {result.stderr}")
-            return []
-        
-        # Parse the output to extract structured data
-        try:
-            # The output might contain logs and other information before the JSON
-            # Look for a valid JSON object in the output
-            output_lines = result.stdout.strip().split('\n')
-            json_data = None
-            
-            for line in output_lines:
-                line = line.strip()
-                if line.startswith('{') and line.endswith('}'):
-                    try:
-                        json_data = json.loads(line)
-                        break
-                    except json.JSONDecodeError:
-                        continue
-            
-            if json_data and 'businesses' in json_data:
-                return json_data['businesses']
-            elif json_data:
-                return [json_data]
-            else:
-                logger.warning("No valid JSON data found in MCP output")
-                return []
-                
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse MCP output: {result.stdout}")
-            return []
-            
+        worker = get_mcp_worker(api_token, web_unlocker_zone, browser_auth)
+        businesses = worker.submit(SCRAPE_TOOL, {"query": query})
+        if not businesses:
+            logger.warning("No business data found in the MCP tool result")
+        return businesses
     except Exception as e:
-        logger.error(f"Error running MCP client: {str(e)}")
+        logger.error(f"Error running MCP scrape: {str(e)}")
         return []
-    finally:
-        # Clean up the temporary config file
-        if os.path.exists(config_path):
-            os.unlink(config_path)
 
 def scrape_businesses(location="Denver, CO", industry="Plumbing", limit=30):
     """Scrape businesses from Google Maps or business directories using Bright Data MCP"""
@@ -112,14 +71,11 @@ def scrape_businesses(location="Denver, CO", industry="Plumbing", limit=30):
         logger.warning("No Bright Data API token provided. Using dummy data.")
         return generate_dummy_businesses(location, industry, limit)
     
-    # Create MCP config file
-    config_path = create_mcp_config(api_token, web_unlocker_zone, browser_auth)
-    
-    # Craft the prompt for business extraction
-    prompt = f"Extract data for {limit} {industry} companies in {location} from Google Maps or business directories. For each business, get their name, phone number, address, website if available, and estimate the number of employees if shown. Return as structured JSON."
+    # Search for the businesses; the tool result is parsed as it arrives
+    query = f"{limit} {industry} companies in {location}"
     
     # Run the MCP scraper
-    businesses = run_mcp_scraper(prompt, config_path)
+    businesses = run_mcp_scraper(query, api_token, web_unlocker_zone, browser_auth)
     
     # Process and format the results
     formatted_businesses = []
@@ -1034,13 +990,8 @@ def scrape_business_leads(location="Denver, CO", industry="Plumbing", limit=30):
         except Exception as e:
             logger.error(f"Error scraping from Google Search: {str(e)}")
     
-    # Deduplicate businesses by name
-    unique_businesses = []
-    seen_names = set()
-    for business in businesses:
-        if business['name'] not in seen_names:
-            seen_names.add(business['name'])
-            unique_businesses.append(business)
+    # Deduplicate businesses by normalized phone, then fuzzy name/address
+    unique_businesses = dedupe_businesses(businesses)
     
     # Check if we succeeded in getting real data
     is_real_data = sources_tried and len(unique_businesses) > 0 and not all(is_dummy_business(b, industry) for b in unique_businesses)
@@ -0,0 +1,240 @@
+import re
+import html
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Results per page, and the most a client may ask for
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Lead columns in leads_fts, with their bm25 weights (a name hit outranks a notes hit)
+LEAD_SEARCH_COLUMNS = ['name', 'company', 'notes', 'address']
+LEAD_SEARCH_WEIGHTS = [10.0, 8.0, 2.0, 1.0]
+
+# Only conversation turns are indexed, not status rows or voicemail TwiML
+def turn_filter(expression):
+    return f"({expression} LIKE 'Lead: %' OR {expression} LIKE 'Bot: %')"
+
+
+TURN_FILTER = turn_filter('transcript')
+
+# Diacritics folded; 2- and 3-character prefix indexes keep "acm*" style lookups fast
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# Snippet markers, swapped for <mark> after the snippet text is HTML-escaped
+MARK_START, MARK_END = '\x02', '\x03'
+
+SNIPPET_TOKENS = 16
+
+WORD = re.compile(r'"([^"]*)"|(\w+)(\*?)', re.UNICODE)
+
+
+def search_available(conn):
+    """Whether this database has the FTS5 search tables (SQLite may be built without FTS5)"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'transcripts_fts'").fetchone() is not None
+
+
+def ensure_search_index(conn):
+    """Create the FTS5 tables and sync triggers, backfilling them the first time"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE name IN ('leads_fts', 'transcripts_fts')")}
+    columns = ', '.join(LEAD_SEARCH_COLUMNS)
+    old_columns = ', '.join(f"old.{column}" for column in LEAD_SEARCH_COLUMNS)
+    new_columns = ', '.join(f"new.{column}" for column in LEAD_SEARCH_COLUMNS)
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5({columns}, content='leads', content_rowid='id', {TOKENIZE})")
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(transcript, content='call_logs', content_rowid='id', {TOKENIZE})")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Full-text search disabled: {str(e)}")
+        return False
+
+    # External-content tables: each delete must repeat the values that were indexed
+    conn.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS leads_fts_insert AFTER INSERT ON leads BEGIN
+            INSERT INTO leads_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END;
+        CREATE TRIGGER IF NOT EXISTS leads_fts_delete AFTER DELETE ON leads BEGIN
+            INSERT INTO leads_fts(leads_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+        END;
+        CREATE TRIGGER IF NOT EXISTS leads_fts_update AFTER UPDATE OF {columns} ON leads BEGIN
+            INSERT INTO leads_fts(leads_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+            INSERT INTO leads_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS transcripts_fts_insert AFTER INSERT ON call_logs
+        WHEN new.transcript LIKE 'Lead: %' OR new.transcript LIKE 'Bot: %' BEGIN
+            INSERT INTO transcripts_fts(rowid, transcript) VALUES (new.id, new.transcript);
+        END;
+        CREATE TRIGGER IF NOT EXISTS transcripts_fts_delete AFTER DELETE ON call_logs
+        WHEN old.transcript LIKE 'Lead: %' OR old.transcript LIKE 'Bot: %' BEGIN
+            INSERT INTO transcripts_fts(transcripts_fts, rowid, transcript) VALUES ('delete', old.id, old.transcript);
+        END;
+        CREATE TRIGGER IF NOT EXISTS transcripts_fts_update_old AFTER UPDATE OF transcript ON call_logs
+        WHEN old.transcript LIKE 'Lead: %' OR old.transcript LIKE 'Bot: %' BEGIN
+            INSERT INTO transcripts_fts(transcripts_fts, rowid, transcript) VALUES ('delete', old.id, old.transcript);
+        END;
+        CREATE TRIGGER IF NOT EXISTS transcripts_fts_update_new AFTER UPDATE OF transcript ON call_logs
+        WHEN new.transcript LIKE 'Lead: %' OR new.transcript LIKE 'Bot: %' BEGIN
+            INSERT INTO transcripts_fts(rowid, transcript) VALUES (new.id, new.transcript);
+        END;
+    ''')
+
+    if 'leads_fts' not in existing:
+        conn.execute("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO leads_fts(leads_fts, rank) VALUES ('rank', ?)",
+                     (f"bm25({', '.join(str(weight) for weight in LEAD_SEARCH_WEIGHTS)})",))
+    if 'transcripts_fts' not in existing:
+        conn.execute(f"INSERT INTO transcripts_fts(rowid, transcript) SELECT id, transcript FROM call_logs WHERE {TURN_FILTER}")
+    conn.commit()
+    return True
+
+
+def ensure_archive_search_index(conn):
+    """Index the archive tier's turns in archive.archived_transcripts_fts (called by attach_archive).
+
+    Archived transcripts are stored compressed, so the index reads them through
+    the archive.archived_turns view, which inflates them with archive_text().
+    Archived rows are only ever inserted and deleted, and a trigger for each
+    keeps the index in sync. Turns archived before the index existed are
+    indexed when it is created.
+    """
+    if not search_available(conn):
+        return False
+    if conn.execute("SELECT 1 FROM archive.sqlite_master WHERE name = 'archived_transcripts_fts'").fetchone():
+        return True
+    new_text, old_text = 'archive_text(new.transcript_z)', 'archive_text(old.transcript_z)'
+    conn.execute(f'''
+        CREATE VIEW IF NOT EXISTS archive.archived_turns AS
+        SELECT id, transcript FROM (SELECT id, archive_text(transcript_z) AS transcript FROM archived_call_logs)
+        WHERE {TURN_FILTER}
+    ''')
+    conn.execute(f"CREATE VIRTUAL TABLE archive.archived_transcripts_fts USING fts5(transcript, content='archived_turns', content_rowid='id', {TOKENIZE})")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS archive.archived_transcripts_fts_insert AFTER INSERT ON archived_call_logs
+        WHEN {turn_filter(new_text)} BEGIN
+            INSERT INTO archived_transcripts_fts(rowid, transcript) VALUES (new.id, {new_text});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS archive.archived_transcripts_fts_delete AFTER DELETE ON archived_call_logs
+        WHEN {turn_filter(old_text)} BEGIN
+            INSERT INTO archived_transcripts_fts(archived_transcripts_fts, rowid, transcript) VALUES ('delete', old.id, {old_text});
+        END
+    ''')
+    conn.execute("INSERT INTO archive.archived_transcripts_fts(archived_transcripts_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def rebuild_search_index(conn):
+    """Re-index everything from leads and both call log tiers (after bulk edits with triggers bypassed).
+
+    conn needs the archive attached (get_db(with_archive=True)).
+    """
+    conn.execute("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('delete-all')")
+    conn.execute(f"INSERT INTO transcripts_fts(rowid, transcript) SELECT id, transcript FROM call_logs WHERE {TURN_FILTER}")
+    conn.execute("INSERT INTO archive.archived_transcripts_fts(archived_transcripts_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def optimize_search_index(conn):
+    """Merge the FTS5 index segments (worth doing after large imports or archive runs).
+
+    conn needs the archive attached (get_db(with_archive=True)).
+    """
+    conn.execute("INSERT INTO leads_fts(leads_fts) VALUES ('optimize')")
+    conn.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('optimize')")
+    conn.execute("INSERT INTO archive.archived_transcripts_fts(archived_transcripts_fts) VALUES ('optimize')")
+    conn.commit()
+
+
+def build_match_query(text):
+    """FTS5 MATCH expression from free text: words are ANDed, "quoted text" is a phrase,
+    and word* (or the last word typed) matches as a prefix. Returns None for an empty query."""
+    terms = []
+    matches = list(WORD.finditer(text or ''))
+    for index, match in enumerate(matches):
+        phrase, word, star = match.groups()
+        if phrase is not None:
+            words = re.findall(r'\w+', phrase, re.UNICODE)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+        elif word:
+            # Search-as-you-type: the trailing word may be incomplete
+            prefix = star or index == len(matches) - 1
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+
+def _snippet_html(snippet):
+    return html.escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def search_leads(conn, match, limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """Leads matching an FTS5 expression, best first; returns (results, next_offset)"""
+    rows = conn.execute(f'''
+        SELECT l.id, l.name, l.company, l.phone, l.status, l.city, l.state, leads_fts.rank AS score,
+               snippet(leads_fts, -1, ?, ?, '...', {SNIPPET_TOKENS}) AS snippet
+        FROM leads_fts JOIN leads l ON l.id = leads_fts.rowid
+        WHERE leads_fts MATCH ?
+        ORDER BY leads_fts.rank
+        LIMIT ? OFFSET ?
+    ''', (MARK_START, MARK_END, match, limit + 1, offset)).fetchall()
+    results = [dict(row, snippet=_snippet_html(row['snippet'])) for row in rows[:limit]]
+    return results, (offset + limit if len(rows) > limit else None)
+
+
+def search_transcripts(conn, match, limit=DEFAULT_SEARCH_LIMIT, offset=0, lead_id=None, sort='rank'):
+    """Conversation turns in either call log tier matching an FTS5 expression; returns (results, next_offset).
+
+    sort='rank' orders by bm25, which scores every match; sort='recent' walks each
+    index newest first and stops after the page, so it stays fast for common words.
+    Each tier's index yields at most offset + limit + 1 hits, which are then merged.
+    Each result carries the call_id used by /api/lead_history/<lead_id>/calls/<call_id>.
+    conn needs the call_logs_all view (get_db(with_archive=True)).
+    """
+    lead_filter = 'AND c.lead_id = ?' if lead_id is not None else ''
+    tier_params = [MARK_START, MARK_END, match] + ([lead_id] if lead_id is not None else []) + [offset + limit + 1]
+    tiers = []
+    for index, table in (('transcripts_fts', 'main.call_logs'), ('archived_transcripts_fts', 'archive.archived_call_logs')):
+        order = f'{index}.rowid DESC' if sort == 'recent' else f'{index}.rank'
+        tiers.append(f'''
+            SELECT * FROM (
+                SELECT c.id, c.lead_id, c.call_status, c.created_at, {index}.rank AS score,
+                       snippet({index}, 0, ?, ?, '...', {SNIPPET_TOKENS}) AS snippet
+                FROM {index}
+                JOIN {table} c ON c.id = {index}.rowid
+                WHERE {index} MATCH ? {lead_filter}
+                ORDER BY {order}
+                LIMIT ?
+            )''')
+    rows = conn.execute(f'''
+        SELECT hits.id, hits.lead_id, l.name AS lead_name, hits.call_status, hits.created_at, hits.score, hits.snippet,
+               COALESCE((SELECT MAX(s.id) FROM call_logs_all s
+                         WHERE s.lead_id = hits.lead_id AND s.id <= hits.id AND s.call_status = 'Started'),
+                        (SELECT MIN(f.id) FROM call_logs_all f WHERE f.lead_id = hits.lead_id)) AS call_id
+        FROM ({' UNION ALL '.join(tiers)}) hits
+        LEFT JOIN leads l ON l.id = hits.lead_id
+        ORDER BY {'hits.id DESC' if sort == 'recent' else 'hits.score'}
+        LIMIT ? OFFSET ?
+    ''', tier_params * 2 + [limit + 1, offset]).fetchall()
+    results = [dict(row, snippet=_snippet_html(row['snippet'])) for row in rows[:limit]]
+    return results, (offset + limit if len(rows) > limit else None)
+
+
+if __name__ == '__main__':
+    # Index maintenance, e.g. weekly from cron:
+    #   0 3 * * 0 cd /path/to/backend && python search.py
+    import sys
+    from models import get_db, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    with get_db(with_archive=True) as conn:
+        if '--rebuild' in sys.argv:
+            rebuild_search_index(conn)
+            print("Search index rebuilt")
+        optimize_search_index(conn)
+    print("Search index optimized")
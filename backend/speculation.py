@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Representative lead answers generated ahead of time for the common branches
+YES_NO_CANDIDATES = {
+    "yes": "Yes.",
+    "no": "No."
+}
+EMPLOYEE_CANDIDATES = {
+    "employees:small": "We have fewer than 10 employees.",
+    "employees:large": "We have more than 10 employees."
+}
+
+# Bot questions that lead to the employee-count branch
+EMPLOYEE_QUESTION = re.compile(r"how many (employees|people|staff)|employee count|number of employees", re.IGNORECASE)
+
+# Number words leads commonly use for head counts
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+    'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'fifteen': 15, 'twenty': 20, 'thirty': 30,
+    'forty': 40, 'fifty': 50, 'hundred': 100, 'dozen': 12
+}
+
+# The qualification cut-off from the system prompt (10+ employees)
+EMPLOYEE_THRESHOLD = 10
+
+# Speculated replies not picked within this many seconds are dropped
+SPECULATION_TTL = 120
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='speculation')
+_pending = {}
+_pending_lock = threading.Lock()
+stats = {'scheduled': 0, 'generated': 0, 'picked': 0, 'discarded': 0}
+
+
+def speculation_enabled(config):
+    """Whether SPECULATION_ENABLED is on (it may come from the environment as a string)"""
+    return str(config.get('SPECULATION_ENABLED', False)).lower() not in ('false', '0', '')
+
+
+def _reset_after_fork():
+    """Give a forked worker its own pool; speculations belong to the parent's calls"""
+    global _executor, _pending_lock
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='speculation')
+    _pending.clear()
+    _pending_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def turn_key(lead_id, history):
+    """Identifies the point in a call the speculation was made for"""
+    last_bot = next((msg["content"] for msg in reversed(history or []) if msg["role"] == "assistant"), "")
+    digest = hashlib.sha1(last_bot.encode('utf-8')).hexdigest()[:12]
+    return (str(lead_id), len(history or []), digest)
+
+
+def candidates_for(history):
+    """Branches worth speculating on after the bot's latest message"""
+    last_bot = next((msg["content"] for msg in reversed(history or []) if msg["role"] == "assistant"), "")
+    if not last_bot.rstrip().endswith('?'):
+        return {}
+    if EMPLOYEE_QUESTION.search(last_bot):
+        return dict(EMPLOYEE_CANDIDATES)
+    return dict(YES_NO_CANDIDATES)
+
+
+def spoken_employee_count(text):
+    """First head count in an answer ("about 25", "twenty people"), or None"""
+    match = re.search(r"\d+", text.replace(',', ''))
+    if match:
+        return int(match.group())
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word in NUMBER_WORDS:
+            return NUMBER_WORDS[word]
+    return None
+
+
+def match_branch(speech_result, branches):
+    """Which speculated branch the lead's actual answer belongs to, if any"""
+    if not speech_result:
+        return None
+    if any(branch.startswith("employees:") for branch in branches):
+        count = spoken_employee_count(speech_result)
+        if count is None:
+            return None
+        return "employees:large" if count >= EMPLOYEE_THRESHOLD else "employees:small"
+
+    from config import get_config
+    from intent_classifier import get_intent_classifier, MAX_FAST_PATH_WORDS
+    if len(speech_result.split()) > MAX_FAST_PATH_WORDS:
+        return None
+    intent, confidence = get_intent_classifier().predict(speech_result)
+    threshold = float(get_config().get('FAST_PATH_CONFIDENCE', 0.85))
+    return intent if intent in branches and confidence >= threshold else None
+
+
+def schedule_speculation(lead_id, history, history_digest, stage, generate, render):
+    """Generate and pre-render replies for the likely answers to the bot's last question.
+
+    generate(utterance, history, history_digest) returns (reply, prompt_hash)
+    and render(reply, history) warms the TTS audio. Both run on a background
+    pool; pick_speculation() collects the result for the branch the lead
+    actually takes.
+    """
+    if not lead_id:
+        return
+    # Branches the template fast path already answers don't need an LLM reply
+    from intent_classifier import RESPONSE_TEMPLATES
+    branches = {branch: utterance for branch, utterance in candidates_for(history).items()
+                if not RESPONSE_TEMPLATES.get(branch, {}).get(stage)}
+    if not branches:
+        return
+
+    key = turn_key(lead_id, history)
+    _expire()
+    history = list(history)
+    futures = {}
+    for branch, utterance in branches.items():
+        futures[branch] = _executor.submit(_speculate, branch, utterance, history, history_digest, generate, render)
+    with _pending_lock:
+        _pending[key] = (time.time(), futures)
+    stats['scheduled'] += len(futures)
+    logger.info(f"Speculating on {list(branches)} for lead {lead_id}")
+
+
+def _speculate(branch, utterance, history, history_digest, generate, render):
+    reply, prompt_hash = generate(utterance, history, history_digest)
+    if reply:
+        render(reply, history + [{"role": "user", "content": utterance}, {"role": "assistant", "content": reply}])
+        stats['generated'] += 1
+    return reply, prompt_hash
+
+
+def pick_speculation(lead_id, history, speech_result, wait=2.0):
+    """Return (reply, prompt_hash) speculated for this answer, or None; other branches are discarded"""
+    if not lead_id:
+        return None
+    key = turn_key(lead_id, history)
+    with _pending_lock:
+        entry = _pending.pop(key, None)
+    if not entry:
+        return None
+
+    created, futures = entry
+    branch = match_branch(speech_result, futures)
+    for other, future in futures.items():
+        if other != branch:
+            future.cancel()
+            stats['discarded'] += 1
+    if branch is None or time.time() - created > SPECULATION_TTL:
+        return None
+
+    try:
+        # A reply still being generated is usually closer to done than a fresh LLM call
+        reply, prompt_hash = futures[branch].result(timeout=wait)
+    except Exception as e:
+        logger.info(f"Speculated {branch} reply for lead {lead_id} not usable: {str(e)}")
+        return None
+    if not reply:
+        return None
+    stats['picked'] += 1
+    logger.info(f"Using speculated {branch} reply for lead {lead_id}")
+    return reply, prompt_hash
+
+
+def _expire():
+    cutoff = time.time() - SPECULATION_TTL
+    with _pending_lock:
+        for key in [key for key, (created, _) in _pending.items() if created < cutoff]:
+            for future in _pending.pop(key)[1].values():
+                future.cancel()
+                stats['discarded'] += 1
@@ -0,0 +1,249 @@
+import os
+import json
+import glob
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds (a turn the caller notices is ~1s+)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0)
+
+# Turns slower than this are kept for /api/debug/slow_turns
+SLOW_TURN_SECONDS = 2.0
+SLOW_TURN_BUFFER = 200
+
+# With several gunicorn workers each process writes its histograms to METRICS_DIR
+# every METRICS_FLUSH_SECONDS, and /metrics reports every worker's series with a
+# worker label. Snapshots of workers that stopped flushing are dropped.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_SECONDS = 5
+STALE_SNAPSHOT_SECONDS = 300
+
+_local = threading.local()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one label"""
+
+    def __init__(self, name, help_text, label=None, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, label_value=None):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def snapshot(self):
+        """[(label value, series), ...] for writing to the metrics directory"""
+        with self._lock:
+            return [(label_value, list(series)) for label_value, series in self._series.items()]
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self, workers=None):
+        """Text exposition of this process's series, or of {worker: snapshot} with a worker label"""
+        if workers is None:
+            workers = {None: self.snapshot()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for worker, snapshot in sorted(workers.items(), key=lambda item: str(item[0])):
+            for label_value, series in sorted(snapshot, key=lambda item: str(item[0])):
+                labels = f'worker="{worker}",' if worker is not None else ''
+                labels += f'{self.label}="{label_value}",' if self.label else ''
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {series[-1]}')
+                suffix = f'{{{labels.rstrip(",")}}}' if labels else ''
+                lines.append(f"{self.name}_sum{suffix} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return "\n".join(lines)
+
+
+TURN_SECONDS = Histogram('voice_turn_seconds', 'Total time to produce the TwiML for a conversation turn')
+STAGE_SECONDS = Histogram('voice_turn_stage_seconds', 'Time spent in each stage of a conversation turn', label='stage')
+
+_slow_turns = deque(maxlen=SLOW_TURN_BUFFER)
+_slow_lock = threading.Lock()
+
+
+class TurnRecord:
+    """Stage timings for one turn; stages may nest (e.g. llm inside process)"""
+
+    def __init__(self, lead_id=None, call_sid=None):
+        self.lead_id = lead_id
+        self.call_sid = call_sid
+        self.turn_index = None
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.last_checkpoint = self.start
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage)
+
+    def as_dict(self, total):
+        return {
+            'lead_id': self.lead_id,
+            'call_sid': self.call_sid,
+            'turn_index': self.turn_index,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'total_ms': round(total * 1000, 1),
+            'stages_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        }
+
+
+@contextmanager
+def start_turn(lead_id=None, call_sid=None):
+    """Time a conversation turn on this thread; stages are added with checkpoint() and span()"""
+    record = TurnRecord(lead_id, call_sid)
+    previous = getattr(_local, 'turn', None)
+    _local.turn = record
+    try:
+        yield record
+    finally:
+        _local.turn = previous
+        total = time.perf_counter() - record.start
+        TURN_SECONDS.observe(total)
+        if total >= SLOW_TURN_SECONDS:
+            summary = record.as_dict(total)
+            with _slow_lock:
+                _slow_turns.append(summary)
+            logger.warning(f"Slow turn for lead {lead_id} ({summary['total_ms']}ms): {summary['stages_ms']}")
+
+
+def current_turn():
+    return getattr(_local, 'turn', None)
+
+
+def checkpoint(stage):
+    """Record the time since the turn started or the previous checkpoint as stage"""
+    record = current_turn()
+    if record is None:
+        return
+    now = time.perf_counter()
+    record.add(stage, now - record.last_checkpoint)
+    record.last_checkpoint = now
+
+
+def annotate_turn(**fields):
+    """Attach details known only mid-turn (e.g. turn_index) to the current turn"""
+    record = current_turn()
+    if record is None:
+        return
+    for name, value in fields.items():
+        setattr(record, name, value)
+
+
+@contextmanager
+def span(stage):
+    """Time a block as stage within the current turn (a no-op outside a turn)"""
+    record = current_turn()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add(stage, time.perf_counter() - start)
+
+
+def slow_turns(limit=50):
+    """The slowest recently recorded slow turns, slowest first"""
+    with _slow_lock:
+        turns = list(_slow_turns)
+    return sorted(turns, key=lambda turn: turn['total_ms'], reverse=True)[:limit]
+
+
+HISTOGRAMS = (TURN_SECONDS, STAGE_SECONDS)
+
+_flusher = None
+
+
+def write_snapshot(metrics_dir=None):
+    """Write this process's histograms to <metrics_dir>/<pid>.json"""
+    metrics_dir = metrics_dir or METRICS_DIR
+    if not metrics_dir:
+        return
+    path = os.path.join(metrics_dir, f"{os.getpid()}.json")
+    snapshot = {histogram.name: histogram.snapshot() for histogram in HISTOGRAMS}
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics snapshot to {path}: {str(e)}")
+
+
+def _read_snapshots(metrics_dir):
+    """{pid: {histogram name: snapshot}} for every worker that flushed recently"""
+    workers = {}
+    now = time.time()
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        try:
+            if now - os.path.getmtime(path) > STALE_SNAPSHOT_SECONDS:
+                os.remove(path)
+                continue
+            with open(path) as f:
+                workers[os.path.basename(path)[:-len('.json')]] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return workers
+
+
+def start_metrics_flusher():
+    """Flush this worker's histograms to METRICS_DIR in the background (no-op without it)"""
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+
+    def flush_forever():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            write_snapshot()
+
+    _flusher = threading.Thread(target=flush_forever, name='metrics-flusher', daemon=True)
+    _flusher.start()
+
+
+def _reset_after_fork():
+    # A forked worker starts with empty histograms and no flusher thread
+    global _flusher
+    _flusher = None
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def render_metrics(metrics_dir=None):
+    """All turn histograms in Prometheus text exposition format, across workers when METRICS_DIR is set"""
+    metrics_dir = metrics_dir or METRICS_DIR
+    if not metrics_dir:
+        return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
+    # Include this worker's latest numbers, then everyone's last flush
+    write_snapshot(metrics_dir)
+    workers = _read_snapshots(metrics_dir)
+    return "\n".join(
+        histogram.render({pid: snapshot.get(histogram.name, []) for pid, snapshot in workers.items()})
+        for histogram in HISTOGRAMS
+    ) + "\n"
@@ -1,20 +1,26 @@
 import os
-import requests
 import json
-import time
-from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse, Gather
+import hashlib
+import threading
 import logging
-from config import get_config
+from config import get_config, public_base_url
+from lead_identity import normalize_phone, find_lead_id_by_phone
+from history_window import window_history
+from intent_classifier import fast_path_response
+from llm_router import get_llm_router
+from phrase_matcher import CONVERSATION_MATCHER, find_spoken_time, first_weekday
+from prompt_compiler import compile_prompt, invalidate_learned_patterns
+from response_cache import get_response_cache, lead_slots, strip_slots, question_context
+from speculation import schedule_speculation, pick_speculation, speculation_enabled
+from turn_metrics import span
 from datetime import datetime, timedelta
 import re
 import urllib.parse
-import openai
 
 logger = logging.getLogger(__name__)
 
 # Get LLM response for conversation handling
-def get_llm_response(prompt, conversation_history=None, stage="introduction", industry=None):
+def get_llm_response(prompt, conversation_history=None, stage="introduction", industry=None, history_digest=None, turn_info=None, lead_data=None, speculative=False):
     """
     Get AI response using GPT-4 or other LLM
     Stage options:
@@ -24,6 +30,12 @@ def get_llm_response(prompt, conversation_history=None, stage="introduction", in
     - objection_handling: Address concerns
     - appointment_setting: Book the appointment
     - closing: End the call politely
+
+    conversation_history is the current call; history_digest summarizes earlier
+    calls. Both are fitted to the stage's token budget (see history_window.py).
+    If turn_info is a dict, the compiled prompt's hash is stored in it.
+    lead_data lets the response cache blank out the lead's name and city;
+    speculative lookups (see speculate_next_turn) don't count as cache hits or misses.
     """
     config = get_config()
     api_key = config.get('LLM_API_KEY')
@@ -41,110 +53,56 @@ def get_llm_response(prompt, conversation_history=None, stage="introduction", in
     }
     
     try:
-        client = openai.OpenAI(api_key=api_key)
+        import openai
+        client = openai.OpenAI(api_key=api_key, base_url=config.get('OPENAI_BASE_URL') or None)
         logger.info("Successfully initialized OpenAI client")
         
-        # Build the system prompt with Steve Schiffman-style instructions
-        system_prompt = f"""
-        You are an AI sales assistant named Steve following the Steve Schiffman method of appointment setting. 
-        Your goal is to set an appointment, not to sell on this call.
-        
-        Current conversation stage: {stage}
-        
-        Follow these principles:
-        1. Be direct, polite, and straight to the point
-        2. Focus on qualifying the prospect (do they use mobile devices, do they have 10+ employees)
-        3. Present brief value (example: "We've helped similar {industry} companies save 20% on mobile costs through telecom expense management and mobile device management")
-        4. Ask directly for a short appointment (15 minutes)
-        5. Handle objections with the Ledge technique (acknowledge, pivot back to appointment)
-        6. Maintain a professional, confident tone
-        
-        To sound more natural and human-like:
-        1. Use contractions (I'm, we've, can't, don't)
-        2. Include occasional filler words like "um" or "you know" (but sparingly)
-        3. Start some sentences with connectors like "So," "Well," or "And"
-        4. Occasionally correct yourself mid-sentence or rephrase
-        5. Vary your sentence length and structure
-        6. Use more casual language and informal phrases
-        7. Sound engaged and empathetic by responding to what the person just said 
-        
-        For objection handling:
-        - If "not interested": Respond with a benefit example and restate meeting request
-        - If "too busy": Suggest a short meeting later, "even 10 minutes can find savings"
-        - If "using another provider": Acknowledge and mention "we often find savings even with current providers"
-        
-        Keep your responses brief, natural and conversational.
-        """
-        
-        # Get learned patterns for this industry if available
-        if industry and 'get_industry_specific_patterns' in globals():
-            learned_patterns = get_industry_specific_patterns(industry)
-            if learned_patterns:
-                # Add successful phrases to the prompt if we're in the right stage
-                if stage == "value_proposition" and "successful_phrases" in learned_patterns:
-                    top_phrases = sorted(learned_patterns["successful_phrases"].items(), 
-                                        key=lambda x: x[1], reverse=True)[:3]
-                    if top_phrases:
-                        phrases_text = "\n".join([f"- {phrase}" for phrase, _ in top_phrases])
-                        system_prompt += f"\n\nThese value statements have been particularly effective for {industry} companies:\n{phrases_text}"
-                
-                # Add objection handling patterns if we're dealing with objections
-                if stage == "objection_handling" and "objection_responses" in learned_patterns:
-                    # Try to determine what type of objection we're facing
-                    objection_type = "general"
-                    if prompt:
-                        prompt_lower = prompt.lower()
-                        objection_indicators = {
-                            "not interested": "objection:not interested",
-                            "too busy": "objection:too busy",
-                            "already have": "objection:already have",
-                            "using another": "objection:using another", 
-                            "too expensive": "objection:too expensive"
-                        }
-                        for indicator, key in objection_indicators.items():
-                            if indicator in prompt_lower and key in learned_patterns["objection_responses"]:
-                                objection_type = key
-                                break
-                    
-                    # Add successful objection handling examples
-                    if objection_type in learned_patterns["objection_responses"]:
-                        successful_responses = learned_patterns["objection_responses"][objection_type][:2]
-                        if successful_responses:
-                            responses_text = "\n".join([f"- {resp}" for resp in successful_responses])
-                            system_prompt += f"\n\nThese responses have worked well for this type of objection:\n{responses_text}"
+        # Compiled (and cached) Steve Schiffman-style prompt plus learned patterns for this industry
+        system_prompt, prompt_hash = compile_prompt(stage, industry, prompt, get_industry_specific_patterns)
+        if turn_info is not None:
+            turn_info["prompt_hash"] = prompt_hash
+        
+        # Conversation history, windowed to the stage's token budget
+        history = window_history(conversation_history, stage, history_digest) if conversation_history or history_digest else []
+        
+        # Near-duplicate utterances at the same stage reuse an earlier reply given to any
+        # lead asked the same question (with the lead's name and city blanked out).
+        # Calls with a digest of earlier calls are skipped; their replies refer back to it.
+        response_cache = None if history_digest else get_response_cache(config)
+        slots = lead_slots(lead_data)
+        context = question_context(history, slots)
+        if response_cache:
+            cached_response = response_cache.get(stage, industry, prompt, prompt_hash, context, record=not speculative)
+            if cached_response:
+                logger.info(f"Response cache hit at stage {stage}")
+                return cached_response
         
         messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history if available
-        if conversation_history:
-            messages.extend(conversation_history)
+        messages.extend(history)
         
         # Add the current user input
         messages.append({"role": "user", "content": prompt})
         
-        # Try gpt-4 first
-        try:
-            logger.info("Attempting to use gpt-4 model")
+        def complete(model, timeout):
+            logger.info(f"Requesting completion from {model}")
             response = client.chat.completions.create(
-                model="gpt-4",
+                model=model,
                 messages=messages,
-                temperature=0.7
+                temperature=0.7,
+                timeout=timeout
             )
-            logger.info("Successfully received response from OpenAI API using gpt-4")
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.warning(f"Failed to use gpt-4: {str(e)}")
-            if test_mode:
-                logger.info("Using test mode fallback response")
-                return test_responses.get(stage, "I understand. Would you be interested in scheduling a 15-minute meeting to discuss this further?")
-            logger.info("Falling back to gpt-3.5-turbo")
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7
-            )
-            logger.info("Successfully received response from OpenAI API using gpt-3.5-turbo")
+            logger.info(f"Successfully received response from OpenAI API using {model}")
             return response.choices[0].message.content
+        
+        # Route across models (gpt-4, then gpt-3.5-turbo) within the turn deadline;
+        # the canned stage response is the last resort so the caller never hears silence
+        fallback = test_responses.get(stage, "I understand. Would you be interested in scheduling a 15-minute meeting to discuss this further?")
+        with span('llm'):
+            ai_response = get_llm_router(config).complete(complete, fallback=fallback)
+        # A reply naming this lead is never replayed to another one
+        if response_cache and ai_response != fallback and strip_slots(ai_response, slots) == ai_response:
+            response_cache.put(stage, industry, prompt, ai_response, prompt_hash, context)
+        return ai_response
             
     except Exception as e:
         logger.error(f"Error in get_llm_response: {str(e)}")
@@ -155,9 +113,21 @@ def get_llm_response(prompt, conversation_history=None, stage="introduction", in
             return test_responses.get(stage, "I understand. Would you be interested in scheduling a 15-minute meeting to discuss this further?")
         raise
 
+# Hits/misses of the content-addressed audio cache in elevenlabs_tts
+TTS_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def twilio_client(config):
+    """Twilio REST client, sent to TWILIO_API_URL instead of api.twilio.com when it is set"""
+    from twilio.rest import Client
+    client = Client(config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'])
+    if config.get('TWILIO_API_URL'):
+        client.api.base_url = config['TWILIO_API_URL'].rstrip('/')
+    return client
+
 # Generate voice using ElevenLabs TTS
 def elevenlabs_tts(text):
     """Generate audio for voice agent using ElevenLabs"""
+    import requests
     config = get_config()
     elevenlabs_api_key = config.get('ELEVENLABS_API_KEY')
     elevenlabs_voice_id = config.get('ELEVENLABS_VOICE_ID')
@@ -166,7 +136,7 @@ def elevenlabs_tts(text):
         logger.error("ElevenLabs API key or Voice ID not configured")
         return None
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{elevenlabs_voice_id}"
+    url = f"{config.get('ELEVENLABS_API_URL') or 'https://api.elevenlabs.io'}/v1/text-to-speech/{elevenlabs_voice_id}"
     headers = {
         "xi-api-key": elevenlabs_api_key,
         "Content-Type": "application/json"
@@ -184,20 +154,31 @@ def elevenlabs_tts(text):
         }
     }
     
+    # Audio is named after a hash of the voice, settings and text, so repeated
+    # replies (including response cache hits) reuse the file instead of calling ElevenLabs
+    audio_dir = "audio_files"
+    audio_key = hashlib.sha1(json.dumps([elevenlabs_voice_id, data], sort_keys=True).encode('utf-8')).hexdigest()[:20]
+    audio_file = os.path.join(audio_dir, f"audio_{audio_key}.mp3")
+    if os.path.exists(audio_file):
+        TTS_CACHE_STATS["hits"] += 1
+        logger.info(f"Using cached audio file: {audio_file}")
+        return audio_file
+    TTS_CACHE_STATS["misses"] += 1
+    
     try:
-        r = requests.post(url, headers=headers, json=data)
+        with span('tts_api'):
+            r = requests.post(url, headers=headers, json=data)
         r.raise_for_status()  # Raise exception for bad status codes
         
         # Create audio directory if it doesn't exist
-        audio_dir = "audio_files"
         os.makedirs(audio_dir, exist_ok=True)
         
-        # Save audio file with timestamp
-        timestamp = int(time.time())
-        audio_file = os.path.join(audio_dir, f"audio_{timestamp}.mp3")
-        
-        with open(audio_file, "wb") as f:
-            f.write(r.content)
+        # Write to a temporary name first so a concurrent reader never sees a partial file
+        tmp_file = f"{audio_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with span('audio_write'):
+            with open(tmp_file, "wb") as f:
+                f.write(r.content)
+            os.replace(tmp_file, audio_file)
             
         logger.info(f"Successfully generated audio file: {audio_file}")
         return audio_file
@@ -212,7 +193,7 @@ def elevenlabs_tts(text):
         return None
 
 # Place a call using Twilio
-def place_call(phone_number, script):
+def place_call(phone_number, script, lead_id=None):
     """Place a call using Twilio"""
     config = get_config()
     
@@ -229,20 +210,22 @@ def place_call(phone_number, script):
     logger.info(f"Full config: {json.dumps(config, indent=2)}")
     
     # Initialize Twilio client with credentials from config
-    client = Client(config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'])
+    client = twilio_client(config)
     
     # Get webhook URL from config and ensure it doesn't end with /webhook
-    webhook_url = config.get('CALLBACK_URL', 'http://localhost:5001').rstrip('/webhook')
+    webhook_url = public_base_url(config, 'http://localhost:5001')
     logger.info(f"Using webhook URL: {webhook_url}")
     
-    # Get lead_id from phone number if possible (used for continuation)
-    from models import get_db
-    lead_id = None
-    with get_db() as conn:
-        result = conn.execute('SELECT id FROM leads WHERE phone = ?', (phone_number,)).fetchone()
-        if result:
-            lead_id = result['id']
-            logger.info(f"Found lead_id: {lead_id}")
+    # Get lead_id from phone number if the caller didn't pass it (used for continuation)
+    if lead_id is None:
+        from models import get_db
+        with get_db() as conn:
+            lead_id = find_lead_id_by_phone(conn, phone_number)
+            if lead_id:
+                logger.info(f"Found lead_id: {lead_id}")
+    
+    # Twilio expects E.164; fall back to the raw string if it can't be normalized
+    dial_number = normalize_phone(phone_number) or phone_number
     
     # Check if recording is enabled
     recording_enabled = config.get('RECORDING_ENABLED', False)
@@ -269,7 +252,7 @@ def place_call(phone_number, script):
             logger.info(f"Recording URL: {recording_url}")
         
         call = client.calls.create(
-            to=phone_number,
+            to=dial_number,
             from_=config['TWILIO_PHONE_NUMBER'],
             url=voice_url,
             status_callback=status_url,
@@ -295,6 +278,7 @@ def place_call(phone_number, script):
 # For Twilio webhook to handle voice conversation
 def get_voice_response(text, lead_data=None, history=None, is_voicemail=False):
     """Generate voice response for Twilio"""
+    from twilio.twiml.voice_response import VoiceResponse, Gather
     # Create TwiML response
     response = VoiceResponse()
     
@@ -360,7 +344,7 @@ def get_voice_response(text, lead_data=None, history=None, is_voicemail=False):
                 audio_file = elevenlabs_tts(enhanced_voicemail_text)
                 if audio_file and os.path.exists(audio_file):
                     # Get the full URL for the audio file
-                    webhook_url = config.get('CALLBACK_URL', '').rstrip('/webhook')
+                    webhook_url = public_base_url(config)
                     audio_url = f"{webhook_url}/audio/{os.path.basename(audio_file)}"
                     response.play(audio_url)
                     logger.info(f"Using ElevenLabs audio for voicemail: {audio_url}")
@@ -383,7 +367,7 @@ def get_voice_response(text, lead_data=None, history=None, is_voicemail=False):
                 audio_file = elevenlabs_tts(enhanced_text)
                 if audio_file and os.path.exists(audio_file):
                     # Get the full URL for the audio file
-                    webhook_url = config.get('CALLBACK_URL', '').rstrip('/webhook')
+                    webhook_url = public_base_url(config)
                     audio_url = f"{webhook_url}/audio/{os.path.basename(audio_file)}"
                     response.play(audio_url)
                     logger.info(f"Using ElevenLabs audio: {audio_url}")
@@ -507,53 +491,23 @@ def analyze_callback_indicators(conversation_history):
     # Extract text from recent messages
     full_text = " ".join([msg["content"].lower() for msg in recent_messages])
     
-    # Check for explicit callback requests
-    callback_phrases = [
-        "call me back",
-        "call back",
-        "call later",
-        "try again",
-        "try me again",
-        "call again",
-        "another time",
-        "busy right now",
-        "not a good time"
-    ]
-    
-    has_callback_phrase = any(phrase in full_text for phrase in callback_phrases)
-    
-    # Check for time indicators
-    tomorrow_indicators = ["tomorrow", "next day"]
-    next_week_indicators = ["next week"]
-    specific_day_indicators = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    morning_indicators = ["morning"]
-    afternoon_indicators = ["afternoon"]
+    # Tag callback requests, day/time indicators in a single pass
+    hits = CONVERSATION_MATCHER.scan(full_text)
     
     # Time pattern matching (e.g., "call at 3pm" or "call at 3:00")
-    time_patterns = [
-        r"(\d{1,2})\s*(am|pm)",
-        r"(\d{1,2}):(\d{2})\s*(am|pm)?",
-        r"(\d{1,2})\s*o'clock"
-    ]
-    
-    extracted_time = None
-    for pattern in time_patterns:
-        matches = re.findall(pattern, full_text)
-        if matches:
-            # Simple extraction, would need more sophistication in production
-            extracted_time = matches[0]
-            break
+    # Simple extraction, would need more sophistication in production
+    extracted_time = find_spoken_time(full_text)
     
     # Determine when to call back based on indicators
-    if has_callback_phrase:
+    if "callback" in hits:
         result["has_callback"] = True
         result["priority"] = 6  # Higher priority because lead asked for callback
         
         # Calculate callback time
-        if any(day in full_text for day in specific_day_indicators):
+        if "weekday" in hits:
             # Calculate days until the specified day
             today = datetime.now().weekday()  # 0 = Monday, 6 = Sunday
-            target_day = next((i for i, day in enumerate(["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]) if day in full_text), None)
+            target_day = first_weekday(hits)
             
             if target_day is not None:
                 days_ahead = (target_day - today) % 7
@@ -566,14 +520,14 @@ def analyze_callback_indicators(conversation_history):
                 result["callback_time"] = callback_date
                 result["reason"] = f"Lead requested callback on {callback_date.strftime('%A')}."
         
-        elif any(indicator in full_text for indicator in tomorrow_indicators):
+        elif "tomorrow" in hits:
             callback_date = datetime.now() + timedelta(days=1)
             # Set to 10 AM by default
             callback_date = callback_date.replace(hour=10, minute=0, second=0, microsecond=0)
             result["callback_time"] = callback_date
             result["reason"] = "Lead requested callback tomorrow."
             
-        elif any(indicator in full_text for indicator in next_week_indicators):
+        elif "next_week" in hits:
             # Calculate next Monday
             today = datetime.now().weekday()
             days_to_monday = 7 - today
@@ -623,7 +577,7 @@ def calculate_follow_up_time(days=1, hour=10):
     return follow_up_time
 
 # Modify the existing process_lead_response function to include follow-up recommendation
-def process_lead_response(speech_result, lead_data, conversation_history):
+def process_lead_response(speech_result, lead_data, conversation_history, history_digest=None):
     """Process the lead's response and determine next steps"""
     # Determine which stage of the conversation we're in
     current_stage = determine_conversation_stage(conversation_history)
@@ -631,8 +585,17 @@ def process_lead_response(speech_result, lead_data, conversation_history):
     # Get industry if available from lead data
     industry = lead_data.get('industry') or lead_data.get('category') if lead_data else None
     
-    # Get AI response for this stage
-    ai_response = get_llm_response(speech_result, conversation_history, current_stage, industry)
+    # Answer trivial turns ("yes", "not interested", "wrong number") locally;
+    # anything the classifier isn't confident about goes to the LLM
+    turn_info = {"prompt_hash": None}
+    ai_response = fast_path_response(speech_result, current_stage, industry)
+    if ai_response is None:
+        # A reply generated while the lead was still talking (see speculate_next_turn)
+        speculated = pick_speculation(lead_data.get('id') if lead_data else None, conversation_history, speech_result)
+        if speculated:
+            ai_response, turn_info["prompt_hash"] = speculated
+    if ai_response is None:
+        ai_response = get_llm_response(speech_result, conversation_history, current_stage, industry, history_digest, turn_info, lead_data)
     
     # Update conversation history
     conversation_history.append({"role": "user", "content": speech_result})
@@ -640,6 +603,7 @@ def process_lead_response(speech_result, lead_data, conversation_history):
     
     # Check if we've reached a conclusion (appointment set or not qualified)
     result = check_conversation_result(conversation_history)
+    result["prompt_hash"] = turn_info["prompt_hash"]
     
     # If conversation is complete, generate follow-up recommendation
     follow_up = None
@@ -648,6 +612,26 @@ def process_lead_response(speech_result, lead_data, conversation_history):
     
     return ai_response, conversation_history, result, follow_up
 
+def speculate_next_turn(lead_id, lead_data, conversation_history, history_digest=None):
+    """Pre-generate and pre-render replies to the likely answers to the bot's last question"""
+    if not speculation_enabled(get_config()):
+        return
+    
+    # The stage only depends on the exchange count, so the next turn's stage is known now
+    stage = determine_conversation_stage(conversation_history)
+    industry = lead_data.get('industry') or lead_data.get('category') if lead_data else None
+    
+    def generate(utterance, history, digest):
+        turn_info = {"prompt_hash": None}
+        reply = get_llm_response(utterance, history, stage, industry, digest, turn_info, lead_data, speculative=True)
+        return reply, turn_info["prompt_hash"]
+    
+    def render(reply, history):
+        # Warms the content-addressed TTS audio cache
+        get_voice_response(reply, lead_data, history)
+    
+    schedule_speculation(lead_id, conversation_history, history_digest, stage, generate, render)
+
 def determine_conversation_stage(history):
     """Determine which stage of the conversation we're in based on the history"""
     if not history or len(history) < 2:
@@ -686,9 +670,10 @@ def check_conversation_result(history):
     # Analyze last assistant message
     if history and len(history) > 1:
         last_message = history[-1]["content"].lower()
+        hits = CONVERSATION_MATCHER.scan(last_message)
         
         # Check for appointment confirmation
-        if ("confirmed" in last_message or "scheduled" in last_message) and ("appointment" in last_message or "meeting" in last_message):
+        if "confirmation" in hits and "meeting" in hits:
             result["status"] = "complete"
             result["appointment_set"] = True
             
@@ -703,12 +688,12 @@ def check_conversation_result(history):
                     pass
         
         # Check for disqualification
-        elif "not a good fit" in last_message or "doesn't seem like" in last_message:
+        elif "disqualified" in hits:
             result["status"] = "complete"
             result["qualified"] = False
         
         # Check for completion without appointment
-        elif "thank you for your time" in last_message and "goodbye" in last_message:
+        elif "thanks_for_time" in hits and "goodbye" in hits:
             result["status"] = "complete"
     
     return result
@@ -779,3 +764,5 @@ def update_industry_patterns(industry, pattern_type, pattern_key, pattern_value,
             ''', (industry, pattern_type, pattern_key, pattern_value, 1 if success else 0))
         
         conn.commit()
+    
+    invalidate_learned_patterns(industry)
@@ -0,0 +1,19 @@
+"""WSGI entry point for production servers (see gunicorn.conf.py)"""
+import logging
+from app import app
+from config import get_config
+from call_calendar import get_call_calendar
+from intent_classifier import get_intent_classifier
+
+logger = logging.getLogger(__name__)
+
+
+def warm_caches():
+    """Build the read-only caches once so preloaded workers inherit them instead of each building its own"""
+    get_config()
+    get_call_calendar()
+    get_intent_classifier()
+    logger.info("Warmed config, calling calendar and intent classifier")
+
+
+application = app
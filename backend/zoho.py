@@ -0,0 +1,387 @@
+import logging
+from datetime import datetime, timedelta
+import requests
+from config import get_config
+from models import get_db
+
+logger = logging.getLogger(__name__)
+
+def zoho_api_url(config):
+    """Base URL of the Zoho CRM and Calendar APIs"""
+    return (config.get('ZOHO_API_URL') or 'https://www.zohoapis.com').rstrip('/')
+
+def get_zoho_access_token():
+    """Get an access token for Zoho CRM API"""
+    config = get_config()
+    refresh_token = config.get('ZOHO_REFRESH_TOKEN')
+    client_id = config.get('ZOHO_CLIENT_ID')
+    client_secret = config.get('ZOHO_CLIENT_SECRET')
+    
+    if not refresh_token or not client_id or not client_secret:
+        return None
+    
+    url = f"{config.get('ZOHO_ACCOUNTS_URL') or 'https://accounts.zoho.com'}/oauth/v2/token"
+    data = {
+        "refresh_token": refresh_token,
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token"
+    }
+    
+    try:
+        response = requests.post(url, data=data)
+        if response.status_code == 200:
+            return response.json().get('access_token')
+    except Exception as e:
+        logger.error(f"Error getting Zoho access token: {str(e)}")
+    
+    return None
+
+def sync_leads_to_zoho(lead_ids):
+    """Sync leads to Zoho CRM"""
+    access_token = get_zoho_access_token()
+    if not access_token:
+        return False
+    
+    config = get_config()
+    org_id = config.get('ZOHO_ORG_ID')
+    department_id = config.get('ZOHO_DEPARTMENT_ID')
+    
+    with get_db() as conn:
+        for lead_id in lead_ids:
+            lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
+            if not lead:
+                continue
+            
+            # Format lead data for Zoho
+            lead_data = {
+                "data": [{
+                    "Company": lead['name'],
+                    "Phone": lead['phone'],
+                    "Industry": lead['industry'] or lead['category'],
+                    "Address": lead['address'],
+                    "Website": lead['website'],
+                    "City": lead['city'],
+                    "State": lead['state'],
+                    "Description": f"Employee Count: {lead['employee_count']}\nUses Mobile Devices: {lead['uses_mobile_devices']}",
+                    "Lead_Source": "AI Assistant",
+                    "Department": department_id
+                }]
+            }
+            
+            # Create lead in Zoho
+            url = f"{zoho_api_url(config)}/crm/v2/Leads"
+            headers = {
+                "Authorization": f"Zoho-oauthtoken {access_token}",
+                "Content-Type": "application/json"
+            }
+            
+            if org_id:
+                headers["X-ORGID"] = org_id
+                
+            try:
+                response = requests.post(url, headers=headers, json=lead_data)
+                if response.status_code == 201:
+                    zoho_id = response.json()['data'][0]['details']['id']
+                    # Store Zoho ID in local DB for future reference
+                    conn.execute('UPDATE leads SET notes = ? WHERE id = ?', 
+                               (f"Zoho Lead ID: {zoho_id}", lead_id))
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Error creating lead in Zoho: {str(e)}")
+    
+    return True
+
+def create_zoho_appointment(lead_id, date, time, medium):
+    """Create an appointment in Zoho Calendar"""
+    access_token = get_zoho_access_token()
+    if not access_token:
+        return False
+    
+    config = get_config()
+    org_id = config.get('ZOHO_ORG_ID')
+    department_id = config.get('ZOHO_DEPARTMENT_ID')
+    
+    with get_db() as conn:
+        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
+        if not lead:
+            return False
+        
+        # Extract Zoho Lead ID if available
+        zoho_lead_id = None
+        if lead['notes'] and "Zoho Lead ID:" in lead['notes']:
+            try:
+                zoho_lead_id = lead['notes'].split("Zoho Lead ID:")[1].strip().split()[0]
+            except:
+                pass
+        
+        # Format appointment data
+        start_datetime = f"{date}T{time}:00"
+        end_datetime = increment_time(start_datetime, minutes=30)
+        
+        # Create event in Zoho Calendar
+        url = f"{zoho_api_url(config)}/crm/v2/Events"
+        headers = {
+            "Authorization": f"Zoho-oauthtoken {access_token}",
+            "Content-Type": "application/json"
+        }
+        
+        if org_id:
+            headers["X-ORGID"] = org_id
+        
+        event_data = {
+            "data": [{
+                "Subject": f"Meeting with {lead['name']}",
+                "Start_DateTime": start_datetime,
+                "End_DateTime": end_datetime,
+                "Event_Title": f"Mobile Solutions Consultation with {lead['name']}",
+                "Location": "Phone Call" if medium == "Phone" else "Zoom Meeting",
+                "Department": department_id
+            }]
+        }
+        
+        # Link to lead if we have the Zoho Lead ID
+        if zoho_lead_id:
+            event_data["data"][0]["What_Id"] = zoho_lead_id
+            event_data["data"][0]["$se_module"] = "Leads"
+        
+        try:
+            response = requests.post(url, headers=headers, json=event_data)
+            if response.status_code == 201:
+                event_id = response.json()['data'][0]['details']['id']
+                # Store Event ID in appointment notes for future reference
+                with get_db() as conn:
+                    appointment = conn.execute(
+                        'SELECT id FROM appointments WHERE lead_id = ? AND date = ? AND time = ?',
+                        (lead_id, date, time)
+                    ).fetchone()
+                    if appointment:
+                        conn.execute('UPDATE appointments SET notes = ? WHERE id = ?',
+                                   (f"Zoho Event ID: {event_id}", appointment['id']))
+                        conn.commit()
+                return True
+        except Exception as e:
+            logger.error(f"Error creating event in Zoho: {str(e)}")
+    
+    return False
+
+def update_zoho_appointment(lead_id, date, time, medium):
+    """Update an existing appointment in Zoho"""
+    access_token = get_zoho_access_token()
+    if not access_token:
+        return False
+    
+    config = get_config()
+    org_id = config.get('ZOHO_ORG_ID')
+    
+    with get_db() as conn:
+        # Get the appointment details from our database
+        appointment = conn.execute('''
+            SELECT a.*, l.notes 
+            FROM appointments a 
+            JOIN leads l ON a.lead_id = l.id 
+            WHERE a.lead_id = ? AND a.date = ? AND a.time = ?
+        ''', (lead_id, date, time)).fetchone()
+        
+        if not appointment:
+            return False
+        
+        # Extract Zoho Event ID if available in notes
+        zoho_event_id = None
+        if appointment['notes'] and "Zoho Event ID:" in appointment['notes']:
+            try:
+                zoho_event_id = appointment['notes'].split("Zoho Event ID:")[1].strip().split()[0]
+            except:
+                pass
+        
+        if not zoho_event_id:
+            # If no event ID, create a new appointment instead
+            return create_zoho_appointment(lead_id, date, time, medium)
+        
+        # Format appointment data
+        start_datetime = f"{date}T{time}:00"
+        end_datetime = increment_time(start_datetime, minutes=30)
+        
+        # Update event in Zoho Calendar
+        url = f"{zoho_api_url(config)}/crm/v2/Events/{zoho_event_id}"
+        headers = {
+            "Authorization": f"Zoho-oauthtoken {access_token}",
+            "Content-Type": "application/json"
+        }
+        
+        if org_id:
+            headers["X-ORGID"] = org_id
+        
+        # Get lead information
+        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
+        if not lead:
+            return False
+        
+        event_data = {
+            "data": [{
+                "Start_DateTime": start_datetime,
+                "End_DateTime": end_datetime,
+                "Location": "Phone Call" if medium == "Phone" else "Zoom Meeting"
+            }]
+        }
+        
+        try:
+            response = requests.put(url, headers=headers, json=event_data)
+            return response.status_code in (200, 201, 204)
+        except Exception as e:
+            logger.error(f"Error updating event in Zoho: {str(e)}")
+            return False
+
+def update_zoho_lead_qualification(lead_id, qualification_status, uses_mobile, employee_count, notes):
+    """Update lead qualification status in Zoho CRM"""
+    access_token = get_zoho_access_token()
+    if not access_token:
+        return False
+    
+    config = get_config()
+    org_id = config.get('ZOHO_ORG_ID')
+    
+    with get_db() as conn:
+        lead = conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)).fetchone()
+        if not lead:
+            return False
+        
+        # Extract Zoho Lead ID if available
+        zoho_lead_id = None
+        if lead['notes'] and "Zoho Lead ID:" in lead['notes']:
+            try:
+                zoho_lead_id = lead['notes'].split("Zoho Lead ID:")[1].strip().split()[0]
+            except:
+                pass
+        
+        if not zoho_lead_id:
+            # If no Zoho ID, we can't update the lead
+            return False
+        
+        # Format lead data for update
+        lead_data = {
+            "data": [{
+                "Description": f"Employee Count: {employee_count}\nUses Mobile Devices: {uses_mobile}\n\n{notes or ''}",
+                # Custom fields - these would need to match your actual Zoho CRM setup
+                "$se_module": "Leads"
+            }]
+        }
+        
+        # Add a custom field for qualification status if your Zoho has one
+        if qualification_status == 'Qualified':
+            lead_data["data"][0]["Lead_Status"] = "Qualified"
+        else:
+            lead_data["data"][0]["Lead_Status"] = "Not Qualified"
+        
+        # Update lead in Zoho
+        url = f"{zoho_api_url(config)}/crm/v2/Leads/{zoho_lead_id}"
+        headers = {
+            "Authorization": f"Zoho-oauthtoken {access_token}",
+            "Content-Type": "application/json"
+        }
+        
+        if org_id:
+            headers["X-ORGID"] = org_id
+        
+        try:
+            response = requests.put(url, headers=headers, json=lead_data)
+            return response.status_code in (200, 201, 204)
+        except Exception as e:
+            logger.error(f"Error updating lead in Zoho: {str(e)}")
+            return False
+
+def get_zoho_availability(date):
+    """Get available time slots from Zoho Calendar"""
+    access_token = get_zoho_access_token()
+    if not access_token:
+        return []
+    
+    config = get_config()
+    org_id = config.get('ZOHO_ORG_ID')
+    
+    # Format date for Zoho API
+    try:
+        dt = datetime.fromisoformat(f"{date}T00:00:00")
+        
+        # Get start of day and end of day
+        start_time = dt.isoformat() + 'Z'
+        end_time = dt.replace(hour=23, minute=59, second=59).isoformat() + 'Z'
+    except:
+        # If date parsing fails, return empty list
+        return []
+    
+    try:
+        # Get user ID - needed for free/busy lookup
+        user_url = f"{zoho_api_url(config)}/crm/v2/users?type=CurrentUser"
+        headers = {
+            "Authorization": f"Zoho-oauthtoken {access_token}"
+        }
+        
+        if org_id:
+            headers["X-ORGID"] = org_id
+        
+        user_response = requests.get(user_url, headers=headers)
+        if user_response.status_code != 200:
+            return []
+        
+        user_id = user_response.json()['users'][0]['id']
+        
+        # Get free/busy information from Zoho Calendar
+        calendar_url = f"{zoho_api_url(config)}/calendar/v1/freebusy"
+        params = {
+            "users": user_id,
+            "starttime": start_time,
+            "endtime": end_time
+        }
+        
+        response = requests.get(calendar_url, headers=headers, params=params)
+        if response.status_code != 200:
+            return []
+        
+        # Extract busy times
+        busy_times = []
+        try:
+            freebusy_data = response.json()
+            if 'users' in freebusy_data and len(freebusy_data['users']) > 0:
+                busy_periods = freebusy_data['users'][0]['busy']
+                for period in busy_periods:
+                    start = datetime.fromisoformat(period['startTime'].replace('Z', ''))
+                    end = datetime.fromisoformat(period['endTime'].replace('Z', ''))
+                    busy_times.append((start, end))
+        except Exception as e:
+            logger.error(f"Error parsing Zoho freebusy response: {str(e)}")
+            return []
+        
+        # Generate all available slots during business hours (9am-5pm)
+        all_slots = []
+        business_start = dt.replace(hour=9, minute=0, second=0)
+        business_end = dt.replace(hour=17, minute=0, second=0)
+        
+        # Create 30-minute slots
+        current_slot = business_start
+        while current_slot < business_end:
+            slot_end = current_slot + timedelta(minutes=30)
+            
+            # Check if slot overlaps with any busy time
+            is_available = True
+            for busy_start, busy_end in busy_times:
+                # Slot is unavailable if it overlaps with a busy period
+                if not (slot_end <= busy_start or current_slot >= busy_end):
+                    is_available = False
+                    break
+            
+            if is_available:
+                all_slots.append(current_slot.strftime('%H:%M'))
+            
+            current_slot = slot_end
+        
+        return all_slots
+    except Exception as e:
+        logger.error(f"Error getting Zoho availability: {str(e)}")
+        return []
+
+def increment_time(datetime_str, minutes=30):
+    """Add minutes to a datetime string in ISO format"""
+    dt = datetime.fromisoformat(datetime_str)
+    dt = dt + timedelta(minutes=minutes)
+    return dt.isoformat()
@@ -62,15 +62,15 @@ function App() {
     setScraping(true);
     
     try {
-      const response = await axios.post(`${API_BASE}/scrape`, scrapeParams);
-      console.log('Scraping response:', response.data);
+      const result = await scrapeLeads(scrapeParams);
+      console.log('Scraping result:', result);
       await fetchLeads();
       
       // Show success notification
       setNotification({
         show: true,
         type: 'success',
-        message: `Successfully added ${response.data.count} new leads!`
+        message: `Successfully added ${result.count} new leads!`
       });
     } catch (error) {
       console.error("Error scraping leads:", error);
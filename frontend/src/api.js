@@ -2,19 +2,60 @@ import axios from 'axios';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5001/api';
 
+// Background jobs: long operations answer 202 with a job id; poll it until it finishes
+export const getJob = (jobId) => axios.get(`${API_BASE}/jobs/${jobId}`).then(r => r.data);
+// A queued job that has already been attempted is waiting out a retry backoff
+// (up to an hour), so onProgress gets job.retrying; waiting gives up after timeout ms
+// and rejects with the last job seen (error.job) - the job itself keeps going
+export const waitForJob = async (jobId, { interval = 1000, timeout = 10 * 60 * 1000, onProgress } = {}) => {
+  const deadline = Date.now() + timeout;
+  for (;;) {
+    const job = await getJob(jobId);
+    job.retrying = job.status === 'queued' && job.attempts > 0;
+    if (onProgress) onProgress(job);
+    if (['succeeded', 'failed', 'cancelled'].includes(job.status)) return job;
+    if (Date.now() >= deadline) {
+      const error = new Error(job.retrying
+        ? `Job ${jobId} failed (${job.error}) and will be retried in the background`
+        : `Job ${jobId} is still ${job.status}; check back later`);
+      error.job = job;
+      throw error;
+    }
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+};
+// Resolves with the job's result; a failed job rejects with an Error carrying the job (error.job)
+export const runJob = async (request, options) => {
+  const response = await request;
+  const job = await waitForJob(response.data.job_id, options);
+  if (job.status !== 'succeeded') {
+    const error = new Error(job.error || `Job ${job.status}`);
+    error.job = job;
+    throw error;
+  }
+  return job.result;
+};
+
 export const getLeads = () => axios.get(`${API_BASE}/leads`).then(r => r.data);
 export const addLead = (lead) => axios.post(`${API_BASE}/leads`, lead);
 export const updateLead = (id, data) => axios.patch(`${API_BASE}/leads/${id}`, data);
 export const deleteLead = (id) => axios.delete(`${API_BASE}/leads/${id}`);
 export const deleteLeads = (leadIds) => axios.post(`${API_BASE}/leads/batch-delete`, { lead_ids: leadIds });
-export const scrapeLeads = (limit = 30) => axios.post(`${API_BASE}/scrape`, { limit });
+export const scrapeLeads = (params = { limit: 30 }, options) => runJob(axios.post(`${API_BASE}/scrape`, params), options);
 export const callLead = (lead_id, script) => axios.post(`${API_BASE}/call`, { lead_id, script });
 export const manualCallLead = (lead_id, script) => axios.post(`${API_BASE}/call`, { lead_id, script, is_manual: true });
-export const autoDialLeads = (lead_ids) => axios.post(`${API_BASE}/auto_dial`, { lead_ids });
+export const autoDialLeads = (lead_ids, options) => runJob(axios.post(`${API_BASE}/auto_dial`, { lead_ids }), options);
 export const checkBusinessHours = () => axios.get(`${API_BASE}/check_business_hours`).then(r => r.data);
 export const getCallLogs = (lead_id) => axios.get(`${API_BASE}/call_logs/${lead_id}`).then(r => r.data);
 export const addCallLog = (log) => axios.post(`${API_BASE}/call_logs`, log);
-export const getLeadHistory = (lead_id) => axios.get(`${API_BASE}/lead_history/${lead_id}`).then(r => r.data);
+export const getLeadHistory = (lead_id, { cursor, types, limit } = {}) => {
+  const params = new URLSearchParams();
+  if (cursor) params.append('cursor', cursor);
+  if (types && types.length) params.append('types', types.join(','));
+  if (limit) params.append('limit', limit);
+  return axios.get(`${API_BASE}/lead_history/${lead_id}${params.toString() ? '?' + params.toString() : ''}`).then(r => r.data);
+};
+export const getLeadCallTurns = (lead_id, call_id) => axios.get(`${API_BASE}/lead_history/${lead_id}/calls/${call_id}`).then(r => r.data);
 
 // Follow-up API functions
 export const getFollowUps = (filters = {}) => {
@@ -33,4 +74,4 @@ export const addFollowUp = (followUp) => axios.post(`${API_BASE}/follow_ups`, fo
 
 export const updateFollowUp = (id, data) => axios.patch(`${API_BASE}/follow_ups/${id}`, data);
 
-export const runAutoFollowUp = (maxCalls = 10) => axios.post(`${API_BASE}/auto_follow_up`, { max_calls: maxCalls });
+export const runAutoFollowUp = (maxCalls = 10, options) => runJob(axios.post(`${API_BASE}/auto_follow_up`, { max_calls: maxCalls }), options);
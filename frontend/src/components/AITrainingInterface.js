@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { runJob } from '../api';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5001/api';
 
@@ -138,14 +139,14 @@ export default function AITrainingInterface() {
     try {
       setLearningInProgress(true);
       
-      const response = await axios.post(`${API_BASE}/analytics/learn`, {
+      const result = await runJob(axios.post(`${API_BASE}/analytics/learn`, {
         feedback: feedback
-      });
+      }));
       
       setLearningSummary({
         message: 'Learning process completed successfully',
-        callsAnalyzed: response.data?.callsAnalyzed || 0,
-        patternsIdentified: response.data?.patternsIdentified || 0,
+        callsAnalyzed: result?.callsAnalyzed || 0,
+        patternsIdentified: result?.patternsIdentified || 0,
         timestamp: new Date().toLocaleString()
       });
       
@@ -155,7 +156,7 @@ export default function AITrainingInterface() {
     } catch (err) {
       console.error('Error running learning process:', err);
       setLearningSummary({
-        message: `Error: ${err.response?.data?.error || 'Failed to run learning process'}`,
+        message: `Error: ${err.job?.error || err.response?.data?.error || 'Failed to run learning process'}`,
         timestamp: new Date().toLocaleString()
       });
     } finally {
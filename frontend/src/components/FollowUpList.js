@@ -115,10 +115,10 @@ export default function FollowUpList() {
     try {
       const result = await runAutoFollowUp();
       
-      if (result.data.count > 0) {
+      if (result.count > 0) {
         setNotification({
           show: true,
-          message: `Started ${result.data.count} follow-up calls`,
+          message: `Started ${result.count} follow-up calls`,
           type: 'success'
         });
       } else {
@@ -135,7 +135,7 @@ export default function FollowUpList() {
       console.error('Error running auto follow-up:', err);
       
       // Check if it's an outside business hours error
-      if (err.response && err.response.data && err.response.data.error === 'Outside of calling hours') {
+      if (err.job && err.job.error === 'Outside of calling hours') {
         setNotification({
           show: true,
           message: 'Auto follow-up can only be run during business hours',
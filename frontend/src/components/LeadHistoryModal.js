@@ -1,17 +1,32 @@
 import React, { useState, useEffect } from 'react';
-import { getLeadHistory } from '../api';
+import { getLeadHistory, getLeadCallTurns } from '../api';
+
+const TIMELINE_FILTERS = [
+  { type: 'call', label: 'Calls' },
+  { type: 'appointment', label: 'Appointments' },
+  { type: 'follow_up', label: 'Follow-ups' },
+  { type: 'qualification', label: 'Qualification' }
+];
 
 export default function LeadHistoryModal({ lead, open, onClose }) {
-  const [history, setHistory] = useState(null);
+  const [timeline, setTimeline] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [types, setTypes] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
+  // Turns of expanded calls, fetched on demand: { [callId]: rows | 'loading' }
+  const [callTurns, setCallTurns] = useState({});
 
   useEffect(() => {
     if (open && lead) {
       setLoading(true);
-      getLeadHistory(lead.id)
+      setError(null);
+      setCallTurns({});
+      getLeadHistory(lead.id, { types })
         .then(data => {
-          setHistory(data);
+          setTimeline(data.timeline);
+          setNextCursor(data.next_cursor);
           setLoading(false);
         })
         .catch(err => {
@@ -20,7 +35,40 @@ export default function LeadHistoryModal({ lead, open, onClose }) {
           setLoading(false);
         });
     }
-  }, [open, lead]);
+  }, [open, lead, types]);
+
+  const loadMore = () => {
+    setLoadingMore(true);
+    getLeadHistory(lead.id, { types, cursor: nextCursor })
+      .then(data => {
+        setTimeline(items => [...items, ...data.timeline]);
+        setNextCursor(data.next_cursor);
+        setLoadingMore(false);
+      })
+      .catch(err => {
+        console.error("Error fetching lead history:", err);
+        setError("Failed to load more history");
+        setLoadingMore(false);
+      });
+  };
+
+  const toggleType = (type) => {
+    setTypes(current => current.includes(type) ? current.filter(t => t !== type) : [...current, type]);
+  };
+
+  const toggleCall = (callId) => {
+    if (callTurns[callId]) {
+      setCallTurns(({ [callId]: _, ...rest }) => rest);
+      return;
+    }
+    setCallTurns(turns => ({ ...turns, [callId]: 'loading' }));
+    getLeadCallTurns(lead.id, callId)
+      .then(data => setCallTurns(turns => ({ ...turns, [callId]: data.turns })))
+      .catch(err => {
+        console.error("Error fetching call turns:", err);
+        setCallTurns(({ [callId]: _, ...rest }) => rest);
+      });
+  };
 
   if (!open) return null;
 
@@ -74,14 +122,29 @@ export default function LeadHistoryModal({ lead, open, onClose }) {
               </div>
             </div>
             
-            <h3 className="font-bold mb-2">Timeline</h3>
+            <div className="flex items-center justify-between mb-2">
+              <h3 className="font-bold">Timeline</h3>
+              <div className="flex gap-1">
+                {TIMELINE_FILTERS.map(filter => (
+                  <button
+                    key={filter.type}
+                    className={`text-xs px-2 py-1 rounded border ${
+                      types.includes(filter.type) ? 'bg-blue-500 text-white border-blue-500' : 'bg-white text-gray-700'
+                    }`}
+                    onClick={() => toggleType(filter.type)}
+                  >
+                    {filter.label}
+                  </button>
+                ))}
+              </div>
+            </div>
             
-            {history && history.timeline.length > 0 ? (
+            {timeline.length > 0 ? (
               <div className="space-y-4">
-                {history.timeline.map((item, index) => (
-                  <div key={index} className="border-l-4 pl-4 py-2 relative">
+                {timeline.map(item => (
+                  <div key={`${item.type}-${item.id}`} className="border-l-4 pl-4 py-2 relative">
                     <div className={`absolute w-3 h-3 rounded-full -left-[6.5px] top-4 ${
-                      item.type === 'call_log' 
+                      item.type === 'call' 
                         ? 'bg-blue-500' 
                         : item.type === 'appointment' 
                           ? 'bg-purple-500' 
@@ -92,20 +155,30 @@ export default function LeadHistoryModal({ lead, open, onClose }) {
                     
                     <div className="flex justify-between mb-1">
                       <span className="font-bold">
-                        {item.type === 'call_log' 
+                        {item.type === 'call' 
                           ? `Call ${item.status}` 
                           : item.type === 'appointment' 
-                            ? `Appointment (${item.medium})` 
+                            ? `Appointment (${item.data.medium})` 
                             : item.type === 'follow_up'
-                              ? `Follow-up (Priority: ${item.priority})`
+                              ? `Follow-up (Priority: ${item.data.priority})`
                               : `Qualification: ${item.status}`}
                       </span>
                       <span className="text-gray-500 text-sm">{item.timestamp}</span>
                     </div>
                     
-                    {item.type === 'call_log' && item.transcript && (
-                      <div className="text-sm mt-1 whitespace-pre-wrap bg-gray-50 p-2 rounded">
-                        {item.transcript}
+                    {item.type === 'call' && (
+                      <div className="text-sm mt-1">
+                        <button className="text-blue-600 hover:underline" onClick={() => toggleCall(item.id)}>
+                          {callTurns[item.id] ? 'Hide' : 'Show'} transcript ({item.data.messages} messages)
+                        </button>
+                        {callTurns[item.id] === 'loading' && (
+                          <div className="text-gray-500 mt-1">Loading transcript...</div>
+                        )}
+                        {Array.isArray(callTurns[item.id]) && (
+                          <div className="whitespace-pre-wrap bg-gray-50 p-2 rounded mt-1">
+                            {callTurns[item.id].map(turn => turn.transcript).join('\n')}
+                          </div>
+                        )}
                       </div>
                     )}
                     
@@ -123,12 +196,12 @@ export default function LeadHistoryModal({ lead, open, onClose }) {
                         <span className={`${getStatusBadge(item.status)} px-2 py-1 rounded mr-2`}>
                           {item.status}
                         </span>
-                        <span className={`${getPriorityColor(item.priority)} px-2 py-1 rounded`}>
-                          Priority: {item.priority}
+                        <span className={`${getPriorityColor(item.data.priority)} px-2 py-1 rounded`}>
+                          Priority: {item.data.priority}
                         </span>
-                        {item.reason && (
+                        {item.data.reason && (
                           <div className="mt-1 bg-gray-50 p-2 rounded">
-                            {item.reason}
+                            {item.data.reason}
                           </div>
                         )}
                       </div>
@@ -147,6 +220,18 @@ export default function LeadHistoryModal({ lead, open, onClose }) {
               <div className="text-gray-500 py-4 text-center">No history available for this lead</div>
             )}
             
+            {nextCursor && (
+              <div className="flex justify-center mt-4">
+                <button
+                  className="px-4 py-2 text-sm bg-gray-100 hover:bg-gray-200 rounded disabled:opacity-50"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
+            
           </>
         )}
       </div>
@@ -147,22 +147,23 @@ export default function LeadTable({ leads, onStatusChange }) {
     }
 
     try {
-      const response = await autoDialLeads(selectedLeads);
+      const result = await autoDialLeads(selectedLeads);
       onStatusChange();
+      const called = result.results.filter(r => r.status === 'success').length;
       setNotification({
         show: true,
         type: 'success',
-        message: `Auto-dialer started for ${selectedLeads.length} leads`
+        message: `Auto-dialer called ${called} of ${selectedLeads.length} leads`
       });
       setTimeout(() => setNotification({ show: false, message: '', type: '' }), 5000);
       setSelectedLeads([]);
     } catch (error) {
       // Show error message if outside business hours
-      if (error.response && error.response.status === 400) {
+      if (error.job && error.job.error === 'Outside of calling hours') {
         setNotification({
           show: true,
           type: 'error',
-          message: error.response.data.message || 'Auto-dialer can only be used during business hours'
+          message: error.job.result?.message || 'Auto-dialer can only be used during business hours'
         });
       } else {
         setNotification({
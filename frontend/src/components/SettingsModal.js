@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { runJob } from '../api';
 import VoiceSelector from './VoiceSelector';
 
 const API_BASE = process.env.REACT_APP_API_BASE || 'http://localhost:5001/api';
@@ -109,15 +110,15 @@ export default function SettingsModal({ open, onClose, onSave }) {
   const triggerLearning = async () => {
     setLearningStatus({ message: 'Analyzing successful conversations...', visible: true });
     try {
-      const response = await axios.post(`${API_BASE}/analytics/learn`, { days: learningDays });
+      const result = await runJob(axios.post(`${API_BASE}/analytics/learn`, { days: learningDays }));
       setLearningStatus({ 
-        message: `Success! ${response.data.message || 'Learning process completed successfully.'}`, 
+        message: `Success! ${result.message || 'Learning process completed successfully.'}`, 
         visible: true,
         isError: false
       });
     } catch (error) {
       setLearningStatus({ 
-        message: `Error: ${error.response?.data?.message || 'Could not complete learning process.'}`, 
+        message: `Error: ${error.job?.error || error.response?.data?.error || 'Could not complete learning process.'}`, 
         visible: true,
         isError: true
       });
@@ -136,11 +137,11 @@ export default function SettingsModal({ open, onClose, onSave }) {
       setError(null);
       setSuccess(null);
       
-      const response = await axios.post(`${API_BASE}/zoho/sync`);
-      setSuccess(`Successfully synced ${response.data.syncedCount} appointments to Zoho CRM`);
+      const result = await runJob(axios.post(`${API_BASE}/zoho/sync`));
+      setSuccess(`Successfully synced ${result.syncedCount} appointments to Zoho CRM`);
     } catch (err) {
       console.error('Error syncing to Zoho:', err);
-      setError(err.response?.data?.error || 'Failed to sync with Zoho CRM');
+      setError(err.job?.error || err.response?.data?.error || 'Failed to sync with Zoho CRM');
     } finally {
       setLoading(false);
     }
@@ -0,0 +1,2 @@
+# Scripts in this directory are run directly, not collected as tests
+collect_ignore = ['load_test.py', 'dataset.py']
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Steve Appointment Booker - Synthetic Dataset Generator
+This script builds a realistic production-scale database (leads, call-log turns,
+appointments, follow-ups) for benchmarking. Rows are streamed into SQLite in
+batches, so a 1M-lead / 20M-turn database needs little memory.
+
+Usage:
+    python tests/bench/dataset.py --leads 1000000 --out /tmp/bench_1m.db
+    python tests/bench/dataset.py --leads 50000 --calls-per-lead 3 --turns-per-call 5 --out bench.db
+    python tests/bench/dataset.py --profile my_profile.json --out bench.db   # override any distribution
+
+At the defaults (half the leads called, ~3 calls each, ~6 exchanges an answered
+call) 1M leads give roughly 20M call-log rows.
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from lead_identity import lead_identity
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("dataset")
+
+# Every distribution is a {value: weight} map or a number; override any key with --profile
+DEFAULT_PROFILE = {
+    'industries': {'Plumbing': 18, 'HVAC': 16, 'Electrical': 14, 'Construction': 14, 'Landscaping': 10,
+                   'Cleaning': 8, 'Roofing': 7, 'Pest Control': 5, 'Trucking': 5, 'Security': 3},
+    'states': {'TX': 14, 'CA': 13, 'FL': 10, 'CO': 9, 'NY': 8, 'AZ': 7, 'GA': 6, 'IL': 6, 'NC': 5,
+               'WA': 5, 'OH': 5, 'PA': 4, 'UT': 4, 'NV': 4},
+    # Median and spread (lognormal sigma) of company size
+    'employee_median': 15,
+    'employee_sigma': 0.9,
+    'uses_mobile': {'Yes': 55, 'No': 10, 'Unknown': 35},
+    # Share of leads that have been called at all, and outcome weights for called leads
+    'called_rate': 0.5,
+    'outcomes': {'Completed': 45, 'Call Attempted': 35, 'Appointment Set': 12, 'Calling': 1, 'Not Interested': 7},
+    # Mean calls per called lead and speech turns per answered call (Poisson)
+    'calls_per_lead': 3.0,
+    'turns_per_call': 6.0,
+    # Share of calls that reach voicemail instead of a person
+    'voicemail_rate': 0.15,
+    # Share of called leads without an appointment that get a follow-up
+    'follow_up_rate': 0.3,
+    'follow_up_status': {'Pending': 60, 'Completed': 30, 'Cancelled': 10},
+    'appointment_status': {'Scheduled': 70, 'Completed': 20, 'Cancelled': 10},
+    # Activity is spread over this many days before now
+    'days': 365
+}
+
+OPENING = "Bot: Hello, this is Steve with Seamless Mobile Services. I'll be brief."
+
+LEAD_LINES = [
+    "Yes, who is this?", "Speaking.", "What is this about?", "We have about {n} employees.",
+    "Yes, our techs all carry phones.", "We use tablets in the field.", "How much does it cost?",
+    "I'm pretty busy right now.", "We already have a provider.", "Sure, that sounds interesting.",
+    "Can you call back next week?", "Send me an email instead."
+]
+
+BOT_LINES = [
+    "Do you currently use mobile devices in your business?",
+    "Great, and roughly how many employees do you have?",
+    "Companies like yours in {industry} usually save about 20% on mobile costs.",
+    "I understand. Many of our clients felt the same way at first.",
+    "Would a quick 15-minute meeting this week work for you?",
+    "Would Thursday at 10 AM or Friday at 2 PM be better?"
+]
+
+BATCH_SIZE = 20000
+
+
+class WeightedChoice:
+    """Fast repeated random.choices over a {value: weight} map"""
+
+    def __init__(self, weights, rng):
+        self.values = list(weights)
+        total = float(sum(weights.values()))
+        self.cumulative = []
+        running = 0.0
+        for value in self.values:
+            running += weights[value] / total
+            self.cumulative.append(running)
+        self.rng = rng
+
+    def __call__(self):
+        return self.rng.choices(self.values, cum_weights=self.cumulative)[0]
+
+
+def poisson(rng, mean):
+    """Poisson sample (Knuth); means here are small"""
+    limit, k, p = math.exp(-mean), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def load_profile(path=None, overrides=None):
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path) as f:
+            profile.update(json.load(f))
+    profile.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    return profile
+
+
+class DatasetBuilder:
+    """Generates one lead at a time with its calls, appointment and follow-up"""
+
+    def __init__(self, profile, seed=42, now=None):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.now = now or datetime.now()
+        self.industry = WeightedChoice(profile['industries'], self.rng)
+        self.state = WeightedChoice(profile['states'], self.rng)
+        self.uses_mobile = WeightedChoice(profile['uses_mobile'], self.rng)
+        self.outcome = WeightedChoice(profile['outcomes'], self.rng)
+        self.follow_up_status = WeightedChoice(profile['follow_up_status'], self.rng)
+        self.appointment_status = WeightedChoice(profile['appointment_status'], self.rng)
+        self.area_codes = [303, 720, 512, 213, 305, 602, 404, 312, 704, 206, 614, 215, 801, 702]
+
+    def _timestamp(self, moment):
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+    def lead(self, lead_id):
+        rng = self.rng
+        industry = self.industry()
+        # The 7-digit subscriber number is unique per lead, so phones never collide
+        subscriber = 2000000 + lead_id
+        phone = f"{rng.choice(self.area_codes)}-{subscriber // 10000:03d}-{subscriber % 10000:04d}"
+        name = f"{rng.choice(['Apex', 'Summit', 'Blue Sky', 'Precision', 'Front Range', 'Reliable', 'Metro', 'Elite'])} {industry} {lead_id}"
+        employees = max(1, int(rng.lognormvariate(math.log(self.profile['employee_median']), self.profile['employee_sigma'])))
+        called = rng.random() < self.profile['called_rate']
+        status = self.outcome() if called else 'Not Called'
+        created_at = self.now - timedelta(days=rng.uniform(0, self.profile['days']))
+        lead = {
+            'id': lead_id, 'name': name, 'phone': phone, 'industry': industry, 'category': industry,
+            'city': f"City {lead_id % 500}", 'state': self.state(), 'zipcode': f"{rng.randint(10000, 99999)}",
+            'address': f"{rng.randint(10, 9999)} Main St", 'website': f"https://www.lead{lead_id}.example.com",
+            'employee_count': employees, 'uses_mobile_devices': self.uses_mobile() if called else 'Unknown',
+            'status': status,
+            'qualification_status': 'Qualified' if status == 'Appointment Set' else 'Not Qualified',
+            'created_at': self._timestamp(created_at)
+        }
+        lead['phone_e164'], lead['identity_key'] = lead_identity(lead)
+        return lead, created_at
+
+    def calls(self, lead, created_at):
+        """Call-log rows (lead_id, call_status, transcript, created_at, call_sid) for a called lead"""
+        rng = self.rng
+        rows = []
+        calls = max(1, poisson(rng, self.profile['calls_per_lead']))
+        start = created_at
+        for call in range(calls):
+            start = min(start + timedelta(days=rng.uniform(0.5, 20)), self.now)
+            moment = start
+            call_sid = f"CA{rng.getrandbits(128):032x}"
+            rows.append((lead['id'], 'Started', OPENING, self._timestamp(moment), call_sid))
+            if rng.random() < self.profile['voicemail_rate']:
+                rows.append((lead['id'], 'AMD Detection', 'Call was answered by: machine_end_beep (detection took 1800ms)',
+                             self._timestamp(moment), call_sid))
+                rows.append((lead['id'], 'completed', 'Call ended with status: completed', self._timestamp(moment + timedelta(seconds=30)), call_sid))
+                continue
+            for turn in range(max(1, poisson(rng, self.profile['turns_per_call']))):
+                moment += timedelta(seconds=rng.uniform(4, 20))
+                lead_line = rng.choice(LEAD_LINES).format(n=lead['employee_count'])
+                bot_line = rng.choice(BOT_LINES).format(industry=lead['industry'])
+                rows.append((lead['id'], 'In Progress', f"Lead: {lead_line}", self._timestamp(moment), call_sid))
+                rows.append((lead['id'], 'In Progress', f"Bot: {bot_line}", self._timestamp(moment + timedelta(seconds=2)), call_sid))
+            last_call = call == calls - 1
+            if last_call and lead['status'] == 'Appointment Set':
+                rows.append((lead['id'], 'In Progress', "Bot: Perfect! I've scheduled our meeting. Thank you for your time!",
+                             self._timestamp(moment + timedelta(seconds=5)), call_sid))
+            rows.append((lead['id'], 'completed', 'Call ended with status: completed', self._timestamp(moment + timedelta(seconds=10)), call_sid))
+        return rows, start
+
+    def appointment(self, lead, last_call):
+        day = last_call + timedelta(days=self.rng.randint(1, 10))
+        return (lead['id'], day.strftime('%Y-%m-%d'), f"{self.rng.choice([9, 10, 11, 13, 14, 15])}:00",
+                self.appointment_status(), self.rng.choice(['Phone', 'Zoom', 'In Person']), self._timestamp(last_call))
+
+    def follow_up(self, lead, last_call):
+        scheduled = last_call + timedelta(days=self.rng.uniform(1, 30))
+        return (lead['id'], self._timestamp(scheduled), self.rng.randint(1, 10),
+                self.rng.choice(['Requested callback', 'Busy during call', 'Needs pricing', 'Voicemail']),
+                self.follow_up_status(), self._timestamp(last_call))
+
+
+LEAD_COLUMNS = ['id', 'name', 'phone', 'industry', 'category', 'city', 'state', 'zipcode', 'address', 'website',
+                'employee_count', 'uses_mobile_devices', 'status', 'qualification_status', 'created_at',
+                'phone_e164', 'identity_key']
+
+
+def build_dataset(path, leads=10000, profile=None, seed=42):
+    """Create a fresh database at path with synthetic data; returns row counts"""
+    profile = profile or load_profile()
+    if os.path.exists(path):
+        os.unlink(path)
+    previous_path = models.DB_PATH
+    models.DB_PATH = path
+    try:
+        models.init_db()
+        builder = DatasetBuilder(profile, seed)
+        counts = {'leads': 0, 'call_logs': 0, 'appointments': 0, 'follow_ups': 0}
+        with models.get_db() as conn:
+            # Bulk load: durability doesn't matter for a throwaway benchmark database
+            conn.execute('PRAGMA journal_mode = OFF')
+            conn.execute('PRAGMA synchronous = OFF')
+            batches = {'leads': [], 'call_logs': [], 'appointments': [], 'follow_ups': []}
+            statements = {
+                'leads': f"INSERT INTO leads ({', '.join(LEAD_COLUMNS)}) VALUES ({', '.join('?' for _ in LEAD_COLUMNS)})",
+                'call_logs': 'INSERT INTO call_logs (lead_id, call_status, transcript, created_at, call_sid) VALUES (?, ?, ?, ?, ?)',
+                'appointments': 'INSERT INTO appointments (lead_id, date, time, status, medium, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                'follow_ups': 'INSERT INTO follow_ups (lead_id, scheduled_time, priority, reason, status, created_at) VALUES (?, ?, ?, ?, ?, ?)'
+            }
+
+            def flush(force=False):
+                for table, rows in batches.items():
+                    if rows and (force or len(rows) >= BATCH_SIZE):
+                        conn.executemany(statements[table], rows)
+                        counts[table] += len(rows)
+                        rows.clear()
+
+            for lead_id in range(1, leads + 1):
+                lead, created_at = builder.lead(lead_id)
+                batches['leads'].append([lead[column] for column in LEAD_COLUMNS])
+                if lead['status'] != 'Not Called':
+                    rows, last_call = builder.calls(lead, created_at)
+                    batches['call_logs'].extend(rows)
+                    if lead['status'] == 'Appointment Set':
+                        batches['appointments'].append(builder.appointment(lead, last_call))
+                    elif builder.rng.random() < profile['follow_up_rate']:
+                        batches['follow_ups'].append(builder.follow_up(lead, last_call))
+                flush()
+                if lead_id % 100000 == 0:
+                    conn.commit()
+                    logger.info(f"{lead_id}/{leads} leads, {counts['call_logs']} call log rows")
+            flush(force=True)
+            conn.commit()
+            conn.execute('ANALYZE')
+        logger.info(f"Built {path}: {counts}")
+        return counts
+    finally:
+        models.DB_PATH = previous_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a synthetic benchmark database')
+    parser.add_argument('--out', required=True, help='Database file to create (replaced if it exists)')
+    parser.add_argument('--leads', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--profile', help='JSON file overriding DEFAULT_PROFILE keys')
+    parser.add_argument('--called-rate', type=float)
+    parser.add_argument('--calls-per-lead', type=float)
+    parser.add_argument('--turns-per-call', type=float)
+    parser.add_argument('--follow-up-rate', type=float)
+    parser.add_argument('--days', type=int)
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile, {
+        'called_rate': args.called_rate, 'calls_per_lead': args.calls_per_lead,
+        'turns_per_call': args.turns_per_call, 'follow_up_rate': args.follow_up_rate, 'days': args.days
+    })
+    build_dataset(args.out, args.leads, profile, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Steve Appointment Booker - Webhook Load Test
+This script replays simulated Twilio calls through /webhook/voice, /webhook/amd_status,
+/webhook/response and /webhook/status with OpenAI, ElevenLabs, Twilio and Zoho replaced
+by local stubs, and reports throughput, turn latency and SQLite contention.
+
+Usage:
+    python tests/bench/load_test.py --calls 1000 --concurrency 50
+    python tests/bench/load_test.py --latency openai=lognormal:1.2,0.5 --env ASYNC_TURNS=true
+    python tests/bench/load_test.py --server gunicorn --env GUNICORN_WORKERS=4
+    python tests/bench/load_test.py --calls 200 --write-baseline    # record tests/bench/baseline.json
+    python tests/bench/load_test.py --calls 200 --check-baseline    # CI gate, exits 1 on a regression
+"""
+
+import os
+import re
+import math
+import sys
+import json
+import html
+import time
+import uuid
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+# Add the backend and tests directories to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BACKEND_DIR = os.path.join(project_root, 'backend')
+sys.path.append(BACKEND_DIR)
+sys.path.append(project_root)
+from tests.stubs.services import start_stubs, stop_stubs, stub_environment, STUB_CLASSES
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("load_test")
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Runs the Flask app in a child process so its logging doesn't skew the driver
+SERVER_BOOTSTRAP = """
+import sys
+sys.path.insert(0, sys.argv[2])
+from app import app
+app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True, debug=False, use_reloader=False)
+"""
+
+SERVERS = ('dev', 'gunicorn')
+
+# Calling windows that never close, so the run doesn't depend on the time of day
+ALWAYS_OPEN_HOURS = {
+    'timezone': 'US/Mountain',
+    'weekday_start': '00:00',
+    'weekday_end': '23:59:59',
+    'weekend_enabled': True,
+    'weekend_start': '00:00',
+    'weekend_end': '23:59:59'
+}
+
+# What leads say on each turn (one is picked at random per turn)
+LEAD_UTTERANCES = [
+    ["Yes, who is this?", "Hello?", "Speaking, what is this about?"],
+    ["Yes, all our techs carry phones", "We use a few tablets in the field", "Not really, just office phones"],
+    ["About 25 employees", "We have maybe 40 people", "Just 8 of us"],
+    ["I'm not sure we need that", "How much does it cost?", "Sounds interesting"],
+    ["Sure, Thursday at 10 works", "Can you call back next week?", "Friday afternoon is fine"]
+]
+
+INDUSTRIES = ['Plumbing', 'HVAC', 'Electrical', 'Landscaping', 'Construction', 'Cleaning']
+
+STATES = ['CO', 'TX', 'CA', 'NY', 'FL', 'AZ']
+
+TURN_REDIRECT = re.compile(r'<Redirect[^>]*>([^<]*/webhook/turn/[^<]+)</Redirect>')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_histograms(text):
+    """{(metric, stage): [(le, cumulative count), ...]} from Prometheus text"""
+    histograms = {}
+    for line in text.splitlines():
+        match = re.match(r'^(\w+)_bucket\{(.*)\} (\d+)$', line)
+        if not match:
+            continue
+        name, labels, count = match.groups()
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', labels))
+        le = float('inf') if labels['le'] == '+Inf' else float(labels['le'])
+        # Several gunicorn workers report their own series; add them up per bucket
+        buckets = histograms.setdefault((name, labels.get('stage')), {})
+        buckets[le] = buckets.get(le, 0) + int(count)
+    return {key: sorted(buckets.items()) for key, buckets in histograms.items()}
+
+
+def histogram_quantile(buckets, q):
+    """Quantile estimate from cumulative buckets, interpolating linearly like Prometheus"""
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return 0.0
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float('inf'):
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / max(count - lower_count, 1)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def seed_leads(db_path, count):
+    """Create the schema and count leads mid-call (status 'Calling') in a fresh database"""
+    import models
+    models.DB_PATH = db_path
+    models.init_db()
+    with models.get_db() as conn:
+        conn.executemany(
+            'INSERT INTO leads (name, phone, industry, category, city, state, status) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(f"Load Test Co {i}", f"303555{i:04d}", INDUSTRIES[i % len(INDUSTRIES)], INDUSTRIES[i % len(INDUSTRIES)],
+              'Denver', STATES[i % len(STATES)], 'Calling') for i in range(count)]
+        )
+        conn.commit()
+        return [row['id'] for row in conn.execute('SELECT id FROM leads ORDER BY id')]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port):
+    """Command line for the Flask development server or gunicorn with backend/gunicorn.conf.py"""
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '-c', os.path.join(BACKEND_DIR, 'gunicorn.conf.py'),
+                '--pythonpath', BACKEND_DIR, '--bind', f"127.0.0.1:{port}", 'wsgi:app']
+    return [sys.executable, '-c', SERVER_BOOTSTRAP, str(port), BACKEND_DIR]
+
+
+def start_backend(workdir, env, port, server='dev'):
+    """Start the app on port and wait until it answers"""
+    log_file = open(os.path.join(workdir, 'backend.log'), 'w')
+    process = subprocess.Popen(server_command(server, port),
+                               cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}, see {log_file.name}")
+        try:
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Backend did not start within 60 seconds")
+
+
+class CallSimulator:
+    """Plays one Twilio call: voice webhook, AMD callback, speech turns, status callback"""
+
+    def __init__(self, base_url, turns=4, voicemail_rate=0.1, think_time=0.0, timeout=30):
+        self.base_url = base_url
+        self.turns = turns
+        self.voicemail_rate = voicemail_rate
+        self.think_time = think_time
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _post(self, samples, endpoint, path, data):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}{path}", data=data, timeout=self.timeout)
+            ok = response.status_code < 400
+            body = response.text
+        except requests.RequestException:
+            ok, body = False, ''
+        samples.append((endpoint, time.perf_counter() - start, ok))
+        return ok, body
+
+    def _turn(self, samples, lead_id, call_sid, speech):
+        """One /webhook/response turn, following async-turn <Redirect> polls to the final TwiML"""
+        start = time.perf_counter()
+        ok, body = self._post(samples, 'response', f"/webhook/response?lead_id={lead_id}",
+                              {'CallSid': call_sid, 'SpeechResult': speech, 'Confidence': '0.92'})
+        for _ in range(10):
+            match = ok and TURN_REDIRECT.search(body)
+            if not match:
+                break
+            path = '/webhook/turn/' + html.unescape(match.group(1)).split('/webhook/turn/', 1)[1]
+            ok, body = self._post(samples, 'turn_poll', path, {'CallSid': call_sid})
+        samples.append(('turn', time.perf_counter() - start, ok))
+
+    def run(self, lead_id):
+        """Simulate a call to a lead; returns (endpoint, seconds, ok) samples"""
+        samples = []
+        call_sid = f"CA{uuid.uuid4().hex}"
+        voicemail = random.random() < self.voicemail_rate
+
+        ok, _ = self._post(samples, 'voice', f"/webhook/voice?lead_id={lead_id}",
+                           {'CallSid': call_sid, 'CallStatus': 'in-progress', 'Direction': 'outbound-api'})
+        self._post(samples, 'amd_status', f"/webhook/amd_status?lead_id={lead_id}",
+                   {'CallSid': call_sid, 'AnsweredBy': 'machine_end_beep' if voicemail else 'human',
+                    'MachineDetectionDuration': '1800'})
+
+        if ok and not voicemail:
+            for turn in range(self.turns):
+                if self.think_time:
+                    time.sleep(random.uniform(0, 2 * self.think_time))
+                speech = random.choice(LEAD_UTTERANCES[min(turn, len(LEAD_UTTERANCES) - 1)])
+                self._turn(samples, lead_id, call_sid, speech)
+
+        self._post(samples, 'status', f"/webhook/status?lead_id={lead_id}",
+                   {'CallSid': call_sid, 'CallStatus': 'completed', 'CallDuration': '60'})
+        return samples
+
+
+def run_load(base_url, lead_ids, calls, concurrency, turns, voicemail_rate, think_time):
+    """Drive calls concurrent calls; returns (samples, wall seconds)"""
+    simulator = CallSimulator(base_url, turns, voicemail_rate, think_time)
+    samples = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(simulator.run, lead_ids[i % len(lead_ids)]) for i in range(calls)]
+        for done, future in enumerate(as_completed(futures), 1):
+            samples.extend(future.result())
+            if done % max(calls // 10, 1) == 0:
+                logger.info(f"{done}/{calls} calls finished")
+    return samples, time.perf_counter() - start
+
+
+def build_report(samples, wall, calls, metrics_text, server_log, stubs):
+    by_endpoint = {}
+    for endpoint, seconds, ok in samples:
+        by_endpoint.setdefault(endpoint, []).append((seconds, ok))
+
+    requests_made = sum(len(items) for endpoint, items in by_endpoint.items() if endpoint != 'turn')
+    errors = sum(1 for endpoint, _, ok in samples if endpoint != 'turn' and not ok)
+    turn_times = [seconds for seconds, ok in by_endpoint.get('turn', []) if ok]
+
+    histograms = parse_histograms(metrics_text)
+    db_stages = {}
+    for stage in ('history_load', 'db_write'):
+        buckets = histograms.get(('voice_turn_stage_seconds', stage))
+        if buckets:
+            db_stages[stage] = {
+                'p50_ms': round(histogram_quantile(buckets, 0.5) * 1000, 1),
+                'p99_ms': round(histogram_quantile(buckets, 0.99) * 1000, 1)
+            }
+
+    return {
+        'calls': calls,
+        'wall_seconds': round(wall, 2),
+        'requests': requests_made,
+        'requests_per_second': round(requests_made / wall, 1) if wall else 0.0,
+        'calls_per_second': round(calls / wall, 2) if wall else 0.0,
+        'error_rate': round(errors / requests_made, 4) if requests_made else 0.0,
+        'turn_p50_ms': round(percentile(turn_times, 50) * 1000, 1),
+        'turn_p99_ms': round(percentile(turn_times, 99) * 1000, 1),
+        'endpoints': {
+            endpoint: {
+                'count': len(items),
+                'errors': sum(1 for _, ok in items if not ok),
+                'p50_ms': round(percentile([s for s, _ in items], 50) * 1000, 1),
+                'p99_ms': round(percentile([s for s, _ in items], 99) * 1000, 1),
+                'max_ms': round(max(s for s, _ in items) * 1000, 1)
+            }
+            for endpoint, items in sorted(by_endpoint.items())
+        },
+        'sqlite': {
+            'locked_errors': server_log.count('database is locked'),
+            'stages': db_stages
+        },
+        'stub_requests': {name: stub.requests for name, stub in stubs.items()}
+    }
+
+
+def print_report(report):
+    print(f"\nCalls: {report['calls']} in {report['wall_seconds']}s "
+          f"({report['calls_per_second']} calls/s, {report['requests_per_second']} req/s)")
+    print(f"Turn latency: p50 {report['turn_p50_ms']}ms, p99 {report['turn_p99_ms']}ms; "
+          f"error rate {report['error_rate']:.2%}")
+    print(f"\n{'endpoint':<12}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:<12}{stats['count']:>8}{stats['errors']:>8}{stats['p50_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    print(f"\nSQLite: {report['sqlite']['locked_errors']} 'database is locked' errors")
+    for stage, stats in report['sqlite']['stages'].items():
+        print(f"  {stage}: p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms")
+    print(f"Stub requests: {report['stub_requests']}")
+
+
+def check_baseline(report, baseline, tolerance):
+    """Regressions against the baseline as a list of messages (empty when within tolerance)"""
+    problems = []
+    for key in ('turn_p50_ms', 'turn_p99_ms'):
+        limit = baseline[key] * (1 + tolerance)
+        if report[key] > limit:
+            problems.append(f"{key} {report[key]} exceeds baseline {baseline[key]} by more than {tolerance:.0%}")
+    floor = baseline['requests_per_second'] * (1 - tolerance)
+    if report['requests_per_second'] < floor:
+        problems.append(f"requests_per_second {report['requests_per_second']} is below baseline {baseline['requests_per_second']} by more than {tolerance:.0%}")
+    if report['error_rate'] > baseline.get('error_rate', 0.0) + 0.01:
+        problems.append(f"error_rate {report['error_rate']} is above baseline {baseline.get('error_rate', 0.0)}")
+    return problems
+
+
+def parse_pairs(values, what):
+    pairs = {}
+    for value in values or []:
+        key, sep, setting = value.partition('=')
+        if not sep:
+            raise SystemExit(f"Invalid {what} '{value}', expected KEY=VALUE")
+        pairs[key] = setting
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Steve Appointment Booker webhook load test')
+    parser.add_argument('--calls', type=int, default=1000, help='Number of simulated calls')
+    parser.add_argument('--concurrency', type=int, default=50, help='Calls in flight at once')
+    parser.add_argument('--turns', type=int, default=4, help='Speech turns per answered call')
+    parser.add_argument('--leads', type=int, default=500, help='Leads to seed (calls cycle through them)')
+    parser.add_argument('--voicemail-rate', type=float, default=0.1, help='Share of calls answered by a machine')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean seconds a lead takes to reply')
+    parser.add_argument('--latency', action='append', metavar='SERVICE=SPEC',
+                        help=f"Stub latency, e.g. openai=lognormal:0.6,0.4 (services: {', '.join(STUB_CLASSES)})")
+    parser.add_argument('--server', choices=SERVERS, default='dev', help='Serve the backend with the Flask dev server or gunicorn')
+    parser.add_argument('--env', action='append', metavar='KEY=VALUE', help='Extra backend config, e.g. ASYNC_TURNS=true')
+    parser.add_argument('--json', help='Also write the report to this file')
+    parser.add_argument('--write-baseline', action='store_true', help=f"Record this run as {BASELINE_FILE}")
+    parser.add_argument('--check-baseline', action='store_true', help='Exit 1 if the run regresses against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed regression for --check-baseline')
+    parser.add_argument('--keep-workdir', action='store_true', help='Keep the database and backend log')
+    args = parser.parse_args()
+
+    latency = parse_pairs(args.latency, 'latency')
+    unknown = set(latency) - set(STUB_CLASSES)
+    if unknown:
+        raise SystemExit(f"Unknown stub service(s): {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='steve_load_')
+    stubs = start_stubs(latency)
+    process = None
+    try:
+        lead_ids = seed_leads(os.path.join(workdir, 'leads.db'), args.leads)
+
+        env = dict(os.environ)
+        env.update(stub_environment(stubs))
+        env.update({
+            'DATABASE_URL': os.path.join(workdir, 'leads.db'),
+            'BUSINESS_HOURS': json.dumps(ALWAYS_OPEN_HOURS),
+            'US_HOLIDAYS_ENABLED': 'false',
+            'CALL_IN_LEAD_TIMEZONE': 'false',
+            'PYTHONUNBUFFERED': '1'
+        })
+        env.update(parse_pairs(args.env, 'env setting'))
+        process, base_url = start_backend(workdir, env, free_port(), args.server)
+
+        logger.info(f"Driving {args.calls} calls ({args.concurrency} concurrent) against {base_url}")
+        samples, wall = run_load(base_url, lead_ids, args.calls, args.concurrency, args.turns,
+                                 args.voicemail_rate, args.think_time)
+        metrics_text = requests.get(f"{base_url}/metrics", timeout=10).text
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        stop_stubs(stubs)
+
+    with open(os.path.join(workdir, 'backend.log')) as f:
+        server_log = f.read()
+    report = build_report(samples, wall, args.calls, metrics_text, server_log, stubs)
+    report['settings'] = {
+        'server': args.server, 'calls': args.calls, 'concurrency': args.concurrency, 'turns': args.turns,
+        'voicemail_rate': args.voicemail_rate, 'think_time': args.think_time, 'latency': latency
+    }
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.keep_workdir:
+        logger.info(f"Database and backend log kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.write_baseline:
+        baseline = {key: report[key] for key in ('turn_p50_ms', 'turn_p99_ms', 'requests_per_second', 'error_rate')}
+        baseline['settings'] = report['settings']
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        logger.info(f"Baseline written to {BASELINE_FILE}")
+
+    if args.check_baseline:
+        if not os.path.exists(BASELINE_FILE):
+            logger.error(f"No baseline at {BASELINE_FILE}; record one with --write-baseline")
+            return 2
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+        if baseline.get('settings', {}).get('calls') != args.calls or baseline.get('settings', {}).get('concurrency') != args.concurrency:
+            logger.warning("Baseline was recorded with different --calls/--concurrency; comparison may be meaningless")
+        problems = check_baseline(report, baseline, args.tolerance)
+        for problem in problems:
+            logger.error(f"Regression: {problem}")
+        if problems:
+            return 1
+        logger.info("Load test is within the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Steve Appointment Booker - Serving Benchmark
+This script compares request throughput of the Flask development server with gunicorn
+(backend/gunicorn.conf.py). Each server gets a fresh database and the same stubbed
+services, then answers a fixed-duration burst of API reads and a batch of simulated
+Twilio calls (see load_test.py).
+
+Usage:
+    python tests/bench/serve_bench.py
+    python tests/bench/serve_bench.py --concurrency 64 --duration 20 --latency openai=fixed:0.8
+    python tests/bench/serve_bench.py --env GUNICORN_WORKERS=4 --env GUNICORN_THREADS=32
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from load_test import (SERVERS, ALWAYS_OPEN_HOURS, seed_leads, free_port, start_backend, run_load,
+                       percentile, parse_pairs)
+from tests.stubs.services import start_stubs, stop_stubs, stub_environment
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("serve_bench")
+
+# Read endpoints hit in rotation during the burst
+READ_PATHS = ['/health', '/api/leads?status=Calling', '/api/follow_ups?status=Pending']
+
+
+def read_burst(base_url, concurrency, duration):
+    """Hit READ_PATHS from concurrency threads for duration seconds; returns (latencies, errors)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        session = requests.Session()
+        own, failed, i = [], 0, index
+        while time.perf_counter() < stop_at:
+            path = READ_PATHS[i % len(READ_PATHS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                ok = session.get(f"{base_url}{path}", timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            own.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return latencies, errors[0]
+
+
+def bench_server(server, args, latency):
+    """Run both workloads against one server and return its results"""
+    workdir = tempfile.mkdtemp(prefix=f"steve_serve_{server}_")
+    stubs = start_stubs(latency)
+    process = None
+    try:
+        lead_ids = seed_leads(os.path.join(workdir, 'leads.db'), args.leads)
+        env = dict(os.environ)
+        env.update(stub_environment(stubs))
+        env.update({
+            'DATABASE_URL': os.path.join(workdir, 'leads.db'),
+            'BUSINESS_HOURS': json.dumps(ALWAYS_OPEN_HOURS),
+            'US_HOLIDAYS_ENABLED': 'false',
+            'CALL_IN_LEAD_TIMEZONE': 'false',
+            'GUNICORN_ACCESS_LOG': '',
+            'PYTHONUNBUFFERED': '1'
+        })
+        env.update(parse_pairs(args.env, 'env setting'))
+        process, base_url = start_backend(workdir, env, free_port(), server)
+
+        logger.info(f"[{server}] {args.duration}s read burst with {args.concurrency} clients")
+        latencies, errors = read_burst(base_url, args.concurrency, args.duration)
+
+        logger.info(f"[{server}] {args.calls} simulated calls, {args.concurrency} concurrent")
+        samples, wall = run_load(base_url, lead_ids, args.calls, args.concurrency, args.turns, 0.1, 0.0)
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        stop_stubs(stubs)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    webhook = [seconds for endpoint, seconds, ok in samples if endpoint != 'turn']
+    turns = [seconds for endpoint, seconds, ok in samples if endpoint == 'turn' and ok]
+    return {
+        'read_rps': round(len(latencies) / args.duration, 1),
+        'read_p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'read_p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'read_errors': errors,
+        'webhook_rps': round(len(webhook) / wall, 1) if wall else 0.0,
+        'webhook_errors': sum(1 for endpoint, _, ok in samples if endpoint != 'turn' and not ok),
+        'turn_p50_ms': round(percentile(turns, 50) * 1000, 1),
+        'turn_p99_ms': round(percentile(turns, 99) * 1000, 1)
+    }
+
+
+def print_comparison(results):
+    servers = list(results)
+    print(f"\n{'':<16}" + ''.join(f"{server:>12}" for server in servers))
+    for key in next(iter(results.values())):
+        print(f"{key:<16}" + ''.join(f"{results[server][key]:>12}" for server in servers))
+    if 'dev' in results and 'gunicorn' in results and results['dev']['read_rps']:
+        print(f"\ngunicorn serves {results['gunicorn']['read_rps'] / results['dev']['read_rps']:.1f}x the read throughput "
+              f"and {results['gunicorn']['webhook_rps'] / max(results['dev']['webhook_rps'], 0.1):.1f}x the webhook throughput")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Flask dev server with gunicorn')
+    parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of the read burst')
+    parser.add_argument('--calls', type=int, default=200, help='Simulated calls per server')
+    parser.add_argument('--turns', type=int, default=4, help='Speech turns per answered call')
+    parser.add_argument('--leads', type=int, default=500, help='Leads to seed')
+    parser.add_argument('--latency', action='append', metavar='SERVICE=SPEC', help='Stub latency, as in load_test.py')
+    parser.add_argument('--env', action='append', metavar='KEY=VALUE', help='Extra backend or GUNICORN_* settings')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    latency = parse_pairs(args.latency, 'latency')
+    results = {server: bench_server(server, args, latency) for server in args.servers}
+    print_comparison(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Steve Appointment Booker - API Benchmark Suite
+This script benchmarks the read-heavy and bulk API endpoints against a synthetic
+database (see dataset.py), recording latency with pytest-benchmark and peak
+Python memory per request with tracemalloc.
+
+Usage:
+    # Small generated dataset (BENCH_LEADS leads, default 20000)
+    python -m pytest tests/bench/test_api_benchmarks.py --benchmark-autosave
+
+    # Production scale: build once, then reuse
+    python tests/bench/dataset.py --leads 1000000 --out /tmp/bench_1m.db
+    BENCH_DB=/tmp/bench_1m.db python -m pytest tests/bench/test_api_benchmarks.py --benchmark-autosave
+
+    # Release gate: fail when any endpoint's mean is 25% slower than the last saved run
+    python -m pytest tests/bench/test_api_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Peak memory is stored in each benchmark's extra_info (peak_memory_kb) and, when
+BENCH_MEMORY_BUDGET_KB is set, any endpoint above it fails.
+"""
+
+import io
+import os
+import sys
+import shutil
+import sqlite3
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('flask')
+
+# Add the backend and bench directories to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+sys.path.append(os.path.dirname(__file__))
+from dataset import build_dataset
+
+BENCH_LEADS = int(os.environ.get('BENCH_LEADS', 20000))
+
+IMPORT_ROWS = 1000
+
+
+@pytest.fixture(scope='module')
+def bench_db(tmp_path_factory):
+    """Copy of BENCH_DB, or a freshly generated dataset, so benchmarks can write to it"""
+    path = str(tmp_path_factory.mktemp('bench') / 'bench.db')
+    if os.environ.get('BENCH_DB'):
+        shutil.copyfile(os.environ['BENCH_DB'], path)
+    else:
+        build_dataset(path, BENCH_LEADS)
+    return path
+
+
+@pytest.fixture(scope='module')
+def client(bench_db):
+    import models
+    models.DB_PATH = bench_db
+    from app import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def busiest_lead(bench_db):
+    conn = sqlite3.connect(bench_db)
+    try:
+        return conn.execute('SELECT lead_id FROM call_logs GROUP BY lead_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def peak_memory_kb(request_fn):
+    """Peak traced allocation while serving one request"""
+    tracemalloc.start()
+    try:
+        request_fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_endpoint(benchmark, request_fn, rounds=5, setup=None):
+    """Benchmark request_fn, then record its peak memory in extra_info"""
+    if setup:
+        response = benchmark.pedantic(request_fn, setup=setup, rounds=rounds, iterations=1)
+        args, kwargs = setup()
+        benchmark.extra_info['peak_memory_kb'] = peak_memory_kb(lambda: request_fn(*args, **kwargs))
+    else:
+        response = benchmark.pedantic(request_fn, rounds=rounds, iterations=1)
+        benchmark.extra_info['peak_memory_kb'] = peak_memory_kb(request_fn)
+    assert response.status_code < 400, response.get_data(as_text=True)[:500]
+
+    budget = os.environ.get('BENCH_MEMORY_BUDGET_KB')
+    if budget:
+        assert benchmark.extra_info['peak_memory_kb'] <= int(budget), \
+            f"peak memory {benchmark.extra_info['peak_memory_kb']}KB exceeds budget {budget}KB"
+    return response
+
+
+def queued_and_run(client, response):
+    """Run the job a 202 endpoint queued, as a worker would; returns the finished job's status response"""
+    from job_queue import JobWorker
+    assert response.status_code == 202, response.get_data(as_text=True)[:500]
+    JobWorker().run_once()
+    job = client.get(response.get_json()['status_url'])
+    assert job.get_json()['status'] == 'succeeded', job.get_data(as_text=True)[:500]
+    return job
+
+
+def test_list_leads(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/leads'), rounds=3)
+
+
+def test_list_leads_by_status(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/leads?status=Appointment%20Set'))
+
+
+def test_lead_history(benchmark, client, busiest_lead):
+    run_endpoint(benchmark, lambda: client.get(f'/api/lead_history/{busiest_lead}'), rounds=20)
+
+
+def test_search_leads(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/search?type=leads&q=plumb'), rounds=20)
+
+
+def test_search_transcripts(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/search?type=transcripts&q=already%20have%20a%20provider'), rounds=20)
+
+
+def test_search_transcripts_recent(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/search?type=transcripts&sort=recent&q=tablets'), rounds=20)
+
+
+def test_follow_ups(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/follow_ups?status=Pending'))
+
+
+def test_call_logs_summary(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/call_logs/summary'), rounds=3)
+
+
+def test_export_leads(benchmark, client):
+    run_endpoint(benchmark, lambda: client.get('/api/leads/export'), rounds=3)
+
+
+def test_import_leads(benchmark, client):
+    batch = iter(range(1, 10 ** 6))
+
+    def setup():
+        # Fresh phone numbers every round, so each import inserts rather than dedupes
+        offset = next(batch) * IMPORT_ROWS
+        rows = ['name,phone,category,city,state,employee_count']
+        rows += [f"Import Co {offset + i},555{(offset + i) % 10 ** 7:07d},Plumbing,Denver,CO,12" for i in range(IMPORT_ROWS)]
+        data = {'file': (io.BytesIO('\n'.join(rows).encode('utf-8')), 'leads.csv')}
+        return (data,), {}
+
+    run_endpoint(benchmark, lambda data: queued_and_run(
+        client, client.post('/api/leads/import', data=data, content_type='multipart/form-data')), setup=setup)
+
+
+def test_learn_from_successful_calls(benchmark, client):
+    run_endpoint(benchmark, lambda: queued_and_run(client, client.post('/api/analytics/learn', json={})), rounds=3)
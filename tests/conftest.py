@@ -0,0 +1,26 @@
+"""
+Steve Appointment Booker - Shared Test Fixtures
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Point the models module at a fresh database for one test.
+
+    The file (and the archive database next to it) lives in the test's
+    tmp_path, and DB_PATH is restored when the test ends.
+    """
+    path = str(tmp_path / 'leads.db')
+    monkeypatch.setattr(models, 'DB_PATH', path)
+    models.init_db()
+    return path
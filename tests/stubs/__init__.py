@@ -0,0 +1,4 @@
+"""
+Steve Appointment Booker - Test Stubs
+Local stand-ins for the external services the backend talks to.
+"""
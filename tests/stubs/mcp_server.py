@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Steve Appointment Booker - Bright Data MCP server stub
+Speaks MCP over stdio (newline-delimited JSON-RPC 2.0) like `npx @brightdata/mcp`,
+so scraping can be exercised without Node or a Bright Data account.
+
+The stub answers `initialize`, refuses tool calls until the client has sent
+`notifications/initialized`, and serves one tool, `search_engine`, whose text
+content is {"businesses": [...]} as JSON. Queries containing "FAIL" return a
+tool error and queries containing "HANG" never get a reply. If MCP_STUB_LOG is
+set, every message received is appended to that file as a JSON line.
+"""
+
+import json
+import os
+import re
+import sys
+
+
+def businesses_for(query):
+    match = re.search(r"(\d+) (.+?) companies in (.+)", query)
+    count, industry, location = (int(match.group(1)), match.group(2), match.group(3)) if match else (3, "Test", "Denver, CO")
+    return [
+        {
+            "name": f"{industry} Stub {i + 1}",
+            "phone": f"303-555-{2000 + i:04d}",
+            "address": f"{10 + i} Stub St, {location} 80202",
+            "website": "",
+            "employee_count": 5 + i
+        }
+        for i in range(count)
+    ]
+
+
+def send(message):
+    print(json.dumps(message), flush=True)
+
+
+def call_tool(params):
+    if params.get("name") != "search_engine":
+        return {"content": [{"type": "text", "text": f"Unknown tool {params.get('name')}"}], "isError": True}
+    query = params.get("arguments", {}).get("query", "")
+    if "FAIL" in query:
+        return {"content": [{"type": "text", "text": "stub failure"}], "isError": True}
+    return {"content": [{"type": "text", "text": json.dumps({"businesses": businesses_for(query)})}]}
+
+
+def main():
+    log_path = os.environ.get("MCP_STUB_LOG")
+    initialized = False
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        message = json.loads(line)
+        if log_path:
+            with open(log_path, "a") as log:
+                log.write(json.dumps(message) + "\n")
+
+        method = message.get("method")
+        print(f"[stub pid {os.getpid()}] received {method}", flush=True)
+        if "id" not in message:
+            if method == "notifications/initialized":
+                initialized = True
+            continue
+
+        if method == "initialize":
+            send({"jsonrpc": "2.0", "id": message["id"], "result": {
+                "protocolVersion": message["params"]["protocolVersion"],
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "brightdata-stub", "version": "0.1"}
+            }})
+        elif not initialized:
+            send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32002, "message": "Server not initialized"}})
+        elif method == "tools/call":
+            if "HANG" in message["params"].get("arguments", {}).get("query", ""):
+                continue
+            send({"jsonrpc": "2.0", "id": message["id"], "result": call_tool(message["params"])})
+        else:
+            send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": f"Method not found: {method}"}})
+
+
+if __name__ == "__main__":
+    main()
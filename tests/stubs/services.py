@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Steve Appointment Booker - HTTP service stubs
+Local stand-ins for the OpenAI, ElevenLabs, Twilio REST and Zoho APIs, each
+on its own port with a configurable latency distribution, so the call flow
+can be driven offline (see tests/bench/load_test.py).
+
+Latency specs are "0" (none), "fixed:SECONDS", "uniform:LOW,HIGH" or
+"lognormal:MEDIAN,SIGMA" (a long-tailed distribution like real API latency).
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LATENCY = {
+    'openai': 'lognormal:0.6,0.4',
+    'elevenlabs': 'lognormal:0.3,0.3',
+    'twilio': 'fixed:0.05',
+    'zoho': 'fixed:0.1'
+}
+
+BOT_REPLIES = [
+    "That makes sense. Do you currently use mobile devices in your business?",
+    "Great, and roughly how many employees do you have?",
+    "Companies your size usually save about 20% on mobile costs. Would a 15-minute meeting this week work?",
+    "I understand. Would Thursday at 10 AM or Friday at 2 PM be better for a quick call?",
+    "Perfect, I'll send over a calendar invite. Thanks for your time!"
+]
+
+# A few KB of bytes stands in for an MP3 clip
+FAKE_AUDIO = b'ID3' + bytes(4093)
+
+
+def parse_latency(spec):
+    """Sampler returning a delay in seconds for a latency spec"""
+    spec = str(spec or '0').strip()
+    if spec in ('0', 'none'):
+        return lambda: 0.0
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Routes requests to the owning StubService's handle()"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        service = self.server.service
+        time.sleep(max(service.latency(), 0.0))
+        status, content_type, payload = service.handle(self.command, self.path, body)
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode('utf-8')
+        with service.lock:
+            service.requests += 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubService:
+    """One stub API on 127.0.0.1; subclasses implement handle()"""
+
+    name = None
+
+    def __init__(self, latency='0', port=0):
+        self.latency = parse_latency(latency)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"{self.name}-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path, body):
+        raise NotImplementedError
+
+
+class OpenAIStub(StubService):
+    """POST /v1/chat/completions with a canned assistant reply"""
+
+    name = 'openai'
+
+    def handle(self, method, path, body):
+        if method != 'POST' or not path.startswith('/v1/chat/completions'):
+            return 404, 'application/json', {'error': {'message': f"Unknown path {path}"}}
+        request = json.loads(body or b'{}')
+        return 200, 'application/json', {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': random.choice(BOT_REPLIES)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 400, 'completion_tokens': 30, 'total_tokens': 430}
+        }
+
+
+class ElevenLabsStub(StubService):
+    """POST /v1/text-to-speech/<voice> returns audio; GET /v1/voices/<voice> describes the voice"""
+
+    name = 'elevenlabs'
+
+    def handle(self, method, path, body):
+        if method == 'POST' and path.startswith('/v1/text-to-speech/'):
+            return 200, 'audio/mpeg', FAKE_AUDIO
+        if method == 'GET' and path.startswith('/v1/voices/'):
+            return 200, 'application/json', {'voice_id': path.rsplit('/', 1)[-1], 'name': 'Stub Voice'}
+        return 404, 'application/json', {'detail': f"Unknown path {path}"}
+
+
+class TwilioStub(StubService):
+    """Calls create and update under /2010-04-01/Accounts/<sid>/Calls"""
+
+    name = 'twilio'
+
+    def handle(self, method, path, body):
+        match = re.match(r'^/2010-04-01/Accounts/([^/]+)/Calls(?:/([^/.]+))?\.json', path)
+        if not match or method != 'POST':
+            return 404, 'application/json', {'code': 20404, 'message': 'The requested resource was not found'}
+        account_sid, call_sid = match.groups()
+        call_sid = call_sid or f"CA{uuid.uuid4().hex}"
+        return (201 if not match.group(2) else 200), 'application/json', {
+            'sid': call_sid,
+            'account_sid': account_sid,
+            'status': 'queued',
+            'direction': 'outbound-api',
+            'uri': f"/2010-04-01/Accounts/{account_sid}/Calls/{call_sid}.json"
+        }
+
+
+class ZohoStub(StubService):
+    """OAuth token refresh plus the CRM and Calendar endpoints the app calls"""
+
+    name = 'zoho'
+
+    def handle(self, method, path, body):
+        if path.startswith('/oauth/v2/token'):
+            return 200, 'application/json', {'access_token': 'stub-token', 'expires_in': 3600}
+        if path.startswith('/crm/v2/users'):
+            return 200, 'application/json', {'users': [{'id': '1', 'email': 'steve@example.com'}]}
+        if path.startswith('/crm/v2/'):
+            return 200, 'application/json', {'data': [{'code': 'SUCCESS', 'details': {'id': str(random.randint(10 ** 9, 10 ** 10))}}]}
+        if path.startswith('/calendar/v1/freebusy'):
+            return 200, 'application/json', {'freebusy': []}
+        return 404, 'application/json', {'code': 'INVALID_URL_PATTERN'}
+
+
+STUB_CLASSES = {cls.name: cls for cls in (OpenAIStub, ElevenLabsStub, TwilioStub, ZohoStub)}
+
+
+def start_stubs(latency=None):
+    """Start every stub; latency maps service name to a latency spec"""
+    specs = dict(DEFAULT_LATENCY, **(latency or {}))
+    return {name: cls(specs[name]).start() for name, cls in STUB_CLASSES.items()}
+
+
+def stop_stubs(stubs):
+    for stub in stubs.values():
+        stub.stop()
+
+
+def stub_environment(stubs):
+    """Config overrides (as environment variables) that point the backend at the stubs"""
+    return {
+        'OPENAI_BASE_URL': f"{stubs['openai'].url}/v1",
+        'LLM_API_KEY': 'sk-stub',
+        'ELEVENLABS_API_URL': stubs['elevenlabs'].url,
+        'ELEVENLABS_API_KEY': 'stub',
+        'ELEVENLABS_VOICE_ID': 'stub-voice',
+        'TWILIO_API_URL': stubs['twilio'].url,
+        'TWILIO_ACCOUNT_SID': 'AC' + '0' * 32,
+        'TWILIO_AUTH_TOKEN': 'stub',
+        'TWILIO_PHONE_NUMBER': '+13035550100',
+        'ZOHO_ACCOUNTS_URL': stubs['zoho'].url,
+        'ZOHO_API_URL': stubs['zoho'].url
+    }
+
+
+if __name__ == "__main__":
+    stubs = start_stubs()
+    for name, url in stub_environment(stubs).items():
+        print(f"{name}={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stop_stubs(stubs)
@@ -0,0 +1,53 @@
+"""
+Steve Appointment Booker - Artifact Store Test
+This script tests TTL expiry, size bounds and SQLite spill of the per-call artifact store.
+"""
+
+import os
+import sys
+import time
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from artifact_store import ArtifactStore
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TWIML = "<Response><Play>https://example.com/audio/voicemail.mp3</Play><Hangup/></Response>"
+
+def test_ttl_and_bounds():
+    store = ArtifactStore(ttl=0.05)
+    store.put('voicemail_twiml', 'CA123', TWIML)
+    assert store.get('voicemail_twiml', 'CA123') == TWIML
+    assert store.get('voicemail_twiml', 'CA999') is None
+    time.sleep(0.1)
+    assert store.get('voicemail_twiml', 'CA123') is None
+
+    store = ArtifactStore(max_entries=3)
+    for i in range(5):
+        store.put('voicemail_twiml', f'CA{i}', TWIML, ttl=60 + i)
+    assert len(store) == 3
+    assert store.get('voicemail_twiml', 'CA0') is None
+    assert store.get('voicemail_twiml', 'CA4') == TWIML
+
+def test_spill_is_shared_between_workers(db_path):
+    # Two stores stand in for two worker processes sharing the database
+    ArtifactStore(spill=True).put('voicemail_twiml', 'CA123', TWIML)
+    other = ArtifactStore(spill=True)
+    assert other.get('voicemail_twiml', 'CA123') == TWIML
+    assert ArtifactStore(spill=False).get('voicemail_twiml', 'CA123') is None
+
+    ArtifactStore(spill=True).put('voicemail_twiml', 'CA456', TWIML, ttl=0.01)
+    time.sleep(0.05)
+    assert ArtifactStore(spill=True).get('voicemail_twiml', 'CA456') is None
+
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,156 @@
+"""
+Steve Appointment Booker - Async Turns Test
+This script tests asynchronous conversation turns: the grace-period wait, filler + <Redirect>
+holding TwiML, polling through /webhook/turn/<id>, the retry prompt for lost or slow turns,
+abandoned turns and the worker pool size.
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import async_turns
+from async_turns import (submit_turn, get_turn, forget_turn, abandon_turn, turn_abandoned, wait_for_turn,
+                         holding_twiml, retry_twiml)
+
+pytest.importorskip('twilio')
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPLY = '<Response><Say>We have a plan for that.</Say></Response>'
+
+def test_grace_period_hit_and_miss():
+    turn_id, future = submit_turn(lambda: REPLY)
+    assert wait_for_turn(future, 1, lead_id=1) == REPLY
+    forget_turn(turn_id)
+    assert get_turn(turn_id) is None
+
+    release = threading.Event()
+    turn_id, future = submit_turn(lambda: release.wait(5) and REPLY)
+    assert wait_for_turn(future, 0.05, lead_id=1) is None
+    assert get_turn(turn_id) is future
+    release.set()
+    assert wait_for_turn(future, 1, lead_id=1) == REPLY
+    forget_turn(turn_id)
+
+def test_failed_turn_asks_to_repeat():
+    def broken():
+        raise RuntimeError("LLM down")
+
+    _, future = submit_turn(broken)
+    twiml = wait_for_turn(future, 1, lead_id=7)
+    assert "Could you say that again?" in twiml
+    assert 'action="/webhook/response?lead_id=7"' in twiml
+
+def test_holding_twiml_redirects_to_poll():
+    twiml = holding_twiml('abc123', 7, {})
+    # Without ElevenLabs the filler phrase is spoken
+    assert any(f'<Say>{phrase}</Say>' in twiml for phrase in async_turns.FILLER_PHRASES)
+    assert '<Redirect method="POST">/webhook/turn/abc123?lead_id=7&amp;attempt=1</Redirect>' in twiml
+
+    # Later polls just pause before redirecting again
+    twiml = holding_twiml('abc123', 7, {}, attempt=2)
+    assert '<Pause length="1" />' in twiml and '<Say>' not in twiml
+    assert 'attempt=3' in twiml
+
+def test_retry_twiml():
+    twiml = retry_twiml(None)
+    assert "Could you say that again?" in twiml
+    assert 'action="/webhook/response?lead_id="' in twiml
+
+def test_filler_url_keeps_host(tmp_path, monkeypatch):
+    import voice
+    clip = tmp_path / 'filler.mp3'
+    clip.write_bytes(b'ID3')
+    monkeypatch.setattr(voice, 'elevenlabs_tts', lambda phrase: str(clip))
+    monkeypatch.setattr(async_turns, '_filler_urls', {})
+    config = {'ELEVENLABS_API_KEY': 'key', 'ELEVENLABS_VOICE_ID': 'voice',
+              'CALLBACK_URL': 'https://x.ngrok.io/webhook'}
+
+    # The first use generates the clip in the background and falls back to <Say>
+    assert async_turns._filler_audio_url('Mm, sure.', config) is None
+    for _ in range(100):
+        if async_turns._filler_urls.get('Mm, sure.'):
+            break
+        time.sleep(0.01)
+    assert async_turns._filler_audio_url('Mm, sure.', config) == 'https://x.ngrok.io/audio/filler.mp3'
+
+def test_webhook_polls_until_turn_is_ready(monkeypatch):
+    import app as app_module
+    config = {'TEST_MODE': True, 'ASYNC_TURNS': True, 'ASYNC_TURN_GRACE': 0.05, 'ASYNC_POLL_WAIT': 0.05}
+    monkeypatch.setattr(app_module, 'get_config', lambda: config)
+    client = app_module.app.test_client()
+
+    # Ready within the grace period: the reply comes straight back
+    monkeypatch.setattr(app_module, 'handle_turn', lambda lead_id, speech, call_sid=None: REPLY)
+    response = client.post('/webhook/response', data={'SpeechResult': 'Yes', 'CallSid': 'CA1'})
+    assert response.get_data(as_text=True) == REPLY
+
+    # Too slow: filler and a redirect, then polls hold until the turn finishes
+    release = threading.Event()
+    monkeypatch.setattr(app_module, 'handle_turn',
+                        lambda lead_id, speech, call_sid=None: release.wait(5) and REPLY)
+    twiml = client.post('/webhook/response?lead_id=7', data={'SpeechResult': 'Yes', 'CallSid': 'CA1'}).get_data(as_text=True)
+    assert '<Redirect method="POST">/webhook/turn/' in twiml
+    poll_url = twiml.split('<Redirect method="POST">')[1].split('</Redirect>')[0].replace('&amp;', '&')
+    turn_id = poll_url.split('/webhook/turn/')[1].split('?')[0]
+
+    twiml = client.post(poll_url).get_data(as_text=True)
+    assert '<Pause length="1" />' in twiml and 'attempt=2' in twiml
+
+    release.set()
+    assert client.post(poll_url).get_data(as_text=True) == REPLY
+    # Served once, then forgotten: a repeated poll asks the lead to repeat
+    assert get_turn(turn_id) is None
+    assert "Could you say that again?" in client.post(poll_url).get_data(as_text=True)
+
+def test_poll_gives_up_after_max_attempts(monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'get_config', lambda: {'ASYNC_POLL_WAIT': 0.01})
+    client = app_module.app.test_client()
+
+    release = threading.Event()
+    # The turn sees it was abandoned, so its reply is never logged
+    turn_id, future = submit_turn(lambda: release.wait(5) and turn_abandoned())
+    try:
+        twiml = client.post(f'/webhook/turn/{turn_id}?lead_id=7&attempt={async_turns.MAX_POLL_ATTEMPTS}').get_data(as_text=True)
+        assert "Could you say that again?" in twiml
+        assert get_turn(turn_id) is None
+    finally:
+        release.set()
+    assert future.result(1) is True
+
+def test_only_abandoned_turns_are_flagged():
+    turn_id, future = submit_turn(turn_abandoned)
+    assert future.result(1) is False
+    forget_turn(turn_id)
+
+    release = threading.Event()
+    turn_id, future = submit_turn(lambda: release.wait(5) and turn_abandoned())
+    abandon_turn(turn_id)
+    release.set()
+    assert future.result(1) is True and get_turn(turn_id) is None
+    # Outside a turn nothing is abandoned
+    assert turn_abandoned() is False
+
+def test_pool_matches_request_threads(monkeypatch):
+    monkeypatch.setattr(async_turns, '_executor', None)
+    monkeypatch.setattr(async_turns, 'get_config', lambda: {})
+    monkeypatch.setenv('GUNICORN_THREADS', '32')
+    assert async_turns._get_executor()._max_workers == 32
+
+    monkeypatch.setattr(async_turns, '_executor', None)
+    monkeypatch.setattr(async_turns, 'get_config', lambda: {'ASYNC_TURN_WORKERS': '24'})
+    assert async_turns._get_executor()._max_workers == 24
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,84 @@
+"""
+Steve Appointment Booker - Call Calendar Test
+This script tests per-lead time zones, holidays, next-window lookups and descriptions, and dialer ordering of the calling calendar.
+"""
+
+import os
+import sys
+import logging
+from datetime import datetime, date
+
+import pytz
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from call_calendar import CallCalendar, lead_timezone, us_federal_holidays
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HOURS = {'timezone': 'US/Mountain', 'weekday_start': '09:30', 'weekday_end': '16:00', 'weekend_enabled': False}
+
+def utc(*args):
+    return pytz.utc.localize(datetime(*args))
+
+def test_lead_timezone():
+    assert str(lead_timezone('NY')) == 'US/Eastern'
+    assert str(lead_timezone(' ca ')) == 'US/Pacific'
+    assert str(lead_timezone(None, '80202')) == 'US/Mountain'
+    assert str(lead_timezone('', '85004-1234')) == 'US/Arizona'
+    assert lead_timezone('XX', None) is None
+
+def test_us_federal_holidays():
+    holidays = us_federal_holidays(2024)
+    assert date(2024, 5, 27) in holidays   # Memorial Day
+    assert date(2024, 9, 2) in holidays    # Labor Day
+    assert date(2024, 11, 28) in holidays  # Thanksgiving
+
+def test_can_call_in_lead_timezone():
+    calendar = CallCalendar(HOURS)
+    # Wednesday 2024-03-13 14:00 UTC is 10:00 in New York but 07:00 in Los Angeles
+    now = utc(2024, 3, 13, 14, 0)
+    assert calendar.can_call({'state': 'NY'}, now)
+    assert not calendar.can_call({'state': 'CA'}, now)
+    # Unknown location falls back to the configured zone (08:00 Mountain)
+    assert not calendar.can_call({}, now)
+
+    next_start = calendar.next_window({'state': 'CA'}, now)
+    assert next_start.strftime('%Y-%m-%d %H:%M') == '2024-03-13 09:30'
+
+def test_holidays_and_weekends_are_skipped():
+    calendar = CallCalendar(HOURS, holidays={date(2024, 7, 4)})
+    holiday = utc(2024, 7, 4, 17, 0)
+    assert not calendar.can_call({'state': 'CO'}, holiday)
+    assert calendar.next_window({'state': 'CO'}, holiday).strftime('%Y-%m-%d %H:%M') == '2024-07-05 09:30'
+
+    saturday = utc(2024, 3, 16, 18, 0)
+    assert calendar.next_window({'state': 'CO'}, saturday).strftime('%Y-%m-%d %H:%M') == '2024-03-18 09:30'
+
+def test_describe_next_window():
+    calendar = CallCalendar(HOURS, holidays={date(2024, 7, 4)})
+    # 07:00 in Los Angeles, 08:00 in Denver
+    assert calendar.describe_next_window({'state': 'CA'}, utc(2024, 3, 13, 14, 0)) == 'today at 9:30 AM Pacific Time'
+    assert calendar.describe_next_window({}, utc(2024, 7, 3, 23, 0)) == 'Friday, July 5 at 9:30 AM Mountain Time'
+    assert calendar.describe_next_window({'state': 'NY'}, utc(2024, 3, 13, 21, 0)) == 'tomorrow at 9:30 AM Eastern Time'
+
+def test_order_for_dialing():
+    calendar = CallCalendar(HOURS)
+    # 20:30 UTC: 16:30 in New York (closed), 14:30 in Denver, 13:30 in Los Angeles
+    now = utc(2024, 3, 13, 20, 30)
+    leads = [{'id': 1, 'state': 'CA'}, {'id': 2, 'state': 'NY'}, {'id': 3, 'state': 'CO'}]
+    ready, waiting = calendar.order_for_dialing(leads, now)
+    assert [lead['id'] for lead in ready] == [3, 1]
+    assert [lead['id'] for lead, _ in waiting] == [2]
+
+if __name__ == "__main__":
+    test_lead_timezone()
+    test_us_federal_holidays()
+    test_can_call_in_lead_timezone()
+    test_holidays_and_weekends_are_skipped()
+    test_describe_next_window()
+    test_order_for_dialing()
+    logger.info("Call calendar tests passed")
@@ -0,0 +1,113 @@
+"""
+Steve Appointment Booker - Call Log Writer Test
+This script tests group commits, durability waits, lock retries, bad-row isolation and shutdown flushing of the write-behind call log writer.
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+import call_log_writer
+from call_log_writer import CallLogWriter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def count_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM call_logs').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_concurrent_writes_are_group_committed(db_path):
+    writer = CallLogWriter(batch_interval=0.02)
+    try:
+        def turn(lead_id):
+            writer.write(lead_id, 'In Progress', "Lead: Yes.")
+            writer.write(lead_id, 'In Progress', "Bot: Great!", 'abc123').wait()
+            # Durable once wait() returns
+            assert count_rows(db_path) >= 2
+
+        threads = [threading.Thread(target=turn, args=(lead_id,)) for lead_id in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert count_rows(db_path) == 40
+        assert writer.stats['rows'] == 40
+        assert writer.stats['batches'] < 40
+    finally:
+        writer.close()
+
+def test_close_flushes_queued_rows(db_path):
+    writer = CallLogWriter(batch_interval=0.5)
+    for i in range(5):
+        writer.write(1, 'In Progress', f"Lead: message {i}")
+    writer.close()
+    assert count_rows(db_path) == 5
+
+def test_failed_commit_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, 'DB_PATH', str(tmp_path / 'empty.db'))  # No call_logs table
+    writer = CallLogWriter()
+    try:
+        ticket = writer.write(1, 'Started', "Bot: Hello")
+        try:
+            ticket.wait()
+            assert False, "expected the missing table to surface"
+        except sqlite3.OperationalError:
+            pass
+        assert writer.stats['errors'] == 1
+    finally:
+        writer.close()
+
+def test_locked_batch_is_retried(db_path, monkeypatch):
+    real_get_db = models.get_db
+    attempts = []
+
+    def flaky_get_db():
+        attempts.append(1)
+        if len(attempts) == 1:
+            # Another worker or a job thread holds the write lock
+            raise sqlite3.OperationalError('database is locked')
+        return real_get_db()
+
+    monkeypatch.setattr(call_log_writer, 'get_db', flaky_get_db)
+    monkeypatch.setattr(call_log_writer, 'RETRY_BACKOFF', 0.01)
+    writer = CallLogWriter()
+    try:
+        writer.write(1, 'Started', "Bot: Hello").wait()
+        assert len(attempts) == 2
+        assert count_rows(db_path) == 1
+        assert writer.stats == {'rows': 1, 'batches': 1, 'errors': 0}
+    finally:
+        writer.close()
+
+def test_bad_row_does_not_fail_the_batch(db_path):
+    writer = CallLogWriter(batch_interval=0.2)
+    try:
+        good = writer.write(1, 'In Progress', "Lead: Yes.")
+        bad = writer.write(2, 'In Progress', {'not': 'text'})  # Can't be bound as a column value
+        other = writer.write(3, 'In Progress', "Bot: Great!")
+        good.wait()
+        other.wait()
+        with pytest.raises(sqlite3.Error):
+            bad.wait()
+        assert count_rows(db_path) == 2
+        assert writer.stats['rows'] == 2 and writer.stats['errors'] == 1
+    finally:
+        writer.close()
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
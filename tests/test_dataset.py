@@ -0,0 +1,75 @@
+"""
+Steve Appointment Booker - Synthetic Dataset Test
+This script tests the benchmark dataset generator: row shapes, configurable distributions and reproducibility.
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import logging
+
+# Add the bench directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'tests', 'bench'))
+from dataset import build_dataset, load_profile
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def build(leads, profile=None, seed=7):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    counts = build_dataset(path, leads, profile, seed)
+    conn = sqlite3.connect(path)
+    return path, conn, counts
+
+def remove(path):
+    """Delete a built database and the archive database init_db creates beside it"""
+    for db in (path, f"{os.path.splitext(path)[0]}_archive.db"):
+        if os.path.exists(db):
+            os.unlink(db)
+
+def test_dataset_shape():
+    path, conn, counts = build(500)
+    try:
+        assert counts['leads'] == 500
+        assert conn.execute('SELECT COUNT(DISTINCT phone_e164) FROM leads').fetchone()[0] == 500
+        # Every called lead has a call that starts with the opening line and ends with a status row
+        called = conn.execute("SELECT COUNT(*) FROM leads WHERE status != 'Not Called'").fetchone()[0]
+        started = conn.execute("SELECT COUNT(DISTINCT lead_id) FROM call_logs WHERE call_status = 'Started'").fetchone()[0]
+        assert called == started > 0
+        assert conn.execute("SELECT COUNT(*) FROM call_logs WHERE transcript LIKE 'Lead: %'").fetchone()[0] > 0
+        # Appointments belong to 'Appointment Set' leads only
+        assert conn.execute('''SELECT COUNT(*) FROM appointments a JOIN leads l ON l.id = a.lead_id
+                               WHERE l.status != 'Appointment Set' ''').fetchone()[0] == 0
+        assert counts['appointments'] == conn.execute("SELECT COUNT(*) FROM leads WHERE status = 'Appointment Set'").fetchone()[0]
+    finally:
+        conn.close()
+        remove(path)
+
+def test_profile_and_seed():
+    path, conn, counts = build(300, load_profile(overrides={'called_rate': 0.0}))
+    try:
+        assert counts['call_logs'] == 0 and counts['follow_ups'] == 0
+    finally:
+        conn.close()
+        remove(path)
+
+    first, conn_a, counts_a = build(200)
+    second, conn_b, counts_b = build(200)
+    try:
+        assert counts_a == counts_b
+        query = 'SELECT name, phone, status FROM leads ORDER BY id'
+        assert conn_a.execute(query).fetchall() == conn_b.execute(query).fetchall()
+    finally:
+        conn_a.close()
+        conn_b.close()
+        remove(first)
+        remove(second)
+
+if __name__ == "__main__":
+    test_dataset_shape()
+    test_profile_and_seed()
+    logger.info("Synthetic dataset tests passed")
@@ -0,0 +1,67 @@
+"""
+Steve Appointment Booker - History Window Test
+This script tests conversation history windowing and the per-lead digest of earlier calls.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from history_window import load_conversation, window_history, estimate_tokens, STAGE_TOKEN_BUDGETS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def log_call(conn, lead_id, lines, status=None):
+    """Write one call's worth of call_logs rows"""
+    conn.execute("INSERT INTO call_logs (lead_id, call_status, transcript) VALUES (?, 'Started', ?)",
+                 (lead_id, f"Bot: {lines[0]}"))
+    for i, line in enumerate(lines[1:]):
+        prefix = 'Lead' if i % 2 == 0 else 'Bot'
+        conn.execute("INSERT INTO call_logs (lead_id, call_status, transcript) VALUES (?, 'In Progress', ?)",
+                     (lead_id, f"{prefix}: {line}"))
+    if status:
+        conn.execute("INSERT INTO call_logs (lead_id, call_status, transcript) VALUES (?, ?, ?)",
+                     (lead_id, status, f"Call ended with status: {status}"))
+
+def test_current_call_verbatim_with_digest(db_path):
+    with models.get_db() as conn:
+        log_call(conn, 1, ["Hi, it's Steve.", "I'm too busy, call me back next week", "Will do."], 'completed')
+        log_call(conn, 1, ["Hi again, it's Steve.", "Yes, we have 25 employees"])
+        conn.commit()
+
+        history, digest = load_conversation(conn, 1)
+        assert [msg["content"] for msg in history] == ["Hi again, it's Steve.", "Yes, we have 25 employees"]
+        assert "too busy, call me back next week" in digest
+        assert "Ended: completed" in digest
+
+        # The digest is cached per call, so later turns don't re-read earlier calls
+        conn.execute('DELETE FROM call_logs WHERE id < 3')
+        assert load_conversation(conn, 1)[1] == digest
+
+
+def test_window_respects_stage_budget():
+    history = [{"role": "user" if i % 2 else "assistant", "content": f"message {i} " + "word " * 40}
+               for i in range(60)]
+    digest = "\n".join(f"Call on 2024-01-{day:02d} (4 messages). Lead said: \"maybe later\"." for day in range(1, 29))
+
+    for stage, budget in STAGE_TOKEN_BUDGETS.items():
+        messages = window_history(history, stage, digest)
+        assert sum(estimate_tokens(msg["content"]) for msg in messages) <= budget + 20
+        # Newest messages survive, older ones are summarized as omitted
+        assert messages[-1] == history[-1]
+        assert messages[0]["content"].startswith("Summary of earlier calls")
+
+    short = history[-2:]
+    assert window_history(short, "qualification") == short
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,68 @@
+"""
+Steve Appointment Booker - Import Time Test
+This script tests that importing the backend app stays within its import-time budget
+(measured with `python -X importtime`), leaves the heavy integrations unloaded and
+doesn't touch the database.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import importlib.util
+import logging
+
+import pytest
+
+# Backend directory the app is imported from
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(project_root, 'backend')
+
+# Cumulative import time allowed for `import app`, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 600))
+
+# Loaded on first use only (calls, TTS, LLM, scraping, CRM sync)
+LAZY_MODULES = ['twilio', 'openai', 'bs4', 'requests', 'scraper', 'zoho']
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def import_app(code, db_path):
+    env = dict(os.environ, DATABASE_URL=db_path)
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, timeout=120)
+
+def app_import_ms(stderr):
+    """Cumulative time of the top-level `app` import from -X importtime output"""
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and line.rsplit('|', 1)[-1].strip() == 'app':
+            return int(line.split('|')[1]) / 1000.0
+    raise AssertionError("no importtime entry for app")
+
+def test_import_time():
+    if importlib.util.find_spec('flask') is None:
+        pytest.skip("flask is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'leads.db')
+        code = f"import sys, app; print(__import__('json').dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+        # The first run warms the bytecode cache so the measurement is of a normal worker boot
+        import_app(code, db_path)
+        result = import_app(code, db_path)
+        assert result.returncode == 0, result.stderr[-2000:]
+
+        elapsed = app_import_ms(result.stderr)
+        logger.info(f"import app took {elapsed:.1f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+        assert elapsed <= IMPORT_BUDGET_MS, f"import app took {elapsed:.1f}ms, budget is {IMPORT_BUDGET_MS:.0f}ms"
+
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        assert loaded == [], f"imported eagerly: {loaded}"
+
+        # Schema setup is a separate step (python models.py), not an import side effect
+        assert not os.path.exists(db_path)
+
+if __name__ == "__main__":
+    test_import_time()
+    logger.info("Import time tests passed")
@@ -0,0 +1,108 @@
+"""
+Steve Appointment Booker - Intent Classifier Test
+This script tests the local fast-path intent classifier and its templated replies.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import intent_classifier
+from intent_classifier import train_intent_classifier, fast_path_response, weak_label, OTHER
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONFIG = {'FAST_PATH_ENABLED': True, 'FAST_PATH_CONFIDENCE': 0.85}
+
+def make_classifier():
+    """Train on the seed examples plus a couple of stored lead lines"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE call_logs (id INTEGER PRIMARY KEY, lead_id INTEGER, transcript TEXT)')
+    conn.executemany('INSERT INTO call_logs (transcript) VALUES (?)',
+                     [('Lead: Yes.',), ('Lead: Nope.',), ('Lead: We have around 40 people here',)])
+    return train_intent_classifier(conn)
+
+def test_predicts_trivial_intents():
+    classifier = make_classifier()
+    assert classifier.predict("Yes.")[0] == 'yes'
+    assert classifier.predict("I'm not interested, thanks")[0] == 'not_interested'
+    assert classifier.predict("Can you call me back on Friday?")[0] == 'callback'
+    assert classifier.predict("Sorry, wrong number")[0] == 'wrong_number'
+    assert classifier.predict("yes but we're under contract with AT&T")[0] == OTHER
+    assert classifier.predict("") == (OTHER, 0.0)
+
+def test_weak_labels():
+    assert weak_label("Yeah.") == 'yes'
+    assert weak_label("you've got the wrong number") == 'wrong_number'
+    assert weak_label("try me again tomorrow") == 'callback'
+    assert weak_label("we have fifteen trucks") == OTHER
+
+def test_fast_path_templates():
+    # Use the in-memory training set instead of the app database
+    intent_classifier._classifier = make_classifier()
+    intent_classifier._trained_at = time.time()
+
+    # Callback and wrong-number replies must end the call the way check_conversation_result expects
+    reply = fast_path_response("call me back tomorrow", "qualification", config=CONFIG)
+    assert "call back tomorrow" in reply
+    assert "thank you for your time" in reply.lower() and "goodbye" in reply.lower()
+
+    # A yes to the opener moves on instead of asking about mobile devices again
+    reply = fast_path_response("Yes", "introduction", config=CONFIG)
+    assert "how many" in reply and "Do you currently use mobile devices" not in reply
+
+    reply = fast_path_response("Yes", "value_proposition", industry="Plumbing", config=CONFIG)
+    assert "Plumbing companies" in reply
+
+    # No template for a bare "yes" once objections are being handled, and
+    # anything long or uncertain falls through to the LLM
+    assert fast_path_response("Yes", "objection_handling", config=CONFIG) is None
+    assert fast_path_response("We have about thirty employees and they all carry phones", "qualification", config=CONFIG) is None
+    assert fast_path_response("Yes", "qualification", config={'FAST_PATH_ENABLED': 'false'}) is None
+
+def test_retrains_in_the_background():
+    old = make_classifier()
+    new = make_classifier()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_train():
+        started.set()
+        release.wait(5)
+        return new
+
+    original = intent_classifier.train_intent_classifier
+    intent_classifier.train_intent_classifier = slow_train
+    try:
+        intent_classifier._classifier = old
+        intent_classifier._trained_at = time.time() - intent_classifier.RETRAIN_INTERVAL - 1
+
+        # A stale model is still served while the new one trains
+        assert intent_classifier.get_intent_classifier() is old
+        assert started.wait(5)
+        assert intent_classifier.get_intent_classifier() is old
+
+        release.set()
+        for _ in range(100):
+            if intent_classifier.get_intent_classifier() is new:
+                break
+            time.sleep(0.01)
+        assert intent_classifier.get_intent_classifier() is new
+        assert not intent_classifier._retraining
+    finally:
+        release.set()
+        intent_classifier.train_intent_classifier = original
+
+if __name__ == "__main__":
+    test_predicts_trivial_intents()
+    test_weak_labels()
+    test_fast_path_templates()
+    test_retrains_in_the_background()
+    logger.info("Intent classifier tests passed")
@@ -0,0 +1,230 @@
+"""
+Steve Appointment Booker - Job Queue Test
+This script tests the durable background job queue: priorities, retries with backoff,
+permanent failures, lease expiry, progress, cancellation, dialing claims and the 202 + polling API.
+"""
+
+import os
+import io
+import sys
+import time
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from job_queue import (job_handler, JobFailed, JobWorker, enqueue_job, get_job, claim_job, cancel_job,
+                       requeue_expired, RETRY_BASE_SECONDS)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+calls = []
+
+@job_handler('test_record')
+def record_job(job):
+    calls.append(job.payload['name'])
+    job.progress(1, 1, 'Recorded')
+    return {'name': job.payload['name']}
+
+@job_handler('test_flaky', max_attempts=2)
+def flaky_job(job):
+    raise RuntimeError(f"attempt {job.attempt} failed")
+
+@job_handler('test_rejected')
+def rejected_job(job):
+    raise JobFailed('Outside of calling hours', {'message': 'Try again later'})
+
+def make_ready(conn, job_id):
+    """Skip a retry's backoff"""
+    conn.execute('UPDATE jobs SET run_after = 0 WHERE id = ?', (job_id,))
+    conn.commit()
+
+def test_priority_order_and_progress(db_path):
+    del calls[:]
+    with models.get_db() as conn:
+        first = enqueue_job(conn, 'test_record', {'name': 'low'})
+        enqueue_job(conn, 'test_record', {'name': 'high'}, priority=10)
+        enqueue_job(conn, 'test_record', {'name': 'low again'})
+
+    worker = JobWorker()
+    while worker.run_once() is not None:
+        pass
+    # Highest priority first, then oldest first
+    assert calls == ['high', 'low', 'low again']
+
+    with models.get_db() as conn:
+        job = get_job(conn, first)
+    assert job['status'] == 'succeeded' and job['attempts'] == 1
+    assert job['result'] == {'name': 'low'}
+    assert (job['progress'], job['total'], job['message']) == (1, 1, 'Recorded')
+
+def test_retry_with_backoff_then_fail(db_path):
+    with models.get_db() as conn:
+        job_id = enqueue_job(conn, 'test_flaky')
+
+    worker = JobWorker()
+    before = time.time()
+    assert worker.run_once() == job_id
+    with models.get_db() as conn:
+        job = get_job(conn, job_id)
+        assert job['status'] == 'queued' and job['error'] == 'attempt 1 failed'
+        # Backed off, so not ready yet
+        run_after = conn.execute('SELECT run_after FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+        assert run_after >= before + RETRY_BASE_SECONDS * 0.8
+        assert worker.run_once() is None
+        make_ready(conn, job_id)
+
+    assert worker.run_once() == job_id
+    with models.get_db() as conn:
+        job = get_job(conn, job_id)
+    assert job['status'] == 'failed' and job['attempts'] == 2 and job['error'] == 'attempt 2 failed'
+
+def test_job_failed_is_not_retried(db_path):
+    with models.get_db() as conn:
+        job_id = enqueue_job(conn, 'test_rejected')
+    JobWorker().run_once()
+    with models.get_db() as conn:
+        job = get_job(conn, job_id)
+    assert job['status'] == 'failed' and job['attempts'] == 1
+    assert job['error'] == 'Outside of calling hours'
+    assert job['result'] == {'message': 'Try again later'}
+
+def test_expired_lease_is_requeued(db_path):
+    with models.get_db() as conn:
+        job_id = enqueue_job(conn, 'test_record', {'name': 'orphan'})
+        # A worker claims the job and dies without renewing its lease
+        assert claim_job(conn, 'dead-worker', lease_seconds=60)['id'] == job_id
+        assert requeue_expired(conn) == 0
+        assert requeue_expired(conn, now=time.time() + 61) == 1
+        conn.commit()
+        job = get_job(conn, job_id)
+        assert job['status'] == 'queued' and job['error'] == 'Worker stopped before the job finished'
+        make_ready(conn, job_id)
+
+    del calls[:]
+    assert JobWorker().run_once() == job_id
+    assert calls == ['orphan']
+    with models.get_db() as conn:
+        assert get_job(conn, job_id)['attempts'] == 2
+
+def test_cancel_and_unknown_kind(db_path):
+    with models.get_db() as conn:
+        job_id = enqueue_job(conn, 'test_record', {'name': 'cancelled'})
+        assert cancel_job(conn, job_id)
+        assert not cancel_job(conn, job_id)
+        assert get_job(conn, job_id)['status'] == 'cancelled'
+        try:
+            enqueue_job(conn, 'no_such_job')
+            assert False, 'unknown kinds must be rejected'
+        except ValueError:
+            pass
+    assert JobWorker().run_once() is None
+
+class OpenCalendar:
+    """Every lead is inside its calling window; on_check runs before the first check"""
+
+    def __init__(self, on_check=None):
+        self.on_check = on_check
+
+    def can_call(self, lead=None, now=None):
+        on_check, self.on_check = self.on_check, None
+        if on_check:
+            on_check()
+        return True
+
+    def order_for_dialing(self, leads):
+        return leads, []
+
+class FakeJob:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def progress(self, done, total=None, message=None):
+        pass
+
+def test_dialing_jobs_claim_before_calling(db_path, monkeypatch):
+    import jobs
+    monkeypatch.setattr(jobs, 'get_config', lambda: {'TEST_MODE': True})
+    with models.get_db() as conn:
+        conn.execute("INSERT INTO leads (id, name, phone, status) VALUES (1, 'Acme Plumbing', '3035550100', 'Not Called')")
+        conn.execute("INSERT INTO follow_ups (lead_id, scheduled_time, reason, status) VALUES (1, '2020-01-01 09:00:00', 'Callback requested', 'Pending')")
+        conn.commit()
+
+    # A second follow-up job runs after the first has read the due rows but before it dials
+    second = {}
+    calendar = OpenCalendar(on_check=lambda: second.update(jobs.auto_follow_up(FakeJob({}))))
+    monkeypatch.setattr(jobs, 'get_call_calendar', lambda: calendar)
+    first = jobs.auto_follow_up(FakeJob({}))
+    assert [result['status'] for result in second['results']] == ['success']
+    assert [result['status'] for result in first['results']] == ['skipped']
+
+    # A lead that is already on a call is not dialed again
+    monkeypatch.setattr(jobs, 'get_call_calendar', lambda: OpenCalendar())
+    results = jobs.auto_dial_leads(FakeJob({'lead_ids': [1]}))['results']
+    assert results == [{'lead_id': 1, 'status': 'skipped', 'message': 'Lead is already being called'}]
+
+def test_follow_ups_are_read_in_pages(db_path, monkeypatch):
+    import jobs
+    monkeypatch.setattr(jobs, 'get_config', lambda: {'TEST_MODE': True})
+    monkeypatch.setattr(jobs, 'DUE_PAGE_SIZE', 2)
+    states = ['NY', 'NY', 'CO', 'NY', 'CO', 'CO', 'CO', 'CO']
+    with models.get_db() as conn:
+        for lead_id, state in enumerate(states, 1):
+            conn.execute("INSERT INTO leads (id, name, phone, state) VALUES (?, ?, ?, ?)",
+                         (lead_id, f"Lead {lead_id}", f"30355501{lead_id:02d}", state))
+            # Highest priority first, so the follow-ups are dialed in lead order
+            conn.execute("INSERT INTO follow_ups (lead_id, scheduled_time, priority, reason) VALUES (?, '2020-01-01 09:00:00', ?, 'Callback')",
+                         (lead_id, 10 - lead_id))
+        conn.commit()
+
+    checked = []
+
+    class MountainCalendar(OpenCalendar):
+        def can_call(self, lead=None, now=None):
+            checked.append(lead['lead_id'])
+            return lead['state'] == 'CO'
+
+    monkeypatch.setattr(jobs, 'get_call_calendar', lambda: MountainCalendar())
+    results = jobs.auto_follow_up(FakeJob({'max_calls': 2}))['results']
+    assert [result['lead_id'] for result in results] == [3, 5]
+    # The last page is never read
+    assert checked == [1, 2, 3, 4, 5, 6]
+
+def test_api_queues_and_reports_jobs(db_path):
+    from app import app
+    client = app.test_client()
+
+    csv_text = 'name,phone\nAcme Plumbing,3035550100\nBest Electric,3035550101\n'
+    response = client.post('/api/leads/import', content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(csv_text.encode('utf-8')), 'leads.csv')})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'queued' and body['kind'] == 'lead_import'
+
+    # Nothing is imported until a worker runs the job
+    with models.get_db() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM leads').fetchone()[0] == 0
+    JobWorker().run_once()
+
+    job = client.get(body['status_url']).get_json()
+    assert job['status'] == 'succeeded' and job['result']['imported_count'] == 2
+    assert [row['id'] for row in client.get('/api/jobs?kind=lead_import').get_json()['jobs']] == [body['job_id']]
+
+    assert client.post('/api/leads/import', content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(b'name\nAcme\n'), 'leads.csv')}).status_code == 400
+    assert client.post('/api/jobs', json={'kind': 'no_such_job'}).status_code == 400
+    assert client.get('/api/jobs/999').status_code == 404
+    assert client.post(f"/api/jobs/{body['job_id']}/cancel").status_code == 409
+
+    queued = client.post('/api/jobs', json={'kind': 'merge_duplicates'}).get_json()
+    cancelled = client.post(f"/api/jobs/{queued['job_id']}/cancel")
+    assert cancelled.status_code == 200 and cancelled.get_json()['status'] == 'cancelled'
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,67 @@
+"""
+Steve Appointment Booker - Lead Cache Test
+This script tests the read-through lead cache: compact records, LRU bounds and invalidation.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from lead_cache import LeadCache, LeadRecord
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_lead(conn, name, phone, industry='Plumbing'):
+    cursor = conn.execute('INSERT INTO leads (name, phone, industry, city) VALUES (?, ?, ?, ?)',
+                          (name, phone, industry, 'Denver'))
+    return cursor.lastrowid
+
+def test_record_reads_like_a_row(db_path):
+    with models.get_db() as conn:
+        lead_id = add_lead(conn, 'ABC Plumbing', '720-555-1234')
+        conn.commit()
+        lead = LeadCache().get(conn, lead_id)
+    assert isinstance(lead, LeadRecord)
+    assert not hasattr(lead, '__dict__')
+    assert lead['name'] == 'ABC Plumbing'
+    assert lead.get('industry', lead.get('category', 'business')) == 'Plumbing'
+    assert lead.get('notes', 'none') == 'none'
+    assert lead.to_dict()['city'] == 'Denver'
+
+def test_cache_hits_and_invalidation(db_path):
+    cache = LeadCache(max_entries=2)
+    with models.get_db() as conn:
+        first = add_lead(conn, 'ABC Plumbing', '720-555-1234')
+        second = add_lead(conn, 'Best Roofing', '720-555-5678')
+        third = add_lead(conn, 'City Electric', '720-555-9012')
+        conn.commit()
+
+        assert cache.get(conn, first)['status'] == 'Not Called'
+        conn.execute('UPDATE leads SET status = ? WHERE id = ?', ('Calling', first))
+        conn.commit()
+        # Served from memory until the write path invalidates it
+        assert cache.get(conn, str(first))['status'] == 'Not Called'
+        cache.invalidate(first)
+        assert cache.get(conn, first)['status'] == 'Calling'
+
+        cache.get(conn, second)
+        cache.get(conn, third)
+        assert cache.stats()['entries'] == 2
+        assert cache.get(conn, 9999) is None
+        assert cache.get(conn, None) is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 5
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
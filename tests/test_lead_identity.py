@@ -0,0 +1,121 @@
+"""
+Steve Appointment Booker - Lead Identity Test
+This script tests phone normalization, lead dedupe (never across different known phones) and the duplicate merge job.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from lead_identity import (normalize_phone, identity_key, dedupe_businesses, insert_lead,
+                           merge_duplicate_leads, find_lead_id_by_phone)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_normalize_phone():
+    """Common US formats collapse to one E.164 number"""
+    for raw in ['(720) 555-1234', '720.555.1234', '1-720-555-1234', '+1 720 555 1234', '7205551234']:
+        assert normalize_phone(raw) == '+17205551234', raw
+    assert normalize_phone('555-1234') is None
+    # A + prefix doesn't make a short number dialable
+    assert normalize_phone('+1 555 1234') is None
+    assert normalize_phone('+44 1234 567') is None
+    assert normalize_phone('+44 20 7946 0958') == '+442079460958'
+    assert normalize_phone('N/A') is None
+    assert normalize_phone('') is None
+
+def test_identity_key_is_fuzzy():
+    """Suffixes, punctuation and ZIP+4 don't change the identity key"""
+    a = identity_key('ABC Plumbing, LLC', '123 Main Street, Denver, CO 80202')
+    b = identity_key('abc plumbing', '123 Main St, Denver, CO 80202-1234')
+    assert a == b
+    assert identity_key('ABC Plumbing', '125 Main St, Denver, CO 80202') != a
+    # A name alone identifies nothing
+    assert identity_key('ABC Plumbing') is None
+    assert identity_key('ABC Plumbing', 'Main St') is None
+    assert identity_key('ABC Plumbing', city='Denver') == 'abc plumbing||denver'
+
+def test_dedupe_businesses():
+    """A scrape that lists the same business twice keeps one copy"""
+    businesses = [
+        {'name': 'Mile High HVAC', 'phone': '(719) 555-4321', 'address': '789 Pine Blvd, Denver, CO 80202'},
+        {'name': 'Mile High HVAC Inc.', 'phone': '719-555-4321', 'address': '789 Pine Blvd'},
+        {'name': 'Front Range Electric', 'phone': 'N/A', 'address': '1 Volt Ave, Denver, CO 80203'},
+        {'name': 'Front Range Electric LLC', 'phone': '', 'address': '1 Volt Ave, Denver, CO 80203'},
+    ]
+    assert [b['name'] for b in dedupe_businesses(businesses)] == ['Mile High HVAC', 'Front Range Electric']
+
+    # Same name and address but different phones: two branches, both kept
+    branches = [
+        {'name': 'Mile High HVAC', 'phone': '(719) 555-4321', 'address': '789 Pine Blvd, Denver, CO 80202'},
+        {'name': 'Mile High HVAC', 'phone': '(719) 555-9876', 'address': '789 Pine Blvd, Denver, CO 80202'},
+    ]
+    assert len(dedupe_businesses(branches)) == 2
+
+def test_insert_and_merge(db_path):
+    """insert_lead refuses duplicates and the merge job folds legacy ones"""
+    with models.get_db() as conn:
+        first_id, created = insert_lead(conn, {'name': 'ABC Plumbing', 'phone': '720-555-1234', 'address': '123 Main St'})
+        assert created
+        again_id, created = insert_lead(conn, {'name': 'ABC Plumbing LLC', 'phone': '(720) 555-1234', 'address': '123 Main St'})
+        assert not created and again_id == first_id
+        assert find_lead_id_by_phone(conn, '+17205551234') == first_id
+
+        # Rows written before the identity columns existed bypass the unique index
+        conn.execute("INSERT INTO leads (name, phone, status, industry) VALUES ('ABC Plumbing', '7205551234', 'Called', 'Plumbing')")
+        dup_id = conn.execute('SELECT max(id) FROM leads').fetchone()[0]
+        conn.execute("INSERT INTO call_logs (lead_id, call_status, transcript) VALUES (?, 'Started', 'Bot: hi')", (dup_id,))
+        conn.commit()
+
+        assert merge_duplicate_leads(conn) == 1
+        conn.commit()
+        leads = conn.execute('SELECT id, industry, status FROM leads').fetchall()
+        assert [tuple(row) for row in leads] == [(first_id, 'Plumbing', 'Called')]
+        assert conn.execute('SELECT lead_id FROM call_logs').fetchone()[0] == first_id
+
+
+def test_same_name_different_phones_are_different_leads(db_path):
+    with models.get_db() as conn:
+        # No address or city: the name alone must not match
+        first_id, _ = insert_lead(conn, {'name': 'Joe\'s Plumbing', 'phone': '720-555-1111'})
+        second_id, created = insert_lead(conn, {'name': 'Joe\'s Plumbing', 'phone': '303-555-2222'})
+        assert created and second_id != first_id
+
+        # Same name and city, different known phones
+        third_id, created = insert_lead(conn, {'name': 'ABC Plumbing', 'phone': '720-555-3333', 'city': 'Denver'})
+        fourth_id, created = insert_lead(conn, {'name': 'ABC Plumbing', 'phone': '720-555-4444', 'city': 'Denver'})
+        assert created and fourth_id != third_id
+        # A listing without a phone still matches on name and city
+        assert insert_lead(conn, {'name': 'ABC Plumbing LLC', 'phone': 'N/A', 'city': 'Denver'}) == (third_id, False)
+        conn.commit()
+
+        assert merge_duplicate_leads(conn) == 0
+        assert conn.execute('SELECT COUNT(*) FROM leads').fetchone()[0] == 4
+
+def test_update_to_taken_phone_conflicts(db_path):
+    """Changing a phone to one another lead owns answers 409 with that lead's id"""
+    from app import app
+    client = app.test_client()
+    with models.get_db() as conn:
+        first_id, _ = insert_lead(conn, {'name': 'ABC Plumbing', 'phone': '720-555-1234'})
+        second_id, _ = insert_lead(conn, {'name': 'XYZ Electric', 'phone': '720-555-9999'})
+        conn.commit()
+
+    response = client.patch(f'/api/leads/{second_id}', json={'phone': '(720) 555-1234'})
+    assert response.status_code == 409
+    assert response.get_json()['existing_id'] == first_id
+    with models.get_db() as conn:
+        assert conn.execute('SELECT phone FROM leads WHERE id = ?', (second_id,)).fetchone()[0] == '720-555-9999'
+
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
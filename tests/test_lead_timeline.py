@@ -0,0 +1,119 @@
+"""
+Steve Appointment Booker - Lead Timeline Test
+This script tests the paginated lead history timeline: calls grouped from call log rows,
+cursor pagination, type filters and archived calls.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from archive import archive_call_logs
+from lead_timeline import load_timeline, load_call_turns, parse_types, decode_cursor
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@pytest.fixture
+def history_db(db_path):
+    """A fresh database with one lead's history"""
+    with models.get_db() as conn:
+        conn.execute("""INSERT INTO leads (id, name, phone, qualification_status, updated_at)
+                        VALUES (1, 'Acme Plumbing', '3035550100', 'Qualified', '2024-03-02 12:00:00')""")
+        conn.execute("INSERT INTO leads (id, name, phone) VALUES (2, 'Other Co', '3035550199')")
+        logs = [
+            (1, 'Started', 'Bot: Hi, this is Steve.', '2023-01-05 10:00:00'),
+            (1, 'In Progress', 'Lead: Call me next week', '2023-01-05 10:00:10'),
+            (1, 'no-answer', 'Call ended with status: no-answer', '2023-01-05 10:01:00'),
+            (2, 'Started', 'Bot: Hello?', '2024-03-01 09:00:00'),
+            (1, 'Started', 'Bot: Hi again.', '2024-03-01 10:00:00'),
+            (1, 'In Progress', 'Lead: We have 25 techs', '2024-03-01 10:00:20'),
+            (1, 'In Progress', 'Bot: Great, does Thursday work?', '2024-03-01 10:00:25'),
+            (1, 'completed', 'Call ended with status: completed', '2024-03-01 10:02:00')
+        ]
+        conn.executemany('INSERT INTO call_logs (lead_id, call_status, transcript, created_at) VALUES (?, ?, ?, ?)', logs)
+        conn.execute("""INSERT INTO appointments (lead_id, date, time, status, medium, created_at)
+                        VALUES (1, '2024-03-07', '10:00', 'Scheduled', 'Phone', '2024-03-01 10:02:00')""")
+        conn.executemany("""INSERT INTO follow_ups (lead_id, scheduled_time, priority, reason, status)
+                            VALUES (1, ?, ?, ?, 'Pending')""",
+                         [('2023-01-12 10:00:00', 7, 'Asked for a call next week'),
+                          ('2024-03-08 09:00:00', 5, 'Confirm appointment')])
+        conn.commit()
+    return db_path
+
+def test_timeline_groups_calls(history_db):
+    with models.get_db(with_archive=True) as conn:
+        items, next_cursor = load_timeline(conn, 1)
+        assert next_cursor is None
+        assert [(item['type'], item['timestamp']) for item in items] == [
+            ('follow_up', '2024-03-08 09:00:00'),
+            ('appointment', '2024-03-07 10:00'),
+            ('qualification', '2024-03-02 12:00:00'),
+            ('call', '2024-03-01 10:00:00'),
+            ('follow_up', '2023-01-12 10:00:00'),
+            ('call', '2023-01-05 10:00:00')
+        ]
+
+        # Each call is one item: status and outcome from its last row, messages counted
+        latest = items[3]
+        assert latest['status'] == 'completed'
+        assert latest['data']['messages'] == 3
+        assert latest['data']['ended_at'] == '2024-03-01 10:02:00'
+        assert latest['data']['outcome'] == 'Call ended with status: completed'
+
+        turns = load_call_turns(conn, 1, latest['id'])
+        assert [turn['transcript'] for turn in turns] == [
+            'Bot: Hi again.', 'Lead: We have 25 techs', 'Bot: Great, does Thursday work?',
+            'Call ended with status: completed'
+        ]
+        assert load_call_turns(conn, 2, latest['id']) == []
+
+def test_pagination_and_filters(history_db):
+    with models.get_db(with_archive=True) as conn:
+        everything, _ = load_timeline(conn, 1)
+
+        # Walking the pages returns every item once, in the same order
+        pages, cursor = [], None
+        while True:
+            items, cursor = load_timeline(conn, 1, cursor=cursor, limit=2)
+            pages.extend(items)
+            if not cursor:
+                break
+        assert [(item['type'], item['id']) for item in pages] == [(item['type'], item['id']) for item in everything]
+
+        calls, _ = load_timeline(conn, 1, parse_types('call'))
+        assert [item['type'] for item in calls] == ['call', 'call']
+        follow_ups, _ = load_timeline(conn, 1, parse_types('follow_up,appointment'))
+        assert {item['type'] for item in follow_ups} == {'follow_up', 'appointment'}
+
+        for bad in ('calls', 'call,sms'):
+            try:
+                parse_types(bad)
+                assert False, f"{bad} should be rejected"
+            except ValueError:
+                pass
+        try:
+            decode_cursor('not-a-cursor')
+            assert False, "bad cursor should be rejected"
+        except ValueError:
+            pass
+
+def test_archived_calls_stay_on_timeline(history_db):
+    with models.get_db() as conn:
+        assert archive_call_logs(conn, older_than_days=90) > 0
+    with models.get_db(with_archive=True) as conn:
+        calls, _ = load_timeline(conn, 1, ['call'])
+        assert [item['timestamp'] for item in calls] == ['2024-03-01 10:00:00', '2023-01-05 10:00:00']
+        assert calls[1]['status'] == 'no-answer'
+        assert [turn['transcript'] for turn in load_call_turns(conn, 1, calls[1]['id'])][1] == 'Lead: Call me next week'
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,119 @@
+"""
+Steve Appointment Booker - Learning Engine Test
+This script tests the incremental learning engine: high-water marks, phrase dedupe,
+objection handling success, booked-lead upgrades and calls still in progress.
+"""
+
+import os
+import sys
+import json
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from learning import run_learning
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CALL = [
+    ('Started', 'Bot: Hi, this is Steve. How many employees do you currently have?'),
+    ('In Progress', 'Lead: About 40, but we are not interested right now'),
+    ('In Progress', 'Bot: Understood. Most teams our size save 20% on their phone bills.'),
+    ('In Progress', 'Lead: Oh, yes that sounds interesting'),
+    ('In Progress', 'Bot: Can we schedule a short appointment for Thursday?'),
+    ('completed', 'Call ended with status: completed')
+]
+
+def add_lead(conn, name, industry='Plumbing', status='New', qualification='Not Qualified'):
+    return conn.execute('INSERT INTO leads (name, phone, industry, status, qualification_status) VALUES (?, ?, ?, ?, ?)',
+                        (name, '3035550100', industry, status, qualification)).lastrowid
+
+def add_call(conn, lead_id, rows=CALL):
+    conn.executemany('INSERT INTO call_logs (lead_id, call_status, transcript) VALUES (?, ?, ?)',
+                     [(lead_id, status, transcript) for status, transcript in rows])
+    conn.commit()
+
+def industry_patterns(conn):
+    return {(row['pattern_type'], row['pattern_key']): (row['pattern_value'], row['success_count'])
+            for row in conn.execute('SELECT * FROM industry_patterns')}
+
+def latest_patterns(conn):
+    return json.loads(conn.execute('SELECT patterns FROM ai_patterns ORDER BY id DESC LIMIT 1').fetchone()[0])
+
+def test_learns_incrementally(db_path):
+    with models.get_db(with_archive=True) as conn:
+        booked = add_lead(conn, 'Acme Plumbing', status='Appointment Set')
+        add_lead(conn, 'Not Yet Co', status='New')
+        add_call(conn, booked)
+
+        stats = run_learning(conn, feedback='More questions about fleet size')
+        assert stats['callsAnalyzed'] == 1 and stats['leadsProcessed'] == 1
+        patterns = industry_patterns(conn)
+        assert patterns[('successful_phrases', 'value_proposition')][1] == 1
+        # The objection counts as handled because the lead's reply was positive
+        assert patterns[('objection_responses', 'objection:not interested')] == (
+            'Understood. Most teams our size save 20% on their phone bills.', 1)
+        snapshot = latest_patterns(conn)
+        assert snapshot['qualificationQuestions'] == ['Hi, this is Steve. How many employees do you currently have?']
+        assert snapshot['closingTechniques'] == ['Can we schedule a short appointment for Thursday?']
+        assert conn.execute('SELECT feedback FROM ai_feedback').fetchone()[0] == 'More questions about fleet size'
+
+        # Nothing new: the run reads no rows and leaves the counts alone
+        stats = run_learning(conn)
+        assert stats['callsAnalyzed'] == 0 and stats['leadsProcessed'] == 0
+        assert industry_patterns(conn) == patterns
+
+        # A second call with the same lines adds to the counts instead of duplicating phrases
+        add_call(conn, booked, [(status, transcript.replace('Steve', 'STEVE')) for status, transcript in CALL])
+        stats = run_learning(conn)
+        assert stats['callsAnalyzed'] == 1
+        assert industry_patterns(conn)[('successful_phrases', 'value_proposition')][1] == 2
+        counts = conn.execute("SELECT count FROM learned_phrases WHERE category = 'qualificationQuestions'").fetchall()
+        assert [row[0] for row in counts] == [2]
+
+def test_unanswered_objection_is_not_a_success(db_path):
+    with models.get_db(with_archive=True) as conn:
+        lead = add_lead(conn, 'Acme Plumbing', status='Appointment Set')
+        add_call(conn, lead, [
+            ('Started', 'Bot: Hi, this is Steve.'),
+            ('In Progress', 'Lead: We are not interested'),
+            ('In Progress', 'Bot: Yes, I understand.'),
+            ('In Progress', 'Lead: Please take us off your list'),
+            ('completed', 'Call ended with status: completed')
+        ])
+        run_learning(conn)
+        assert industry_patterns(conn) == {}
+
+def test_booked_lead_is_relearned_and_open_calls_wait(db_path):
+    with models.get_db(with_archive=True) as conn:
+        lead = add_lead(conn, 'Acme Plumbing', qualification='Qualified')
+        add_call(conn, lead)
+
+        # Qualified but not booked: phrases are learned, industry patterns are not
+        assert run_learning(conn)['callsAnalyzed'] == 1
+        assert industry_patterns(conn) == {}
+
+        # A call still in progress is held back until it ends
+        add_call(conn, lead, CALL[:4])
+        conn.execute("INSERT INTO appointments (lead_id, date, time, status) VALUES (?, '2024-03-07', '10:00', 'Scheduled')", (lead,))
+        conn.commit()
+        run_learning(conn)
+        assert industry_patterns(conn)[('successful_phrases', 'value_proposition')][1] == 1
+        assert conn.execute('SELECT pending FROM learning_progress WHERE lead_id = ?', (lead,)).fetchone()[0] == 1
+
+        add_call(conn, lead, CALL[4:])
+        assert run_learning(conn)['callsAnalyzed'] == 1
+        assert industry_patterns(conn)[('successful_phrases', 'value_proposition')][1] == 2
+        # Phrases from the first call were counted once, before the lead was booked
+        counts = conn.execute("SELECT count FROM learned_phrases WHERE category = 'qualificationQuestions'").fetchone()
+        assert counts[0] == 2
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,117 @@
+"""
+Steve Appointment Booker - LLM Router Test
+This script tests the per-model circuit breakers, hedging, turn deadline and concurrent turns of the LLM router.
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from llm_router import LLMRouter, FAILURE_THRESHOLD
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def fake_models(behaviour):
+    """call(model, timeout) that sleeps or fails per model"""
+    def call(model, timeout):
+        delay, error = behaviour[model]
+        time.sleep(delay)
+        if error:
+            raise RuntimeError(f"{model} unavailable")
+        return f"reply from {model}"
+    return call
+
+def test_failure_falls_through_and_opens_breaker():
+    router = LLMRouter(['primary', 'backup'], deadline=2, hedge_after=1)
+    call = fake_models({'primary': (0, True), 'backup': (0, False)})
+    for _ in range(FAILURE_THRESHOLD):
+        assert router.complete(call, fallback='canned') == 'reply from backup'
+    assert router.breakers['primary'].state == 'open'
+
+    # With the breaker open the primary isn't even attempted
+    calls_before = router.stats()['models']['primary']['calls']
+    assert router.complete(call, fallback='canned') == 'reply from backup'
+    assert router.stats()['models']['primary']['calls'] == calls_before
+    router.shutdown()
+
+def test_hedges_slow_primary():
+    router = LLMRouter(['primary', 'backup'], deadline=3, hedge_after=0.1)
+    call = fake_models({'primary': (1.5, False), 'backup': (0.05, False)})
+    start = time.monotonic()
+    assert router.complete(call, fallback='canned') == 'reply from backup'
+    assert time.monotonic() - start < 1
+    router.shutdown()
+
+def test_deadline_returns_fallback():
+    router = LLMRouter(['primary', 'backup'], deadline=0.3, hedge_after=0.1)
+    call = fake_models({'primary': (2, False), 'backup': (2, False)})
+    start = time.monotonic()
+    assert router.complete(call, fallback='canned') == 'canned'
+    assert time.monotonic() - start < 1
+    stats = router.stats()
+    assert stats['fallbacks'] == 1
+    assert stats['models']['primary']['timeouts'] == 1
+    router.shutdown()
+
+def test_abandoned_call_counts_once():
+    """A call that finishes after the deadline doesn't update its breaker a second time"""
+    for fails in (True, False):
+        router = LLMRouter(['primary'], deadline=0.1, hedge_after=1)
+
+        def call(model, timeout):
+            time.sleep(0.3)
+            if fails:
+                raise RuntimeError("late failure")
+            return "late reply"
+
+        assert router.complete(call, fallback='canned') == 'canned'
+        time.sleep(0.4)
+        breaker = router.breakers['primary']
+        assert (breaker.state, breaker.failures) == ('closed', 1)
+        assert router.stats()['models']['primary']['timeouts'] == 1
+        assert router.stats()['models']['primary']['failures'] == 0
+        router.shutdown()
+
+def test_concurrent_turns_do_not_queue():
+    """A burst of turns larger than any fixed pool gets every model call started at once"""
+    router = LLMRouter(['primary', 'backup'], deadline=3, hedge_after=2.5)
+    call = fake_models({'primary': (1, False), 'backup': (1, False)})
+    replies = []
+    turns = [threading.Thread(target=lambda: replies.append(router.complete(call, fallback='canned')))
+             for _ in range(16)]
+    for turn in turns:
+        turn.start()
+    for turn in turns:
+        turn.join()
+    assert replies == ['reply from primary'] * 16
+    stats = router.stats()
+    assert stats['fallbacks'] == 0
+    assert stats['models']['primary']['state'] == stats['models']['backup']['state'] == 'closed'
+    router.shutdown()
+
+def test_unstarted_call_is_not_a_model_failure():
+    router = LLMRouter(['primary'], deadline=1)
+    attempt = {'model': 'primary', 'settled': True, 'started': False}
+    try:
+        router._timed_call(lambda model, timeout: "reply", attempt, time.monotonic() + 1)
+        assert False, "an attempt the turn gave up on must not call the model"
+    except TimeoutError:
+        pass
+    stats = router.stats()['models']['primary']
+    assert (stats['calls'], stats['failures'], stats['state']) == (0, 0, 'closed')
+
+if __name__ == "__main__":
+    test_failure_falls_through_and_opens_breaker()
+    test_hedges_slow_primary()
+    test_deadline_returns_fallback()
+    test_abandoned_call_counts_once()
+    test_concurrent_turns_do_not_queue()
+    test_unstarted_call_is_not_a_model_failure()
+    logger.info("LLM router tests passed")
@@ -0,0 +1,96 @@
+"""
+Steve Appointment Booker - MCP Client Worker Test
+This script tests the long-lived Bright Data MCP worker against a local stub server.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from mcp_client import MCPClientWorker, parse_json_line, businesses_from_result
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STUB_COMMAND = [sys.executable, '-u', os.path.join(project_root, 'tests', 'stubs', 'mcp_server.py')]
+
+def make_worker(**kwargs):
+    return MCPClientWorker(STUB_COMMAND, **kwargs)
+
+def search(worker, query, **kwargs):
+    return worker.submit("search_engine", {"query": query}, **kwargs)
+
+def read_log(path):
+    with open(path) as log:
+        return [json.loads(line) for line in log]
+
+def test_worker_reuses_one_process():
+    """Consecutive scrapes are served by the same warm process after one handshake"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'mcp.log')
+        worker = make_worker(env={'MCP_STUB_LOG': log_path})
+        try:
+            first = search(worker, "3 Plumbing companies in Denver, CO")
+            pid = worker.pid
+            second = search(worker, "2 HVAC companies in Boulder, CO")
+
+            assert [b['name'] for b in first] == ['Plumbing Stub 1', 'Plumbing Stub 2', 'Plumbing Stub 3']
+            assert len(second) == 2 and second[0]['name'] == 'HVAC Stub 1'
+            assert worker.pid == pid
+            assert worker.server_info == {"name": "brightdata-stub", "version": "0.1"}
+        finally:
+            worker.close()
+
+        messages = read_log(log_path)
+        assert [m['method'] for m in messages] == ['initialize', 'notifications/initialized', 'tools/call', 'tools/call']
+        assert all(m['jsonrpc'] == '2.0' for m in messages)
+        assert messages[2]['params'] == {"name": "search_engine", "arguments": {"query": "3 Plumbing companies in Denver, CO"}}
+
+def test_worker_handles_errors_and_timeouts():
+    """A tool error yields no results; a hung request is cancelled on the server and the process kept"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'mcp.log')
+        worker = make_worker(env={'MCP_STUB_LOG': log_path})
+        try:
+            assert search(worker, "FAIL please") == []
+            pid = worker.pid
+
+            assert search(worker, "HANG forever", timeout=1) == []
+            recovered = search(worker, "1 Roofing companies in Denver, CO")
+            assert len(recovered) == 1
+            assert worker.pid == pid
+        finally:
+            worker.close()
+
+        messages = read_log(log_path)
+        hung = next(m for m in messages if m.get('method') == 'tools/call' and 'HANG' in m['params']['arguments']['query'])
+        cancelled = [m for m in messages if m.get('method') == 'notifications/cancelled']
+        assert [m['params']['requestId'] for m in cancelled] == [hung['id']]
+
+def test_parse_json_line():
+    """Log output is skipped, JSON objects are returned"""
+    assert parse_json_line(b'npm WARN something\n') is None
+    assert parse_json_line(b'{"jsonrpc": "2.0", "id": 1, "result": {}}\n') == {"jsonrpc": "2.0", "id": 1, "result": {}}
+    assert parse_json_line('{"broken": \n') is None
+
+def test_businesses_from_result():
+    """Structured content and JSON text content are read; plain text and tool errors are not business data"""
+    business = {"name": "ABC Plumbing", "phone": "303-555-1234"}
+    assert businesses_from_result({"structuredContent": {"businesses": [business]}}) == [business]
+    assert businesses_from_result({"content": [{"type": "text", "text": json.dumps([business])}]}) == [business]
+    assert businesses_from_result({"content": [{"type": "text", "text": json.dumps(business)}]}) == [business]
+    assert businesses_from_result({"content": [{"type": "text", "text": "# Search results\n..."}]}) == []
+    assert businesses_from_result({"content": [{"type": "text", "text": json.dumps([business])}], "isError": True}) == []
+
+if __name__ == "__main__":
+    test_parse_json_line()
+    test_businesses_from_result()
+    test_worker_reuses_one_process()
+    test_worker_handles_errors_and_timeouts()
+    logger.info("MCP client worker tests passed")
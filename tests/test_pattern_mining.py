@@ -0,0 +1,77 @@
+"""
+Steve Appointment Booker - Pattern Mining Test
+This script tests the offline n-gram mining job: phrase extraction, stage attribution,
+lift and conversion rates, and the rows written to ai_patterns and industry_patterns.
+"""
+
+import os
+import sys
+import json
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from pattern_mining import phrase_set, mine_patterns
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STRONG_OFFER = 'We can cut your fleet fuel bill in half.'
+WEAK_OFFER = 'Let me tell you about our standard plan.'
+
+def add_lead(conn, offer, booked, industry='Plumbing'):
+    lead_id = conn.execute('INSERT INTO leads (name, phone, industry, status) VALUES (?, ?, ?, ?)',
+                           ('Lead', '3035550100', industry, 'Appointment Set' if booked else 'Called')).lastrowid
+    conn.executemany('INSERT INTO call_logs (lead_id, call_status, transcript, prompt_hash) VALUES (?, ?, ?, ?)', [
+        (lead_id, 'Started', 'Bot: Hi, this is Steve.', None),
+        (lead_id, 'In Progress', 'Lead: Hello', None),
+        (lead_id, 'In Progress', f'Bot: {offer}', 'vp-prompt'),
+        (lead_id, 'In Progress', 'Lead: Go on', None),
+        (lead_id, 'In Progress', "Bot: Perfect, I've scheduled our meeting." if booked else 'Bot: Thanks anyway.', None)
+    ])
+
+def test_phrase_set():
+    phrases = phrase_set('Do you have 25 trucks?')
+    assert {'25', 'trucks', 'have 25', '25 trucks', 'you have 25'} <= phrases
+    # n-grams made only of stopwords are dropped
+    assert 'do you' not in phrases and 'you' not in phrases
+    # Confirmations follow a booking, so they are not mined
+    assert phrase_set("Great, you're confirmed for Tuesday.") == frozenset()
+
+def test_mine_patterns(db_path):
+    with models.get_db(with_archive=True) as conn:
+        conn.execute("INSERT INTO prompt_versions (prompt_hash, stage) VALUES ('vp-prompt', 'value_proposition')")
+        conn.execute('INSERT INTO ai_patterns (patterns) VALUES (?)', (json.dumps({'objectionHandling': ['Kept']}),))
+        for i in range(20):
+            add_lead(conn, STRONG_OFFER, booked=i < 15)
+            add_lead(conn, WEAK_OFFER, booked=i < 3)
+        conn.commit()
+
+        stats = mine_patterns(conn, min_support=10)
+        assert stats['leads'] == 40
+
+        snapshot = json.loads(conn.execute('SELECT patterns FROM ai_patterns ORDER BY id DESC LIMIT 1').fetchone()[0])
+        assert snapshot['objectionHandling'] == ['Kept']
+        # One phrase per sentence; the weak offer converts below the base rate and is left out
+        [top] = snapshot['phraseLift']['value_proposition']
+        assert top['phrase'] in STRONG_OFFER.lower()
+        assert (top['support'], top['booked'], top['conversionRate']) == (20, 15, 0.75)
+        # Smoothed toward the 45% base rate: (15 + 10 * 0.45) / (20 + 10) / 0.45
+        assert top['lift'] == 1.444
+        assert snapshot['phraseLift']['introduction'] == []
+
+        rows = conn.execute("SELECT industry, pattern_key, success_count FROM industry_patterns WHERE pattern_type = 'phrase_lift'").fetchall()
+        assert [(row[0], row[1], row[2]) for row in rows] == [('Plumbing', f"value_proposition:{top['phrase']}", 15)]
+
+        # Each run replaces the previous results
+        mine_patterns(conn, min_support=10)
+        assert conn.execute("SELECT COUNT(*) FROM industry_patterns WHERE pattern_type = 'phrase_lift'").fetchone()[0] == 1
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,56 @@
+"""
+Steve Appointment Booker - Phrase Matcher Test
+This script tests the single-pass conversation phrase matcher used for intent tagging.
+"""
+
+import os
+import sys
+import random
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from phrase_matcher import (PhraseMatcher, CONVERSATION_MATCHER, find_spoken_time,
+                            first_weekday, first_objection)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_matches_substring_semantics():
+    """Every phrase found by `phrase in text` is found by the matcher, and nothing else"""
+    rng = random.Random(7)
+    phrases = {''.join(rng.choice('abc ') for _ in range(rng.randint(1, 4))) for _ in range(60)}
+    matcher = PhraseMatcher({phrase: phrase for phrase in phrases})
+    for _ in range(200):
+        text = ''.join(rng.choice('abcABC ') for _ in range(40))
+        assert matcher.tags(text) == {phrase for phrase in phrases if phrase in text.lower()}
+
+def test_conversation_tags():
+    hits = CONVERSATION_MATCHER.scan("I'm too busy, call me back Thursday or Monday morning")
+    assert {'callback', 'objection', 'objection:too busy', 'weekday', 'morning'} <= set(hits)
+    assert first_weekday(hits) == 0
+    assert first_objection(hits) == 'objection:too busy'
+
+    # Objection types without learned responses are skipped
+    hits = CONVERSATION_MATCHER.scan("Not interested, we already have a provider")
+    assert first_objection(hits) == 'objection:not interested'
+    assert first_objection(hits, {'objection:already have': '...'}) == 'objection:already have'
+    assert first_objection(hits, {}) is None
+
+    hits = CONVERSATION_MATCHER.scan("Great, your appointment is confirmed. Thank you for your time, goodbye!")
+    assert {'confirmation', 'meeting', 'thanks_for_time', 'goodbye'} <= set(hits)
+    assert CONVERSATION_MATCHER.scan('') == {}
+
+def test_find_spoken_time():
+    assert find_spoken_time("try me at 3pm") == ('3', 'pm')
+    assert find_spoken_time("call at 3:30") == ('3', '30', '')
+    assert find_spoken_time("around 4 o'clock") == '4'
+    assert find_spoken_time("whenever") is None
+
+if __name__ == "__main__":
+    test_matches_substring_semantics()
+    test_conversation_tags()
+    test_find_spoken_time()
+    logger.info("Phrase matcher tests passed")
@@ -0,0 +1,63 @@
+"""
+Steve Appointment Booker - Prompt Compiler Test
+This script tests compiled system prompts, the learned-pattern cache and prompt hash recording.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from prompt_compiler import compile_prompt, invalidate_learned_patterns, get_prompt_version
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PATTERNS = {
+    "successful_phrases": {"We cut fleet phone bills by a fifth": 4, "We help you save": 1},
+    "objection_responses": {"objection:too busy": ["Totally get it, even 10 minutes can find savings."]}
+}
+
+def test_compile_and_record(db_path):
+    loads = []
+
+    def load_patterns(industry):
+        loads.append(industry)
+        return PATTERNS
+
+    invalidate_learned_patterns()
+    prompt, prompt_hash = compile_prompt("value_proposition", "Plumbing", "sure", load_patterns)
+    assert "Current conversation stage: value_proposition" in prompt
+    assert "- We cut fleet phone bills by a fifth" in prompt
+
+    # Same inputs give the same prompt and hash without reloading patterns
+    assert compile_prompt("value_proposition", "Plumbing", "sure", load_patterns) == (prompt, prompt_hash)
+    assert loads == ["Plumbing"]
+
+    objection_prompt, objection_hash = compile_prompt("objection_handling", "Plumbing", "I'm too busy", load_patterns)
+    assert "even 10 minutes can find savings." in objection_prompt
+    # The first objection with learned responses is used, not just the first one mentioned
+    mixed_prompt, _ = compile_prompt("objection_handling", "Plumbing", "Not interested, I'm too busy", load_patterns)
+    assert "even 10 minutes can find savings." in mixed_prompt
+    assert objection_hash != prompt_hash
+
+    # Invalidation picks up new patterns
+    invalidate_learned_patterns("Plumbing")
+    compile_prompt("value_proposition", "Plumbing", "sure", load_patterns)
+    assert loads == ["Plumbing", "Plumbing"]
+
+    with models.get_db() as conn:
+        version = get_prompt_version(conn, objection_hash)
+        assert version["prompt"] == objection_prompt
+        assert version["stage"] == "objection_handling"
+
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
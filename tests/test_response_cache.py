@@ -0,0 +1,121 @@
+"""
+Steve Appointment Booker - Response Cache Test
+This script tests near-duplicate matching, TTL/LRU eviction and hit metrics of the response cache.
+"""
+
+import os
+import sys
+import time
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from response_cache import ResponseCache, normalize_utterance, lead_slots, question_context, get_response_cache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPLY = "Totally fair. Even 10 minutes can find savings. Would Thursday work?"
+
+def test_normalize_utterance():
+    assert normalize_utterance("Um, I'm REALLY busy right now!") == "im really busy right now"
+
+def test_exact_and_near_duplicate_hits():
+    cache = ResponseCache()
+    cache.put("objection_handling", "Plumbing", "I'm really busy right now, we're slammed this week", REPLY)
+
+    assert cache.get("objection_handling", "Plumbing", "Um, I'm really busy right now, we're slammed this week.") == REPLY
+    assert cache.get("objection_handling", "Plumbing", "I'm really busy right now, we're slammed this week honestly") == REPLY
+
+    # Different stage, industry or meaning misses
+    assert cache.get("qualification", "Plumbing", "I'm really busy right now, we're slammed this week") is None
+    assert cache.get("objection_handling", "Roofing", "I'm really busy right now, we're slammed this week") is None
+    assert cache.get("objection_handling", "Plumbing", "We already use another provider for phones") is None
+
+    stats = cache.stats()['stages']
+    assert stats['objection_handling']['hits'] == 2
+    assert stats['objection_handling']['near_hits'] == 1
+    assert stats['objection_handling']['misses'] == 2
+    assert stats['qualification']['hit_rate'] == 0.0
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(ttl=0.05, max_entries=2)
+    cache.put("qualification", None, "we have ten employees", "a")
+    time.sleep(0.1)
+    assert cache.get("qualification", None, "we have ten employees") is None
+
+    cache = ResponseCache(max_entries=2)
+    cache.put("qualification", None, "first answer", "a")
+    cache.put("qualification", None, "second answer", "b")
+    cache.get("qualification", None, "first answer")
+    cache.put("qualification", None, "third answer", "c")
+    assert cache.get("qualification", None, "second answer") is None
+    assert cache.get("qualification", None, "first answer") == "a"
+    assert cache.stats()['entries'] == 2
+
+def test_question_context_is_shared_across_leads():
+    """Leads asked the same question at the same stage share entries, whatever the opener said"""
+    acme = question_context([{"role": "assistant", "content": "Hello, is this Bob? I understand Acme Plumbing works in Denver. Quick question: do your crews use mobile phones?"},
+                             {"role": "user", "content": "Yes"},
+                             {"role": "assistant", "content": "Great, Bob. How many people at Acme Plumbing use one?"}],
+                            lead_slots({"name": "Acme Plumbing", "city": "Denver"}))
+    best = question_context([{"role": "assistant", "content": "Hello, is this Best? I understand Best Pipes works in Aurora. Quick question: do your crews use mobile phones?"},
+                             {"role": "user", "content": "Yep"},
+                             {"role": "assistant", "content": "Great, Best. How many people at Best Pipes use one?"}],
+                            lead_slots({"name": "Best Pipes", "city": "Aurora"}))
+    assert acme == best == "how many people at lead use one"
+    assert question_context([]) == question_context(None) == ""
+
+    cache = ResponseCache()
+    cache.put("qualification", "Plumbing", "about forty", "That's a big team. Who handles your phone bills?", context=acme)
+    assert cache.get("qualification", "Plumbing", "about forty", context=best).startswith("That's a big team")
+    assert cache.get("qualification", "Plumbing", "about forty", context="do you use tablets") is None
+
+def test_speculative_lookups_not_counted():
+    cache = ResponseCache()
+    cache.put("qualification", None, "yes", "a")
+    assert cache.get("qualification", None, "yes", record=False) == "a"
+    assert cache.get("qualification", None, "no", record=False) is None
+    assert cache.stats()['stages']['qualification']['hits'] == 0
+    assert cache.stats()['stages']['qualification']['misses'] == 0
+
+def test_llm_replies_reused_across_leads(db_path, monkeypatch):
+    """get_llm_response reuses a reply for another lead, but never one that names the lead"""
+    import voice
+    from config import get_config
+    config = dict(get_config(), LLM_API_KEY="sk-test-key", RESPONSE_CACHE_ENABLED=True)
+    monkeypatch.setattr(voice, 'get_config', lambda: config)
+    get_response_cache(config).clear()
+    replies = ["That's a big team. Who handles your phone bills?", "Thanks, Ann. Who handles Best Pipes' phone bills?"]
+    calls = []
+
+    class Router:
+        def complete(self, call, fallback):
+            calls.append(fallback)
+            return replies[len(calls) - 1]
+    monkeypatch.setattr(voice, 'get_llm_router', lambda config: Router())
+
+    def ask(lead, city, speech, speculative=False):
+        history = [{"role": "assistant", "content": f"Hello, is this {lead}? Quick question: how many people at {lead} in {city} use a mobile phone?"}]
+        return voice.get_llm_response(speech, history, "qualification", "Plumbing", lead_data={"name": lead, "city": city}, speculative=speculative)
+
+    assert ask("Acme Plumbing", "Denver", "about forty") == replies[0]
+    assert ask("Best Pipes", "Aurora", "about forty", speculative=True) == replies[0]
+    assert ask("Best Pipes", "Aurora", "Um, about forty.") == replies[0]
+    assert len(calls) == 1
+    assert get_response_cache(config).stats()['stages']['qualification']['hits'] == 1
+
+    # The second reply names its lead, so it isn't stored
+    assert ask("Best Pipes", "Aurora", "we have twelve") == replies[1]
+    assert get_response_cache(config).get("qualification", "Plumbing", "we have twelve", context="how many people at lead in lead use a mobile phone", record=False) is None
+    get_response_cache(config).clear()
+
+if __name__ == "__main__":
+    test_normalize_utterance()
+    test_exact_and_near_duplicate_hits()
+    test_question_context_is_shared_across_leads()
+    test_speculative_lookups_not_counted()
+    test_ttl_and_lru_eviction()
+    logger.info("Response cache tests passed")
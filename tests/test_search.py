@@ -0,0 +1,152 @@
+"""
+Steve Appointment Booker - Full-Text Search Test
+This script tests the FTS5 search indexes: trigger sync with leads and both call log tiers,
+query building, ranking, snippets and pagination.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import models
+from search import (ensure_search_index, rebuild_search_index, build_match_query, search_leads,
+                    search_transcripts, search_available)
+from archive import archive_call_logs, delete_archived_logs
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_lead(conn, name, phone, company=None, notes=None, address=None):
+    return conn.execute('INSERT INTO leads (name, phone, company, notes, address) VALUES (?, ?, ?, ?, ?)',
+                        (name, phone, company, notes, address)).lastrowid
+
+def add_log(conn, lead_id, status, transcript, created_at=None):
+    return conn.execute('INSERT INTO call_logs (lead_id, call_status, transcript, created_at) VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))',
+                        (lead_id, status, transcript, created_at)).lastrowid
+
+def lead_ids(conn, text):
+    return [row['id'] for row in search_leads(conn, build_match_query(text))[0]]
+
+def test_build_match_query():
+    assert build_match_query('') is None
+    assert build_match_query('  ?! ') is None
+    assert build_match_query('acme') == '"acme"*'
+    assert build_match_query('already have a provider') == '"already" "have" "a" "provider"*'
+    assert build_match_query('"already have" provider') == '"already have" "provider"*'
+    assert build_match_query('plumb* denver') == '"plumb"* "denver"*'
+    # FTS5 syntax in user input is neutralized rather than raising
+    assert build_match_query('AND OR (x:y) NEAR') == '"AND" "OR" "x" "y" "NEAR"*'
+
+def test_triggers_keep_leads_in_sync(db_path):
+    with models.get_db() as conn:
+        assert search_available(conn)
+        acme = add_lead(conn, 'Acme Plumbing', '3035550100', company='Acme Holdings', address='12 Main St, Denver')
+        other = add_lead(conn, 'Summit HVAC', '3035550101', notes='Mentioned Acme as a competitor')
+        conn.commit()
+
+        # Name and company hits outrank a mention in the notes
+        assert lead_ids(conn, 'acme') == [acme, other]
+        assert lead_ids(conn, 'acm') == [acme, other]
+        assert lead_ids(conn, 'main denver') == [acme]
+
+        conn.execute("UPDATE leads SET name = 'Apex Plumbing', company = NULL WHERE id = ?", (acme,))
+        conn.commit()
+        assert lead_ids(conn, 'acme') == [other]
+        assert lead_ids(conn, 'apex') == [acme]
+
+        conn.execute('DELETE FROM leads WHERE id = ?', (other,))
+        conn.commit()
+        assert lead_ids(conn, 'acme') == []
+        conn.execute("INSERT INTO leads_fts(leads_fts) VALUES ('integrity-check')")
+
+def test_transcript_search(db_path):
+    with models.get_db(with_archive=True) as conn:
+        lead = add_lead(conn, 'Acme Plumbing', '3035550100')
+        started = add_log(conn, lead, 'Started', 'Bot: Hi, this is Steve.')
+        turn = add_log(conn, lead, 'In Progress', 'Lead: We already have a provider <b>thanks</b>')
+        add_log(conn, lead, 'VoicemailTwiML', '<Response><Say>already have a provider</Say></Response>')
+        for i in range(5):
+            add_log(conn, lead, 'In Progress', f'Lead: Our provider contract ends in {i + 2} months')
+        conn.commit()
+
+        results, next_offset = search_transcripts(conn, build_match_query('"already have a provider"'))
+        assert [row['id'] for row in results] == [turn]
+        assert next_offset is None
+        # Only turns are indexed; the call the turn belongs to is included
+        assert results[0]['call_id'] == started and results[0]['lead_name'] == 'Acme Plumbing'
+        # Snippets are HTML-escaped with the matched words marked
+        assert results[0]['snippet'] == 'Lead: We <mark>already have a provider</mark> &lt;b&gt;thanks&lt;/b&gt;'
+
+        first, next_offset = search_transcripts(conn, build_match_query('provider'), limit=4)
+        second, last_offset = search_transcripts(conn, build_match_query('provider'), limit=4, offset=next_offset)
+        assert next_offset == 4 and last_offset is None
+        assert len({row['id'] for row in first + second}) == 6
+
+        recent, _ = search_transcripts(conn, build_match_query('provider'), limit=2, sort='recent')
+        assert recent[0]['id'] > recent[1]['id']
+        assert search_transcripts(conn, build_match_query('provider'), lead_id=lead + 1)[0] == []
+
+        conn.execute('DELETE FROM call_logs WHERE id = ?', (turn,))
+        conn.commit()
+        assert search_transcripts(conn, build_match_query('"already have"'))[0] == []
+        conn.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('integrity-check')")
+
+def test_archived_turns_stay_searchable(db_path):
+    with models.get_db() as conn:
+        lead = add_lead(conn, 'Acme Plumbing', '3035550100')
+        old_call = add_log(conn, lead, 'Started', 'Bot: Hi, this is Steve.', '2023-01-05 10:00:00')
+        old_turn = add_log(conn, lead, 'In Progress', 'Lead: We already have a provider', '2023-01-05 10:00:10')
+        add_log(conn, lead, 'VoicemailTwiML', '<Response><Say>already have a provider</Say></Response>', '2023-01-05 10:00:20')
+        new_call = add_log(conn, lead, 'Started', 'Bot: Hi again, Steve here.')
+        new_turn = add_log(conn, lead, 'In Progress', 'Lead: Still have a provider, sorry')
+        conn.commit()
+        assert archive_call_logs(conn, older_than_days=90) == 3
+
+    with models.get_db(with_archive=True) as conn:
+        results, _ = search_transcripts(conn, build_match_query('"already have a provider"'))
+        assert [row['id'] for row in results] == [old_turn]
+        assert results[0]['call_id'] == old_call and results[0]['lead_name'] == 'Acme Plumbing'
+        assert results[0]['snippet'] == 'Lead: We <mark>already have a provider</mark>'
+
+        # Both tiers are merged and paged together
+        recent, next_offset = search_transcripts(conn, build_match_query('provider'), limit=1, sort='recent')
+        older, last_offset = search_transcripts(conn, build_match_query('provider'), limit=1, offset=next_offset, sort='recent')
+        assert [row['id'] for row in recent + older] == [new_turn, old_turn]
+        assert recent[0]['call_id'] == new_call and last_offset is None
+        assert len(search_transcripts(conn, build_match_query('provider'), lead_id=lead)[0]) == 2
+
+        rebuild_search_index(conn)
+        assert len(search_transcripts(conn, build_match_query('already'))[0]) == 1
+        conn.execute("INSERT INTO transcripts_fts(transcripts_fts) VALUES ('integrity-check')")
+        conn.execute("INSERT INTO archived_transcripts_fts(archived_transcripts_fts) VALUES ('integrity-check')")
+
+        # A deleted lead's archived turns leave the index with them
+        delete_archived_logs(conn, [lead])
+        conn.commit()
+        assert search_transcripts(conn, build_match_query('already'))[0] == []
+
+def test_backfill_existing_database(db_path):
+    with models.get_db(with_archive=True) as conn:
+        lead = add_lead(conn, 'Acme Plumbing', '3035550100')
+        add_log(conn, lead, 'In Progress', 'Lead: Call me next Tuesday')
+        conn.executescript('''
+            DROP TABLE leads_fts; DROP TABLE transcripts_fts;
+            DROP TRIGGER leads_fts_insert; DROP TRIGGER transcripts_fts_insert;
+        ''')
+        # Rows written before the index existed are picked up when it is created
+        assert ensure_search_index(conn)
+        assert lead_ids(conn, 'acme') == [lead]
+        assert len(search_transcripts(conn, build_match_query('tuesday'))[0]) == 1
+
+        rebuild_search_index(conn)
+        assert len(search_transcripts(conn, build_match_query('tuesday'))[0]) == 1
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
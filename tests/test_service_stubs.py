@@ -0,0 +1,71 @@
+"""
+Steve Appointment Booker - Service Stubs Test
+This script tests the local OpenAI, ElevenLabs, Twilio and Zoho stand-ins used by the load test.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import urllib.request
+
+# Add the project root to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+from tests.stubs.services import parse_latency, start_stubs, stop_stubs, stub_environment
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def post(url, payload=None):
+    data = json.dumps(payload or {}).encode('utf-8')
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.headers.get('Content-Type'), response.read()
+
+def test_parse_latency():
+    assert parse_latency('0')() == 0.0
+    assert parse_latency('fixed:0.25')() == 0.25
+    assert all(0.1 <= parse_latency('uniform:0.1,0.2')() <= 0.2 for _ in range(50))
+    assert all(parse_latency('lognormal:0.5,0.4')() > 0 for _ in range(50))
+    try:
+        parse_latency('gamma:1')
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def test_stub_endpoints():
+    stubs = start_stubs({'openai': 'fixed:0.05', 'elevenlabs': '0', 'twilio': '0', 'zoho': '0'})
+    try:
+        env = stub_environment(stubs)
+
+        start = time.perf_counter()
+        status, _, body = post(f"{env['OPENAI_BASE_URL']}/chat/completions", {'model': 'gpt-4', 'messages': []})
+        assert time.perf_counter() - start >= 0.05
+        completion = json.loads(body)
+        assert status == 200 and completion['choices'][0]['message']['content']
+
+        status, content_type, body = post(f"{env['ELEVENLABS_API_URL']}/v1/text-to-speech/stub-voice", {'text': 'Hi'})
+        assert status == 200 and content_type == 'audio/mpeg' and body.startswith(b'ID3')
+
+        account = env['TWILIO_ACCOUNT_SID']
+        status, _, body = post(f"{env['TWILIO_API_URL']}/2010-04-01/Accounts/{account}/Calls/CA123.json")
+        assert status == 200 and json.loads(body)['sid'] == 'CA123'
+        status, _, body = post(f"{env['TWILIO_API_URL']}/2010-04-01/Accounts/{account}/Calls.json")
+        assert status == 201 and json.loads(body)['sid'].startswith('CA')
+
+        status, _, body = post(f"{env['ZOHO_ACCOUNTS_URL']}/oauth/v2/token")
+        assert json.loads(body)['access_token'] == 'stub-token'
+        status, _, body = post(f"{env['ZOHO_API_URL']}/crm/v2/Leads", {'data': [{}]})
+        assert json.loads(body)['data'][0]['code'] == 'SUCCESS'
+
+        assert stubs['openai'].requests == 1 and stubs['twilio'].requests == 2
+    finally:
+        stop_stubs(stubs)
+
+if __name__ == "__main__":
+    test_parse_latency()
+    test_stub_endpoints()
+    logger.info("Service stub tests passed")
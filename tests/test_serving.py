@@ -0,0 +1,117 @@
+"""
+Steve Appointment Booker - Production Serving Test
+This script tests the gunicorn profile: the /ready probe, the gunicorn.conf.py defaults
+and the per-process state that is reset in each forked worker.
+"""
+
+import os
+import sys
+import runpy
+import tempfile
+import importlib.util
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(project_root, 'backend')
+sys.path.append(BACKEND_DIR)
+import models
+import async_turns
+from call_log_writer import call_log_writer, write_call_log
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_ready_probe():
+    if importlib.util.find_spec('flask') is None:
+        pytest.skip("flask is not installed")
+    from app import app
+
+    original = models.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DB_PATH = os.path.join(tmp, 'leads.db')
+        try:
+            client = app.test_client()
+            response = client.get('/ready')
+            assert response.status_code == 503
+            assert 'missing tables' in response.get_json()['checks']['database']
+
+            models.init_db()
+            response = client.get('/ready')
+            assert response.status_code == 200
+            assert response.get_json()['status'] == 'ready'
+
+            # Liveness doesn't depend on the database
+            assert client.get('/health').status_code == 200
+        finally:
+            models.DB_PATH = original
+
+def test_gunicorn_config():
+    conf = os.path.join(BACKEND_DIR, 'gunicorn.conf.py')
+    saved = {key: os.environ.get(key) for key in ('ASYNC_TURNS', 'GUNICORN_WORKERS', 'GUNICORN_THREADS')}
+    try:
+        for key in saved:
+            os.environ.pop(key, None)
+        settings = runpy.run_path(conf)
+        assert settings['worker_class'] == 'gthread'
+        assert settings['threads'] >= 8
+        assert settings['preload_app'] is True
+        assert 1 <= settings['workers'] <= 4
+
+        # In-process async turns need every poll to reach the same worker
+        os.environ['ASYNC_TURNS'] = 'true'
+        assert runpy.run_path(conf)['workers'] == 1
+        os.environ['GUNICORN_WORKERS'] = '3'
+        os.environ['GUNICORN_THREADS'] = '32'
+        settings = runpy.run_path(conf)
+        assert settings['workers'] == 3 and settings['threads'] == 32
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def test_fork_reset():
+    if not hasattr(os, 'fork'):
+        pytest.skip("os.fork is not available")
+
+    original = models.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        models.DB_PATH = os.path.join(tmp, 'leads.db')
+        try:
+            models.init_db()
+            # Start the parent's writer thread and turn pool before forking
+            write_call_log(1, 'Started', 'parent').wait()
+            assert async_turns.submit_turn(lambda: 'parent')[1].result(timeout=5) == 'parent'
+
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    assert call_log_writer._thread is None
+                    assert async_turns._turns == {}
+                    # The child starts its own threads on first use
+                    write_call_log(1, 'Started', 'child').wait()
+                    assert async_turns.submit_turn(lambda: 'child')[1].result(timeout=5) == 'child'
+                    code = 0
+                finally:
+                    os._exit(code)
+            _, status = os.waitpid(pid, 0)
+            assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+            with models.get_db() as conn:
+                transcripts = [row[0] for row in conn.execute('SELECT transcript FROM call_logs ORDER BY id')]
+            assert transcripts == ['parent', 'child']
+        finally:
+            call_log_writer.flush()
+            models.DB_PATH = original
+
+if __name__ == "__main__":
+    test_ready_probe()
+    test_gunicorn_config()
+    test_fork_reset()
+    logger.info("Production serving tests passed")
@@ -0,0 +1,82 @@
+"""
+Steve Appointment Booker - Speculation Test
+This script tests branch selection and the schedule/pick cycle of speculative reply generation.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+from speculation import candidates_for, spoken_employee_count, match_branch, schedule_speculation, pick_speculation
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_HISTORY = [
+    {"role": "assistant", "content": "Hello, this is Steve with Seamless Mobile Services."},
+    {"role": "user", "content": "Hi."},
+    {"role": "assistant", "content": "Great! And how many employees do you have?"}
+]
+
+def test_candidates_for():
+    assert set(candidates_for(EMPLOYEE_HISTORY)) == {"employees:small", "employees:large"}
+    assert set(candidates_for([{"role": "assistant", "content": "Do you use mobile devices?"}])) == {"yes", "no"}
+    # Nothing to speculate on when the bot didn't ask anything
+    assert candidates_for([{"role": "assistant", "content": "I'll be brief."}]) == {}
+
+def test_employee_branches():
+    assert spoken_employee_count("About 25 of us") == 25
+    assert spoken_employee_count("maybe twenty people") == 20
+    assert spoken_employee_count("it's just me") is None
+
+    branches = {"employees:small": None, "employees:large": None}
+    assert match_branch("We have about 40", branches) == "employees:large"
+    assert match_branch("five or so", branches) == "employees:small"
+    assert match_branch("why do you ask?", branches) is None
+
+def test_schedule_and_pick():
+    generated = []
+    rendered = []
+
+    def generate(utterance, history, history_digest):
+        generated.append(utterance)
+        return f"reply to {utterance}", "hash123"
+
+    def render(reply, history):
+        rendered.append(reply)
+
+    schedule_speculation(42, EMPLOYEE_HISTORY, None, "qualification", generate, render)
+    reply, prompt_hash = pick_speculation(42, EMPLOYEE_HISTORY, "We've got about 60 employees")
+    assert reply == "reply to We have more than 10 employees."
+    assert prompt_hash == "hash123"
+    assert len(generated) == 2
+    assert reply in rendered
+
+    # Picked entries are consumed, and other leads or turns never match
+    assert pick_speculation(42, EMPLOYEE_HISTORY, "60") is None
+    schedule_speculation(42, EMPLOYEE_HISTORY, None, "qualification", generate, render)
+    assert pick_speculation(43, EMPLOYEE_HISTORY, "60") is None
+    assert pick_speculation(42, EMPLOYEE_HISTORY[:1], "60") is None
+
+def test_call_start_skips_history_when_disabled(db_path, monkeypatch):
+    pytest.importorskip('twilio')
+    import app as app_module
+    config = {'TEST_MODE': True, 'SPECULATION_ENABLED': 'false'}
+    monkeypatch.setattr(app_module, 'get_config', lambda: config)
+
+    def load_conversation(conn, lead_id):
+        raise AssertionError("history loaded with speculation off")
+
+    monkeypatch.setattr(app_module, 'load_conversation', load_conversation)
+    response = app_module.app.test_client().post('/webhook/voice?lead_id=1')
+    assert response.status_code == 200 and '<Response>' in response.get_data(as_text=True)
+
+if __name__ == "__main__":
+    # The database fixture lives in conftest.py, so run the tests through pytest
+    sys.exit(pytest.main([__file__, "-q"]))
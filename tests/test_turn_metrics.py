@@ -0,0 +1,101 @@
+"""
+Steve Appointment Booker - Turn Metrics Test
+This script tests per-stage turn timing, the Prometheus histograms (merged across workers) and the slow-turn buffer.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import logging
+
+# Add the backend directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(project_root, 'backend'))
+import turn_metrics
+from turn_metrics import start_turn, checkpoint, span, annotate_turn, slow_turns, render_metrics, Histogram
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_stages_are_timed():
+    with start_turn(7, 'CA123') as turn:
+        annotate_turn(turn_index=3)
+        time.sleep(0.02)
+        checkpoint('history_load')
+        with span('llm'):
+            time.sleep(0.02)
+        checkpoint('process')
+    assert turn.turn_index == 3
+    assert turn.stages['history_load'] >= 0.02
+    assert turn.stages['llm'] >= 0.02
+    # Checkpoints cover everything since the previous one, including nested spans
+    assert turn.stages['process'] >= turn.stages['llm']
+
+    # Outside a turn the helpers do nothing
+    checkpoint('history_load')
+    with span('llm'):
+        pass
+    assert turn_metrics.current_turn() is None
+
+def test_histogram_rendering():
+    histogram = Histogram('test_seconds', 'Test latency', label='stage', buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'llm')
+    histogram.observe(0.5, 'llm')
+    histogram.observe(2.0, 'llm')
+    text = histogram.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="llm",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{stage="llm",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="llm"} 3' in text
+
+    text = render_metrics()
+    assert 'voice_turn_seconds_count' in text
+    assert 'voice_turn_stage_seconds_bucket{stage="history_load"' in text
+
+def test_slow_turns_are_kept():
+    threshold = turn_metrics.SLOW_TURN_SECONDS
+    turn_metrics.SLOW_TURN_SECONDS = 0.01
+    try:
+        with start_turn(8, 'CA456'):
+            time.sleep(0.02)
+            checkpoint('tts')
+        with start_turn(9, 'CA789'):
+            pass
+    finally:
+        turn_metrics.SLOW_TURN_SECONDS = threshold
+    slow = slow_turns()
+    assert [turn['call_sid'] for turn in slow] == ['CA456']
+    assert slow[0]['stages_ms']['tts'] >= 20
+
+def test_metrics_from_every_worker():
+    metrics_dir = tempfile.mkdtemp()
+    try:
+        # Another worker flushed one 0.3s turn a moment ago; a long-gone worker left a stale snapshot
+        with open(os.path.join(metrics_dir, '4242.json'), 'w') as f:
+            json.dump({'voice_turn_seconds': [[None, [0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 0.3, 1]]]}, f)
+        stale = os.path.join(metrics_dir, '1111.json')
+        with open(stale, 'w') as f:
+            json.dump({'voice_turn_seconds': [[None, [1] * 10 + [0.01, 1]]]}, f)
+        os.utime(stale, (time.time() - turn_metrics.STALE_SNAPSHOT_SECONDS - 1,) * 2)
+
+        with start_turn(10, 'CA999'):
+            checkpoint('history_load')
+        text = render_metrics(metrics_dir)
+        assert 'voice_turn_seconds_count{worker="4242"} 1' in text
+        assert f'voice_turn_seconds_count{{worker="{os.getpid()}"}}' in text
+        assert f'voice_turn_stage_seconds_bucket{{worker="{os.getpid()}",stage="history_load",le="0.05"}}' in text
+        assert 'worker="1111"' not in text and not os.path.exists(stale)
+    finally:
+        shutil.rmtree(metrics_dir)
+
+if __name__ == "__main__":
+    test_stages_are_timed()
+    test_histogram_rendering()
+    test_slow_turns_are_kept()
+    test_metrics_from_every_worker()
+    logger.info("Turn metrics tests passed")